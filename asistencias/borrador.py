@@ -0,0 +1,105 @@
+# asistencias/borrador.py
+#
+# Borrador de la toma de asistencia.
+#
+# Mientras el profesor marca la lista, cada clic ya no escribe en la base de
+# datos: el navegador agrupa los cambios y los envía en lotes (con debounce)
+# y aquí se acumulan en la sesión del profesor, una entrada por grupo y
+# fecha. Al confirmar, la lista completa se guarda de una sola vez dentro de
+# una transacción (get_or_create del registro + guardar_asistencia_masiva) y
+# el borrador se descarta.
+
+from django.db import transaction
+
+from .models import RegistroAsistencia
+from .registro import guardar_asistencia_masiva
+
+
+CLAVE_SESION = 'borradores_asistencia'
+ESTADOS_SIMPLES = {'A': 'PRESENTE', 'F': 'FALTA'}
+MAX_CAMBIOS_POR_LOTE = 500
+
+
+def _clave(grupo_id, fecha):
+    return f"{grupo_id}|{fecha.isoformat()}"
+
+
+def obtener_borrador(session, grupo_id, fecha):
+    """Cambios pendientes {cui: 'A' | 'F'} del grupo en la fecha indicada."""
+    return dict(session.get(CLAVE_SESION, {}).get(_clave(grupo_id, fecha), {}))
+
+
+def agregar_cambios(session, grupo_id, fecha, cambios):
+    """
+    Aplica un lote de cambios [{'cui': ..., 'estado': 'A' | 'F'}, ...] sobre el
+    borrador. El último cambio de cada estudiante es el que vale. Se valida
+    el lote completo antes de tocar la sesión; lanza ValueError si algo falla.
+    Devuelve el borrador resultante.
+    """
+    if not isinstance(cambios, list) or not cambios:
+        raise ValueError("No se recibieron cambios.")
+    if len(cambios) > MAX_CAMBIOS_POR_LOTE:
+        raise ValueError(f"Demasiados cambios en un solo envío (máximo {MAX_CAMBIOS_POR_LOTE}).")
+
+    lote = {}
+    for cambio in cambios:
+        if not isinstance(cambio, dict):
+            raise ValueError("Formato de cambio inválido.")
+        cui = str(cambio.get('cui') or '').strip()
+        estado = cambio.get('estado')
+        if not cui or estado not in ESTADOS_SIMPLES:
+            raise ValueError("Cada cambio debe indicar 'cui' y 'estado' (A o F).")
+        lote[cui] = estado
+
+    borradores = session.get(CLAVE_SESION, {})
+    borrador = borradores.setdefault(_clave(grupo_id, fecha), {})
+    borrador.update(lote)
+    session[CLAVE_SESION] = borradores
+    session.modified = True
+    return dict(borrador)
+
+
+def descartar_borrador(session, grupo_id, fecha):
+    borradores = session.get(CLAVE_SESION, {})
+    if borradores.pop(_clave(grupo_id, fecha), None) is not None:
+        session[CLAVE_SESION] = borradores
+        session.modified = True
+
+
+def confirmar_borrador(session, grupo, fecha, estudiantes_ids, ip_profesor, hora_inicio):
+    """
+    Guarda la lista completa del grupo en una sola transacción.
+
+    `estudiantes_ids` son los estudiantes matriculados en el grupo. Para cada
+    uno vale el estado del borrador; si no lo tocó, se conserva lo ya
+    guardado y, si la sesión recién se crea, se asume PRESENTE (lo mismo que
+    muestra la pantalla por defecto). Los CUIs del borrador que no
+    pertenecen al grupo se ignoran.
+
+    Devuelve (registro, creados, actualizados).
+    """
+    borrador = obtener_borrador(session, grupo.id, fecha)
+
+    with transaction.atomic():
+        registro, creado = RegistroAsistencia.objects.get_or_create(
+            grupo_curso=grupo,
+            fechaClase=fecha,
+            defaults={'ipProfesor': ip_profesor, 'horaInicioVentana': hora_inicio},
+        )
+        if creado:
+            guardados = {}
+        else:
+            guardados = dict(registro.registroasistenciadetalle_set.values_list('estudiante_id', 'estado'))
+
+        estados = {}
+        for estudiante_id in estudiantes_ids:
+            estado_simple = borrador.get(str(estudiante_id))
+            if estado_simple:
+                estados[estudiante_id] = ESTADOS_SIMPLES[estado_simple]
+            else:
+                estados[estudiante_id] = guardados.get(estudiante_id, 'PRESENTE' if creado else 'FALTA')
+
+        creados, actualizados = guardar_asistencia_masiva(registro, estados)
+
+    descartar_borrador(session, grupo.id, fecha)
+    return registro, creados, actualizados
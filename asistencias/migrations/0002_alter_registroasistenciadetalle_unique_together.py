@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2025-11-20 09:42
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def eliminar_detalles_duplicados(apps, schema_editor):
+    # Antes de crear la restricción se conserva solo el detalle más reciente
+    # de cada (registro, estudiante).
+    Detalle = apps.get_model('asistencias', 'RegistroAsistenciaDetalle')
+    duplicados = (
+        Detalle.objects.values('registro_asistencia', 'estudiante')
+        .annotate(total=Count('id'), ultimo=Max('id'))
+        .filter(total__gt=1)
+    )
+    for fila in duplicados:
+        Detalle.objects.filter(
+            registro_asistencia=fila['registro_asistencia'],
+            estudiante=fila['estudiante'],
+        ).exclude(id=fila['ultimo']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_detalles_duplicados, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='registroasistenciadetalle',
+            unique_together={('registro_asistencia', 'estudiante')},
+        ),
+    ]
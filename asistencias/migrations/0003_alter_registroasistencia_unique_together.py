@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2025-11-25 09:30
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def fusionar_sesiones_duplicadas(apps, schema_editor):
+    # Antes de crear la restricción se deja una sola sesión por (grupo, fecha):
+    # se conserva la más antigua y se le pasan los detalles de las demás
+    # (si el estudiante ya tiene estado en la conservada, gana ese).
+    Registro = apps.get_model('asistencias', 'RegistroAsistencia')
+    Detalle = apps.get_model('asistencias', 'RegistroAsistenciaDetalle')
+    duplicados = (
+        Registro.objects.values('grupo_curso', 'fechaClase')
+        .annotate(total=Count('id'), primero=Min('id'))
+        .filter(total__gt=1)
+    )
+    for fila in duplicados:
+        sobrantes = list(
+            Registro.objects.filter(grupo_curso=fila['grupo_curso'], fechaClase=fila['fechaClase'])
+            .exclude(id=fila['primero'])
+            .values_list('id', flat=True)
+        )
+        ya_registrados = set(
+            Detalle.objects.filter(registro_asistencia_id=fila['primero']).values_list('estudiante_id', flat=True)
+        )
+        for detalle in Detalle.objects.filter(registro_asistencia_id__in=sobrantes).order_by('-id'):
+            if detalle.estudiante_id in ya_registrados:
+                detalle.delete()
+            else:
+                detalle.registro_asistencia_id = fila['primero']
+                detalle.save(update_fields=['registro_asistencia'])
+                ya_registrados.add(detalle.estudiante_id)
+        Registro.objects.filter(id__in=sobrantes).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0002_alter_registroasistenciadetalle_unique_together'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_sesiones_duplicadas, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='registroasistencia',
+            unique_together={('grupo_curso', 'fechaClase')},
+        ),
+    ]
@@ -18,6 +18,8 @@ class RegistroAsistencia(models.Model):
 
     class Meta:
         db_table = 'RegistroAsistencia'
+        # Una sola sesión por grupo y fecha (get_or_create del guardado de asistencia)
+        unique_together = ('grupo_curso', 'fechaClase')
         verbose_name = 'Registro de Asistencia'
         verbose_name_plural = 'Registros de Asistencia'
 
@@ -47,5 +49,8 @@ class RegistroAsistenciaDetalle(models.Model):
 
     class Meta:
         db_table = 'RegistroAsistencia_Detalle'
+        # Un solo estado por estudiante en cada sesión (evita duplicados entre
+        # el guardado AJAX y el guardado masivo)
+        unique_together = ('registro_asistencia', 'estudiante')
         verbose_name = 'Detalle de Asistencia'
         verbose_name_plural = 'Detalles de Asistencia'
\ No newline at end of file
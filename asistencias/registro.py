@@ -0,0 +1,64 @@
+# asistencias/registro.py
+#
+# Escritura de asistencias en bloque.
+
+from django.db import IntegrityError, transaction
+
+from .models import RegistroAsistenciaDetalle
+
+
+ESTADOS_VALIDOS = ('PRESENTE', 'FALTA')
+
+
+def _escribir_detalles(registro, estados):
+    existentes = {
+        detalle.estudiante_id: detalle
+        for detalle in RegistroAsistenciaDetalle.objects.filter(registro_asistencia=registro)
+    }
+
+    nuevos = []
+    modificados = []
+    for estudiante_id, estado in estados.items():
+        detalle = existentes.get(estudiante_id)
+        if detalle is None:
+            nuevos.append(RegistroAsistenciaDetalle(
+                registro_asistencia=registro,
+                estudiante_id=estudiante_id,
+                estado=estado,
+            ))
+        elif detalle.estado != estado:
+            detalle.estado = estado
+            modificados.append(detalle)
+
+    if nuevos:
+        RegistroAsistenciaDetalle.objects.bulk_create(nuevos)
+    if modificados:
+        RegistroAsistenciaDetalle.objects.bulk_update(modificados, ['estado'])
+
+    return len(nuevos), len(modificados)
+
+
+def guardar_asistencia_masiva(registro, estados):
+    """
+    Guarda el estado de asistencia de varios estudiantes en un registro (sesión).
+
+    `estados` es un dict {estudiante_id: 'PRESENTE' | 'FALTA'}. Se leen los
+    detalles existentes del registro en una sola consulta y luego se ejecuta
+    un bulk_create para los nuevos y un bulk_update para los que cambiaron.
+
+    La restricción única (registro_asistencia, estudiante) impide duplicados
+    si un guardado AJAX inserta al mismo estudiante en paralelo; en ese caso
+    se vuelve a leer y se reintenta una vez.
+
+    Devuelve (creados, actualizados).
+    """
+    for estado in estados.values():
+        if estado not in ESTADOS_VALIDOS:
+            raise ValueError(f"Estado de asistencia inválido: {estado}")
+
+    try:
+        with transaction.atomic():
+            return _escribir_detalles(registro, estados)
+    except IntegrityError:
+        with transaction.atomic():
+            return _escribir_detalles(registro, estados)
@@ -0,0 +1,167 @@
+# asistencias/reportes.py
+#
+# Exportación de asistencia en streaming (CSV / XLSX).
+#
+# El reporte clásico arma el pivote completo { CUI: { fecha: estado } } en
+# memoria antes de escribir el archivo. Aquí las filas se producen con un
+# generador: los estudiantes se procesan por lotes y para cada lote se
+# recorren sus detalles ordenados por estudiante con .iterator(), así que en
+# memoria solo vive un lote a la vez. El driver de MySQL no usa cursores del
+# lado del servidor (trae el resultado completo de cada consulta), por eso
+# el corte se hace por lotes de estudiantes y no con un único cursor.
+
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from cursos.models import GrupoCurso, GrupoLaboratorio
+from matriculas.models import Matricula, MatriculaLaboratorio
+from .models import RegistroAsistencia, RegistroAsistenciaDetalle
+
+
+# Estudiantes cuyo detalle se carga por consulta
+TAMANO_LOTE = 500
+
+ENCABEZADO_GENERAL = ['CURSO', 'GRUPO', 'CUI', 'ALUMNO', 'FECHA', 'ESTADO']
+
+
+def _matriculas_del_grupo(grupo):
+    # Determinar si es un grupo de Laboratorio
+    if GrupoLaboratorio.objects.filter(grupo_curso=grupo).exists():
+        return MatriculaLaboratorio.objects.filter(laboratorio_id=grupo.id)
+    return Matricula.objects.filter(grupo_curso=grupo)
+
+
+def _abreviar(estado):
+    return 'A' if estado == 'PRESENTE' else 'F'
+
+
+# ----------------------------------------------------------------------
+# GENERADORES DE FILAS
+# ----------------------------------------------------------------------
+
+def filas_asistencia_grupo(grupo, tamano_lote=TAMANO_LOTE):
+    """
+    Filas del reporte de un grupo: encabezado (CUI, ALUMNO, fechas...) y
+    una fila por estudiante matriculado con 'A'/'F' por sesión.
+    """
+    fechas = list(
+        RegistroAsistencia.objects.filter(grupo_curso=grupo)
+                                  .order_by('fechaClase')
+                                  .values_list('fechaClase', flat=True)
+                                  .distinct()
+    )
+    columnas = {fecha: indice for indice, fecha in enumerate(fechas)}
+    yield ['CUI', 'ALUMNO'] + [fecha.strftime('%d/%m') for fecha in fechas]
+
+    # Solo (CUI, nombre): es lo único que se guarda de todos los estudiantes
+    estudiantes = list(
+        _matriculas_del_grupo(grupo).order_by('estudiante__perfil__nombre')
+                                    .values_list('estudiante_id', 'estudiante__perfil__nombre')
+    )
+
+    for desde in range(0, len(estudiantes), tamano_lote):
+        lote = estudiantes[desde:desde + tamano_lote]
+        registros = {cui: [''] * len(fechas) for cui, _ in lote}
+
+        detalles = RegistroAsistenciaDetalle.objects.filter(
+            registro_asistencia__grupo_curso=grupo,
+            estudiante_id__in=registros.keys(),
+        ).order_by('estudiante_id', 'registro_asistencia__fechaClase').values_list(
+            'estudiante_id', 'registro_asistencia__fechaClase', 'estado'
+        )
+        for cui, fecha, estado in detalles.iterator(chunk_size=tamano_lote):
+            registros[cui][columnas[fecha]] = _abreviar(estado)
+
+        for cui, nombre in lote:
+            yield [cui, nombre] + registros[cui]
+
+
+def grupos_exportables(profesor):
+    """Grupos del profesor cuyo curso ya tiene sílabo (requisito para exportar)."""
+    return GrupoCurso.objects.filter(profesor=profesor, curso__silabo_url__gt='')
+
+
+def filas_asistencia_profesor(profesor, tamano_lote=TAMANO_LOTE):
+    """
+    Reporte de todos los grupos de un profesor en formato largo (una fila por
+    estudiante y sesión), ya que cada grupo tiene sus propias fechas. Solo se
+    incluyen los grupos cuyo curso tiene sílabo. Se recorre grupo por grupo
+    y, dentro de cada grupo, por lotes de estudiantes (igual que el reporte
+    de un grupo), para no traer todos los detalles en una sola consulta.
+    """
+    yield list(ENCABEZADO_GENERAL)
+
+    grupos = grupos_exportables(profesor).order_by('curso__nombre', 'grupo') \
+                                         .values_list('id', 'curso__nombre', 'grupo')
+    for grupo_id, curso, grupo in grupos:
+        estudiantes = list(
+            RegistroAsistenciaDetalle.objects.filter(registro_asistencia__grupo_curso_id=grupo_id)
+                                             .order_by('estudiante__perfil__nombre', 'estudiante_id')
+                                             .values_list('estudiante_id', 'estudiante__perfil__nombre')
+                                             .distinct()
+        )
+
+        for desde in range(0, len(estudiantes), tamano_lote):
+            lote = estudiantes[desde:desde + tamano_lote]
+            registros = {cui: [] for cui, _ in lote}
+
+            detalles = RegistroAsistenciaDetalle.objects.filter(
+                registro_asistencia__grupo_curso_id=grupo_id,
+                estudiante_id__in=registros.keys(),
+            ).order_by('estudiante_id', 'registro_asistencia__fechaClase').values_list(
+                'estudiante_id', 'registro_asistencia__fechaClase', 'estado'
+            )
+            for cui, fecha, estado in detalles.iterator(chunk_size=tamano_lote):
+                registros[cui].append((fecha, estado))
+
+            for cui, nombre in lote:
+                for fecha, estado in registros[cui]:
+                    yield [curso, grupo, cui, nombre, fecha.strftime('%d/%m/%Y'), _abreviar(estado)]
+
+
+# ----------------------------------------------------------------------
+# RESPUESTAS HTTP
+# ----------------------------------------------------------------------
+
+class _Eco:
+    """Buffer mínimo para csv.writer: devuelve la línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def respuesta_csv(filas, nombre_archivo):
+    escritor = csv.writer(_Eco())
+
+    def contenido():
+        yield '\ufeff'  # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+        for fila in filas:
+            yield escritor.writerow(fila)
+
+    return StreamingHttpResponse(
+        contenido(),
+        content_type='text/csv; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename="{nombre_archivo}"'},
+    )
+
+
+def respuesta_xlsx(filas, nombre_archivo, titulo='Registro Asistencia'):
+    # En modo write_only openpyxl vuelca cada fila a disco al agregarla
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(titulo[:31])
+    for fila in filas:
+        sheet.append(fila)
+
+    archivo = tempfile.TemporaryFile()
+    workbook.save(archivo)
+    archivo.seek(0)
+
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=nombre_archivo,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
@@ -44,7 +44,8 @@ INSTALLED_APPS = [
     'reservas',
     'cursos',
     'matriculas',
-    'asistencias'
+    'asistencias',
+    'exportaciones',
 ]
 
 MIDDLEWARE = [
@@ -95,6 +96,28 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# 'dashboard' guarda las métricas de los paneles de Secretaría/Administrador
+# (usuarios/metricas.py). LocMemCache es por proceso: si se despliega con
+# varios workers conviene usar el backend de archivos para que la
+# invalidación por señales llegue a todos, por ejemplo:
+#     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#     'LOCATION': BASE_DIR / 'cache' / 'dashboard',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sistema-academico',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard-metricas',
+        'TIMEOUT': 600,  # Límite de antigüedad aunque no llegue ninguna señal
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,6 +158,12 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
 
+# Exportaciones (PDF/Excel) generadas por el comando `procesar_exportaciones`
+# (ver exportaciones/cola.py). Los archivos se nombran con la huella de sus
+# datos de entrada, así que pueden borrarse en cualquier momento.
+
+EXPORTACIONES_DIR = os.path.join(BASE_DIR, 'archivos_generados', 'exportaciones')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,250 @@
+# cursos/horarios.py
+#
+# Motor de horarios semanales.
+#
+# Todas las vistas de horario (alumno, profesor, reserva de aulas y horario por
+# aula de secretaría/administración) construyen la misma grilla: se toman los
+# inicios y fines de todos los bloques como "puntos de corte", cada par de
+# puntos consecutivos forma una fila y en cada fila/día se busca el bloque
+# activo. Antes cada vista recorría TODOS los bloques por cada celda
+# (filas x días x bloques); aquí los bloques se indexan una sola vez por día y
+# se recorren con un barrido (sweep-line), así que el costo pasa a ser
+# O(B log B + filas x días).
+#
+# Los tiempos se manejan internamente en minutos desde las 00:00 (se descartan
+# segundos, igual que hacían las vistas con replace(second=0, microsecond=0)).
+
+from bisect import bisect_left, insort
+from datetime import time
+
+
+DIAS_SEMANA = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
+
+# Filas más cortas que esto (en minutos) se descartan al armar la grilla.
+# Coincide con el umbral que usaban las vistas de horario.
+DURACION_MINIMA_FILA = 11
+
+
+# ----------------------------------------------------------------------
+# CONVERSIONES
+# ----------------------------------------------------------------------
+
+def a_minutos(valor):
+    """Convierte un time, un string 'HH:MM[:SS]' o un entero a minutos del día."""
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str):
+        partes = valor.split(':')
+        return int(partes[0]) * 60 + int(partes[1])
+    return valor.hour * 60 + valor.minute
+
+
+def a_time(minutos):
+    """Convierte minutos del día a un objeto time."""
+    return time(minutos // 60, minutos % 60)
+
+
+def formatear_minutos(minutos, con_segundos=False):
+    """Formatea minutos del día como 'HH:MM' (o 'HH:MM:SS')."""
+    texto = f"{minutos // 60:02d}:{minutos % 60:02d}"
+    return f"{texto}:00" if con_segundos else texto
+
+
+def formatear_rango(inicio, fin, con_segundos=False):
+    return f"{formatear_minutos(inicio, con_segundos)} - {formatear_minutos(fin, con_segundos)}"
+
+
+# ----------------------------------------------------------------------
+# FILAS DE LA GRILLA
+# ----------------------------------------------------------------------
+
+def puntos_de_corte(intervalos, extras=()):
+    """
+    Devuelve la lista ordenada (sin repetidos) de inicios y fines.
+    `intervalos` es un iterable de pares (inicio, fin); `extras` permite
+    forzar límites adicionales (por ejemplo el inicio y fin de la jornada).
+    """
+    puntos = set(a_minutos(p) for p in extras)
+    for inicio, fin in intervalos:
+        puntos.add(a_minutos(inicio))
+        puntos.add(a_minutos(fin))
+    return sorted(puntos)
+
+
+def filas_de_horario(puntos, duracion_minima=DURACION_MINIMA_FILA):
+    """
+    Convierte los puntos de corte en filas (inicio, fin) en minutos.
+    Las filas con duración menor a `duracion_minima` se omiten.
+    """
+    filas = []
+    for inicio, fin in zip(puntos, puntos[1:]):
+        if fin - inicio < duracion_minima or inicio >= fin:
+            continue
+        filas.append((inicio, fin))
+    return filas
+
+
+# ----------------------------------------------------------------------
+# ÍNDICE DE INTERVALOS
+# ----------------------------------------------------------------------
+
+class IndiceHorario:
+    """
+    Índice de intervalos agrupados por clave (día de la semana, fecha, aula...).
+
+    Se construye a partir de tuplas (clave, inicio, fin, dato). Por clave los
+    intervalos quedan ordenados por inicio junto con el máximo fin acumulado,
+    lo que permite consultar solapamientos con búsqueda binaria y cortar el
+    recorrido en cuanto ningún intervalo anterior puede llegar al rango
+    consultado.
+
+    Cuando varios intervalos coinciden, los resultados se devuelven en el
+    orden en que fueron agregados (igual que el recorrido original del
+    queryset), de modo que "el primero" sigue siendo el mismo bloque.
+    """
+
+    def __init__(self, intervalos=()):
+        self._items = {}
+        self._inicios = {}
+        self._max_fin = {}
+        self._total = 0
+        for clave, inicio, fin, dato in intervalos:
+            self._items.setdefault(clave, []).append(
+                (a_minutos(inicio), a_minutos(fin), self._total, dato)
+            )
+            self._total += 1
+
+        for clave, items in self._items.items():
+            items.sort(key=lambda item: (item[0], item[2]))
+            acumulado = []
+            maximo = -1
+            for item in items:
+                maximo = max(maximo, item[1])
+                acumulado.append(maximo)
+            self._inicios[clave] = [item[0] for item in items]
+            self._max_fin[clave] = acumulado
+
+    def __len__(self):
+        return self._total
+
+    def claves(self):
+        return self._items.keys()
+
+    def intervalos(self, clave):
+        """Intervalos (inicio, fin, dato) de una clave, ordenados por inicio."""
+        return [(i, f, d) for i, f, _, d in self._items.get(clave, [])]
+
+    def solapados(self, clave, inicio, fin):
+        """Datos cuyos intervalos se cruzan con [inicio, fin) en la clave dada."""
+        items = self._items.get(clave)
+        if not items:
+            return []
+        inicio = a_minutos(inicio)
+        fin = a_minutos(fin)
+
+        # Solo pueden cruzarse los que empiezan antes de `fin`
+        limite = bisect_left(self._inicios[clave], fin)
+        max_fin = self._max_fin[clave]
+        encontrados = []
+        for posicion in range(limite - 1, -1, -1):
+            if max_fin[posicion] <= inicio:
+                break  # Ningún intervalo anterior termina después de `inicio`
+            item = items[posicion]
+            if item[1] > inicio:
+                encontrados.append(item)
+        encontrados.sort(key=lambda item: item[2])
+        return [item[3] for item in encontrados]
+
+    def hay_cruce(self, clave, inicio, fin):
+        return bool(self.solapados(clave, inicio, fin))
+
+    def barrer(self, clave, filas):
+        """
+        Barrido sobre filas ordenadas: para cada (inicio, fin) devuelve la lista
+        de datos activos al inicio de la fila (inicio_bloque <= inicio_fila < fin_bloque).
+        """
+        items = self._items.get(clave, [])
+        resultado = []
+        activos = []  # (orden, fin, dato) ordenados por orden de inserción
+        siguiente = 0
+        for inicio_fila, _ in filas:
+            while siguiente < len(items) and items[siguiente][0] <= inicio_fila:
+                _, fin, orden, dato = items[siguiente]
+                insort(activos, (orden, fin, dato), key=lambda activo: activo[0])
+                siguiente += 1
+            activos = [activo for activo in activos if activo[1] > inicio_fila]
+            resultado.append([activo[2] for activo in activos])
+        return resultado
+
+    def cruces(self, clave):
+        """Pares (dato_a, dato_b) de intervalos que se solapan dentro de una clave."""
+        pares = []
+        activos = []
+        for inicio, fin, _, dato in self._items.get(clave, []):
+            activos = [activo for activo in activos if activo[0] > inicio]
+            for _, otro in activos:
+                pares.append((otro, dato))
+            activos.append((fin, dato))
+        return pares
+
+
+# ----------------------------------------------------------------------
+# GRILLA SEMANAL
+# ----------------------------------------------------------------------
+
+def construir_grilla(intervalos, claves=DIAS_SEMANA, duracion_minima=DURACION_MINIMA_FILA, filas=None):
+    """
+    Arma la grilla semanal a partir de tuplas (clave, inicio, fin, dato).
+
+    Devuelve una lista de filas; cada fila es un dict con:
+        'inicio', 'fin' -> minutos del día
+        'rango'         -> texto 'HH:MM - HH:MM'
+        'celdas'        -> lista (una por clave) con los datos activos en esa celda
+    Si se pasan `filas` explícitas se usan tal cual (por ejemplo, una grilla
+    por defecto cuando no hay bloques).
+    """
+    intervalos = list(intervalos)
+    if filas is None:
+        puntos = puntos_de_corte((inicio, fin) for _, inicio, fin, _ in intervalos)
+        filas = filas_de_horario(puntos, duracion_minima)
+
+    indice = IndiceHorario(intervalos)
+    por_clave = [indice.barrer(clave, filas) for clave in claves]
+
+    grilla = []
+    for fila_index, (inicio, fin) in enumerate(filas):
+        grilla.append({
+            'inicio': inicio,
+            'fin': fin,
+            'rango': formatear_rango(inicio, fin),
+            'celdas': [activos[fila_index] for activos in por_clave],
+        })
+    return grilla
+
+
+def grilla_actividades(actividades):
+    """
+    Grilla semanal de un aula a partir de actividades (clases y reservas)
+    representadas como dicts con 'dia', 'horaInicio' y 'horaFin'.
+
+    Devuelve (horas, celdas) donde `horas` son los rangos 'HH:MM - HH:MM' y
+    celdas[hora_idx][dia_idx] es la primera actividad activa en ese slot o None.
+    Si no hay actividades se usa una grilla por defecto de 07:00 a 21:00.
+    """
+    intervalos = [
+        (actividad['dia'], actividad['horaInicio'], actividad['horaFin'], actividad)
+        for actividad in actividades
+    ]
+    filas = filas_de_horario(puntos_de_corte((inicio, fin) for _, inicio, fin, _ in intervalos))
+
+    # Si no hay actividades, usar horas por defecto (bloques de una hora)
+    if not filas:
+        filas = [(hora * 60, (hora + 1) * 60) for hora in range(7, 21)]
+
+    grilla = construir_grilla(intervalos, filas=filas)
+    horas = [fila['rango'] for fila in grilla]
+    celdas = [
+        [activas[0] if activas else None for activas in fila['celdas']]
+        for fila in grilla
+    ]
+    return horas, celdas
@@ -0,0 +1,100 @@
+# cursos/management/commands/benchmark_horarios.py
+
+import random
+import time as reloj
+from django.core.management.base import BaseCommand, CommandError
+from cursos.horarios import DIAS_SEMANA, construir_grilla, filas_de_horario, puntos_de_corte
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de construcción de la grilla de horarios con bloques sintéticos (no usa la base de datos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bloques',
+            type=int,
+            default=10000,
+            help='Cantidad de bloques sintéticos a generar (por defecto 10000)'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=5,
+            help='Cantidad de veces que se construye la grilla para promediar'
+        )
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Ejecuta también el algoritmo anterior (filas x días x bloques) y verifica que el resultado sea idéntico'
+        )
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            default=2025,
+            help='Semilla para generar siempre los mismos bloques'
+        )
+
+    def generar_bloques(self, cantidad, semilla):
+        # Bloques de 50 o 100 minutos entre 07:00 y 21:00; los inicios caen en
+        # múltiplos de 50 o 25 minutos para que aparezcan filas de distinto largo
+        aleatorio = random.Random(semilla)
+        bloques = []
+        for indice in range(cantidad):
+            duracion = aleatorio.choice([50, 100])
+            paso = aleatorio.choice([50, 25])
+            inicio = aleatorio.randrange(7 * 60, 21 * 60 - duracion + 1, paso)
+            bloques.append((aleatorio.choice(DIAS_SEMANA), inicio, inicio + duracion, indice))
+        return bloques
+
+    def grilla_anterior(self, bloques):
+        # Réplica del recorrido original: por cada celda se revisan todos los bloques
+        filas = filas_de_horario(puntos_de_corte((inicio, fin) for _, inicio, fin, _ in bloques))
+        grilla = []
+        for inicio_fila, _ in filas:
+            celdas = []
+            for dia in DIAS_SEMANA:
+                celdas.append([
+                    dato for clave, inicio, fin, dato in bloques
+                    if clave == dia and inicio <= inicio_fila and fin > inicio_fila
+                ])
+            grilla.append(celdas)
+        return grilla
+
+    def handle(self, *args, **options):
+        cantidad = options['bloques']
+        repeticiones = options['repeticiones']
+
+        if cantidad <= 0 or repeticiones <= 0:
+            raise CommandError('La cantidad de bloques y de repeticiones debe ser mayor a cero.')
+
+        bloques = self.generar_bloques(cantidad, options['semilla'])
+        self.stdout.write(self.style.NOTICE(f'Bloques generados: {cantidad} | Repeticiones: {repeticiones}'))
+
+        tiempos = []
+        grilla = None
+        for _ in range(repeticiones):
+            inicio = reloj.perf_counter()
+            grilla = construir_grilla(bloques)
+            tiempos.append(reloj.perf_counter() - inicio)
+
+        celdas_ocupadas = sum(1 for fila in grilla for activos in fila['celdas'] if activos)
+        celdas_con_choque = sum(1 for fila in grilla for activos in fila['celdas'] if len(activos) > 1)
+
+        self.stdout.write(f'Filas generadas: {len(grilla)}')
+        self.stdout.write(f'Celdas ocupadas: {celdas_ocupadas} | Celdas con choque: {celdas_con_choque}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Motor de horarios -> mejor: {min(tiempos) * 1000:.2f} ms | promedio: {sum(tiempos) / len(tiempos) * 1000:.2f} ms'
+        ))
+
+        if options['comparar']:
+            inicio = reloj.perf_counter()
+            grilla_anterior = self.grilla_anterior(bloques)
+            tiempo_anterior = reloj.perf_counter() - inicio
+
+            iguales = [fila['celdas'] for fila in grilla] == grilla_anterior
+            self.stdout.write(self.style.WARNING(f'Algoritmo anterior -> {tiempo_anterior * 1000:.2f} ms'))
+            if iguales:
+                self.stdout.write(self.style.SUCCESS('Resultado idéntico al algoritmo anterior.'))
+            else:
+                self.stdout.write(self.style.ERROR('¡Los resultados NO coinciden con el algoritmo anterior!'))
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
@@ -0,0 +1,51 @@
+# cursos/management/commands/completar_temas.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cursos.temas import DIAS_AUTOCOMPLETAR, completar_temas_vencidos, temas_vencidos
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca como completados los temas de curso cuya fecha tiene más de '
+        f'{DIAS_AUTOCOMPLETAR} días de antigüedad (un solo UPDATE). Pensado para ejecutarse a diario con cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=DIAS_AUTOCOMPLETAR,
+            help=f'Antigüedad mínima en días para dar un tema por completado (por defecto {DIAS_AUTOCOMPLETAR})'
+        )
+        parser.add_argument(
+            '--fecha',
+            type=str,
+            default=None,
+            help='Fecha de referencia AAAA-MM-DD (por defecto hoy)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa cuántos temas se completarían, sin modificar la base de datos'
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError('--dias no puede ser negativo.')
+        try:
+            hoy = date.fromisoformat(options['fecha']) if options['fecha'] else date.today()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: "{options["fecha"]}". Use el formato AAAA-MM-DD.')
+
+        if options['dry_run']:
+            pendientes = temas_vencidos(hoy, options['dias']).count()
+            self.stdout.write(self.style.WARNING(f'[dry-run] Se completarían {pendientes} temas (fecha de referencia {hoy}).'))
+            return
+
+        completados = completar_temas_vencidos(hoy, options['dias'])
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
+        self.stdout.write(self.style.SUCCESS(f'Temas marcados como completados: {completados}'))
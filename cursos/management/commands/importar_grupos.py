@@ -7,147 +7,320 @@ from django.db import transaction
 
 # Importa tus modelos de las apps correspondientes
 from cursos.models import Curso, GrupoCurso, GrupoTeoria, GrupoLaboratorio, BloqueHorario
+from cursos.horarios import IndiceHorario, a_minutos, a_time, formatear_rango
+from reservas.models import Aula
+from reservas.disponibilidad import invalidar_capas_semanales
+from usuarios.metricas import invalidar_por_modelo
 from usuarios.models import Profesor # Asumo que Profesor está en la app usuarios
 
+# Campos de GrupoCurso que se comparan/actualizan en modo sincronización
+CAMPOS_GRUPO = ['curso_id', 'profesor_id', 'grupo', 'capacidad']
+
+# Máximo de cruces que se listan en el plan
+MAX_CRUCES = 20
+
 
 class Command(BaseCommand):
     help = 'Importa Grupos de Curso y sus Bloques de Horario desde un archivo CSV.'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Ruta al archivo CSV de grupos a importar.')
+        parser.add_argument(
+            '--sincronizar',
+            action='store_true',
+            help='Actualiza también los grupos existentes: datos del grupo y diferencias de bloques (altas, bajas y cambios)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra el plan de cambios sin escribir en la base de datos'
+        )
+        parser.add_argument(
+            '--estricto',
+            action='store_true',
+            help='Cancela la importación si el resultado tendría cruces de aula o profesor'
+        )
 
     def handle(self, *args, **options):
         csv_path = options['csv_file']
+        sincronizar = options['sincronizar']
         self.stdout.write(self.style.NOTICE(f'Iniciando importación de Grupos de Curso desde: {csv_path}'))
 
-        # 1. Leer y Agrupar Datos
-        # La clave del diccionario será el 'grupo_id' (la nueva PK)
-        grupos_data = defaultdict(
-            # Se añaden curso_id y grupo_letra al defaultdict ya que el key ahora es grupo_id
-            lambda: {'curso_id': None, 'profesor_codigo': None, 'grupo': None, 'capacidad': None, 'tipo': None, 'horarios': []}
-        )
-        
+        grupos_data = self.leer_csv(csv_path)
+
+        # 2. Carga masiva de referencias (una consulta por tabla)
+        cursos = set(Curso.objects.filter(pk__in={d['curso_id'] for d in grupos_data.values()}).values_list('pk', flat=True))
+        profesores = set(Profesor.objects.values_list('pk', flat=True))
+        aulas = set(Aula.objects.values_list('pk', flat=True))
+
+        errores = []
+        for grupo_id, data in grupos_data.items():
+            if data['curso_id'] not in cursos:
+                errores.append(f'Curso con ID "{data["curso_id"]}" no existe (grupo {grupo_id}).')
+            if data['tipo'] not in ('TEORIA', 'LABORATORIO'):
+                errores.append(f"Tipo de grupo no válido '{data['tipo']}' para {grupo_id}.")
+            for horario in data['horarios']:
+                if horario['aula'] not in aulas:
+                    errores.append(f'Aula "{horario["aula"]}" no existe (grupo {grupo_id}).')
+                if horario['inicio'] >= horario['fin']:
+                    errores.append(f'Bloque con hora de fin anterior al inicio en {grupo_id} ({horario["dia"]}).')
+            if data['profesor_id'] and data['profesor_id'] not in profesores:
+                self.stdout.write(self.style.WARNING(f'Advertencia: Profesor con código "{data["profesor_id"]}" no existe para el grupo {grupo_id}. Se asignará NULL.'))
+                data['profesor_id'] = None
+        if errores:
+            for error in errores:
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError(f'Se encontraron {len(errores)} errores en el CSV. No se realizó ningún cambio.')
+
+        # 3. Estado actual de los grupos del CSV y de todos los bloques
+        existentes = {
+            grupo['id']: grupo
+            for grupo in GrupoCurso.objects.filter(pk__in=grupos_data.keys()).values('id', *CAMPOS_GRUPO)
+        }
+        teorias = set(GrupoTeoria.objects.filter(grupo_curso_id__in=existentes).values_list('grupo_curso_id', flat=True))
+
+        bloques_actuales = defaultdict(list)
+        otros_bloques = []  # Bloques de grupos que no se modifican (para validar cruces)
+        for bloque in BloqueHorario.objects.values(
+            'id', 'grupo_curso_id', 'dia', 'horaInicio', 'horaFin', 'aula_id', 'grupo_curso__profesor_id'
+        ):
+            datos = {
+                'id': bloque['id'],
+                'dia': bloque['dia'],
+                'inicio': a_minutos(bloque['horaInicio']),
+                'fin': a_minutos(bloque['horaFin']),
+                'aula': bloque['aula_id'],
+            }
+            if sincronizar and bloque['grupo_curso_id'] in grupos_data:
+                bloques_actuales[bloque['grupo_curso_id']].append(datos)
+            else:
+                otros_bloques.append((bloque['grupo_curso_id'], bloque['grupo_curso__profesor_id'], datos))
+
+        # 4. Plan de cambios
+        plan = {
+            'grupos_nuevos': [],
+            'grupos_actualizados': [],
+            'teorias': [],
+            'laboratorios': [],
+            'bloques_nuevos': [],
+            'bloques_actualizados': [],
+            'bloques_eliminados': [],
+        }
+        finales = []  # (grupo_id, profesor_id, bloque) del estado resultante
+        omitidos = 0
+
+        for grupo_id, data in grupos_data.items():
+            valores = {'curso_id': data['curso_id'], 'profesor_id': data['profesor_id'], 'grupo': data['grupo'], 'capacidad': data['capacidad']}
+            actual = existentes.get(grupo_id)
+
+            if actual is None:
+                plan['grupos_nuevos'].append(GrupoCurso(id=grupo_id, **valores))
+                especializacion = plan['teorias'] if data['tipo'] == 'TEORIA' else plan['laboratorios']
+                especializacion.append(grupo_id)
+                plan['bloques_nuevos'].extend((grupo_id, horario) for horario in data['horarios'])
+                finales.extend((grupo_id, data['profesor_id'], horario) for horario in data['horarios'])
+                self.stdout.write(self.style.SUCCESS(f'+ Grupo {grupo_id} ({data["tipo"]}) con {len(data["horarios"])} bloques.'))
+                continue
+
+            if not sincronizar:
+                self.stdout.write(self.style.WARNING(f'Grupo {grupo_id} ya existe. Saltando especialización y horarios (use --sincronizar para aplicar cambios).'))
+                omitidos += 1
+                continue
+
+            tipo_actual = 'TEORIA' if grupo_id in teorias else 'LABORATORIO'
+            if tipo_actual != data['tipo']:
+                self.stdout.write(self.style.WARNING(f'Grupo {grupo_id} es de {tipo_actual} y el CSV indica {data["tipo"]}; el tipo no se modifica.'))
+
+            cambios = [f'{campo}: {actual[campo]} -> {valor}' for campo, valor in valores.items() if actual[campo] != valor]
+            if cambios:
+                plan['grupos_actualizados'].append(GrupoCurso(id=grupo_id, **valores))
+
+            insertar, actualizar, eliminar = self.diferencia_bloques(bloques_actuales.get(grupo_id, []), data['horarios'])
+            plan['bloques_nuevos'].extend((grupo_id, horario) for horario in insertar)
+            plan['bloques_actualizados'].extend(actualizar)
+            plan['bloques_eliminados'].extend(bloque['id'] for bloque in eliminar)
+            finales.extend((grupo_id, data['profesor_id'], horario) for horario in data['horarios'])
+
+            if cambios or insertar or actualizar or eliminar:
+                detalle = '; '.join(cambios + [f'bloques +{len(insertar)} ~{len(actualizar)} -{len(eliminar)}'])
+                self.stdout.write(self.style.NOTICE(f'~ Grupo {grupo_id}: {detalle}'))
+
+        # 5. Validación de cruces sobre el estado resultante (en memoria)
+        cruces = self.buscar_cruces(otros_bloques + finales, set(grupos_data))
+        for descripcion in cruces[:MAX_CRUCES]:
+            self.stdout.write(self.style.ERROR(f'Cruce: {descripcion}'))
+        if len(cruces) > MAX_CRUCES:
+            self.stdout.write(self.style.ERROR(f'... y {len(cruces) - MAX_CRUCES} cruces más.'))
+
+        self.stdout.write(self.style.SUCCESS('\nPlan de cambios:'))
+        self.stdout.write(f'  Grupos nuevos: {len(plan["grupos_nuevos"])}')
+        self.stdout.write(f'  Grupos actualizados: {len(plan["grupos_actualizados"])}')
+        self.stdout.write(f'  Grupos existentes omitidos: {omitidos}')
+        self.stdout.write(f'  Bloques a insertar: {len(plan["bloques_nuevos"])}')
+        self.stdout.write(f'  Bloques a actualizar: {len(plan["bloques_actualizados"])}')
+        self.stdout.write(f'  Bloques a eliminar: {len(plan["bloques_eliminados"])}')
+        self.stdout.write(f'  Cruces de aula/profesor: {len(cruces)}')
+
+        if cruces and options['estricto']:
+            raise CommandError('Se detectaron cruces de horario (--estricto). No se realizó ningún cambio.')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\nModo --dry-run: no se escribió ningún cambio.'))
+            return
+
+        # 6. Aplicar en bloque (Transacción Atómica)
+        try:
+            with transaction.atomic():
+                GrupoCurso.objects.bulk_create(plan['grupos_nuevos'])
+                if plan['grupos_actualizados']:
+                    GrupoCurso.objects.bulk_update(plan['grupos_actualizados'], ['curso', 'profesor', 'grupo', 'capacidad'])
+                GrupoTeoria.objects.bulk_create([GrupoTeoria(grupo_curso_id=grupo_id) for grupo_id in plan['teorias']])
+                GrupoLaboratorio.objects.bulk_create([GrupoLaboratorio(grupo_curso_id=grupo_id) for grupo_id in plan['laboratorios']])
+
+                if plan['bloques_eliminados']:
+                    BloqueHorario.objects.filter(id__in=plan['bloques_eliminados']).delete()
+                if plan['bloques_actualizados']:
+                    BloqueHorario.objects.bulk_update(plan['bloques_actualizados'], ['dia', 'horaInicio', 'horaFin', 'aula'])
+                BloqueHorario.objects.bulk_create([
+                    BloqueHorario(
+                        grupo_curso_id=grupo_id,
+                        dia=horario['dia'],
+                        horaInicio=a_time(horario['inicio']),
+                        horaFin=a_time(horario['fin']),
+                        aula_id=horario['aula'],
+                    )
+                    for grupo_id, horario in plan['bloques_nuevos']
+                ])
+        except Exception as e:
+            raise CommandError(f'Error crítico al aplicar los cambios: {e}. La transacción ha sido revertida.')
+
+        # bulk_create/bulk_update no disparan señales
+        for modelo in (GrupoCurso, GrupoTeoria, GrupoLaboratorio, BloqueHorario):
+            invalidar_por_modelo(modelo)
+        invalidar_capas_semanales()
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
+        self.stdout.write(self.style.SUCCESS(f'Grupos de Curso creados: {len(plan["grupos_nuevos"])}'))
+        self.stdout.write(self.style.SUCCESS(f'Grupos de Curso actualizados: {len(plan["grupos_actualizados"])}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Bloques de Horario creados/actualizados/eliminados: '
+            f'{len(plan["bloques_nuevos"])}/{len(plan["bloques_actualizados"])}/{len(plan["bloques_eliminados"])}'
+        ))
+
+    # ------------------------------------------------------------------
+    # 1. Leer y Agrupar Datos
+    # ------------------------------------------------------------------
+    def leer_csv(self, csv_path):
+        # La clave del diccionario será el 'grupo_id' (la PK)
+        grupos_data = {}
+
         try:
             with io.open(csv_path, 'r', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
-                
-                # SE MODIFICAN los campos requeridos para incluir 'grupo_id'
+
                 required_fields = ['grupo_id', 'curso_id', 'profesor_codigo', 'grupo', 'capacidad', 'tipo', 'dia', 'hora_inicio', 'hora_fin', 'id_Aula']
-                if not all(field in reader.fieldnames for field in required_fields):
+                if not reader.fieldnames or not all(field in reader.fieldnames for field in required_fields):
                     raise CommandError(f"El CSV debe contener las siguientes columnas: {', '.join(required_fields)}")
 
                 for row in reader:
-                    # LEER el nuevo ID de la columna 'grupo_id'
                     grupo_id_completo = row['grupo_id'].strip()
                     curso_id = row['curso_id'].strip()
                     grupo_letra = row['grupo'].strip().upper()
-                    
+
                     if not grupo_id_completo or not curso_id or not grupo_letra:
                         self.stdout.write(self.style.WARNING(f"Saltando fila con ID/Curso/Grupo vacío: {row}"))
                         continue
 
-                    key = grupo_id_completo # Usamos la nueva PK como clave de agrupación
-                    
-                    # Almacenar la información general del grupo (solo se guarda una vez por clave)
-                    if grupos_data[key]['profesor_codigo'] is None:
-                        grupos_data[key]['curso_id'] = curso_id
-                        grupos_data[key]['grupo'] = grupo_letra
-                        grupos_data[key]['profesor_codigo'] = row['profesor_codigo'].strip()
-                        grupos_data[key]['capacidad'] = int(row['capacidad'])
-                        grupos_data[key]['tipo'] = row['tipo'].strip().upper()
-                        
-                    # Almacenar los bloques de horario
-                    grupos_data[key]['horarios'].append({
+                    # La información general del grupo se toma de su primera fila
+                    if grupo_id_completo not in grupos_data:
+                        grupos_data[grupo_id_completo] = {
+                            'curso_id': curso_id,
+                            'grupo': grupo_letra,
+                            'profesor_id': row['profesor_codigo'].strip() or None,
+                            'capacidad': int(row['capacidad']),
+                            'tipo': row['tipo'].strip().upper(),
+                            'horarios': [],
+                        }
+
+                    # Bloques de horario (en minutos para comparar con la BD)
+                    grupos_data[grupo_id_completo]['horarios'].append({
                         'dia': row['dia'].strip().upper(),
-                        'horaInicio': row['hora_inicio'].strip(),
-                        'horaFin': row['hora_fin'].strip(),
+                        'inicio': a_minutos(row['hora_inicio'].strip()),
+                        'fin': a_minutos(row['hora_fin'].strip()),
                         'aula': row['id_Aula'].strip(),
                     })
         except FileNotFoundError:
             raise CommandError(f'Archivo no encontrado en la ruta: "{csv_path}"')
-        except ValueError as e:
+        except (ValueError, IndexError) as e:
             # Captura errores si 'capacidad' no es número, o si el formato de hora es incorrecto.
             raise CommandError(f'Error de conversión de valor: {e}')
 
+        self.stdout.write(self.style.SUCCESS(f'Datos leídos. Procesando {len(grupos_data)} grupos únicos...'))
+        return grupos_data
 
-        # 2. Creación de Objetos en BBDD (Transacción Atómica)
-        grupos_creados_count = 0
-        horarios_creados_count = 0
-        
-        with transaction.atomic():
-            self.stdout.write(self.style.SUCCESS(f'Datos leídos. Procesando {len(grupos_data)} grupos únicos...'))
-            
-            # La clave es ahora grupo_id_completo
-            for grupo_id_completo, data in grupos_data.items():
-                curso_id = data['curso_id']
-                grupo_letra = data['grupo']
-                
-                try:
-                    # 2.1. Buscar Foráneas (Curso y Profesor)
-                    curso_obj = Curso.objects.get(pk=curso_id)
-                    
-                    profesor_codigo = data['profesor_codigo']
-                    profesor_obj = None
-                    if profesor_codigo:
-                        try:
-                            # Asume que el profesor_codigo es el perfil ID
-                            profesor_obj = Profesor.objects.get(perfil__id=profesor_codigo) 
-                        except Profesor.DoesNotExist:
-                            self.stdout.write(self.style.WARNING(f'Advertencia: Profesor con código "{profesor_codigo}" no existe para el grupo {grupo_id_completo}. Se asignará NULL.'))
-                            profesor_obj = None
-                    
-                    # 2.2. Crear o Actualizar GrupoCurso usando la PK explícita (grupo_id_completo)
-                    grupo_curso_obj, created = GrupoCurso.objects.get_or_create(
-                        pk=grupo_id_completo, # ⬅️ Usa el ID del CSV como Primary Key (PK)
-                        defaults={
-                            # Estos campos son necesarios para la inserción en el modelo
-                            'curso': curso_obj,
-                            'profesor': profesor_obj, # Puede ser None
-                            'grupo': grupo_letra,
-                            'capacidad': data['capacidad']
-                        }
-                    )
-                    
-                    # Si ya existe, saltamos la creación de especialización y horarios
-                    if not created:
-                        self.stdout.write(self.style.WARNING(f'Grupo {grupo_id_completo} ya existe. Saltando especialización y horarios para evitar duplicados.'))
-                        continue 
-
-                    grupos_creados_count += 1
-                    
-                    # 2.3. Crear Especialización (Teoría o Laboratorio)
-                    if data['tipo'] == 'TEORIA':
-                        GrupoTeoria.objects.create(grupo_curso=grupo_curso_obj)
-                    elif data['tipo'] == 'LABORATORIO':
-                        GrupoLaboratorio.objects.create(grupo_curso=grupo_curso_obj)
-                    else:
-                        raise CommandError(f"Tipo de grupo no válido '{data['tipo']}' para {grupo_id_completo}.")
-
-                    # 2.4. Crear Bloques de Horario (Múltiples Bloques)
-                    bloques_a_crear = []
-                    for horario in data['horarios']:
-                        bloques_a_crear.append(
-                            BloqueHorario(
-                                grupo_curso=grupo_curso_obj,
-                                dia=horario['dia'],
-                                horaInicio=horario['horaInicio'],
-                                horaFin=horario['horaFin'],
-                                aula_id=horario['aula'],
-                            )
-                        )
-                    
-                    # Inserción masiva de todos los bloques asociados
-                    BloqueHorario.objects.bulk_create(bloques_a_crear)
-                    horarios_creados_count += len(bloques_a_crear)
-                    
-                    self.stdout.write(self.style.SUCCESS(f'Grupo {grupo_id_completo} creado exitosamente con {len(bloques_a_crear)} bloques.'))
-
-                except Curso.DoesNotExist:
-                    raise CommandError(f'Error: Curso con ID "{curso_id}" no existe. La transacción ha sido revertida.')
-                except Exception as e:
-                    # Capturamos cualquier otro error crítico
-                    raise CommandError(f'Error crítico al crear el grupo {grupo_id_completo}: {e}. La transacción ha sido revertida.')
+    # ------------------------------------------------------------------
+    # Diferencia de bloques de un grupo
+    # ------------------------------------------------------------------
+    def diferencia_bloques(self, actuales, deseados):
+        """
+        Compara los bloques actuales de un grupo con los del CSV.
+        Devuelve (insertar, actualizar, eliminar): los idénticos se conservan,
+        los que cambian dentro del mismo día se actualizan en su lugar y el
+        resto se inserta o elimina.
+        """
+        clave = lambda b: (b['dia'], b['inicio'], b['fin'], b['aula'])
+        pendientes = defaultdict(list)
+        for bloque in actuales:
+            pendientes[clave(bloque)].append(bloque)
 
-        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
-        self.stdout.write(self.style.SUCCESS(f'Grupos de Curso creados: {grupos_creados_count}'))
-        self.stdout.write(self.style.SUCCESS(f'Bloques de Horario creados: {horarios_creados_count}'))
\ No newline at end of file
+        sobrantes = []
+        for horario in deseados:
+            if pendientes[clave(horario)]:
+                pendientes[clave(horario)].pop()
+            else:
+                sobrantes.append(horario)
+
+        viejos_por_dia = defaultdict(list)
+        for bloques in pendientes.values():
+            for bloque in bloques:
+                viejos_por_dia[bloque['dia']].append(bloque)
+
+        insertar, actualizar = [], []
+        for horario in sobrantes:
+            if viejos_por_dia[horario['dia']]:
+                viejo = viejos_por_dia[horario['dia']].pop()
+                actualizar.append(BloqueHorario(
+                    id=viejo['id'],
+                    dia=horario['dia'],
+                    horaInicio=a_time(horario['inicio']),
+                    horaFin=a_time(horario['fin']),
+                    aula_id=horario['aula'],
+                ))
+            else:
+                insertar.append(horario)
+
+        eliminar = [bloque for bloques in viejos_por_dia.values() for bloque in bloques]
+        return insertar, actualizar, eliminar
+
+    # ------------------------------------------------------------------
+    # Cruces de aula y profesor
+    # ------------------------------------------------------------------
+    def buscar_cruces(self, bloques, grupos_csv):
+        """Cruces (misma aula o mismo profesor, mismo día) que involucran a algún grupo del CSV."""
+        intervalos = []
+        for grupo_id, profesor_id, bloque in bloques:
+            intervalos.append((('Aula', bloque['aula'], bloque['dia']), bloque['inicio'], bloque['fin'], (grupo_id, bloque)))
+            if profesor_id:
+                intervalos.append((('Profesor', profesor_id, bloque['dia']), bloque['inicio'], bloque['fin'], (grupo_id, bloque)))
+        indice = IndiceHorario(intervalos)
+
+        cruces = []
+        for clave in indice.claves():
+            tipo, valor, dia = clave
+            for (grupo_a, bloque_a), (grupo_b, bloque_b) in indice.cruces(clave):
+                if grupo_a == grupo_b or (grupo_a not in grupos_csv and grupo_b not in grupos_csv):
+                    continue
+                cruces.append(
+                    f'{tipo} {valor} el {dia}: {grupo_a} ({formatear_rango(bloque_a["inicio"], bloque_a["fin"])}) '
+                    f'y {grupo_b} ({formatear_rango(bloque_b["inicio"], bloque_b["fin"])})'
+                )
+        return sorted(cruces)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2025-11-25 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0002_alter_grupocurso_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloquehorario',
+            index=models.Index(fields=['aula', 'dia'], name='bloque_aula_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloquehorario',
+            index=models.Index(fields=['grupo_curso', 'dia'], name='bloque_grupo_dia_idx'),
+        ),
+    ]
@@ -120,6 +120,11 @@ class BloqueHorario(models.Model):
         db_table = 'cursos_bloque_horario'
         verbose_name = 'Bloque de Horario'
         verbose_name_plural = 'Bloques de Horario'
+        indexes = [
+            # Cruces de horario por aula y horario del día por grupo (dashboards)
+            models.Index(fields=['aula', 'dia'], name='bloque_aula_dia_idx'),
+            models.Index(fields=['grupo_curso', 'dia'], name='bloque_grupo_dia_idx'),
+        ]
 
 class TemaCurso(models.Model):
     # 6. Entidad Tema Curso (id INT AUTO_INCREMENT es automático)
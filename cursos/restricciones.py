@@ -0,0 +1,148 @@
+# cursos/restricciones.py
+#
+# Validación de cruces al crear o editar los bloques de horario de un grupo
+# (teoría o laboratorio) desde gestion_cursos / gestion_laboratorios.
+#
+# Antes cada bloque enviado hacía un Aula.objects.get y dos consultas de
+# solapamiento (aula y docente). Aquí se cargan en una sola consulta los
+# bloques de los días involucrados que usan alguna de las aulas o que dicta
+# el profesor, se indexan con IndiceHorario y todos los bloques enviados se
+# validan en memoria, incluidos los cruces entre ellos mismos.
+
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+
+from reservas.models import Aula
+from reservas.disponibilidad import invalidar_capas_semanales
+from usuarios.metricas import invalidar_por_modelo
+from .horarios import IndiceHorario
+from .models import BloqueHorario
+
+
+def _validar_formato(horarios, aulas, solo_laboratorio):
+    """Valida campos, aulas y horas de cada bloque enviado y los normaliza."""
+    bloques = []
+    for i, h in enumerate(horarios, 1):
+        aula_obj = aulas.get(h.get('aula_id'))
+        if aula_obj is None:
+            raise ValueError(f"El aula con ID '{h.get('aula_id')}' no existe.")
+
+        # Validar que el aula sea de tipo laboratorio
+        if solo_laboratorio and aula_obj.tipo != 'LABORATORIO':
+            raise ValueError(f"El aula {aula_obj.id} no es un laboratorio. Solo se pueden usar aulas tipo LABORATORIO.")
+
+        # Validar campos requeridos
+        if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
+            raise ValueError(f"El horario {i} tiene campos incompletos.")
+
+        # Convertir tiempos
+        try:
+            inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
+            fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
+        except ValueError:
+            raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
+
+        # Validar que inicio < fin
+        if inicio_time >= fin_time:
+            raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
+
+        bloques.append({
+            'numero': i,
+            'aula': aula_obj,
+            'dia': h['dia'],
+            'inicio': inicio_time,
+            'fin': fin_time,
+            'texto_inicio': h['inicio'],
+            'texto_fin': h['fin'],
+        })
+    return bloques
+
+
+def validar_bloques(horarios, profesor=None, excluir_grupo=None, solo_laboratorio=False):
+    """
+    Valida los bloques enviados (dicts con 'aula_id', 'dia', 'inicio', 'fin')
+    contra los horarios existentes y entre sí. Los bloques de `excluir_grupo`
+    (el grupo que se está editando) no cuentan como cruce.
+
+    Devuelve los bloques normalizados (con la instancia de Aula y horas como
+    time) o lanza ValueError con el mensaje para el usuario.
+    """
+    aulas = Aula.objects.in_bulk({h.get('aula_id') for h in horarios if h.get('aula_id')})
+    bloques = _validar_formato(horarios, aulas, solo_laboratorio)
+
+    # 1. Cruces entre los bloques enviados (el mismo grupo no puede estar en dos lugares)
+    enviados = IndiceHorario((b['dia'], b['inicio'], b['fin'], b) for b in bloques)
+    for dia in enviados.claves():
+        for anterior, siguiente in enviados.cruces(dia):
+            primero, segundo = sorted((anterior, siguiente), key=lambda b: b['numero'])
+            raise ValueError(
+                f"Los horarios {primero['numero']} y {segundo['numero']} se cruzan entre sí el día {dia} "
+                f"({primero['texto_inicio']} - {primero['texto_fin']} y {segundo['texto_inicio']} - {segundo['texto_fin']})."
+            )
+
+    # 2. Bloques existentes de esos días en las aulas usadas o del profesor (una consulta)
+    filtro = Q(aula_id__in=[b['aula'].id for b in bloques])
+    if profesor:
+        filtro |= Q(grupo_curso__profesor=profesor)
+    existentes = BloqueHorario.objects.filter(
+        filtro, dia__in={b['dia'] for b in bloques}
+    ).select_related('grupo_curso__curso')
+    if excluir_grupo is not None:
+        existentes = existentes.exclude(grupo_curso=excluir_grupo)
+
+    intervalos = []
+    for bloque in existentes:
+        intervalos.append((('AULA', bloque.aula_id, bloque.dia), bloque.horaInicio, bloque.horaFin, bloque))
+        if profesor and bloque.grupo_curso.profesor_id == profesor.pk:
+            intervalos.append((('PROFESOR', bloque.dia), bloque.horaInicio, bloque.horaFin, bloque))
+    indice = IndiceHorario(intervalos)
+
+    # Los grupos de laboratorio nombran el ambiente como "laboratorio"
+    ambiente = 'laboratorio' if solo_laboratorio else 'aula'
+    for b in bloques:
+        # 2.1 Cruce con horarios existentes en la misma aula
+        conflictos = indice.solapados(('AULA', b['aula'].id, b['dia']), b['inicio'], b['fin'])
+        if conflictos:
+            conflicto = conflictos[0]
+            raise ValueError(
+                f"Conflicto de horario en {ambiente} {b['aula'].id} el día {b['dia']} de {b['texto_inicio']} a {b['texto_fin']}. "
+                f"Ya existe la clase '{conflicto.grupo_curso.curso.nombre}' (Grupo {conflicto.grupo_curso.grupo}) en ese horario."
+            )
+
+        # 2.2 Disponibilidad del docente (si se asignó un profesor)
+        if profesor:
+            conflictos = indice.solapados(('PROFESOR', b['dia']), b['inicio'], b['fin'])
+            if conflictos:
+                conflicto_docente = conflictos[0]
+                raise ValueError(
+                    f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {b['dia']} entre {b['texto_inicio']} a {b['texto_fin']}. "
+                    f"Está asignado a la clase '{conflicto_docente.grupo_curso.curso.nombre}' (Grupo {conflicto_docente.grupo_curso.grupo}) "
+                    f"en el aula {conflicto_docente.aula_id} en ese horario."
+                )
+
+    return bloques
+
+
+def crear_bloques(grupo_curso, bloques, reemplazar=False):
+    """
+    Inserta en bloque los horarios ya validados de un grupo. Con `reemplazar`
+    se eliminan antes los bloques actuales del grupo (edición).
+    """
+    if reemplazar:
+        BloqueHorario.objects.filter(grupo_curso=grupo_curso).delete()
+    BloqueHorario.objects.bulk_create([
+        BloqueHorario(
+            dia=b['dia'],
+            horaInicio=b['inicio'],
+            horaFin=b['fin'],
+            grupo_curso=grupo_curso,
+            aula=b['aula'],
+        )
+        for b in bloques
+    ])
+    # bulk_create no dispara señales. Se invalida al confirmar la transacción
+    # del llamador (si se revierte, el cache sigue siendo válido)
+    transaction.on_commit(lambda: invalidar_por_modelo(BloqueHorario))
+    invalidar_capas_semanales()
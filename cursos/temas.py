@@ -0,0 +1,24 @@
+# cursos/temas.py
+#
+# Avance del sílabo: los temas con más de DIAS_AUTOCOMPLETAR días de
+# antigüedad se dan por dictados. Antes mis_cursos_profesor lo hacía en cada
+# GET con un tema.save() por tema; ahora es un único UPDATE que se ejecuta
+# de forma programada (ver el comando completar_temas).
+
+from datetime import date, timedelta
+
+from .models import TemaCurso
+
+
+DIAS_AUTOCOMPLETAR = 7
+
+
+def temas_vencidos(hoy=None, dias=DIAS_AUTOCOMPLETAR):
+    """Temas no completados cuya fecha quedó al menos `dias` días atrás."""
+    limite = (hoy or date.today()) - timedelta(days=dias)
+    return TemaCurso.objects.filter(completado=False, fecha__lte=limite)
+
+
+def completar_temas_vencidos(hoy=None, dias=DIAS_AUTOCOMPLETAR):
+    """Marca como completados los temas vencidos con un solo UPDATE. Devuelve cuántos cambió."""
+    return temas_vencidos(hoy, dias).update(completado=True)
@@ -1,3 +1,123 @@
+from datetime import date, time
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from reservas.models import Aula
+from usuarios.metricas import clave_seccion, obtener_seccion
+from usuarios.models import Perfil, Profesor
+from .models import BloqueHorario, Curso, GrupoCurso, GrupoTeoria, TemaCurso
+from .restricciones import crear_bloques, validar_bloques
+from .temas import completar_temas_vencidos
+
+
+class ValidarBloquesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profesor = Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P001', nombre='Docente Uno', password='x', rol='PROFESOR'),
+            es_teoria=True,
+        )
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        Aula.objects.create(id='101', tipo='AULA_NORMAL')
+        Aula.objects.create(id='102', tipo='AULA_NORMAL')
+        Aula.objects.create(id='L01', tipo='LABORATORIO')
+        cls.grupo = GrupoCurso.objects.create(id='C001A', curso=curso, profesor=cls.profesor, grupo='A', capacidad=40)
+        BloqueHorario.objects.create(
+            grupo_curso=cls.grupo, aula_id='101', dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40)
+        )
+        BloqueHorario.objects.create(
+            grupo_curso=cls.grupo, aula_id='L01', dia='MARTES', horaInicio=time(7, 0), horaFin=time(8, 40)
+        )
+
+    def bloque(self, aula, dia, inicio, fin):
+        return {'aula_id': aula, 'dia': dia, 'inicio': inicio, 'fin': fin}
+
+    def test_cruce_con_aula_ocupada(self):
+        with self.assertRaisesMessage(ValueError, 'Conflicto de horario en aula 101'):
+            validar_bloques([self.bloque('101', 'LUNES', '08:00:00', '09:00:00')])
+
+    def test_cruce_en_laboratorio(self):
+        with self.assertRaisesMessage(ValueError, 'Conflicto de horario en laboratorio L01 el día MARTES'):
+            validar_bloques([self.bloque('L01', 'MARTES', '08:00:00', '09:00:00')], solo_laboratorio=True)
+
+    def test_cruce_con_profesor_ocupado(self):
+        with self.assertRaisesMessage(ValueError, 'ya tiene clase asignada'):
+            validar_bloques([self.bloque('102', 'LUNES', '08:00:00', '09:00:00')], profesor=self.profesor)
+
+    def test_edicion_excluye_bloques_del_grupo(self):
+        bloques = validar_bloques(
+            [self.bloque('101', 'LUNES', '08:00:00', '09:00:00')],
+            profesor=self.profesor, excluir_grupo=self.grupo,
+        )
+        self.assertEqual(len(bloques), 1)
+
+    def test_cruce_entre_bloques_enviados(self):
+        with self.assertRaisesMessage(ValueError, 'Los horarios 1 y 2 se cruzan'):
+            validar_bloques([
+                self.bloque('101', 'MARTES', '07:00:00', '08:40:00'),
+                self.bloque('102', 'MARTES', '08:00:00', '09:00:00'),
+            ])
+
+    def test_crear_bloques_invalida_al_confirmar(self):
+        cache = caches['dashboard']
+        bloques = validar_bloques([self.bloque('102', 'JUEVES', '10:00:00', '11:00:00')])
+
+        # Si la transacción se revierte, el cache se conserva
+        obtener_seccion('horarios')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    crear_bloques(self.grupo, bloques)
+                    raise ValueError('revertir')
+            except ValueError:
+                pass
+        self.assertIsNotNone(cache.get(clave_seccion('horarios')))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            crear_bloques(self.grupo, bloques)
+        self.assertIsNotNone(cache.get(clave_seccion('horarios')))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(clave_seccion('horarios')))
+
+    def test_consultas_constantes(self):
+        horarios = [self.bloque('102', dia, '10:00:00', '11:00:00') for dia in ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES']]
+        with self.assertNumQueries(2):
+            validar_bloques(horarios, profesor=self.profesor)
+
+
+class CompletarTemasTests(TestCase):
+    HOY = date(2025, 3, 17)
+
+    @classmethod
+    def setUpTestData(cls):
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        teoria = GrupoTeoria.objects.create(
+            grupo_curso=GrupoCurso.objects.create(id='C001A', curso=curso, grupo='A', capacidad=40)
+        )
+        for orden, fecha in enumerate([date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 11)], start=1):
+            TemaCurso.objects.create(nombre=f'Tema {orden}', orden=orden, completado=False, fecha=fecha, grupo_teoria=teoria)
+
+    def test_un_solo_update(self):
+        with self.assertNumQueries(1):
+            completados = completar_temas_vencidos(self.HOY)
+        self.assertEqual(completados, 2)
+        self.assertEqual(list(TemaCurso.objects.filter(completado=False).values_list('orden', flat=True)), [3])
+
+    def test_comando_dry_run_no_modifica(self):
+        salida = StringIO()
+        call_command('completar_temas', fecha=self.HOY.isoformat(), dry_run=True, stdout=salida)
+        self.assertIn('Se completarían 2 temas', salida.getvalue())
+        self.assertFalse(TemaCurso.objects.filter(completado=True).exists())
@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import TrabajoExportacion
+
+# ----------------------------------------------------------------------
+# 1. Administración del modelo TrabajoExportacion
+# ----------------------------------------------------------------------
+
+@admin.register(TrabajoExportacion)
+class TrabajoExportacionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'solicitado_por', 'creado', 'terminado', 'intentos')
+    list_filter = ('tipo', 'estado')
+    search_fields = ('huella', 'solicitado_por__id', 'nombre_descarga')
+    readonly_fields = ('huella', 'creado', 'iniciado', 'terminado', 'intentos', 'error')
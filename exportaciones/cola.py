@@ -0,0 +1,169 @@
+# exportaciones/cola.py
+#
+# Cola de exportaciones (PDF/Excel) persistida en la tabla exportaciones_trabajo.
+#
+# Las vistas solo encolan el trabajo y devuelven su id; el comando
+# `procesar_exportaciones` reclama los pendientes y genera los archivos en
+# EXPORTACIONES_DIR. Hay dos huellas (SHA-256):
+#   - la del pedido, que se calcula al encolar con los parámetros y una
+#     versión barata de los datos (agregados, ver generadores.py). Si un
+#     pedido con la misma huella se completó hace menos de
+#     REUTILIZAR_MINUTOS, se reutiliza su archivo sin leer ni pivotear los
+#     datos dentro del request. Los agregados detectan altas, bajas y
+#     cambios de estado, pero no ediciones en el lugar (un nombre, una
+#     hora), por eso la reutilización se limita a una ventana corta.
+#   - la del contenido, que calcula el worker con los datos completos y da
+#     nombre al archivo: si otro trabajo produce exactamente las mismas
+#     entradas se reutiliza el archivo en lugar de volver a renderizarlo.
+
+import hashlib
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .generadores import GENERADORES
+from .models import TrabajoExportacion
+
+
+# Intentos máximos antes de dejar un trabajo en ERROR definitivo
+MAX_INTENTOS = 3
+
+# Antigüedad máxima de un trabajo completado para reutilizar su archivo al encolar
+REUTILIZAR_MINUTOS = 2
+
+
+def calcular_huella(tipo, datos):
+    """SHA-256 del tipo de exportación y sus datos (de entrada o del pedido)."""
+    contenido = json.dumps({'tipo': tipo, 'datos': datos}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def nombre_archivo(huella, tipo):
+    return f"{huella}.{GENERADORES[tipo][2]}"
+
+
+def ruta_absoluta(nombre):
+    return os.path.join(settings.EXPORTACIONES_DIR, nombre)
+
+
+# ----------------------------------------------------------------------
+# ENCOLAR
+# ----------------------------------------------------------------------
+
+def encolar_exportacion(tipo, parametros, perfil_id, nombre_descarga):
+    """
+    Registra un trabajo de exportación y lo devuelve.
+    Si un pedido con la misma huella (parámetros + versión de los datos) se
+    completó hace menos de REUTILIZAR_MINUTOS y su archivo existe, el
+    trabajo queda COMPLETADO de inmediato y no pasa por el worker.
+    """
+    version = GENERADORES[tipo][3]
+    huella = calcular_huella(tipo, {'parametros': parametros, 'version': version(parametros)})
+    limite = timezone.now() - timedelta(minutes=REUTILIZAR_MINUTOS)
+    nombre = (
+        TrabajoExportacion.objects.filter(huella=huella, estado='COMPLETADO', terminado__gte=limite)
+                                  .exclude(ruta_archivo=None)
+                                  .order_by('-terminado')
+                                  .values_list('ruta_archivo', flat=True)
+                                  .first()
+    )
+
+    trabajo = TrabajoExportacion(
+        tipo=tipo,
+        parametros=parametros,
+        huella=huella,
+        solicitado_por_id=perfil_id,
+        nombre_descarga=nombre_descarga,
+    )
+    if nombre and os.path.exists(ruta_absoluta(nombre)):
+        trabajo.estado = 'COMPLETADO'
+        trabajo.ruta_archivo = nombre
+        trabajo.terminado = timezone.now()
+    trabajo.save()
+    return trabajo
+
+
+# ----------------------------------------------------------------------
+# WORKER
+# ----------------------------------------------------------------------
+
+def reclamar_siguiente():
+    """
+    Marca como PROCESANDO el trabajo pendiente más antiguo y lo devuelve
+    (None si no hay). Con SKIP LOCKED varios workers pueden correr a la vez
+    sin tomar el mismo trabajo.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        trabajo = (
+            TrabajoExportacion.objects
+            .select_for_update(skip_locked=skip_locked)
+            .filter(estado='PENDIENTE')
+            .order_by('creado')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'PROCESANDO'
+        trabajo.iniciado = timezone.now()
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'iniciado', 'intentos'])
+    return trabajo
+
+
+def liberar_trabajos_colgados(minutos):
+    """
+    Devuelve a PENDIENTE los trabajos que llevan más de `minutos` en
+    PROCESANDO; los que ya agotaron sus intentos quedan en ERROR. Devuelve
+    (liberados, fallidos).
+    """
+    ahora = timezone.now()
+    colgados = TrabajoExportacion.objects.filter(estado='PROCESANDO', iniciado__lt=ahora - timedelta(minutes=minutos))
+    liberados = colgados.filter(intentos__lt=MAX_INTENTOS).update(estado='PENDIENTE')
+    fallidos = colgados.filter(intentos__gte=MAX_INTENTOS).update(
+        estado='ERROR',
+        error=f'El trabajo superó {minutos} minutos en proceso en {MAX_INTENTOS} intentos.',
+        terminado=ahora,
+    )
+    return liberados, fallidos
+
+
+def procesar_trabajo(trabajo):
+    """Genera el archivo del trabajo (o reutiliza uno idéntico) y actualiza su estado."""
+    try:
+        preparar, escribir, _, _ = GENERADORES[trabajo.tipo]
+        datos = preparar(trabajo.parametros)
+
+        # El archivo se nombra con la huella del contenido: dos pedidos
+        # distintos con las mismas entradas comparten el archivo
+        huella = calcular_huella(trabajo.tipo, datos)
+        nombre = nombre_archivo(huella, trabajo.tipo)
+        ruta = ruta_absoluta(nombre)
+
+        if not os.path.exists(ruta):
+            os.makedirs(settings.EXPORTACIONES_DIR, exist_ok=True)
+            # Se escribe a un temporal y se renombra: nunca se sirve un archivo a medias
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            try:
+                with open(temporal, 'wb') as destino:
+                    escribir(datos, destino)
+                os.replace(temporal, ruta)
+            finally:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+
+        trabajo.ruta_archivo = nombre
+        trabajo.estado = 'COMPLETADO'
+        trabajo.error = ''
+    except Exception as e:
+        # Se reintenta hasta MAX_INTENTOS antes de marcarlo como ERROR
+        trabajo.estado = 'PENDIENTE' if trabajo.intentos < MAX_INTENTOS else 'ERROR'
+        trabajo.error = str(e)
+
+    trabajo.terminado = timezone.now()
+    trabajo.save(update_fields=['ruta_archivo', 'estado', 'error', 'terminado'])
+    return trabajo
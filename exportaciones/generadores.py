@@ -0,0 +1,306 @@
+# exportaciones/generadores.py
+#
+# Generadores de archivos para la cola de exportaciones.
+#
+# Cada generador tiene tres partes:
+#   - version(parametros): agregados baratos (conteos, ids máximos) de las
+#     tablas que lee el generador; junto con los parámetros forman la huella
+#     del pedido que se calcula al encolar, sin leer los datos completos. No
+#     detectan ediciones en el lugar (ver REUTILIZAR_MINUTOS en cola.py).
+#   - preparar(parametros): lee la base de datos y devuelve los datos de
+#     entrada ya serializables (con ellos el worker calcula la huella del
+#     contenido, que da nombre al archivo).
+#   - escribir(datos, destino): produce el archivo en `destino` (binario).
+
+from datetime import date, timedelta
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from django.db.models import Count, Max, Q, Sum
+from django.template.loader import render_to_string
+from xhtml2pdf import pisa
+
+from asistencias.models import RegistroAsistencia, RegistroAsistenciaDetalle
+from cursos.horarios import DIAS_SEMANA, grilla_actividades
+from cursos.models import BloqueHorario, GrupoCurso, GrupoLaboratorio
+from matriculas.models import Matricula, MatriculaLaboratorio
+from reservas.models import Aula, Reserva
+
+
+# ----------------------------------------------------------------------
+# 1. REPORTE DE ASISTENCIA (Excel y PDF)
+# ----------------------------------------------------------------------
+
+def _agregados(queryset):
+    return queryset.aggregate(total=Count('id'), ultimo=Max('id'))
+
+
+def version_asistencia(parametros):
+    """Versión de los registros, detalles y matrículas del grupo (sin leer filas)."""
+    grupo_id = parametros['grupo_id']
+    detalles = RegistroAsistenciaDetalle.objects.filter(registro_asistencia__grupo_curso_id=grupo_id).aggregate(
+        total=Count('id'),
+        ultimo=Max('id'),
+        # Cambia cuando un estado pasa de PRESENTE a FALTA (o al revés) sin alterar el total
+        presentes=Sum('id', filter=Q(estado='PRESENTE')),
+    )
+    return {
+        'registros': _agregados(RegistroAsistencia.objects.filter(grupo_curso_id=grupo_id)),
+        'detalles': detalles,
+        'matriculas': _agregados(Matricula.objects.filter(grupo_curso_id=grupo_id)),
+        'matriculas_lab': _agregados(MatriculaLaboratorio.objects.filter(laboratorio_id=grupo_id)),
+    }
+
+
+def preparar_asistencia(parametros):
+    """Pivote de asistencia del grupo: { CUI: { 'YYYY-MM-DD': 'A'/'F' } } por estudiante."""
+    grupo_obj = GrupoCurso.objects.select_related('curso').get(id=parametros['grupo_id'])
+
+    # Determinar si es un grupo de Laboratorio
+    if GrupoLaboratorio.objects.filter(grupo_curso=grupo_obj).exists():
+        matriculas_query = MatriculaLaboratorio.objects.filter(laboratorio_id=grupo_obj.id)
+    else:
+        matriculas_query = Matricula.objects.filter(grupo_curso=grupo_obj)
+
+    fechas_str = [
+        f.strftime('%Y-%m-%d')
+        for f in RegistroAsistencia.objects.filter(grupo_curso=grupo_obj)
+                                           .order_by('fechaClase')
+                                           .values_list('fechaClase', flat=True)
+    ]
+
+    estudiantes = matriculas_query.order_by('estudiante__perfil__nombre').values_list(
+        'estudiante__perfil__id', 'estudiante__perfil__nombre'
+    )
+
+    pivote_asistencia = {}
+    detalles = RegistroAsistenciaDetalle.objects.filter(
+        registro_asistencia__grupo_curso=grupo_obj
+    ).values_list('estudiante_id', 'registro_asistencia__fechaClase', 'estado')
+    for cui, fecha, estado in detalles:
+        pivote_asistencia.setdefault(cui, {})[fecha.strftime('%Y-%m-%d')] = 'A' if estado == 'PRESENTE' else 'F'
+
+    reporte_data = []
+    for cui, nombre in estudiantes:
+        registros = pivote_asistencia.get(cui, {})
+        reporte_data.append({
+            'cui': cui,
+            'nombre': nombre,
+            'registros': {f_str: registros.get(f_str, '') for f_str in fechas_str},
+        })
+
+    return {
+        'grupo': {
+            'id': grupo_obj.id,
+            'grupo': grupo_obj.grupo,
+            'curso': {'id': grupo_obj.curso.id, 'nombre': grupo_obj.curso.nombre},
+        },
+        'fechas': fechas_str,
+        'reporte_data': reporte_data,
+        'fecha_generacion': parametros.get('fecha'),
+    }
+
+
+def escribir_asistencia_excel(datos, destino):
+    # write_only no guarda todas las celdas en memoria
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Registro Asistencia")
+
+    header_style = Font(bold=True)
+    headers = ['CUI', 'ALUMNO'] + [date.fromisoformat(f).strftime('%d/%m') for f in datos['fechas']]
+    encabezado = []
+    for texto in headers:
+        celda = WriteOnlyCell(sheet, value=texto)
+        celda.font = header_style
+        encabezado.append(celda)
+    sheet.append(encabezado)
+
+    for fila in datos['reporte_data']:
+        sheet.append([fila['cui'], fila['nombre']] + list(fila['registros'].values()))
+
+    workbook.save(destino)
+
+
+def escribir_asistencia_pdf(datos, destino):
+    grupo = datos['grupo']
+    fecha_generacion = date.fromisoformat(datos['fecha_generacion']) if datos.get('fecha_generacion') else date.today()
+
+    html_content = render_to_string('usuarios/profesor/reporte_asistencia_pdf.html', {
+        'grupo': grupo,
+        'fechas': [date.fromisoformat(f).strftime('%d/%m/%Y') for f in datos['fechas']],
+        'reporte_data': datos['reporte_data'],
+        'titulo_reporte': f"Reporte de Asistencia: {grupo['curso']['nombre']} (Grupo {grupo['grupo']})",
+        'fecha_generacion': fecha_generacion.strftime('%d/%m/%Y'),
+    })
+
+    pisa_status = pisa.CreatePDF(html_content, dest=destino)
+    if pisa_status.err:
+        raise RuntimeError("Error interno de xhtml2pdf al generar el PDF. Revise el formato del template HTML.")
+
+
+# ----------------------------------------------------------------------
+# 2. HORARIO DE AULA (PDF)
+# ----------------------------------------------------------------------
+
+def _semana(parametros):
+    hoy = date.fromisoformat(parametros['fecha']) if parametros.get('fecha') else date.today()
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    return hoy, inicio_semana, inicio_semana + timedelta(days=4)
+
+
+def version_horario_aula(parametros):
+    """Versión de los bloques del aula y de sus reservas de la semana (sin leer filas)."""
+    _, inicio_semana, fin_semana = _semana(parametros)
+    return {
+        'bloques': _agregados(BloqueHorario.objects.filter(aula_id=parametros['aula_id'])),
+        'reservas': _agregados(Reserva.objects.filter(
+            aula_id=parametros['aula_id'], fecha_reserva__range=[inicio_semana, fin_semana]
+        )),
+    }
+
+
+def preparar_horario_aula(parametros):
+    """Grilla semanal (clases + reservas de la semana) de un aula."""
+    aula = Aula.objects.get(id=parametros['aula_id'])
+    hoy, inicio_semana, fin_semana = _semana(parametros)
+
+    COLOR_OPTIONS = ['bg-primary', 'bg-success', 'bg-info', 'bg-warning', 'bg-danger', 'bg-secondary']
+    curso_colores = {}
+    horario_completo = []
+
+    # BloqueHorario para esta aula
+    bloques_clases = BloqueHorario.objects.filter(aula=aula).select_related(
+        'grupo_curso__curso',
+        'grupo_curso__profesor__perfil',
+        'grupo_curso__grupoteoria',
+    ).order_by('horaInicio')
+
+    for bloque in bloques_clases:
+        tipo = "TEO"
+        try:
+            bloque.grupo_curso.grupoteoria
+        except Exception:
+            tipo = "LAB"
+
+        profesor_nombre = ""
+        if bloque.grupo_curso.profesor and bloque.grupo_curso.profesor.perfil:
+            profesor_nombre = bloque.grupo_curso.profesor.perfil.nombre
+
+        horario_completo.append({
+            'tipo_actividad': 'CLASE',
+            'horaInicio': bloque.horaInicio,
+            'horaFin': bloque.horaFin,
+            'dia': bloque.dia,
+            'curso': bloque.grupo_curso.curso,
+            'profesor_nombre': profesor_nombre,
+            'grupo': bloque.grupo_curso.grupo,
+            'tipo': tipo,
+        })
+
+        curso_id = bloque.grupo_curso.curso.id
+        if curso_id not in curso_colores:
+            curso_colores[curso_id] = COLOR_OPTIONS[len(curso_colores) % len(COLOR_OPTIONS)]
+
+    # Reservas de la semana (solo Lunes a Viernes)
+    reservas = Reserva.objects.filter(
+        aula=aula,
+        fecha_reserva__range=[inicio_semana, fin_semana]
+    ).select_related('profesor__perfil')
+
+    for reserva in reservas:
+        dia_semana = reserva.fecha_reserva.weekday()
+        if dia_semana >= 5:
+            continue
+        horario_completo.append({
+            'tipo_actividad': 'RESERVA',
+            'horaInicio': reserva.hora_inicio,
+            'horaFin': reserva.hora_fin,
+            'dia': DIAS_SEMANA[dia_semana],
+            'curso': None,
+            'profesor_nombre': reserva.profesor.perfil.nombre if reserva.profesor else "",
+            'motivo': 'RESERVA',
+            'tipo': 'RES',
+        })
+
+    horas, actividades_por_celda = grilla_actividades(horario_completo)
+
+    horario_data = {}
+    for hora_idx, fila in enumerate(actividades_por_celda):
+        horario_data[str(hora_idx)] = {}
+        for dia_idx, actividad in enumerate(fila):
+            actividad_en_slot = None
+
+            if actividad is None:
+                pass
+
+            # Es una clase regular
+            elif actividad['tipo_actividad'] == 'CLASE':
+                curso = actividad['curso']
+                curso_id = str(curso.id)
+                actividad_en_slot = {
+                    'tipo': actividad['tipo'],
+                    'nombre': curso.nombre,
+                    'codigo_curso': curso_id,
+                    'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
+                    'profesor': actividad['profesor_nombre'],
+                    'aula_id': aula.id,
+                    'color': curso_colores.get(curso_id, 'bg-secondary'),
+                    'hora_inicio': actividad['horaInicio'].strftime("%H:%M"),
+                    'hora_fin': actividad['horaFin'].strftime("%H:%M"),
+                    'es_reserva': False,
+                }
+
+            # Es una reserva
+            else:
+                actividad_en_slot = {
+                    'tipo': 'RES',
+                    'nombre': actividad.get('motivo', 'Reserva de Aula'),
+                    'codigo_curso': 'RES',
+                    'codigo_grupo': 'RESERVA',
+                    'profesor': actividad['profesor_nombre'],
+                    'aula_id': aula.id,
+                    'color': 'bg-secondary',
+                    'hora_inicio': actividad['horaInicio'].strftime("%H:%M"),
+                    'hora_fin': actividad['horaFin'].strftime("%H:%M"),
+                    'es_reserva': True,
+                    'motivo': actividad.get('motivo', ''),
+                }
+
+            horario_data[str(hora_idx)][str(dia_idx)] = actividad_en_slot
+
+    curso_colores_map = {
+        str(curso_id): f"color-{i % 10}" for i, curso_id in enumerate(curso_colores)
+    }
+
+    return {
+        'aula': {'id': aula.id, 'tipo': aula.tipo, 'get_tipo_display': aula.get_tipo_display()},
+        'horas': horas,
+        'horario_data': horario_data,
+        'curso_colores_map': curso_colores_map,
+        'fecha_emision': hoy.strftime("%d/%m/%Y"),
+        'semana_actual': f"{inicio_semana.strftime('%d/%m')} - {fin_semana.strftime('%d/%m')}",
+    }
+
+
+def escribir_horario_aula_pdf(datos, destino):
+    contexto = {
+        **datos,
+        'horas_range': range(len(datos['horas'])),
+        'num_horas': len(datos['horas']),
+        'dias': ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes'],
+        'dias_range': range(len(DIAS_SEMANA)),
+    }
+    html_string = render_to_string('usuarios/secretaria/horario_aula_pdf.html', contexto)
+
+    pisa_status = pisa.CreatePDF(html_string, dest=destino, encoding='UTF-8')
+    if pisa_status.err:
+        raise RuntimeError('Error al generar PDF')
+
+
+# Tipo de trabajo -> (preparar, escribir, extensión, versión)
+GENERADORES = {
+    'ASISTENCIA_EXCEL': (preparar_asistencia, escribir_asistencia_excel, 'xlsx', version_asistencia),
+    'ASISTENCIA_PDF': (preparar_asistencia, escribir_asistencia_pdf, 'pdf', version_asistencia),
+    'HORARIO_AULA_PDF': (preparar_horario_aula, escribir_horario_aula_pdf, 'pdf', version_horario_aula),
+}
@@ -0,0 +1,80 @@
+# exportaciones/management/commands/procesar_exportaciones.py
+
+import time as reloj
+from django.core.management.base import BaseCommand, CommandError
+from exportaciones.cola import liberar_trabajos_colgados, procesar_trabajo, reclamar_siguiente
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de exportaciones: genera los PDF/Excel pendientes fuera del request.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina (útil para cron)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando la cola está vacía (por defecto 2)'
+        )
+        parser.add_argument(
+            '--max-trabajos',
+            type=int,
+            default=0,
+            help='Termina después de procesar esta cantidad de trabajos (0 = sin límite)'
+        )
+        parser.add_argument(
+            '--timeout-minutos',
+            type=int,
+            default=10,
+            help='Trabajos en PROCESANDO por más de estos minutos vuelven a la cola'
+        )
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo debe ser mayor a 0.')
+
+        procesados = 0
+        errores = 0
+        self.stdout.write(self.style.NOTICE('Esperando trabajos de exportación...'))
+
+        try:
+            while True:
+                liberados, fallidos = liberar_trabajos_colgados(options['timeout_minutos'])
+                if liberados:
+                    self.stdout.write(self.style.WARNING(f'{liberados} trabajo(s) colgado(s) devueltos a la cola.'))
+                if fallidos:
+                    self.stdout.write(self.style.ERROR(f'{fallidos} trabajo(s) colgado(s) sin intentos restantes marcados como ERROR.'))
+
+                trabajo = reclamar_siguiente()
+                if trabajo is None:
+                    if options['una_vez']:
+                        break
+                    reloj.sleep(options['intervalo'])
+                    continue
+
+                inicio = reloj.perf_counter()
+                procesar_trabajo(trabajo)
+                duracion = reloj.perf_counter() - inicio
+                procesados += 1
+
+                if trabajo.estado == 'COMPLETADO':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'[{trabajo.id}] {trabajo.get_tipo_display()} -> {trabajo.ruta_archivo} ({duracion:.2f}s)'
+                    ))
+                else:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'[{trabajo.id}] {trabajo.get_tipo_display()} falló (intento {trabajo.intentos}): {trabajo.error}'
+                    ))
+
+                if options['max_trabajos'] and procesados >= options['max_trabajos']:
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nInterrumpido por el usuario.'))
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
+        self.stdout.write(self.style.SUCCESS(f'Trabajos procesados: {procesados}'))
+        self.stdout.write(self.style.SUCCESS(f'Trabajos con error: {errores}'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2025-11-21 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ASISTENCIA_EXCEL', 'Asistencia (Excel)'), ('ASISTENCIA_PDF', 'Asistencia (PDF)'), ('HORARIO_AULA_PDF', 'Horario de Aula (PDF)')], max_length=20)),
+                ('parametros', models.JSONField(default=dict)),
+                ('huella', models.CharField(db_index=True, max_length=64)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=10)),
+                ('nombre_descarga', models.CharField(max_length=255)),
+                ('ruta_archivo', models.CharField(blank=True, max_length=512, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('intentos', models.IntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='usuarios.perfil')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'db_table': 'exportaciones_trabajo',
+                'indexes': [models.Index(fields=['estado', 'creado'], name='exportacion_estado_creado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import models
+from usuarios.models import Perfil
+
+class TrabajoExportacion(models.Model):
+    # Cola de exportaciones (PDF/Excel) generadas fuera del request por el
+    # comando `procesar_exportaciones`.
+
+    TIPO_CHOICES = [
+        ('ASISTENCIA_EXCEL', 'Asistencia (Excel)'),
+        ('ASISTENCIA_PDF', 'Asistencia (PDF)'),
+        ('HORARIO_AULA_PDF', 'Horario de Aula (PDF)'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+
+    # Entradas del generador (ej: {'grupo_id': 'INF101-A'} o {'aula_id': '101', 'fecha': '2025-11-20'})
+    parametros = models.JSONField(default=dict)
+
+    # Hash SHA-256 del pedido (tipo, parámetros y versión de los datos): un
+    # pedido con la misma huella ya completado reutiliza su archivo
+    huella = models.CharField(max_length=64, db_index=True)
+
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE')
+
+    # FK a Perfil ON DELETE CASCADE (solo quien lo pidió puede descargarlo)
+    solicitado_por = models.ForeignKey(
+        Perfil,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+
+    nombre_descarga = models.CharField(max_length=255)
+    ruta_archivo = models.CharField(max_length=512, null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    intentos = models.IntegerField(default=0)
+
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'exportaciones_trabajo'
+        verbose_name = 'Trabajo de Exportación'
+        verbose_name_plural = 'Trabajos de Exportación'
+        indexes = [
+            models.Index(fields=['estado', 'creado'], name='exportacion_estado_creado_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.id} - {self.get_tipo_display()} ({self.estado})'
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from datetime import date, time, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from asistencias.models import RegistroAsistencia, RegistroAsistenciaDetalle
+from cursos.models import BloqueHorario, Curso, GrupoCurso, GrupoTeoria
+from matriculas.models import Matricula
+from reservas.models import Aula
+from usuarios.models import Estudiante, Perfil, Profesor
+from .cola import (
+    MAX_INTENTOS, REUTILIZAR_MINUTOS, encolar_exportacion, liberar_trabajos_colgados, procesar_trabajo,
+    reclamar_siguiente, ruta_absoluta,
+)
+from .models import TrabajoExportacion
+
+
+class ColaExportacionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        profesor = Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P001', nombre='Docente Uno', password='x', rol='PROFESOR'),
+            es_teoria=True,
+        )
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        grupo = GrupoCurso.objects.create(id='C001A', curso=curso, profesor=profesor, grupo='A', capacidad=40)
+        GrupoTeoria.objects.create(grupo_curso=grupo)
+        cls.bloque = BloqueHorario.objects.create(
+            grupo_curso=grupo, aula=Aula.objects.create(id='101', tipo='AULA_NORMAL'),
+            dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40),
+        )
+        estudiante = Estudiante.objects.create(
+            perfil=Perfil.objects.create(id='E001', nombre='Alumno Uno', password='x', rol='ESTUDIANTE')
+        )
+        Matricula.objects.create(estudiante=estudiante, grupo_curso=grupo, estado=True)
+        registro = RegistroAsistencia.objects.create(
+            grupo_curso=grupo, fechaClase=date(2025, 3, 10), ipProfesor='127.0.0.1', horaInicioVentana=time(7, 0)
+        )
+        cls.detalle = RegistroAsistenciaDetalle.objects.create(
+            registro_asistencia=registro, estudiante=estudiante, estado='PRESENTE'
+        )
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = override_settings(EXPORTACIONES_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def encolar(self):
+        return encolar_exportacion('ASISTENCIA_EXCEL', {'grupo_id': 'C001A', 'fecha': '2025-03-10'}, 'P001', 'asistencia.xlsx')
+
+    def test_pedido_repetido_reutiliza_el_archivo(self):
+        trabajo = self.encolar()
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        procesado = procesar_trabajo(reclamar_siguiente())
+        self.assertEqual(procesado.estado, 'COMPLETADO')
+        self.assertTrue(os.path.exists(ruta_absoluta(procesado.ruta_archivo)))
+
+        # Al encolar solo se leen agregados (4), se busca el pedido previo y se inserta
+        with self.assertNumQueries(6):
+            repetido = self.encolar()
+        self.assertEqual(repetido.estado, 'COMPLETADO')
+        self.assertEqual(repetido.ruta_archivo, procesado.ruta_archivo)
+
+    def test_cambio_de_estado_genera_otro_archivo(self):
+        self.encolar()
+        primero = procesar_trabajo(reclamar_siguiente())
+
+        # Mismo total de detalles, distinto estado: la versión del pedido cambia
+        RegistroAsistenciaDetalle.objects.filter(pk=self.detalle.pk).update(estado='FALTA')
+        trabajo = self.encolar()
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        segundo = procesar_trabajo(reclamar_siguiente())
+        self.assertEqual(segundo.estado, 'COMPLETADO')
+        self.assertNotEqual(segundo.ruta_archivo, primero.ruta_archivo)
+
+    def test_edicion_en_el_lugar_no_reutiliza_fuera_de_la_ventana(self):
+        self.encolar()
+        primero = procesar_trabajo(reclamar_siguiente())
+
+        # Renombrar no cambia los agregados; pasada la ventana se regenera
+        Perfil.objects.filter(id='E001').update(nombre='Alumno Renombrado')
+        TrabajoExportacion.objects.filter(pk=primero.pk).update(
+            terminado=timezone.now() - timedelta(minutes=REUTILIZAR_MINUTOS + 1)
+        )
+        trabajo = self.encolar()
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        segundo = procesar_trabajo(reclamar_siguiente())
+        self.assertEqual(segundo.estado, 'COMPLETADO')
+        self.assertNotEqual(segundo.ruta_archivo, primero.ruta_archivo)
+
+    def test_cambio_de_hora_en_el_lugar_genera_otro_horario(self):
+        parametros = {'aula_id': '101', 'fecha': '2025-03-10'}
+        encolar_exportacion('HORARIO_AULA_PDF', parametros, 'P001', 'horario.pdf')
+        primero = procesar_trabajo(reclamar_siguiente())
+        self.assertEqual(primero.estado, 'COMPLETADO')
+
+        BloqueHorario.objects.filter(pk=self.bloque.pk).update(horaInicio=time(8, 0), horaFin=time(9, 40))
+        TrabajoExportacion.objects.filter(pk=primero.pk).update(
+            terminado=timezone.now() - timedelta(minutes=REUTILIZAR_MINUTOS + 1)
+        )
+        self.assertEqual(encolar_exportacion('HORARIO_AULA_PDF', parametros, 'P001', 'horario.pdf').estado, 'PENDIENTE')
+        segundo = procesar_trabajo(reclamar_siguiente())
+        self.assertNotEqual(segundo.ruta_archivo, primero.ruta_archivo)
+
+    def test_colgado_sin_intentos_queda_en_error(self):
+        self.encolar()
+        self.encolar()
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        TrabajoExportacion.objects.update(estado='PROCESANDO', iniciado=hace_una_hora, intentos=1)
+        ultimo = TrabajoExportacion.objects.latest('id')
+        TrabajoExportacion.objects.filter(pk=ultimo.pk).update(intentos=MAX_INTENTOS)
+
+        self.assertEqual(liberar_trabajos_colgados(10), (1, 1))
+        ultimo.refresh_from_db()
+        self.assertEqual(ultimo.estado, 'ERROR')
+        self.assertIsNotNone(ultimo.terminado)
+        self.assertEqual(TrabajoExportacion.objects.filter(estado='PENDIENTE').count(), 1)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Matricula, MatriculaLaboratorio
+from .calificaciones import notas_de_matriculas
 
 # ----------------------------------------------------------------------
 # 1. Administración del modelo Matricula
@@ -17,6 +18,8 @@ class MatriculaAdmin(admin.ModelAdmin):
         'calcular_promedio' # Mostrar una columna de promedio si se define el método
     )
     list_filter = ('grupo_curso__curso__nombre', 'estado')
+    # El promedio usa los porcentajes del curso: se traen en la misma consulta
+    list_select_related = ('estudiante__perfil', 'grupo_curso__curso')
     search_fields = (
         'estudiante__perfil__nombre', 
         'estudiante__perfil__id', 
@@ -48,27 +51,10 @@ class MatriculaAdmin(admin.ModelAdmin):
     grupo_curso_display.short_description = 'Grupo Curso'
     
     def calcular_promedio(self, obj):
-        """Calcula el promedio simple de las notas (solo fines de visualización)."""
-        
-        # 🚨 CORRECCIÓN CLAVE: Reemplazar None con 0.0 en todas las notas
-        # Esto previene el TypeError al sumar None + float.
-        notas_con_cero = [
-            obj.EC1 or 0.0, 
-            obj.EP1 or 0.0, 
-            obj.EC2 or 0.0, 
-            obj.EP2 or 0.0, 
-            obj.EC3 or 0.0, 
-            obj.EP3 or 0.0
-        ]
-        
-        num_notas = len(notas_con_cero)
-        
-        if num_notas == 0:
-            return "N/A" # En caso improbable de que no haya notas, aunque siempre serán 6
-        
-        promedio = sum(notas_con_cero) / num_notas
-        return f"{promedio:.2f}"
-    calcular_promedio.short_description = 'Promedio'
+        """Nota final ponderada con los porcentajes del curso (notas faltantes no suman)."""
+        resultado = notas_de_matriculas([obj])
+        return f"{resultado.nota_final[0]:.2f}"
+    calcular_promedio.short_description = 'Promedio Ponderado'
 
 
 # ----------------------------------------------------------------------
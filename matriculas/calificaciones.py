@@ -0,0 +1,270 @@
+# matriculas/calificaciones.py
+#
+# Motor de calificaciones.
+#
+# Las notas de un conjunto de matrículas se cargan como dos matrices de
+# (matrículas x 6): las notas EP/EC (NaN si aún no hay nota) y los porcentajes
+# del curso. Con ellas se calcula de una sola vez, para todo el conjunto, la
+# nota final, la ponderación cubierta/faltante, la nota requerida para aprobar
+# y los escenarios de aprobación. Lo usan el dashboard y "Mis Notas" del
+# estudiante y el admin de matrículas, y sirve igual para un grupo que para
+# toda la institución.
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .models import Matricula
+
+
+NOTA_MINIMA = 0
+NOTA_MAXIMA = 20
+NOTA_APROBATORIA = 10.5
+
+# (campo de nota, campo de porcentaje en Curso, nombre) en el orden en que se muestran
+EVALUACIONES = [
+    ('EP1', 'porcentajeEP1', 'Examen Parcial 1 (EP1)'),
+    ('EC1', 'porcentajeEC1', 'Nota Continua 1 (EC1)'),
+    ('EP2', 'porcentajeEP2', 'Examen Parcial 2 (EP2)'),
+    ('EC2', 'porcentajeEC2', 'Nota Continua 2 (EC2)'),
+    ('EP3', 'porcentajeEP3', 'Examen Parcial 3 (EP3)'),
+    ('EC3', 'porcentajeEC3', 'Nota Continua 3 (EC3)'),
+]
+
+CAMPOS_NOTA = [nota for nota, _, _ in EVALUACIONES]
+CAMPOS_PESO = [f'grupo_curso__curso__{peso}' for _, peso, _ in EVALUACIONES]
+
+# Nota supuesta para la evaluación faltante de mayor peso en cada escenario
+# (bajo, medio y alto); el escenario calcula cuánto necesita la segunda.
+NOTAS_ESCENARIO = np.array([11.0, 15.0, 20.0])
+
+
+@dataclass
+class ResultadoNotas:
+    """Resultados por matrícula (cada arreglo tiene una posición por fila)."""
+    ids: list
+    notas: np.ndarray                   # (n, 6) con NaN donde no hay nota
+    pesos: np.ndarray                   # (n, 6) porcentajes del curso
+    creditos: np.ndarray                # (n,)
+
+    nota_final: np.ndarray              # Suma de nota * porcentaje / 100 de las notas registradas
+    suma_ponderada: np.ndarray          # Suma de nota * porcentaje de las notas registradas
+    peso_total: np.ndarray              # Suma de porcentajes > 0
+    peso_faltante: np.ndarray           # Porcentaje de evaluaciones sin nota
+    evaluaciones_faltantes: np.ndarray
+    peso_aprobado: np.ndarray           # Porcentaje con nota >= NOTA_APROBATORIA
+    peso_reprobado: np.ndarray
+    completas: np.ndarray               # True si tiene las 6 notas registradas
+
+    suma_requerida: np.ndarray          # Puntos (nota * porcentaje) que faltan para aprobar
+    nota_requerida: np.ndarray          # Promedio requerido en lo faltante (NaN si no falta nada)
+    es_imposible: np.ndarray
+
+    # Escenarios de aprobación (solo válidos donde `con_escenarios` es True)
+    con_escenarios: np.ndarray
+    faltante_1: np.ndarray              # Índice de la evaluación faltante de mayor peso
+    faltante_2: np.ndarray              # Índice de la segunda
+    escenario_nota_2: np.ndarray        # (n, 3) nota requerida en la segunda
+    escenario_promedio: np.ndarray      # (n, 3) promedio final resultante
+
+    def __len__(self):
+        return len(self.ids)
+
+    def posicion(self, matricula_id):
+        return self.ids.index(matricula_id)
+
+    def promedio_ponderado(self, solo_completas=True):
+        """
+        Promedio ponderado por créditos de las notas finales.
+        Devuelve None si no hay filas que considerar o si no suman créditos.
+        """
+        mascara = self.completas if solo_completas else np.ones(len(self), dtype=bool)
+        total_creditos = self.creditos[mascara].sum()
+        if not mascara.any() or total_creditos <= 0:
+            return None
+        return float((self.nota_final[mascara] * self.creditos[mascara]).sum() / total_creditos)
+
+    def escenarios_aprobacion(self, fila):
+        """
+        Escenarios de aprobación de una matrícula (lista de dicts para el
+        template): con la evaluación faltante más pesada en 11, 15 y 20, cuánto
+        se necesita en la segunda. Si ninguno aprueba y es imposible, se
+        muestra el máximo alcanzable.
+        """
+        if not self.con_escenarios[fila]:
+            return []
+
+        i1 = self.faltante_1[fila]
+        i2 = self.faltante_2[fila]
+        base = {
+            'N1_name': EVALUACIONES[i1][2],
+            'N2_name': EVALUACIONES[i2][2],
+            'N1_weight': int(self.pesos[fila, i1]),
+            'N2_weight': int(self.pesos[fila, i2]),
+        }
+
+        escenarios = []
+        vistos = set()
+        for k, nota_1 in enumerate(NOTAS_ESCENARIO):
+            promedio = float(self.escenario_promedio[fila, k])
+            if promedio < NOTA_APROBATORIA:
+                continue
+            escenario = {
+                'N1_grade': round(float(nota_1)),
+                'N2_grade': int(self.escenario_nota_2[fila, k]),
+                'final_average': round(promedio, 1),
+                'is_passing': True,
+                **base,
+            }
+            clave = (escenario['N1_grade'], escenario['N2_grade'], escenario['final_average'])
+            if clave not in vistos:
+                vistos.add(clave)
+                escenarios.append(escenario)
+        escenarios.sort(key=lambda x: x['N1_grade'])
+
+        # Escenario Imposible
+        if not escenarios and self.es_imposible[fila]:
+            promedio_maximo = (self.suma_ponderada[fila] + self.peso_faltante[fila] * NOTA_MAXIMA) / 100.0
+            escenarios.append({
+                'N1_grade': round(NOTA_MAXIMA),
+                'N2_grade': round(NOTA_MAXIMA),
+                'final_average': round(float(promedio_maximo), 1),
+                'is_passing': False,
+                **base,
+            })
+        return escenarios
+
+
+# ----------------------------------------------------------------------
+# CÁLCULO
+# ----------------------------------------------------------------------
+
+def calcular_notas(notas, pesos, creditos=None, ids=None):
+    """
+    Calcula todas las métricas de calificación para las filas dadas.
+    `notas` y `pesos` son matrices (n, 6) en el orden de EVALUACIONES
+    (None/NaN = nota no registrada).
+    """
+    notas = np.asarray(notas, dtype=float).reshape(-1, len(EVALUACIONES))
+    pesos = np.nan_to_num(np.asarray(pesos, dtype=float).reshape(-1, len(EVALUACIONES)))
+    n = notas.shape[0]
+    creditos = np.zeros(n) if creditos is None else np.nan_to_num(np.asarray(creditos, dtype=float))
+    ids = list(range(n)) if ids is None else list(ids)
+
+    activas = pesos > 0
+    sin_nota = np.isnan(notas)
+    registradas = activas & ~sin_nota
+    faltantes = activas & sin_nota
+    notas_registradas = np.where(registradas, notas, 0.0)
+
+    suma_ponderada = (notas_registradas * pesos).sum(axis=1)
+    nota_final = (notas_registradas * pesos / 100).sum(axis=1)
+    peso_total = np.where(activas, pesos, 0.0).sum(axis=1)
+    peso_faltante = np.where(faltantes, pesos, 0.0).sum(axis=1)
+    evaluaciones_faltantes = faltantes.sum(axis=1)
+    aprobadas = registradas & (notas_registradas >= NOTA_APROBATORIA)
+    peso_aprobado = np.where(aprobadas, pesos, 0.0).sum(axis=1)
+    peso_reprobado = np.where(registradas & ~aprobadas, pesos, 0.0).sum(axis=1)
+
+    # Nota mínima requerida en las evaluaciones faltantes
+    suma_requerida = NOTA_APROBATORIA * 100 - suma_ponderada
+    hay_faltantes = evaluaciones_faltantes > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nota_requerida = np.where(
+            hay_faltantes,
+            np.where(suma_requerida <= 0, 0.0, suma_requerida / peso_faltante),
+            np.nan,
+        )
+    es_imposible = hay_faltantes & (suma_requerida > 0) & (nota_requerida > NOTA_MAXIMA)
+
+    # Escenarios: las dos evaluaciones faltantes de mayor peso (orden estable
+    # para que, a igual peso, gane la que aparece primero en EVALUACIONES)
+    orden = np.argsort(-np.where(faltantes, pesos, -1.0), axis=1, kind='stable')
+    faltante_1 = orden[:, 0]
+    faltante_2 = orden[:, 1]
+    peso_1 = np.take_along_axis(pesos, faltante_1[:, None], axis=1)
+    peso_2 = np.take_along_axis(pesos, faltante_2[:, None], axis=1)
+    con_escenarios = (evaluaciones_faltantes >= 2) & (suma_requerida > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nota_2 = np.where(
+            peso_2 > 0,
+            (suma_requerida[:, None] - NOTAS_ESCENARIO[None, :] * peso_1) / peso_2,
+            NOTA_MAXIMA + 1,
+        )
+    # Redondear N2 al entero más cercano hacia arriba
+    escenario_nota_2 = np.maximum(0.0, np.ceil(np.minimum(NOTA_MAXIMA, nota_2)))
+    escenario_promedio = (
+        suma_ponderada[:, None] + NOTAS_ESCENARIO[None, :] * peso_1 + escenario_nota_2 * peso_2
+    ) / 100.0
+
+    return ResultadoNotas(
+        ids=ids,
+        notas=notas,
+        pesos=pesos,
+        creditos=creditos,
+        nota_final=nota_final,
+        suma_ponderada=suma_ponderada,
+        peso_total=peso_total,
+        peso_faltante=peso_faltante,
+        evaluaciones_faltantes=evaluaciones_faltantes,
+        peso_aprobado=peso_aprobado,
+        peso_reprobado=peso_reprobado,
+        completas=~sin_nota.any(axis=1),
+        suma_requerida=suma_requerida,
+        nota_requerida=nota_requerida,
+        es_imposible=es_imposible,
+        con_escenarios=con_escenarios,
+        faltante_1=faltante_1,
+        faltante_2=faltante_2,
+        escenario_nota_2=escenario_nota_2,
+        escenario_promedio=escenario_promedio,
+    )
+
+
+# ----------------------------------------------------------------------
+# CARGA DESDE LA BASE DE DATOS
+# ----------------------------------------------------------------------
+
+def notas_de_matriculas(matriculas):
+    """Motor sobre instancias de Matricula ya cargadas (con grupo_curso__curso)."""
+    matriculas = list(matriculas)
+    notas = [[getattr(m, campo) for campo in CAMPOS_NOTA] for m in matriculas]
+    pesos = [[getattr(m.grupo_curso.curso, peso) for _, peso, _ in EVALUACIONES] for m in matriculas]
+    creditos = [m.grupo_curso.curso.creditos for m in matriculas]
+    return calcular_notas(notas, pesos, creditos, ids=[m.id for m in matriculas])
+
+
+def notas_de_queryset(queryset, clave='id'):
+    """
+    Motor sobre un queryset de Matricula, leído en una sola consulta con values_list.
+    `clave` es el campo que identifica cada fila en `ids` (por ejemplo
+    'estudiante_id' para agrupar por estudiante).
+    """
+    filas = list(queryset.values_list(clave, 'grupo_curso__curso__creditos', *CAMPOS_NOTA, *CAMPOS_PESO))
+    if not filas:
+        return calcular_notas(np.empty((0, 6)), np.empty((0, 6)), [], ids=[])
+
+    matriz = np.array([fila[1:] for fila in filas], dtype=float)
+    return calcular_notas(
+        matriz[:, 1:7],
+        matriz[:, 7:13],
+        matriz[:, 0],
+        ids=[fila[0] for fila in filas],
+    )
+
+
+def notas_de_grupo(grupo):
+    return notas_de_queryset(Matricula.objects.filter(grupo_curso=grupo, estado=True))
+
+
+def notas_institucion():
+    return notas_de_queryset(Matricula.objects.filter(estado=True))
+
+
+def redondear(valor, decimales=1):
+    """Redondeo para mostrar; NaN/None se devuelven como None."""
+    if valor is None or math.isnan(valor):
+        return None
+    return round(float(valor), decimales)
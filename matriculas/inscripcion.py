@@ -0,0 +1,146 @@
+# matriculas/inscripcion.py
+#
+# Matrícula de laboratorio con control de cupos.
+#
+# Al abrir la matrícula cientos de estudiantes envían la misma solicitud a la
+# vez. Para no sobrepasar GrupoCurso.capacidad, cada inscripción toma un
+# bloqueo de fila (SELECT ... FOR UPDATE) sobre el GrupoCurso del laboratorio
+# y, dentro de la misma transacción, cuenta los inscritos, verifica cruces de
+# horario y recién entonces crea la MatriculaLaboratorio. Las solicitudes al
+# mismo laboratorio quedan así serializadas; las de laboratorios distintos no
+# se bloquean entre sí.
+
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from cursos.horarios import IndiceHorario
+from cursos.models import BloqueHorario, GrupoCurso
+from usuarios.models import Estudiante
+from .models import Matricula, MatriculaLaboratorio
+
+
+@dataclass
+class ResultadoInscripcion:
+    matricula: MatriculaLaboratorio
+    grupo_curso: GrupoCurso
+    inscritos: int
+    capacidad: int
+
+    @property
+    def cupos_restantes(self):
+        return max(self.capacidad - self.inscritos, 0)
+
+
+def grupos_del_estudiante(estudiante_id):
+    """Subconsultas con los ids de GrupoCurso de teoría (activa) y laboratorio del estudiante."""
+    teorias = Matricula.objects.filter(estudiante_id=estudiante_id, estado=True).values('grupo_curso_id')
+    laboratorios = MatriculaLaboratorio.objects.filter(estudiante_id=estudiante_id).values('laboratorio_id')
+    return teorias, laboratorios
+
+
+def cruces_con_grupo(estudiante_id, grupo_curso_id):
+    """
+    Bloques del horario actual del estudiante que se cruzan con algún bloque
+    del grupo candidato (mismo día y rangos solapados), con curso y aula ya
+    cargados. Se resuelve con una sola consulta: el solapamiento se evalúa
+    en la base de datos con un EXISTS correlacionado sobre los bloques del
+    candidato.
+    """
+    teorias, laboratorios = grupos_del_estudiante(estudiante_id)
+
+    # Dos intervalos [A, B) y [C, D) se solapan si A < D y C < B
+    bloques_candidato = BloqueHorario.objects.filter(
+        grupo_curso_id=grupo_curso_id,
+        dia=OuterRef('dia'),
+        horaInicio__lt=OuterRef('horaFin'),
+        horaFin__gt=OuterRef('horaInicio'),
+    )
+    return list(
+        BloqueHorario.objects.filter(Q(grupo_curso_id__in=teorias) | Q(grupo_curso_id__in=laboratorios))
+        .exclude(grupo_curso_id=grupo_curso_id)
+        .filter(Exists(bloques_candidato))
+        .select_related('grupo_curso__curso', 'aula')
+        .order_by('dia', 'horaInicio')
+    )
+
+
+def indice_horario_estudiante(estudiante_id):
+    """
+    Horario actual del estudiante (teoría + laboratorio) indexado por día,
+    con el curso de cada bloque ya cargado. Una sola consulta; sirve para
+    evaluar muchos grupos candidatos en memoria.
+    """
+    teorias, laboratorios = grupos_del_estudiante(estudiante_id)
+    bloques = BloqueHorario.objects.filter(
+        Q(grupo_curso_id__in=teorias) | Q(grupo_curso_id__in=laboratorios)
+    ).select_related('grupo_curso__curso')
+    return IndiceHorario((bloque.dia, bloque.horaInicio, bloque.horaFin, bloque) for bloque in bloques)
+
+
+def cursos_en_cruce(indice, bloques_candidato):
+    """Nombres de los cursos del estudiante que se cruzan con los bloques del candidato."""
+    nombres = set()
+    for bloque in bloques_candidato:
+        for conflicto in indice.solapados(bloque.dia, bloque.horaInicio, bloque.horaFin):
+            nombres.add(conflicto.grupo_curso.curso.nombre)
+    return sorted(nombres)
+
+
+def matricular_laboratorio(estudiante, laboratorio_id):
+    """
+    Inscribe al estudiante en el laboratorio indicado (PK del GrupoLaboratorio,
+    igual al id del GrupoCurso). Devuelve un ResultadoInscripcion con los
+    cupos actualizados o lanza ValueError con el motivo del rechazo.
+    """
+    with transaction.atomic():
+        # Orden fijo de bloqueos (estudiante -> grupo) para evitar deadlocks.
+        # El del estudiante impide inscribirse en dos laboratorios del mismo
+        # curso con solicitudes simultáneas.
+        list(Estudiante.objects.select_for_update().filter(pk=estudiante.pk).values_list('pk', flat=True))
+        try:
+            grupo_curso = GrupoCurso.objects.select_for_update().select_related('curso').get(
+                pk=laboratorio_id, grupolaboratorio__isnull=False
+            )
+        except GrupoCurso.DoesNotExist:
+            raise ValueError("Error: Grupo de laboratorio no encontrado.")
+        etiqueta = f"{grupo_curso.curso.id} ({grupo_curso.grupo})"
+
+        # 1. Debe estar matriculado en la teoría del curso y no tener otro laboratorio del mismo curso
+        if not Matricula.objects.filter(estudiante=estudiante, estado=True, grupo_curso__curso_id=grupo_curso.curso_id).exists():
+            raise ValueError(f"No estás matriculado en la teoría de {grupo_curso.curso.nombre}.")
+        if MatriculaLaboratorio.objects.filter(estudiante=estudiante, laboratorio__grupo_curso__curso_id=grupo_curso.curso_id).exists():
+            raise ValueError(f"Ya tienes un laboratorio de {grupo_curso.curso.nombre} matriculado.")
+
+        # 2. Cupos disponibles (una sola consulta, con el grupo bloqueado).
+        # Las lecturas comunes se hacen después de obtener los bloqueos, así que
+        # en InnoDB (REPEATABLE READ) el snapshot ya incluye las inscripciones
+        # confirmadas por quien tenía el bloqueo antes.
+        inscritos = MatriculaLaboratorio.objects.filter(laboratorio_id=grupo_curso.pk).count()
+        if inscritos >= grupo_curso.capacidad:
+            raise ValueError(f"El laboratorio {etiqueta} ya no tiene cupos disponibles ({grupo_curso.capacidad}/{grupo_curso.capacidad}).")
+
+        # 3. Verificar existencia de bloques
+        if not BloqueHorario.objects.filter(grupo_curso_id=grupo_curso.pk).exists():
+            raise ValueError("Error: El grupo de laboratorio seleccionado no tiene horario definido.")
+
+        # 4. Cruce de horario (dentro de la misma transacción)
+        cruces = cruces_con_grupo(estudiante.pk, grupo_curso.pk)
+        if cruces:
+            conflicto = cruces[0]
+            extra = f" (y {len(cruces) - 1} cruce(s) más)" if len(cruces) > 1 else ""
+            raise ValueError(
+                f"El laboratorio {etiqueta} choca con tu clase de {conflicto.grupo_curso.curso.nombre} el {conflicto.dia} "
+                f"a las {conflicto.horaInicio.strftime('%H:%M')}{extra}. Selecciona otro grupo."
+            )
+
+        # 5. Matricular
+        matricula = MatriculaLaboratorio.objects.create(estudiante=estudiante, laboratorio_id=grupo_curso.pk)
+
+    return ResultadoInscripcion(
+        matricula=matricula,
+        grupo_curso=grupo_curso,
+        inscritos=inscritos + 1,
+        capacidad=grupo_curso.capacidad,
+    )
@@ -0,0 +1,150 @@
+# matriculas/management/commands/benchmark_notas.py
+
+import math
+import random
+import time as reloj
+from django.core.management.base import BaseCommand, CommandError
+from matriculas.calificaciones import EVALUACIONES, NOTA_APROBATORIA, calcular_notas
+
+class Command(BaseCommand):
+    help = 'Mide el motor de calificaciones con matrículas sintéticas (no usa la base de datos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--matriculas',
+            type=int,
+            default=100000,
+            help='Cantidad de matrículas sintéticas a generar (por defecto 100000)'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=5,
+            help='Cantidad de veces que se ejecuta el motor para promediar'
+        )
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Ejecuta también el cálculo fila por fila (el de las vistas anteriores) y verifica que coincida'
+        )
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            default=2025,
+            help='Semilla para generar siempre las mismas matrículas'
+        )
+
+    def generar_matriculas(self, cantidad, semilla):
+        # Esquemas de porcentajes típicos de los cursos (suman 100)
+        esquemas = [
+            [15, 15, 15, 15, 20, 20],
+            [10, 20, 10, 20, 10, 30],
+            [20, 10, 20, 10, 30, 10],
+            [0, 30, 0, 30, 0, 40],
+        ]
+        aleatorio = random.Random(semilla)
+        notas = []
+        pesos = []
+        creditos = []
+        for _ in range(cantidad):
+            # Las evaluaciones avanzan en orden: las últimas suelen faltar
+            registradas = aleatorio.randint(0, len(EVALUACIONES))
+            notas.append([
+                round(aleatorio.uniform(0, 20), 1) if indice < registradas else None
+                for indice in range(len(EVALUACIONES))
+            ])
+            pesos.append(aleatorio.choice(esquemas))
+            creditos.append(aleatorio.choice([2, 3, 4, 5]))
+        return notas, pesos, creditos
+
+    def calculo_anterior(self, notas, pesos):
+        # Réplica del cálculo que hacía "Mis Notas" por cada curso
+        resultados = []
+        for fila_notas, fila_pesos in zip(notas, pesos):
+            promedio_final = 0.0
+            current_weighted_score = 0.0
+            total_weight_missing = 0.0
+            faltantes = []
+            for indice, (nota, porcentaje) in enumerate(zip(fila_notas, fila_pesos)):
+                if porcentaje > 0:
+                    if nota is not None:
+                        current_weighted_score += nota * porcentaje
+                        promedio_final += (nota * porcentaje) / 100
+                    else:
+                        total_weight_missing += porcentaje
+                        faltantes.append((indice, porcentaje))
+
+            required_avg_grade = None
+            escenarios = []
+            if faltantes:
+                required_weighted_sum = NOTA_APROBATORIA * 100 - current_weighted_score
+                if required_weighted_sum <= 0:
+                    required_avg_grade = 0.0
+                else:
+                    required_avg_grade = required_weighted_sum / total_weight_missing
+
+                if len(faltantes) >= 2 and required_weighted_sum > 0:
+                    faltantes.sort(key=lambda x: x[1], reverse=True)
+                    p1 = faltantes[0][1]
+                    p2 = faltantes[1][1]
+                    for n1 in (11.0, 15.0, 20.0):
+                        n2 = (required_weighted_sum - n1 * p1) / p2
+                        n2 = max(0.0, math.ceil(min(20.0, n2)))
+                        escenarios.append((current_weighted_score + n1 * p1 + n2 * p2) / 100.0)
+
+            resultados.append((round(promedio_final, 1), required_avg_grade, escenarios))
+        return resultados
+
+    def coincide(self, resultado, anterior):
+        for fila, (promedio, requerida, escenarios) in enumerate(anterior):
+            if round(float(resultado.nota_final[fila]), 1) != promedio:
+                return False
+            if requerida is None:
+                if not math.isnan(resultado.nota_requerida[fila]):
+                    return False
+            elif abs(resultado.nota_requerida[fila] - requerida) > 1e-9:
+                return False
+            if escenarios:
+                if not resultado.con_escenarios[fila]:
+                    return False
+                if any(abs(resultado.escenario_promedio[fila, k] - valor) > 1e-9 for k, valor in enumerate(escenarios)):
+                    return False
+            elif resultado.con_escenarios[fila]:
+                return False
+        return True
+
+    def handle(self, *args, **options):
+        cantidad = options['matriculas']
+        repeticiones = options['repeticiones']
+
+        if cantidad <= 0 or repeticiones <= 0:
+            raise CommandError('La cantidad de matrículas y de repeticiones debe ser mayor a cero.')
+
+        notas, pesos, creditos = self.generar_matriculas(cantidad, options['semilla'])
+        self.stdout.write(self.style.NOTICE(f'Matrículas generadas: {cantidad} | Repeticiones: {repeticiones}'))
+
+        tiempos = []
+        resultado = None
+        for _ in range(repeticiones):
+            inicio = reloj.perf_counter()
+            resultado = calcular_notas(notas, pesos, creditos)
+            tiempos.append(reloj.perf_counter() - inicio)
+
+        self.stdout.write(f'Promedio ponderado institucional: {resultado.promedio_ponderado(solo_completas=False):.2f}')
+        self.stdout.write(f'Matrículas con aprobación imposible: {int(resultado.es_imposible.sum())}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Motor de calificaciones -> mejor: {min(tiempos) * 1000:.2f} ms | promedio: {sum(tiempos) / len(tiempos) * 1000:.2f} ms'
+        ))
+
+        if options['comparar']:
+            inicio = reloj.perf_counter()
+            anterior = self.calculo_anterior(notas, pesos)
+            tiempo_anterior = reloj.perf_counter() - inicio
+
+            self.stdout.write(self.style.WARNING(f'Cálculo fila por fila -> {tiempo_anterior * 1000:.2f} ms'))
+            if self.coincide(resultado, anterior):
+                self.stdout.write(self.style.SUCCESS('Resultado idéntico al cálculo anterior.'))
+            else:
+                self.stdout.write(self.style.ERROR('¡Los resultados NO coinciden con el cálculo anterior!'))
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
@@ -1,16 +1,29 @@
 import csv
 import os
+import time as reloj
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from matriculas.models import Matricula
 # Asegúrate de importar los modelos FK de sus respectivas apps
 from usuarios.models import Estudiante # Asumiendo que Estudiante está en 'usuarios'
 from cursos.models import GrupoCurso   # Asumiendo que GrupoCurso está en 'cursos'
+from usuarios.metricas import invalidar_por_modelo
+from usuarios.resumen import actualizar_resumenes, argumentos_upsert
+
+CAMPOS_NOTA = ['EC1', 'EP1', 'EC2', 'EP2', 'EC3', 'EP3']
+
+# Columnas que se sobrescriben cuando la matrícula ya existe
+CAMPOS_ACTUALIZABLES = ['estado'] + CAMPOS_NOTA
+
+TAMANO_LOTE = 1000
+
+# Máximo de IDs de ejemplo que se listan por cada tipo de error
+MAX_EJEMPLOS = 10
 
 # Función de ayuda para procesar las notas del CSV
 def parse_nota(value):
     """
-    Convierte un valor de cadena de nota a float. 
+    Convierte un valor de cadena de nota a float.
     Retorna None si es nulo, vacío o no es un número válido.
     """
     if value is None or str(value).strip() == '':
@@ -27,90 +40,123 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument(
-            'csv_file', 
-            type=str, 
+            'csv_file',
+            type=str,
             help='La ruta completa al archivo CSV de matrículas'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Matrículas escritas por sentencia INSERT (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida el archivo y muestra el resumen sin escribir en la base de datos'
+        )
 
     def handle(self, *args, **options):
         file_path = options['csv_file']
+        tamano_lote = options['chunk_size']
+        dry_run = options['dry_run']
 
         if not os.path.exists(file_path):
             raise CommandError(f'El archivo CSV no fue encontrado en: "{file_path}"')
+        if tamano_lote <= 0:
+            raise CommandError('--chunk-size debe ser mayor a cero.')
 
         self.stdout.write(self.style.NOTICE(f'Iniciando importación de matrículas desde: {file_path}'))
-        
-        registros_procesados = 0
-        
+        inicio = reloj.perf_counter()
+
+        # 1. Leer el archivo completo (la última fila gana si un par se repite)
+        filas = {}
+        filas_leidas = 0
+        omitidas_incompletas = 0
         try:
-            with transaction.atomic():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    # Usamos DictReader para acceder a las columnas por su nombre
-                    reader = csv.DictReader(f)
-                    
-                    for row in reader:
-                        estudiante_id = row.get('estudiante_id')
-                        grupo_curso_id = row.get('grupo_curso_id')
-                        
-                        if not estudiante_id or not grupo_curso_id:
-                            self.stdout.write(self.style.ERROR(
-                                f'Fila omitida por datos faltantes (estudiante_id={estudiante_id}, grupo_curso_id={grupo_curso_id})'
-                            ))
-                            continue
-                            
-                        try:
-                            # 1. Obtener las instancias de los modelos relacionados (FKs)
-                            estudiante = Estudiante.objects.get(perfil_id=estudiante_id)
-                            grupo_curso = GrupoCurso.objects.get(id=grupo_curso_id)
-
-                            # 2. Crear o actualizar la entidad Matricula
-                            matricula, created = Matricula.objects.update_or_create(
-                                # Campos usados para la búsqueda (unique_together)
-                                estudiante=estudiante,          
-                                grupo_curso=grupo_curso,        
-                                defaults={
-                                    # Estado inicial de la matrícula
-                                    'estado': True, 
-                                    
-                                    # --- LECTURA CONDICIONAL DE NOTAS DEL CSV ---
-                                    # Si la columna existe y tiene valor, lo convierte a float; si no, es None
-                                    'EC1': parse_nota(row.get('EC1')),
-                                    'EP1': parse_nota(row.get('EP1')),
-                                    'EC2': parse_nota(row.get('EC2')),
-                                    'EP2': parse_nota(row.get('EP2')),
-                                    'EC3': parse_nota(row.get('EC3')),
-                                    'EP3': parse_nota(row.get('EP3')),
-                                    # ---------------------------------------------
-                                }
-                            )
-
-                            if created:
-                                self.stdout.write(self.style.SUCCESS(
-                                    f'Matrícula creada: Estudiante ID {estudiante_id} en Grupo ID {grupo_curso_id}'
-                                ))
-                            else:
-                                self.stdout.write(self.style.WARNING(
-                                    f'Matrícula actualizada (ya existía): Estudiante ID {estudiante_id} en Grupo ID {grupo_curso_id}'
-                                ))
-                                
-                            registros_procesados += 1
-                            
-                        except Estudiante.DoesNotExist:
-                            self.stdout.write(self.style.ERROR(
-                                f'Error en Estudiante ID {estudiante_id}: No existe el estudiante. Fila omitida.'
-                            ))
-                        except GrupoCurso.DoesNotExist:
-                            self.stdout.write(self.style.ERROR(
-                                f'Error en GrupoCurso ID {grupo_curso_id}: No existe el grupo de curso. Fila omitida.'
-                            ))
-                        except Exception as e:
-                             self.stdout.write(self.style.ERROR(
-                                f'Error al procesar la fila de Estudiante {estudiante_id}, Grupo {grupo_curso_id}: {e}'
-                            ))
-
-
-            self.stdout.write(self.style.SUCCESS(f'\n--- Proceso Finalizado ---'))
-            self.stdout.write(self.style.SUCCESS(f'Total de registros procesados con éxito: {registros_procesados}'))
-
-        except Exception as e:
-            raise CommandError(f'Fallo la importación debido a un error de archivo o transacción: {e}')
\ No newline at end of file
+            with open(file_path, 'r', encoding='utf-8') as f:
+                # Usamos DictReader para acceder a las columnas por su nombre
+                for row in csv.DictReader(f):
+                    filas_leidas += 1
+                    estudiante_id = (row.get('estudiante_id') or '').strip()
+                    grupo_curso_id = (row.get('grupo_curso_id') or '').strip()
+                    if not estudiante_id or not grupo_curso_id:
+                        omitidas_incompletas += 1
+                        continue
+                    # Si la columna existe y tiene valor, lo convierte a float; si no, es None
+                    filas[(estudiante_id, grupo_curso_id)] = {campo: parse_nota(row.get(campo)) for campo in CAMPOS_NOTA}
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            raise CommandError(f'No se pudo leer el archivo CSV: {e}')
+
+        # 2. Resolver todas las FKs con dos consultas
+        estudiantes = Estudiante.objects.in_bulk({est for est, _ in filas})
+        grupos = GrupoCurso.objects.in_bulk({grp for _, grp in filas})
+
+        estudiantes_faltantes = set()
+        grupos_faltantes = set()
+        validas = {}
+        for (estudiante_id, grupo_curso_id), notas in filas.items():
+            if estudiante_id not in estudiantes:
+                estudiantes_faltantes.add(estudiante_id)
+            elif grupo_curso_id not in grupos:
+                grupos_faltantes.add(grupo_curso_id)
+            else:
+                validas[(estudiante_id, grupo_curso_id)] = notas
+
+        omitidas_fk = len(filas) - len(validas)
+
+        # Pares que ya existen (solo para distinguir creadas de actualizadas)
+        existentes = set(
+            Matricula.objects.filter(
+                estudiante_id__in={est for est, _ in validas},
+                grupo_curso_id__in={grp for _, grp in validas},
+            ).values_list('estudiante_id', 'grupo_curso_id')
+        )
+        por_crear = sum(1 for par in validas if par not in existentes)
+        por_actualizar = len(validas) - por_crear
+
+        # 3. Upsert por lotes
+        if not dry_run and validas:
+            matriculas = [
+                Matricula(estudiante_id=estudiante_id, grupo_curso_id=grupo_curso_id, estado=True, **notas)
+                for (estudiante_id, grupo_curso_id), notas in validas.items()
+            ]
+            try:
+                with transaction.atomic():
+                    for desde in range(0, len(matriculas), tamano_lote):
+                        # Upsert sobre UNIQUE (estudiante_id, grupo_curso_id)
+                        Matricula.objects.bulk_create(
+                            matriculas[desde:desde + tamano_lote],
+                            update_conflicts=True,
+                            update_fields=CAMPOS_ACTUALIZABLES,
+                            **argumentos_upsert(['estudiante', 'grupo_curso']),
+                        )
+            except Exception as e:
+                raise CommandError(f'Fallo la importación debido a un error de transacción: {e}')
+
+            # bulk_create no dispara señales: dashboard y resúmenes académicos
+            invalidar_por_modelo(Matricula)
+            actualizar_resumenes({estudiante_id for estudiante_id, _ in validas})
+
+        duracion = reloj.perf_counter() - inicio
+
+        # 4. Resumen
+        for titulo, faltantes in (('Estudiantes inexistentes', estudiantes_faltantes), ('Grupos inexistentes', grupos_faltantes)):
+            if faltantes:
+                ejemplos = ', '.join(sorted(faltantes)[:MAX_EJEMPLOS])
+                extra = f' (y {len(faltantes) - MAX_EJEMPLOS} más)' if len(faltantes) > MAX_EJEMPLOS else ''
+                self.stdout.write(self.style.ERROR(f'{titulo}: {ejemplos}{extra}'))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('\nModo --dry-run: no se escribió ningún cambio.'))
+
+        self.stdout.write(self.style.SUCCESS(f'\n--- Proceso Finalizado ---'))
+        self.stdout.write(f'Filas leídas: {filas_leidas}')
+        self.stdout.write(f'Filas repetidas (se usó la última): {filas_leidas - omitidas_incompletas - len(filas)}')
+        self.stdout.write(self.style.ERROR(f'Filas omitidas por datos faltantes: {omitidas_incompletas}'))
+        self.stdout.write(self.style.ERROR(f'Filas omitidas por estudiante o grupo inexistente: {omitidas_fk}'))
+        verbo = 'a crear' if dry_run else 'creadas'
+        self.stdout.write(self.style.SUCCESS(f'Matrículas {verbo}: {por_crear}'))
+        verbo = 'a actualizar' if dry_run else 'actualizadas'
+        self.stdout.write(self.style.WARNING(f'Matrículas {verbo}: {por_actualizar}'))
+        self.stdout.write(self.style.SUCCESS(f'Tiempo: {duracion:.2f}s'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2025-11-25 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matriculas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['estudiante', 'estado'], name='matricula_est_estado_idx'),
+        ),
+    ]
@@ -34,6 +34,10 @@ class Matricula(models.Model):
         verbose_name_plural = 'Matriculas'
         # UNIQUE KEY (estudiante_id, grupo_curso_id)
         unique_together = ('estudiante', 'grupo_curso')
+        indexes = [
+            # Matrículas activas de un estudiante
+            models.Index(fields=['estudiante', 'estado'], name='matricula_est_estado_idx'),
+        ]
 
 class MatriculaLaboratorio(models.Model):
     # 1. Matricula Laboratorio (id INT AUTO_INCREMENT es automático)
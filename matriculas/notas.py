@@ -0,0 +1,92 @@
+# matriculas/notas.py
+#
+# Lógica de calificaciones compartida por las vistas y comandos.
+
+from .calificaciones import CAMPOS_NOTA, NOTA_MAXIMA, NOTA_MINIMA
+from .models import Matricula
+
+
+# Diferencia mínima para considerar que una nota cambió
+TOLERANCIA_NOTA = 0.01
+
+
+# ----------------------------------------------------------------------
+# CARGA MASIVA DE NOTAS
+# ----------------------------------------------------------------------
+
+def leer_celdas_nota(datos):
+    """
+    Extrae las celdas 'nota_<cui>_<campo>' de un diccionario (request.POST).
+    Devuelve una lista de tuplas (cui, campo, valor_texto) en el orden recibido.
+    """
+    celdas = []
+    for key, value in datos.items():
+        if not key.startswith('nota_'):
+            continue
+        parts = key.split('_')
+        if len(parts) != 3 or parts[2] not in CAMPOS_NOTA:
+            continue
+        celdas.append((parts[1], parts[2], value))
+    return celdas
+
+
+def nota_cambio(actual, nueva):
+    """True si la nota nueva difiere de la actual (considerando vacíos y tolerancia)."""
+    if actual is None or nueva is None:
+        return actual is not nueva
+    return abs(actual - nueva) > TOLERANCIA_NOTA
+
+
+def guardar_notas_grupo(grupo, celdas):
+    """
+    Aplica en bloque las notas de un grupo.
+
+    Carga todas las matrículas del grupo en una sola consulta (indexadas por
+    CUI), valida y compara cada celda en memoria y persiste únicamente las
+    matrículas modificadas con un solo bulk_update sobre los campos que
+    realmente cambiaron.
+
+    Devuelve (notas_actualizadas, errores) donde `errores` es la lista de
+    mensajes por celda inválida. Las celdas con error no impiden guardar el resto.
+    """
+    matriculas = {
+        m.estudiante_id: m
+        for m in Matricula.objects.filter(grupo_curso=grupo)
+    }
+
+    errores = []
+    modificadas = {}
+    campos_modificados = set()
+    notas_actualizadas = 0
+
+    for cui, campo, valor in celdas:
+        matricula = matriculas.get(cui)
+        if matricula is None:
+            errores.append(f"Matrícula no encontrada para CUI {cui} en este grupo.")
+            continue
+
+        valor = (valor or '').strip()
+        nota = None
+        if valor != '':
+            try:
+                nota = float(valor)
+            except ValueError:
+                errores.append(f"Formato de nota inválido para CUI {cui} en {campo}.")
+                continue
+            if not (NOTA_MINIMA <= nota <= NOTA_MAXIMA):
+                errores.append(f"Nota fuera de rango ({NOTA_MINIMA}-{NOTA_MAXIMA}) para CUI {cui} en {campo}.")
+                continue
+
+        if nota_cambio(getattr(matricula, campo), nota):
+            setattr(matricula, campo, nota)
+            modificadas[matricula.pk] = matricula
+            campos_modificados.add(campo)
+            notas_actualizadas += 1
+
+    if modificadas:
+        Matricula.objects.bulk_update(
+            list(modificadas.values()),
+            [campo for campo in CAMPOS_NOTA if campo in campos_modificados],
+        )
+
+    return notas_actualizadas, errores
@@ -1,3 +1,107 @@
-from django.test import TestCase
+import threading
+from datetime import time
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import connection, connections
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from cursos.models import BloqueHorario, Curso, GrupoCurso, GrupoLaboratorio, GrupoTeoria
+from reservas.models import Aula
+from usuarios.models import Estudiante, Perfil
+from .inscripcion import cruces_con_grupo
+from .models import Matricula, MatriculaLaboratorio
+
+
+class CrucesConGrupoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        Aula.objects.create(id='101', tipo='AULA_NORMAL')
+        teoria = GrupoCurso.objects.create(id='C001A', curso=curso, grupo='A', capacidad=40)
+        cls.candidato = GrupoCurso.objects.create(id='LC001A', curso=curso, grupo='A', capacidad=20)
+        BloqueHorario.objects.create(grupo_curso=teoria, aula_id='101', dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40))
+        BloqueHorario.objects.create(grupo_curso=teoria, aula_id='101', dia='MARTES', horaInicio=time(7, 0), horaFin=time(8, 40))
+        BloqueHorario.objects.create(grupo_curso=cls.candidato, aula_id='101', dia='LUNES', horaInicio=time(8, 0), horaFin=time(9, 0))
+        BloqueHorario.objects.create(grupo_curso=cls.candidato, aula_id='101', dia='MARTES', horaInicio=time(8, 40), horaFin=time(10, 20))
+
+        estudiante = Estudiante.objects.create(
+            perfil=Perfil.objects.create(id='E001', nombre='Alumno Uno', password='x', rol='ESTUDIANTE')
+        )
+        Matricula.objects.create(estudiante=estudiante, grupo_curso=teoria, estado=True)
+
+    def test_devuelve_cruces_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            cruces = cruces_con_grupo('E001', self.candidato.pk)
+            nombres = [bloque.grupo_curso.curso.nombre for bloque in cruces]
+        # El bloque del martes solo toca el borde (08:40) y no cuenta como cruce
+        self.assertEqual([bloque.dia for bloque in cruces], ['LUNES'])
+        self.assertEqual(nombres, ['Curso Uno'])
+
+
+@skipUnless(connection.features.has_select_for_update, 'Requiere una base de datos con SELECT ... FOR UPDATE')
+class MatriculaLaboratorioConcurrenteTests(TransactionTestCase):
+    # Prueba de carga: muchos estudiantes matriculándose a la vez en un laboratorio con pocos cupos
+    ESTUDIANTES = 30
+    CAPACIDAD = 8
+
+    def setUp(self):
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        Aula.objects.create(id='101', tipo='AULA_NORMAL')
+        Aula.objects.create(id='L01', tipo='LABORATORIO')
+
+        teoria = GrupoCurso.objects.create(id='C001A', curso=curso, grupo='A', capacidad=self.ESTUDIANTES)
+        GrupoTeoria.objects.create(grupo_curso=teoria)
+        BloqueHorario.objects.create(grupo_curso=teoria, aula_id='101', dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40))
+
+        self.laboratorio = GrupoCurso.objects.create(id='LC001A', curso=curso, grupo='A', capacidad=self.CAPACIDAD)
+        GrupoLaboratorio.objects.create(grupo_curso=self.laboratorio)
+        BloqueHorario.objects.create(grupo_curso=self.laboratorio, aula_id='L01', dia='MARTES', horaInicio=time(7, 0), horaFin=time(8, 40))
+
+        self.cuis = [f'E{numero:03d}' for numero in range(self.ESTUDIANTES)]
+        for cui in self.cuis:
+            estudiante = Estudiante.objects.create(
+                perfil=Perfil.objects.create(id=cui, nombre=f'Alumno {cui}', password='x', rol='ESTUDIANTE')
+            )
+            Matricula.objects.create(estudiante=estudiante, grupo_curso=teoria, estado=True)
+
+    def cliente_de(self, cui):
+        cliente = Client()
+        sesion = cliente.session
+        sesion['is_authenticated'] = True
+        sesion['usuario_rol'] = 'ESTUDIANTE'
+        sesion['usuario_id'] = cui
+        sesion.save()
+        return cliente
+
+    def test_no_sobrepasa_la_capacidad(self):
+        clientes = [self.cliente_de(cui) for cui in self.cuis]
+        url = reverse('usuarios:matricula_lab_alumno')
+        barrera = threading.Barrier(len(clientes))
+        errores = []
+
+        def matricular(cliente):
+            try:
+                barrera.wait()
+                cliente.post(url, {'lab_id': self.laboratorio.pk})
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=matricular, args=(cliente,)) for cliente in clientes]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(MatriculaLaboratorio.objects.filter(laboratorio_id=self.laboratorio.pk).count(), self.CAPACIDAD)
@@ -0,0 +1,378 @@
+# reservas/disponibilidad.py
+#
+# Índice de disponibilidad de aulas para la reserva.
+#
+# La ocupación de cada aula (y la del profesor) en un día se representa como
+# un entero usado como bitset con resolución de un minuto: el bit `m` indica
+# que el minuto m del día (desde las 00:00) está ocupado. Las clases fijas
+# (BloqueHorario, por día de la semana) y las reservas puntuales (Reserva,
+# por fecha) se combinan con OR, así que saber si un rango está libre es un
+# AND contra la máscara del rango, sin recorrer listas.
+#
+# La capa semanal de cada aula (sus clases fijas) casi no cambia, por lo que
+# para dibujar la grilla y buscar aulas libres se guarda en el cache por aula
+# y se invalida, al confirmar la transacción, cuando cambia algún
+# BloqueHorario (ver usuarios/signals.py y los guardados en bloque). El cache
+# por defecto es local a cada proceso, así que puede quedar desactualizado
+# en otros workers o tras un comando de importación: por eso la validación
+# de una reserva (reservas/registro.py) nunca lo usa y arma la capa desde
+# BloqueHorario dentro de la transacción con bloqueo. Las reservas y el
+# horario del profesor se leen en cada carga: una consulta para cada uno.
+#
+# La grilla de reserva muestra la jornada JORNADA_INICIO - JORNADA_FIN, pero
+# el bitset cubre el día completo para que un bloque fuera de la jornada
+# siga contando como conflicto.
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from cursos.horarios import DIAS_SEMANA, a_minutos, formatear_minutos
+from cursos.models import BloqueHorario
+from .models import Aula, Reserva
+
+
+JORNADA_INICIO = 7 * 60
+JORNADA_FIN = 20 * 60 + 10
+
+CLAVE_VERSION = 'disponibilidad:version'
+DURACION_CACHE = 60 * 60 * 24
+
+# Reglas de reserva (las mismas que valida horarios_reserva)
+MAX_RESERVAS_SEMANA = 2
+MAX_DIAS_BUSQUEDA = 31
+
+
+# ----------------------------------------------------------------------
+# BITSETS
+# ----------------------------------------------------------------------
+
+def mascara(inicio, fin):
+    """Bits de los minutos [inicio, fin). Acepta time, 'HH:MM' o minutos."""
+    inicio = a_minutos(inicio)
+    fin = a_minutos(fin)
+    if fin <= inicio:
+        return 0
+    return ((1 << (fin - inicio)) - 1) << inicio
+
+
+def esta_libre(ocupacion, inicio, fin):
+    return not ocupacion & mascara(inicio, fin)
+
+
+def rangos_libres(ocupacion, duracion, inicio=JORNADA_INICIO, fin=JORNADA_FIN):
+    """
+    Rangos libres maximales (inicio, fin) en minutos dentro de [inicio, fin)
+    que duran al menos `duracion` minutos.
+    """
+    libre = ~ocupacion & mascara(inicio, fin)
+    rangos = []
+    while libre:
+        desde = (libre & -libre).bit_length() - 1
+        corrido = libre >> desde
+        largo = ((corrido + 1) & ~corrido).bit_length() - 1
+        if largo >= duracion:
+            rangos.append((desde, desde + largo))
+        libre &= ~mascara(desde, desde + largo)
+    return rangos
+
+
+def dia_de(fecha):
+    """Clave de BloqueHorario.dia para una fecha (None en fin de semana)."""
+    indice = fecha.weekday()
+    return DIAS_SEMANA[indice] if indice < len(DIAS_SEMANA) else None
+
+
+class CapaOcupacion:
+    """
+    Ocupación agrupada por clave (día de la semana, fecha, (aula, fecha)...).
+
+    Guarda el bitset de cada clave y, aparte, los intervalos con su dato para
+    poder describir la ocupación (quién reservó, en qué aula es la clase).
+    La lista solo se recorre cuando el bitset ya confirmó que hay cruce.
+    """
+
+    def __init__(self, intervalos=()):
+        self._bits = {}
+        self._items = {}
+        for clave, inicio, fin, dato in intervalos:
+            self.agregar(clave, inicio, fin, dato)
+
+    def agregar(self, clave, inicio, fin, dato=None):
+        inicio = a_minutos(inicio)
+        fin = a_minutos(fin)
+        self._bits[clave] = self._bits.get(clave, 0) | mascara(inicio, fin)
+        self._items.setdefault(clave, []).append((inicio, fin, dato))
+
+    def ocupacion(self, clave):
+        return self._bits.get(clave, 0)
+
+    def cantidad(self, clave):
+        return len(self._items.get(clave, ()))
+
+    def ocupado(self, clave, inicio, fin):
+        return not esta_libre(self.ocupacion(clave), inicio, fin)
+
+    def primero(self, clave, inicio, fin):
+        """Dato del primer intervalo (en orden de inserción) que cruza [inicio, fin)."""
+        if not self.ocupado(clave, inicio, fin):
+            return None
+        inicio = a_minutos(inicio)
+        fin = a_minutos(fin)
+        for inicio_item, fin_item, dato in self._items[clave]:
+            if inicio_item < fin and fin_item > inicio:
+                return dato
+        return None
+
+    def items(self):
+        """Tuplas (clave, inicio, fin, dato) con los tiempos en minutos."""
+        for clave, items in self._items.items():
+            for inicio, fin, dato in items:
+                yield clave, inicio, fin, dato
+
+    def intervalos(self):
+        """Todos los (inicio, fin) en minutos, para armar los puntos de corte."""
+        return [(inicio, fin) for _, inicio, fin, _ in self.items()]
+
+
+# ----------------------------------------------------------------------
+# CAPA SEMANAL POR AULA (CACHE)
+# ----------------------------------------------------------------------
+
+def _version():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = 1
+        cache.add(CLAVE_VERSION, version, None)
+    return version
+
+
+def _clave_aula(version, aula_id):
+    return f'disponibilidad:{version}:aula:{aula_id}'
+
+
+def _incrementar_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+def invalidar_capas_semanales():
+    """
+    Descarta la capa semanal de todas las aulas (cambió algún BloqueHorario).
+    Se aplica al confirmar la transacción: antes, otra carga podría volver a
+    guardar en el cache los bloques todavía sin confirmar.
+    """
+    transaction.on_commit(_incrementar_version)
+
+
+def construir_capas(aula_ids):
+    """
+    Clases fijas de cada aula leídas directamente de BloqueHorario (una
+    consulta): {aula_id: {dia: (bits, [(inicio, fin), ...])}}.
+    """
+    capas = {str(aula_id): {} for aula_id in aula_ids}
+    bloques = BloqueHorario.objects.filter(aula_id__in=list(capas)).values_list('aula_id', 'dia', 'horaInicio', 'horaFin')
+    for aula_id, dia, hora_inicio, hora_fin in bloques:
+        inicio = a_minutos(hora_inicio)
+        fin = a_minutos(hora_fin)
+        bits, intervalos = capas[aula_id].get(dia, (0, []))
+        if (inicio, fin) not in intervalos:
+            intervalos.append((inicio, fin))
+        capas[aula_id][dia] = (bits | mascara(inicio, fin), intervalos)
+    return capas
+
+
+def capas_semanales(aula_ids):
+    """
+    Capas de construir_capas() pasando por el cache: las que faltan se
+    cargan con una sola consulta. Solo para mostrar disponibilidad; para
+    validar una reserva usar construir_capas().
+    """
+    aula_ids = [str(aula_id) for aula_id in aula_ids]
+    version = _version()
+    claves = {_clave_aula(version, aula_id): aula_id for aula_id in aula_ids}
+    capas = {claves[clave]: capa for clave, capa in cache.get_many(list(claves)).items()}
+
+    faltantes = [aula_id for aula_id in aula_ids if aula_id not in capas]
+    if faltantes:
+        nuevas = construir_capas(faltantes)
+        cache.set_many({_clave_aula(version, aula_id): capa for aula_id, capa in nuevas.items()}, DURACION_CACHE)
+        capas.update(nuevas)
+    return capas
+
+
+# ----------------------------------------------------------------------
+# ÍNDICE DE DISPONIBILIDAD
+# ----------------------------------------------------------------------
+
+class IndiceDisponibilidad:
+    """
+    Ocupación de un conjunto de aulas y de un profesor en un rango de fechas.
+
+    - capas: capa semanal (clases fijas) de cada aula, ver capas_semanales().
+    - bloques_profesor: CapaOcupacion por día con las clases fijas del
+      profesor (dato = id del aula).
+    - reservas_aula: CapaOcupacion por (aula_id, fecha) con las reservas.
+    - reservas_profesor: CapaOcupacion por fecha con las reservas del profesor.
+    """
+
+    def __init__(self, capas, bloques_profesor, reservas_aula, reservas_profesor):
+        self.capas = capas
+        self.bloques_profesor = bloques_profesor
+        self.reservas_aula = reservas_aula
+        self.reservas_profesor = reservas_profesor
+
+    # --- Ocupación combinada ---
+    def ocupacion_fija_aula(self, aula_id, fecha):
+        return self.capas.get(str(aula_id), {}).get(dia_de(fecha), (0, []))[0]
+
+    def ocupacion_aula(self, aula_id, fecha):
+        return self.ocupacion_fija_aula(aula_id, fecha) | self.reservas_aula.ocupacion((str(aula_id), fecha))
+
+    def ocupacion_profesor(self, fecha):
+        return self.bloques_profesor.ocupacion(dia_de(fecha)) | self.reservas_profesor.ocupacion(fecha)
+
+    def ocupacion(self, aula_id, fecha):
+        """Minutos en los que el profesor no puede reservar esa aula ese día."""
+        return self.ocupacion_aula(aula_id, fecha) | self.ocupacion_profesor(fecha)
+
+    def intervalos_grilla(self, aula_id):
+        """
+        (inicio, fin) de todo lo que ocupa el aula o al profesor en el rango
+        cargado: clases fijas del aula (todos los días), clases fijas del
+        profesor y reservas del aula. Sirven de puntos de corte de la grilla.
+        """
+        intervalos = [
+            intervalo
+            for _, lista in self.capas.get(str(aula_id), {}).values()
+            for intervalo in lista
+        ]
+        intervalos += self.bloques_profesor.intervalos()
+        intervalos += [
+            (inicio, fin)
+            for (aula, _), inicio, fin, _ in self.reservas_aula.items() if aula == str(aula_id)
+        ]
+        return intervalos
+
+    # --- Reglas de reserva ---
+    def reservas_en_semana(self, fecha):
+        """Reservas del profesor en la semana (lunes a domingo) de la fecha."""
+        lunes = fecha - timedelta(days=fecha.weekday())
+        return sum(
+            self.reservas_profesor.cantidad(lunes + timedelta(days=dia))
+            for dia in range(7)
+        )
+
+    def conflicto(self, aula_id, fecha, inicio, fin):
+        """
+        Motivo por el que el rango no se puede reservar, o None si está libre.
+        Se evalúa en el mismo orden que la validación original: clase fija
+        del aula, clase fija del profesor, reserva del aula, reserva del profesor.
+        """
+        dia = dia_de(fecha)
+        if not esta_libre(self.ocupacion_fija_aula(aula_id, fecha), inicio, fin):
+            return f"Conflicto: El aula {aula_id} tiene una clase fija recurrente en ese horario."
+        if self.bloques_profesor.ocupado(dia, inicio, fin):
+            aula_profesor = self.bloques_profesor.primero(dia, inicio, fin)
+            return f"Conflicto: Usted tiene una clase fija recurrente en ese horario (en aula {aula_profesor or 'otra'})."
+        if self.reservas_aula.ocupado((str(aula_id), fecha), inicio, fin):
+            return f"Conflicto: Ya existe otra reserva puntual para el aula {aula_id} en ese periodo."
+        if self.reservas_profesor.ocupado(fecha, inicio, fin):
+            return "Conflicto: Usted ya tiene otra reserva puntual en ese periodo en otra aula."
+        return None
+
+
+def cargar_indice(profesor, aula_ids, desde, hasta, usar_cache=True):
+    """
+    Arma el IndiceDisponibilidad de las aulas indicadas entre `desde` y
+    `hasta` (inclusive). Dos consultas (bloques del profesor y reservas) más
+    las capas semanales: desde el cache, o con `usar_cache=False` leídas de
+    la base de datos (una consulta más), que es lo que usa la validación.
+    """
+    aula_ids = [str(aula_id) for aula_id in aula_ids]
+    capas = capas_semanales(aula_ids) if usar_cache else construir_capas(aula_ids)
+
+    bloques_profesor = CapaOcupacion(
+        (dia, hora_inicio, hora_fin, aula_id)
+        for dia, hora_inicio, hora_fin, aula_id in BloqueHorario.objects.filter(
+            grupo_curso__profesor=profesor
+        ).values_list('dia', 'horaInicio', 'horaFin', 'aula_id').distinct()
+    )
+
+    reservas_aula = CapaOcupacion()
+    reservas_profesor = CapaOcupacion()
+    reservas = Reserva.objects.filter(
+        Q(aula_id__in=aula_ids) | Q(profesor=profesor),
+        fecha_reserva__gte=desde,
+        fecha_reserva__lte=hasta,
+    ).select_related('profesor__perfil').order_by('id')
+    for reserva in reservas:
+        if reserva.aula_id in aula_ids:
+            reservas_aula.agregar((reserva.aula_id, reserva.fecha_reserva), reserva.hora_inicio, reserva.hora_fin, reserva)
+        if reserva.profesor_id == profesor.pk:
+            reservas_profesor.agregar(reserva.fecha_reserva, reserva.hora_inicio, reserva.hora_fin, reserva)
+
+    return IndiceDisponibilidad(capas, bloques_profesor, reservas_aula, reservas_profesor)
+
+
+# ----------------------------------------------------------------------
+# BÚSQUEDA DE AULAS LIBRES
+# ----------------------------------------------------------------------
+
+def buscar_ventanas_libres(profesor, desde, hasta, duracion, tipo=None, hoy=None):
+    """
+    Ventanas libres de todas las aulas (del tipo indicado) entre `desde` y
+    `hasta` en las que el profesor podría reservar al menos `duracion`
+    minutos. Se arma un solo IndiceDisponibilidad con todas las aulas, así
+    que la búsqueda completa cuesta las mismas consultas que una sola aula.
+
+    Respeta las reglas de la reserva: sin fines de semana ni fechas pasadas,
+    se omiten las semanas en las que el profesor ya llegó a
+    MAX_RESERVAS_SEMANA y se descuentan sus propias clases y reservas.
+
+    Devuelve (ventanas, semanas_completas): ventanas es una lista de dicts
+    {aula, tipo, fecha, inicio, fin} ordenada por fecha, inicio y aula.
+    """
+    aulas = Aula.objects.order_by('id')
+    if tipo:
+        aulas = aulas.filter(tipo=tipo)
+    tipos = dict(aulas.values_list('id', 'tipo'))
+    if not tipos:
+        return [], []
+
+    # El índice se extiende a semanas completas para contar el límite semanal
+    inicio_carga = desde - timedelta(days=desde.weekday())
+    fin_carga = hasta + timedelta(days=6 - hasta.weekday())
+    indice = cargar_indice(profesor, list(tipos), inicio_carga, fin_carga)
+
+    ventanas = []
+    semanas_completas = set()
+    fecha = max(desde, hoy) if hoy else desde
+    while fecha <= hasta:
+        if dia_de(fecha) is None:
+            fecha += timedelta(days=1)
+            continue
+        if indice.reservas_en_semana(fecha) >= MAX_RESERVAS_SEMANA:
+            semanas_completas.add(fecha - timedelta(days=fecha.weekday()))
+            fecha += timedelta(days=1)
+            continue
+
+        ocupacion_profesor = indice.ocupacion_profesor(fecha)
+        for aula_id in tipos:
+            ocupacion = indice.ocupacion_aula(aula_id, fecha) | ocupacion_profesor
+            for inicio, fin in rangos_libres(ocupacion, duracion):
+                ventanas.append({
+                    'aula': aula_id,
+                    'tipo': tipos[aula_id],
+                    'fecha': fecha.isoformat(),
+                    'inicio': formatear_minutos(inicio),
+                    'fin': formatear_minutos(fin),
+                })
+        fecha += timedelta(days=1)
+
+    ventanas.sort(key=lambda v: (v['fecha'], v['inicio'], v['aula']))
+    return ventanas, sorted(semanas_completas)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2025-11-25 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['aula', 'fecha_reserva'], name='reserva_aula_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['profesor', 'fecha_reserva'], name='reserva_profesor_fecha_idx'),
+        ),
+    ]
@@ -41,4 +41,9 @@ class Reserva(models.Model):
     class Meta:
         db_table = 'reservas_reservas'
         verbose_name = 'Reserva de Aula'
-        verbose_name_plural = 'Reservas de Aulas'
\ No newline at end of file
+        verbose_name_plural = 'Reservas de Aulas'
+        indexes = [
+            # Reservas de un aula / de un profesor en un rango de fechas
+            models.Index(fields=['aula', 'fecha_reserva'], name='reserva_aula_fecha_idx'),
+            models.Index(fields=['profesor', 'fecha_reserva'], name='reserva_profesor_fecha_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,200 @@
+# reservas/registro.py
+#
+# Registro de reservas sin carreras.
+#
+# Antes la vista validaba el límite semanal y los cruces con consultas
+# sueltas y luego hacía Reserva.objects.create sin transacción: dos
+# profesores que hacían clic en la misma celda libre a la vez podían
+# quedarse ambos con el aula. Aquí cada reserva toma, dentro de una
+# transacción, un bloqueo de fila (SELECT ... FOR UPDATE) sobre el profesor
+# y sobre el aula, y recién con los bloqueos vuelve a armar el índice de
+# disponibilidad y valida. Las reservas de la misma aula (o del mismo
+# profesor) quedan serializadas; las de aulas distintas no se bloquean.
+#
+# Si la base de datos aborta la transacción por un deadlock o un timeout de
+# bloqueo se reintenta unas pocas veces antes de rendirse.
+
+import time as reloj
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.db import OperationalError, transaction
+
+from usuarios.metricas import invalidar_por_modelo
+from usuarios.models import Profesor
+from .disponibilidad import MAX_RESERVAS_SEMANA, cargar_indice, dia_de
+from .models import Aula, Reserva
+
+
+MAX_INTENTOS = 3
+ESPERA_REINTENTO = 0.05  # segundos, se duplica en cada intento
+MAX_OCURRENCIAS = 40
+
+
+@dataclass
+class ResultadoRecurrente:
+    creadas: list = field(default_factory=list)
+    conflictos: list = field(default_factory=list)  # [(fecha, motivo), ...]
+
+
+def _con_reintentos(funcion, *args):
+    espera = ESPERA_REINTENTO
+    for intento in range(1, MAX_INTENTOS + 1):
+        try:
+            return funcion(*args)
+        except OperationalError:
+            # Deadlock o timeout de bloqueo: la transacción ya se revirtió
+            if intento == MAX_INTENTOS:
+                raise ValueError("El aula está siendo reservada por otro usuario. Intente nuevamente.")
+            reloj.sleep(espera)
+            espera *= 2
+
+
+def _bloquear(profesor, aula_id):
+    """Bloqueos en orden fijo (profesor -> aula) para evitar deadlocks. Devuelve el aula."""
+    list(Profesor.objects.select_for_update().filter(pk=profesor.pk).values_list('pk', flat=True))
+    try:
+        return Aula.objects.select_for_update().get(id=aula_id)
+    except Aula.DoesNotExist:
+        raise ValueError("El ID del Aula ingresado no existe.")
+
+
+def _registrar(profesor, aula_id, fecha, hora_inicio, hora_fin):
+    with transaction.atomic():
+        # El bloqueo del profesor cubre el límite semanal y sus reservas en otras aulas
+        aula = _bloquear(profesor, aula_id)
+
+        # Las lecturas se hacen después de obtener los bloqueos, así que ya
+        # incluyen lo confirmado por quien tenía el bloqueo antes. Las clases
+        # fijas se leen de la base de datos, no del cache (puede estar
+        # desactualizado en este proceso)
+        lunes = fecha - timedelta(days=fecha.weekday())
+        indice = cargar_indice(profesor, [aula.id], lunes, lunes + timedelta(days=6), usar_cache=False)
+
+        conteo_reservas_semana = indice.reservas_en_semana(fecha)
+        if conteo_reservas_semana >= MAX_RESERVAS_SEMANA:
+            raise ValueError(
+                f"Error: Ya ha alcanzado el límite de {conteo_reservas_semana} reservas para la semana del {lunes.strftime('%d/%m')}."
+            )
+
+        conflicto = indice.conflicto(aula.id, fecha, hora_inicio, hora_fin)
+        if conflicto:
+            raise ValueError(conflicto)
+
+        return Reserva.objects.create(
+            aula=aula,
+            profesor=profesor,
+            fecha_reserva=fecha,
+            hora_inicio=hora_inicio,
+            hora_fin=hora_fin,
+        )
+
+
+def registrar_reserva(profesor, aula_id, fecha, hora_inicio, hora_fin, hoy=None):
+    """
+    Crea la reserva si el aula y el profesor están libres. Lanza ValueError
+    con el motivo del rechazo (los mismos mensajes que mostraba la vista).
+    """
+    if hora_inicio >= hora_fin:
+        raise ValueError("La hora de inicio debe ser anterior a la hora de fin.")
+    if dia_de(fecha) is None:
+        raise ValueError("Error: No se pueden realizar reservas en fines de semana (Sábado o Domingo).")
+    if fecha < (hoy or date.today()):
+        raise ValueError("Error: No se pueden realizar reservas en fechas pasadas.")
+
+    return _con_reintentos(_registrar, profesor, aula_id, fecha, hora_inicio, hora_fin)
+
+
+# ----------------------------------------------------------------------
+# RESERVAS RECURRENTES
+# ----------------------------------------------------------------------
+
+def fechas_recurrentes(desde, hasta, dias):
+    """Fechas entre `desde` y `hasta` (inclusive) cuyo día está en `dias` (LUNES...VIERNES)."""
+    fechas = []
+    fecha = desde
+    while fecha <= hasta:
+        if dia_de(fecha) in dias:
+            fechas.append(fecha)
+        fecha += timedelta(days=1)
+    return fechas
+
+
+def _registrar_recurrente(profesor, aula_id, fechas, hora_inicio, hora_fin, hoy, parcial):
+    resultado = ResultadoRecurrente()
+    with transaction.atomic():
+        aula = _bloquear(profesor, aula_id)
+
+        # Un solo índice para todo el rango (semanas completas, por el límite
+        # semanal), con las clases fijas leídas de la base de datos
+        lunes_inicial = fechas[0] - timedelta(days=fechas[0].weekday())
+        domingo_final = fechas[-1] + timedelta(days=6 - fechas[-1].weekday())
+        indice = cargar_indice(profesor, [aula.id], lunes_inicial, domingo_final, usar_cache=False)
+
+        # Las ocurrencias aceptadas cuentan para el límite de su semana
+        nuevas_por_semana = {}
+        nuevas = []
+        for fecha in fechas:
+            lunes = fecha - timedelta(days=fecha.weekday())
+            if fecha < hoy:
+                resultado.conflictos.append((fecha, "Error: No se pueden realizar reservas en fechas pasadas."))
+                continue
+            conteo = indice.reservas_en_semana(fecha) + nuevas_por_semana.get(lunes, 0)
+            if conteo >= MAX_RESERVAS_SEMANA:
+                resultado.conflictos.append((
+                    fecha,
+                    f"Error: Ya ha alcanzado el límite de {conteo} reservas para la semana del {lunes.strftime('%d/%m')}.",
+                ))
+                continue
+            conflicto = indice.conflicto(aula.id, fecha, hora_inicio, hora_fin)
+            if conflicto:
+                resultado.conflictos.append((fecha, conflicto))
+                continue
+
+            nuevas_por_semana[lunes] = nuevas_por_semana.get(lunes, 0) + 1
+            nuevas.append(Reserva(
+                aula=aula,
+                profesor=profesor,
+                fecha_reserva=fecha,
+                hora_inicio=hora_inicio,
+                hora_fin=hora_fin,
+            ))
+
+        if nuevas and (parcial or not resultado.conflictos):
+            resultado.creadas = Reserva.objects.bulk_create(nuevas)
+
+    if resultado.creadas:
+        # bulk_create no dispara señales
+        invalidar_por_modelo(Reserva)
+    return resultado
+
+
+def registrar_reservas_recurrentes(profesor, aula_id, desde, hasta, dias, hora_inicio, hora_fin, parcial=False, hoy=None):
+    """
+    Reserva el aula en el mismo horario cada semana, los días indicados,
+    entre `desde` y `hasta`. Todas las ocurrencias se validan juntas contra
+    un solo índice de disponibilidad (clases fijas, reservas existentes y
+    límite semanal, contando también las nuevas) y se insertan con un
+    bulk_create en la misma transacción con bloqueo.
+
+    Sin `parcial` es todo o nada: si alguna fecha tiene conflicto no se crea
+    ninguna. Con `parcial` se crean solo las fechas libres. En ambos casos
+    ResultadoRecurrente.conflictos trae el motivo de cada fecha rechazada.
+    Lanza ValueError si la solicitud en sí es inválida.
+    """
+    hoy = hoy or date.today()
+    if hora_inicio >= hora_fin:
+        raise ValueError("La hora de inicio debe ser anterior a la hora de fin.")
+    if hasta < desde:
+        raise ValueError("La fecha final de la repetición debe ser posterior a la inicial.")
+    dias = [dia for dia in dias if dia]
+    if not dias:
+        raise ValueError("Seleccione al menos un día de la semana (Lunes a Viernes) para repetir la reserva.")
+
+    fechas = fechas_recurrentes(desde, hasta, set(dias))
+    if not fechas:
+        raise ValueError("El rango indicado no contiene ninguno de los días seleccionados.")
+    if len(fechas) > MAX_OCURRENCIAS:
+        raise ValueError(f"Demasiadas fechas en la repetición ({len(fechas)}); el máximo es {MAX_OCURRENCIAS}.")
+
+    return _con_reintentos(_registrar_recurrente, profesor, aula_id, fechas, hora_inicio, hora_fin, hoy, parcial)
@@ -1,3 +1,187 @@
-from django.test import TestCase
+import sys
+import threading
+import time as reloj
+from datetime import date, time, timedelta
+from statistics import median
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from cursos.models import BloqueHorario, Curso, GrupoCurso
+from usuarios.models import Perfil, Profesor
+from .disponibilidad import buscar_ventanas_libres, capas_semanales, cargar_indice, esta_libre, mascara, rangos_libres
+from .models import Aula, Reserva
+from .registro import registrar_reserva, registrar_reservas_recurrentes
+
+
+class DisponibilidadTests(TestCase):
+    # 2025-03-10 es lunes
+    LUNES = date(2025, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profesor = Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P001', nombre='Docente Uno', password='x', rol='PROFESOR'),
+            es_teoria=True,
+        )
+        otro = Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P002', nombre='Docente Dos', password='x', rol='PROFESOR'),
+            es_teoria=True,
+        )
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        Aula.objects.create(id='101', tipo='AULA_NORMAL')
+        Aula.objects.create(id='102', tipo='AULA_NORMAL')
+        grupo_otro = GrupoCurso.objects.create(id='C001A', curso=curso, profesor=otro, grupo='A', capacidad=40)
+        grupo_propio = GrupoCurso.objects.create(id='C001B', curso=curso, profesor=cls.profesor, grupo='B', capacidad=40)
+        BloqueHorario.objects.create(grupo_curso=grupo_otro, aula_id='101', dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40))
+        BloqueHorario.objects.create(grupo_curso=grupo_propio, aula_id='102', dia='LUNES', horaInicio=time(10, 0), horaFin=time(11, 40))
+        Reserva.objects.create(
+            aula_id='101', profesor=otro, fecha_reserva=cls.LUNES, hora_inicio=time(12, 0), hora_fin=time(13, 0)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_mascara_intervalo_semiabierto(self):
+        ocupado = mascara('07:00', '08:40')
+        self.assertTrue(esta_libre(ocupado, '08:40', '09:00'))
+        self.assertFalse(esta_libre(ocupado, '08:39', '09:00'))
+        self.assertEqual(mascara('09:00', '09:00'), 0)
+
+    def test_conflictos_en_orden(self):
+        indice = cargar_indice(self.profesor, ['101'], self.LUNES, self.LUNES)
+        self.assertIn('clase fija recurrente en ese horario.', indice.conflicto('101', self.LUNES, time(8, 0), time(9, 0)))
+        self.assertIn('(en aula 102)', indice.conflicto('101', self.LUNES, time(11, 0), time(12, 0)))
+        self.assertIn('reserva puntual para el aula 101', indice.conflicto('101', self.LUNES, time(12, 30), time(14, 0)))
+        self.assertIsNone(indice.conflicto('101', self.LUNES, time(14, 0), time(15, 0)))
+
+    def test_capa_semanal_en_cache_e_invalidacion(self):
+        with self.assertNumQueries(1):
+            capas_semanales(['101', '102'])
+        with self.assertNumQueries(0):
+            capas = capas_semanales(['101', '102'])
+        self.assertTrue(esta_libre(capas['101']['LUNES'][0], time(9, 0), time(10, 0)))
+
+        # La invalidación se aplica al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            BloqueHorario.objects.create(
+                grupo_curso_id='C001A', aula_id='101', dia='LUNES', horaInicio=time(9, 0), horaFin=time(10, 0)
+            )
+        capas = capas_semanales(['101'])
+        self.assertFalse(esta_libre(capas['101']['LUNES'][0], time(9, 0), time(10, 0)))
+
+    def test_validacion_no_usa_cache_desactualizado(self):
+        capas_semanales(['101'])
+        # Bloque nuevo sin invalidar el cache (como otro proceso o un bulk_create)
+        BloqueHorario.objects.bulk_create([BloqueHorario(
+            grupo_curso_id='C001A', aula_id='101', dia='MARTES', horaInicio=time(9, 0), horaFin=time(10, 0)
+        )])
+        self.assertTrue(esta_libre(capas_semanales(['101'])['101'].get('MARTES', (0, []))[0], time(9, 0), time(10, 0)))
+
+        martes = self.LUNES + timedelta(days=1)
+        with self.assertRaisesMessage(ValueError, 'clase fija recurrente'):
+            registrar_reserva(self.profesor, '101', martes, time(9, 0), time(10, 0), hoy=self.LUNES)
+
+    def test_rangos_libres(self):
+        ocupacion = mascara('07:00', '08:40') | mascara('12:00', '13:00')
+        self.assertEqual(rangos_libres(ocupacion, 60), [(8 * 60 + 40, 12 * 60), (13 * 60, 20 * 60 + 10)])
+
+    def test_busqueda_en_todas_las_aulas(self):
+        with self.assertNumQueries(4):
+            ventanas, semanas = buscar_ventanas_libres(
+                self.profesor, self.LUNES, self.LUNES, 60, tipo='AULA_NORMAL', hoy=self.LUNES
+            )
+        self.assertEqual(semanas, [])
+        self.assertEqual(
+            [(v['aula'], v['inicio'], v['fin']) for v in ventanas],
+            [('102', '07:00', '10:00'), ('101', '08:40', '10:00'), ('102', '11:40', '20:10'), ('101', '13:00', '20:10')],
+        )
+
+    def test_busqueda_respeta_limite_semanal(self):
+        for hora in (14, 16):
+            Reserva.objects.create(
+                aula_id='102', profesor=self.profesor, fecha_reserva=self.LUNES, hora_inicio=time(hora, 0), hora_fin=time(hora + 1, 0)
+            )
+        ventanas, semanas = buscar_ventanas_libres(self.profesor, self.LUNES, self.LUNES, 60, hoy=self.LUNES)
+        self.assertEqual(ventanas, [])
+        self.assertEqual(semanas, [self.LUNES])
+
+
+    def test_reserva_recurrente_conflictos_por_fecha(self):
+        hasta = self.LUNES + timedelta(weeks=2)
+        argumentos = (self.profesor, '101', self.LUNES, hasta, ['LUNES'], time(12, 30), time(13, 30))
+
+        resultado = registrar_reservas_recurrentes(*argumentos, hoy=self.LUNES)
+        self.assertEqual(resultado.creadas, [])
+        self.assertEqual([fecha for fecha, _ in resultado.conflictos], [self.LUNES])
+        self.assertIn('reserva puntual para el aula 101', resultado.conflictos[0][1])
+
+        resultado = registrar_reservas_recurrentes(*argumentos, parcial=True, hoy=self.LUNES)
+        self.assertEqual(len(resultado.creadas), 2)
+        self.assertEqual(Reserva.objects.filter(profesor=self.profesor).count(), 2)
+
+
+@skipUnless(connection.features.has_select_for_update, 'Requiere una base de datos con SELECT ... FOR UPDATE')
+class ReservaConcurrenteTests(TransactionTestCase):
+    # Prueba de carga: varios profesores reservan la misma celda libre a la vez
+    PROFESORES = 12
+
+    def setUp(self):
+        cache.clear()
+        Aula.objects.create(id='101', tipo='AULA_NORMAL')
+        self.cuis = [f'P{numero:03d}' for numero in range(self.PROFESORES)]
+        for cui in self.cuis:
+            Profesor.objects.create(
+                perfil=Perfil.objects.create(id=cui, nombre=f'Docente {cui}', password='x', rol='PROFESOR'),
+                es_teoria=True,
+            )
+        # Un día hábil de la próxima semana
+        proxima = date.today() + timedelta(days=7)
+        self.fecha = proxima - timedelta(days=proxima.weekday())
+
+    def cliente_de(self, cui):
+        cliente = Client()
+        sesion = cliente.session
+        sesion['is_authenticated'] = True
+        sesion['usuario_rol'] = 'PROFESOR'
+        sesion['usuario_id'] = cui
+        sesion.save()
+        return cliente
+
+    def test_una_sola_reserva_gana(self):
+        clientes = [self.cliente_de(cui) for cui in self.cuis]
+        url = reverse('usuarios:reservar_aula')
+        datos = {'aula_id': '101', 'fecha': self.fecha.isoformat(), 'hora_inicio': '09:00', 'hora_fin': '10:00'}
+        barrera = threading.Barrier(len(clientes))
+        latencias = []
+        errores = []
+
+        def reservar(cliente):
+            try:
+                barrera.wait()
+                inicio = reloj.perf_counter()
+                cliente.post(url, datos)
+                latencias.append(reloj.perf_counter() - inicio)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=reservar, args=(cliente,)) for cliente in clientes]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        resumen = f"latencia p50={median(latencias) * 1000:.0f} ms, máx={max(latencias) * 1000:.0f} ms"
+        # Se reporta también cuando la prueba pasa
+        print(f"\n{self.id()}: {len(latencias)} reservas simultáneas, {resumen}", file=sys.stderr)
+        self.assertEqual(Reserva.objects.filter(aula_id='101', fecha_reserva=self.fecha).count(), 1, resumen)
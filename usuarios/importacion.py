@@ -0,0 +1,232 @@
+# usuarios/importacion.py
+#
+# Carga masiva de estudiantes y profesores desde CSV (secretaría y administrador).
+#
+# Formato esperado (sin encabezados): cui, nombre, email, password
+#
+# En lugar de get_or_create + save por fila, se validan todas las filas en
+# memoria, se leen los perfiles existentes (por id o por email) en una sola
+# consulta y se escriben con bulk_create/bulk_update en lotes atómicos. Si un
+# lote falla se reintenta fila por fila para identificar la fila culpable sin
+# perder el resto.
+
+import csv
+import time as reloj
+from dataclasses import dataclass, field
+
+from django.contrib import messages
+from django.db import transaction
+from django.db.models import Q
+
+from .metricas import invalidar_por_modelo
+from .models import Estudiante, Perfil, Profesor
+
+
+TAMANO_LOTE = 500
+
+# Errores por fila que se muestran como mensajes en la página
+MAX_ERRORES_MENSAJE = 10
+
+# Rol -> subtabla de especialización
+MODELOS_ROL = {
+    'ESTUDIANTE': Estudiante,
+    'PROFESOR': Profesor,
+}
+
+CAMPOS_ACTUALIZABLES = ['nombre', 'email', 'password', 'rol', 'estadoCuenta']
+
+
+@dataclass
+class ResultadoImportacion:
+    filas: int = 0
+    creados: int = 0
+    actualizados: int = 0
+    sin_cambios: int = 0
+    errores: list = field(default_factory=list)  # [(número de fila, mensaje)]
+    segundos: float = 0.0
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos > 0 else 0.0
+
+    def resumen(self):
+        return (
+            f"{self.filas} filas procesadas: {self.creados} creados, {self.actualizados} actualizados, "
+            f"{self.sin_cambios} sin cambios, {len(self.errores)} con error "
+            f"({self.segundos:.2f}s, {self.filas_por_segundo:.0f} filas/s)."
+        )
+
+
+def leer_filas_csv(texto):
+    """Filas numeradas (desde 1) de un CSV en texto."""
+    return list(enumerate(csv.reader(texto.splitlines()), start=1))
+
+
+# ----------------------------------------------------------------------
+# VALIDACIÓN
+# ----------------------------------------------------------------------
+
+def _validar_filas(filas, resultado):
+    """
+    Devuelve {cui: (numero_fila, nombre, email, password)} con las filas
+    válidas. Si un CUI se repite en el archivo se conserva la última fila.
+    """
+    validas = {}
+    for numero, row in filas:
+        if not any(celda.strip() for celda in row):
+            continue  # Línea en blanco
+        resultado.filas += 1
+
+        if len(row) < 4:
+            resultado.errores.append((numero, "Faltan columnas (se esperan: cui, nombre, email, password)."))
+            continue
+
+        cui = row[0].strip()
+        nombre = row[1].strip()
+        email = row[2].strip() or None
+        password = row[3].strip()
+
+        if not (cui and nombre and password):
+            resultado.errores.append((numero, "CUI, Nombre y Contraseña son obligatorios."))
+            continue
+        if len(cui) > Perfil._meta.get_field('id').max_length:
+            resultado.errores.append((numero, f"CUI demasiado largo: {cui}."))
+            continue
+
+        if cui in validas:
+            resultado.errores.append((validas[cui][0], f"CUI {cui} repetido en el archivo; se usa la fila {numero}."))
+        validas[cui] = (numero, nombre, email, password)
+    return validas
+
+
+# ----------------------------------------------------------------------
+# ESCRITURA
+# ----------------------------------------------------------------------
+
+def _escribir_lote(rol, nuevos, modificados, cuis):
+    modelo_rol = MODELOS_ROL[rol]
+    with transaction.atomic():
+        if nuevos:
+            Perfil.objects.bulk_create(nuevos)
+        if modificados:
+            Perfil.objects.bulk_update(modificados, CAMPOS_ACTUALIZABLES)
+        # Subtabla del rol (si ya existe se ignora)
+        modelo_rol.objects.bulk_create(
+            [modelo_rol(perfil_id=cui) for cui in cuis],
+            ignore_conflicts=True,
+        )
+
+
+def importar_perfiles(filas, rol, tamano_lote=TAMANO_LOTE):
+    """
+    Crea o actualiza los perfiles (y su subtabla de rol) de las filas dadas.
+    `filas` es una lista de (numero_fila, [cui, nombre, email, password]).
+    Devuelve un ResultadoImportacion con el reporte de errores por fila.
+    """
+    if rol not in MODELOS_ROL:
+        raise ValueError(f"Rol no soportado para importación: {rol}")
+
+    inicio = reloj.perf_counter()
+    resultado = ResultadoImportacion()
+    validas = _validar_filas(filas, resultado)
+
+    # Perfiles existentes por id o por email: una sola consulta
+    emails = {email for _, _, email, _ in validas.values() if email}
+    existentes = {}
+    dueno_email = {}
+    for perfil in Perfil.objects.filter(Q(id__in=validas.keys()) | Q(email__in=emails)):
+        if perfil.id in validas:
+            existentes[perfil.id] = perfil
+        if perfil.email:
+            dueno_email[perfil.email] = perfil.id
+
+    # Clasificar en crear / actualizar
+    operaciones = []  # (numero, cui, perfil, es_nuevo)
+    for cui, (numero, nombre, email, password) in validas.items():
+        if email:
+            dueno = dueno_email.get(email)
+            if dueno is not None and dueno != cui:
+                resultado.errores.append((numero, f"El email {email} ya pertenece al usuario {dueno}."))
+                continue
+
+        perfil = existentes.get(cui)
+        if perfil is not None and perfil.rol != rol:
+            resultado.errores.append((numero, f"El usuario {cui} ya existe con rol {perfil.get_rol_display()}."))
+            continue
+
+        # Fila aceptada: reserva el email para las filas siguientes
+        if email:
+            dueno_email[email] = cui
+
+        if perfil is None:
+            perfil = Perfil(id=cui, nombre=nombre, email=email, password=password, rol=rol, estadoCuenta=True)
+            operaciones.append((numero, cui, perfil, True))
+            continue
+
+        nuevos_valores = {'nombre': nombre, 'email': email, 'password': password, 'rol': rol, 'estadoCuenta': True}
+        if all(getattr(perfil, campo) == valor for campo, valor in nuevos_valores.items()):
+            resultado.sin_cambios += 1
+            operaciones.append((numero, cui, None, False))
+            continue
+        for campo, valor in nuevos_valores.items():
+            setattr(perfil, campo, valor)
+        operaciones.append((numero, cui, perfil, False))
+
+    # Escritura por lotes atómicos
+    for desde in range(0, len(operaciones), tamano_lote):
+        lote = operaciones[desde:desde + tamano_lote]
+        try:
+            _escribir_lote(
+                rol,
+                [perfil for _, _, perfil, es_nuevo in lote if es_nuevo],
+                [perfil for _, _, perfil, es_nuevo in lote if perfil is not None and not es_nuevo],
+                [cui for _, cui, _, _ in lote],
+            )
+            aplicadas = lote
+        except Exception:
+            # El lote se revirtió completo: se reintenta fila por fila
+            aplicadas = []
+            for operacion in lote:
+                numero, cui, perfil, es_nuevo = operacion
+                try:
+                    _escribir_lote(
+                        rol,
+                        [perfil] if es_nuevo else [],
+                        [perfil] if perfil is not None and not es_nuevo else [],
+                        [cui],
+                    )
+                    aplicadas.append(operacion)
+                except Exception as e:
+                    if perfil is None:
+                        resultado.sin_cambios -= 1
+                    resultado.errores.append((numero, f"No se pudo guardar {cui}: {e}"))
+
+        for _, _, perfil, es_nuevo in aplicadas:
+            if es_nuevo:
+                resultado.creados += 1
+            elif perfil is not None:
+                resultado.actualizados += 1
+
+    # bulk_create/bulk_update no disparan señales: invalidar el dashboard
+    # (conteos por las altas; nombres y estado de cuenta por Perfil)
+    if resultado.creados:
+        invalidar_por_modelo(MODELOS_ROL[rol])
+    if resultado.actualizados:
+        invalidar_por_modelo(Perfil)
+
+    resultado.errores.sort()
+    resultado.segundos = reloj.perf_counter() - inicio
+    return resultado
+
+
+def mensajes_importacion(request, resultado):
+    """Resumen y errores por fila de una importación como mensajes de Django."""
+    if resultado.errores:
+        messages.warning(request, f"CSV procesado con observaciones. {resultado.resumen()}")
+        for numero, mensaje in resultado.errores[:MAX_ERRORES_MENSAJE]:
+            messages.warning(request, f"Fila {numero}: {mensaje}")
+        restantes = len(resultado.errores) - MAX_ERRORES_MENSAJE
+        if restantes > 0:
+            messages.warning(request, f"... y {restantes} errores más.")
+    else:
+        messages.success(request, f"CSV procesado correctamente. {resultado.resumen()}")
@@ -0,0 +1,346 @@
+# usuarios/management/commands/cargar_periodo.py
+#
+# Carga completa de un periodo a partir de los seis archivos ingresar*.csv.
+#
+# Etapas:
+#   1. Lectura de los seis CSV.
+#   2. Validación de integridad referencial entre archivos (en memoria,
+#      considerando también lo que ya existe en la base de datos).
+#   3. Tablas independientes en paralelo: aulas, cursos, estudiantes y
+#      profesores (cada una en su propio hilo, conexión y transacción).
+#   4. Tablas dependientes en orden: grupos (importar_grupos --sincronizar) y
+#      matrículas (importar_matriculas), ambos con escrituras en bloque.
+#
+# Cada tabla se confirma en su propia transacción (las independientes usan
+# conexiones distintas, así que no pueden revertirse juntas). Si una etapa
+# falla, el error indica qué tablas ya quedaron guardadas; como todas las
+# escrituras son upserts, basta corregir el archivo y volver a ejecutar.
+
+import csv
+import os
+import time as reloj
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from cursos.models import Curso, GrupoCurso
+from reservas.models import Aula
+from usuarios.importacion import importar_perfiles
+from usuarios.metricas import invalidar_por_modelo
+from usuarios.resumen import argumentos_upsert
+from usuarios.models import Estudiante, Perfil, Profesor
+
+# Archivo por tabla (dentro de --directorio)
+ARCHIVOS = {
+    'aulas': 'ingresarAulas.csv',
+    'cursos': 'ingresarCursosB.csv',
+    'estudiantes': 'ingresarAlumnos.csv',
+    'profesores': 'ingresarProfesores.csv',
+    'grupos': 'ingresarGruposCursos.csv',
+    'matriculas': 'ingresarMatriculas.csv',
+}
+
+COLUMNAS = {
+    'aulas': ['id', 'tipo'],
+    'cursos': ['id', 'nombre', 'creditos', 'EC1', 'EP1', 'EC2', 'EP2', 'EC3', 'EP3'],
+    'estudiantes': ['id', 'nombre', 'password', 'email'],
+    'profesores': ['id', 'password', 'nombre', 'email', 'es_teoria', 'es_lab'],
+    'grupos': ['grupo_id', 'curso_id', 'profesor_codigo', 'grupo', 'capacidad', 'tipo', 'dia', 'hora_inicio', 'hora_fin', 'id_Aula'],
+    'matriculas': ['estudiante_id', 'grupo_curso_id'],
+}
+
+# Campos de Curso que vienen en el CSV (columna -> campo)
+PORCENTAJES_CURSO = {f'porcentaje{campo}': campo for campo in ['EC1', 'EP1', 'EC2', 'EP2', 'EC3', 'EP3']}
+
+TAMANO_LOTE = 1000
+
+# Máximo de errores de validación que se listan
+MAX_ERRORES = 30
+
+
+def es_verdadero(valor):
+    return (valor or '').strip().lower() in ['true', '1', 'yes']
+
+
+class Command(BaseCommand):
+    help = 'Carga un periodo completo (aulas, cursos, estudiantes, profesores, grupos y matrículas) desde los archivos ingresar*.csv.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directorio',
+            type=str,
+            default=str(settings.BASE_DIR),
+            help='Carpeta que contiene los archivos ingresar*.csv (por defecto la raíz del proyecto)'
+        )
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            default=4,
+            help='Hilos para cargar en paralelo las tablas independientes (por defecto 4)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Filas por sentencia INSERT (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo lee y valida los archivos, sin escribir en la base de datos'
+        )
+
+    def handle(self, *args, **options):
+        directorio = options['directorio']
+        self.tamano_lote = options['chunk_size']
+        if options['hilos'] <= 0 or self.tamano_lote <= 0:
+            raise CommandError('--hilos y --chunk-size deben ser mayores a cero.')
+
+        self.tiempos = []
+        self.confirmadas = []
+        inicio_total = reloj.perf_counter()
+
+        # 1. Lectura
+        rutas = {tabla: os.path.join(directorio, archivo) for tabla, archivo in ARCHIVOS.items()}
+        datos = self.medir('Lectura de CSV', self.leer_archivos, rutas)
+        for tabla, filas in datos.items():
+            self.stdout.write(f'  {ARCHIVOS[tabla]}: {len(filas)} filas')
+
+        # 2. Validación
+        errores, advertencias = self.medir('Validación referencial', self.validar, datos)
+        for advertencia in advertencias:
+            self.stdout.write(self.style.WARNING(advertencia))
+        for error in errores[:MAX_ERRORES]:
+            self.stdout.write(self.style.ERROR(error))
+        if len(errores) > MAX_ERRORES:
+            self.stdout.write(self.style.ERROR(f'... y {len(errores) - MAX_ERRORES} errores más.'))
+        if errores:
+            raise CommandError(f'Se encontraron {len(errores)} errores de integridad. No se realizó ningún cambio.')
+
+        if options['dry_run']:
+            self.imprimir_tiempos(inicio_total)
+            self.stdout.write(self.style.WARNING('\nModo --dry-run: archivos válidos, no se escribió ningún cambio.'))
+            return
+
+        # 3. Tablas independientes en paralelo
+        independientes = {
+            'aulas': self.cargar_aulas,
+            'cursos': self.cargar_cursos,
+            'estudiantes': self.cargar_estudiantes,
+            'profesores': self.cargar_profesores,
+        }
+        inicio = reloj.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['hilos']) as ejecutor:
+            futuros = {
+                tabla: ejecutor.submit(self.en_hilo, cargar, datos[tabla])
+                for tabla, cargar in independientes.items()
+            }
+            resultados = {}
+            fallidas = []
+            for tabla, futuro in futuros.items():
+                try:
+                    resultados[tabla] = futuro.result()
+                except Exception as e:
+                    fallidas.append(f'{tabla}: {e}')
+        self.tiempos.append(('Tablas independientes (paralelo)', reloj.perf_counter() - inicio))
+
+        for tabla, (resumen, segundos) in resultados.items():
+            self.tiempos.append((f'  {tabla}', segundos))
+            self.confirmadas.append(tabla)
+            self.stdout.write(self.style.SUCCESS(f'{tabla.capitalize()}: {resumen}'))
+        if fallidas:
+            for fallo in fallidas:
+                self.stdout.write(self.style.ERROR(f'Error al cargar {fallo}'))
+            self.abortar('Falló la carga de tablas independientes. Grupos y matrículas no se cargaron.')
+
+        # 4. Tablas dependientes (orden topológico)
+        self.stdout.write(self.style.NOTICE('\nCargando grupos de curso y horarios...'))
+        self.cargar_dependiente('grupos', 'Grupos y horarios', 'importar_grupos', rutas['grupos'], sincronizar=True)
+        self.stdout.write(self.style.NOTICE('\nCargando matrículas...'))
+        self.cargar_dependiente('matriculas', 'Matrículas', 'importar_matriculas', rutas['matriculas'], chunk_size=self.tamano_lote)
+
+        self.imprimir_tiempos(inicio_total)
+
+    # ------------------------------------------------------------------
+    # UTILIDADES
+    # ------------------------------------------------------------------
+    def medir(self, etapa, funcion, *args, **kwargs):
+        inicio = reloj.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        self.tiempos.append((etapa, reloj.perf_counter() - inicio))
+        return resultado
+
+    def en_hilo(self, cargar, filas):
+        """Ejecuta una carga en un hilo del pool; cada hilo usa y cierra su propia conexión."""
+        inicio = reloj.perf_counter()
+        try:
+            return cargar(filas), reloj.perf_counter() - inicio
+        finally:
+            connections.close_all()
+
+    def cargar_dependiente(self, tabla, etapa, comando, ruta, **opciones):
+        try:
+            self.medir(etapa, call_command, comando, ruta, stdout=self.stdout, **opciones)
+        except CommandError as e:
+            self.abortar(f'Falló la carga de {tabla}: {e}')
+        self.confirmadas.append(tabla)
+
+    def abortar(self, mensaje):
+        """Termina con error indicando qué tablas ya quedaron confirmadas en la base de datos."""
+        guardadas = ', '.join(self.confirmadas) or 'ninguna'
+        raise CommandError(f'{mensaje} Tablas ya guardadas (no se revierten): {guardadas}.')
+
+    def imprimir_tiempos(self, inicio_total):
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
+        for etapa, segundos in self.tiempos:
+            self.stdout.write(f'{etapa:<40} {segundos:8.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'{"Total":<40} {reloj.perf_counter() - inicio_total:8.2f}s'))
+
+    # ------------------------------------------------------------------
+    # 1. LECTURA
+    # ------------------------------------------------------------------
+    def leer_archivos(self, rutas):
+        datos = {}
+        for tabla, ruta in rutas.items():
+            if not os.path.exists(ruta):
+                raise CommandError(f'El archivo CSV no fue encontrado en: "{ruta}"')
+            with open(ruta, 'r', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                faltantes = [c for c in COLUMNAS[tabla] if c not in (reader.fieldnames or [])]
+                if faltantes:
+                    raise CommandError(f"{ARCHIVOS[tabla]} no tiene las columnas: {', '.join(faltantes)}")
+                datos[tabla] = [
+                    {clave: (valor or '').strip() for clave, valor in fila.items() if clave}
+                    for fila in reader
+                ]
+        return datos
+
+    # ------------------------------------------------------------------
+    # 2. VALIDACIÓN
+    # ------------------------------------------------------------------
+    def validar(self, datos):
+        errores = []
+        advertencias = []
+
+        # IDs disponibles = los del CSV + los que ya existen en la BD
+        aulas = {fila['id'] for fila in datos['aulas']} | set(Aula.objects.values_list('pk', flat=True))
+        cursos = {fila['id'] for fila in datos['cursos']} | set(Curso.objects.values_list('pk', flat=True))
+        profesores = {fila['id'] for fila in datos['profesores']} | set(Profesor.objects.values_list('pk', flat=True))
+        estudiantes = {fila['id'] for fila in datos['estudiantes']} | set(Estudiante.objects.values_list('pk', flat=True))
+        grupos = {fila['grupo_id'] for fila in datos['grupos']} | set(GrupoCurso.objects.values_list('pk', flat=True))
+
+        tipos_aula = [choice[0] for choice in Aula.TIPO_CHOICES]
+        for fila in datos['aulas']:
+            if fila['tipo'].upper() not in tipos_aula:
+                errores.append(f'{ARCHIVOS["aulas"]}: tipo "{fila["tipo"]}" no válido para el aula {fila["id"]}.')
+
+        for fila in datos['cursos']:
+            try:
+                int(fila['creditos'])
+                suma = sum(int(fila[campo] or 0) for campo in PORCENTAJES_CURSO.values())
+            except ValueError:
+                errores.append(f'{ARCHIVOS["cursos"]}: valor numérico inválido en el curso {fila["id"]}.')
+                continue
+            if suma != 100:
+                advertencias.append(f'Advertencia: Los porcentajes de evaluación para el curso {fila["id"]} no suman 100% ({suma}%).')
+
+        # Perfiles: un mismo CUI no puede ser estudiante y profesor, ni un email repetirse
+        ids_profesores = {fila['id'] for fila in datos['profesores']}
+        for cui in sorted(ids_profesores & {fila['id'] for fila in datos['estudiantes']}):
+            errores.append(f'El CUI {cui} aparece como estudiante y como profesor.')
+        duenos_email = {}
+        for tabla in ('estudiantes', 'profesores'):
+            for fila in datos[tabla]:
+                if fila['email'] and duenos_email.setdefault(fila['email'], fila['id']) != fila['id']:
+                    errores.append(f'El email {fila["email"]} se repite ({duenos_email[fila["email"]]} y {fila["id"]}).')
+        for email, dueno in Perfil.objects.filter(email__in=duenos_email.keys()).values_list('email', 'id'):
+            if duenos_email[email] != dueno:
+                errores.append(f'El email {email} ya pertenece al usuario {dueno} en la base de datos.')
+
+        for fila in datos['grupos']:
+            grupo_id = fila['grupo_id']
+            if fila['curso_id'] not in cursos:
+                errores.append(f'{ARCHIVOS["grupos"]}: el curso {fila["curso_id"]} del grupo {grupo_id} no existe.')
+            if fila['id_Aula'] not in aulas:
+                errores.append(f'{ARCHIVOS["grupos"]}: el aula {fila["id_Aula"]} del grupo {grupo_id} no existe.')
+            if fila['profesor_codigo'] and fila['profesor_codigo'] not in profesores:
+                advertencias.append(f'Advertencia: el profesor {fila["profesor_codigo"]} del grupo {grupo_id} no existe; se asignará NULL.')
+
+        # Las matrículas con referencias inexistentes se omiten (igual que importar_matriculas)
+        sin_estudiante = {fila['estudiante_id'] for fila in datos['matriculas']} - estudiantes
+        sin_grupo = {fila['grupo_curso_id'] for fila in datos['matriculas']} - grupos
+        if sin_estudiante:
+            advertencias.append(f'Advertencia: {len(sin_estudiante)} estudiantes de {ARCHIVOS["matriculas"]} no existen; sus filas se omitirán.')
+        if sin_grupo:
+            advertencias.append(f'Advertencia: grupos inexistentes en {ARCHIVOS["matriculas"]} (filas omitidas): {", ".join(sorted(sin_grupo))}')
+
+        return errores, sorted(set(advertencias))
+
+    # ------------------------------------------------------------------
+    # 3. CARGAS INDEPENDIENTES (se ejecutan en hilos)
+    # ------------------------------------------------------------------
+    def cargar_aulas(self, filas):
+        aulas = [Aula(id=fila['id'], tipo=fila['tipo'].upper()) for fila in filas]
+        with transaction.atomic():
+            Aula.objects.bulk_create(
+                aulas,
+                batch_size=self.tamano_lote,
+                update_conflicts=True,
+                update_fields=['tipo'],
+                **argumentos_upsert(['id']),
+            )
+        invalidar_por_modelo(Aula)
+        return f'{len(aulas)} registros guardados.'
+
+    def cargar_cursos(self, filas):
+        cursos = [
+            Curso(
+                id=fila['id'],
+                nombre=fila['nombre'],
+                creditos=int(fila['creditos']),
+                **{campo: int(fila[columna] or 0) for campo, columna in PORCENTAJES_CURSO.items()},
+            )
+            for fila in filas
+        ]
+        with transaction.atomic():
+            Curso.objects.bulk_create(
+                cursos,
+                batch_size=self.tamano_lote,
+                update_conflicts=True,
+                update_fields=['nombre', 'creditos', *PORCENTAJES_CURSO],
+                **argumentos_upsert(['id']),
+            )
+        invalidar_por_modelo(Curso)
+        return f'{len(cursos)} registros guardados.'
+
+    def cargar_estudiantes(self, filas):
+        resultado = importar_perfiles(
+            [(numero, [f['id'], f['nombre'], f['email'], f['password']]) for numero, f in enumerate(filas, start=2)],
+            'ESTUDIANTE',
+            tamano_lote=self.tamano_lote,
+        )
+        return self.resumen_perfiles(resultado)
+
+    def cargar_profesores(self, filas):
+        resultado = importar_perfiles(
+            [(numero, [f['id'], f['nombre'], f['email'], f['password']]) for numero, f in enumerate(filas, start=2)],
+            'PROFESOR',
+            tamano_lote=self.tamano_lote,
+        )
+
+        # Tipo de docencia (teoría / laboratorio)
+        existentes = set(Profesor.objects.filter(pk__in=[f['id'] for f in filas]).values_list('pk', flat=True))
+        profesores = [
+            Profesor(perfil_id=f['id'], es_teoria=es_verdadero(f['es_teoria']), es_lab=es_verdadero(f['es_lab']))
+            for f in filas if f['id'] in existentes
+        ]
+        Profesor.objects.bulk_update(profesores, ['es_teoria', 'es_lab'], batch_size=self.tamano_lote)
+        return self.resumen_perfiles(resultado)
+
+    def resumen_perfiles(self, resultado):
+        lineas = [resultado.resumen()]
+        lineas += [f'    Fila {numero}: {mensaje}' for numero, mensaje in resultado.errores[:MAX_ERRORES]]
+        return '\n'.join(lineas)
@@ -0,0 +1,50 @@
+# usuarios/management/commands/reconstruir_resumenes.py
+
+import time as reloj
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import ResumenAcademico
+from usuarios.resumen import TAMANO_LOTE, actualizar_resumenes
+
+class Command(BaseCommand):
+    help = 'Reconstruye en bloque la tabla de resúmenes académicos (promedio, créditos, laboratorio y asistencia por estudiante).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cuis',
+            nargs='*',
+            help='CUIs de los estudiantes a recalcular (por defecto todos)'
+        )
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Estudiantes recalculados por consulta (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help='Elimina todos los resúmenes antes de reconstruir (solo sin CUIs)'
+        )
+
+    def handle(self, *args, **options):
+        cuis = options['cuis'] or None
+        if options['tamano_lote'] <= 0:
+            raise CommandError('--tamano-lote debe ser mayor a cero.')
+        if options['limpiar'] and cuis:
+            raise CommandError('--limpiar solo se puede usar al reconstruir todos los estudiantes.')
+
+        if options['limpiar']:
+            eliminados, _ = ResumenAcademico.objects.all().delete()
+            self.stdout.write(self.style.WARNING(f'Resúmenes eliminados: {eliminados}'))
+
+        inicio = reloj.perf_counter()
+        guardados = actualizar_resumenes(cuis, tamano_lote=options['tamano_lote'])
+        duracion = reloj.perf_counter() - inicio
+
+        if cuis and guardados < len(set(cuis)):
+            self.stdout.write(self.style.WARNING(
+                f'{len(set(cuis)) - guardados} CUI(s) no corresponden a estudiantes existentes.'
+            ))
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes guardados: {guardados} ({duracion:.2f}s)'))
@@ -0,0 +1,142 @@
+# usuarios/management/commands/verificar_indices.py
+
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from asistencias.models import RegistroAsistencia
+from cursos.models import BloqueHorario
+from matriculas.models import Matricula
+from reservas.models import Reserva
+from usuarios.models import Perfil
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas más frecuentes y verifica que usen los índices esperados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estricto',
+            action='store_true',
+            help='Termina con error si alguna consulta no usa un índice esperado'
+        )
+        parser.add_argument(
+            '--mostrar-plan',
+            action='store_true',
+            help='Muestra la salida completa de EXPLAIN de cada consulta'
+        )
+
+    def consultas(self):
+        """
+        (descripción, queryset, combinaciones de columnas aceptadas).
+        Se usan valores reales de la base cuando existen para que el
+        optimizador no descarte la consulta por "tabla vacía".
+        """
+        hoy = date.today()
+        lunes = hoy - timedelta(days=hoy.weekday())
+        viernes = lunes + timedelta(days=4)
+
+        bloque = BloqueHorario.objects.order_by('id').values('aula_id', 'grupo_curso_id', 'dia').first() or {
+            'aula_id': '', 'grupo_curso_id': '', 'dia': 'LUNES'
+        }
+        reserva = Reserva.objects.order_by('id').values('aula_id', 'profesor_id').first() or {
+            'aula_id': '', 'profesor_id': ''
+        }
+        registro = RegistroAsistencia.objects.order_by('id').values('grupo_curso_id', 'fechaClase').first() or {
+            'grupo_curso_id': '', 'fechaClase': hoy
+        }
+        matricula = Matricula.objects.order_by('id').values('estudiante_id').first() or {'estudiante_id': ''}
+        perfil = Perfil.objects.exclude(email=None).values('email', 'rol').first() or {
+            'email': 'usuario@ejemplo.com', 'rol': 'ESTUDIANTE'
+        }
+
+        return [
+            (
+                'Cruce de horario por aula (BloqueHorario aula + día)',
+                BloqueHorario.objects.filter(aula_id=bloque['aula_id'], dia=bloque['dia']),
+                [('aula_id', 'dia')],
+            ),
+            (
+                'Horario del día por grupo (BloqueHorario grupo + día)',
+                BloqueHorario.objects.filter(grupo_curso_id=bloque['grupo_curso_id'], dia=bloque['dia']),
+                [('grupo_curso_id', 'dia')],
+            ),
+            (
+                'Reservas de un aula en la semana',
+                Reserva.objects.filter(aula_id=reserva['aula_id'], fecha_reserva__range=[lunes, viernes]),
+                [('aula_id', 'fecha_reserva')],
+            ),
+            (
+                'Reservas de un profesor en la semana',
+                Reserva.objects.filter(profesor_id=reserva['profesor_id'], fecha_reserva__range=[lunes, viernes]),
+                [('profesor_id', 'fecha_reserva')],
+            ),
+            (
+                'Sesión de asistencia por grupo y fecha',
+                RegistroAsistencia.objects.filter(
+                    grupo_curso_id=registro['grupo_curso_id'], fechaClase=registro['fechaClase']
+                ),
+                [('grupo_curso_id', 'fechaClase')],
+            ),
+            (
+                'Matrículas activas de un estudiante',
+                Matricula.objects.filter(estudiante_id=matricula['estudiante_id'], estado=True),
+                [('estudiante_id', 'estado'), ('estudiante_id', 'grupo_curso_id')],
+            ),
+            (
+                'Login (Perfil email + rol)',
+                Perfil.objects.filter(email=perfil['email'], rol=perfil['rol']),
+                # El índice único de email también es válido (es más selectivo)
+                [('email', 'rol'), ('email',)],
+            ),
+        ]
+
+    def indices_aceptados(self, modelo, combinaciones):
+        """Nombres de los índices de la tabla cuyas columnas iniciales coinciden con alguna combinación."""
+        with connection.cursor() as cursor:
+            restricciones = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+
+        nombres = set()
+        for nombre, datos in restricciones.items():
+            if not datos.get('index') and not datos.get('unique'):
+                continue
+            columnas = tuple(datos.get('columns') or ())
+            for combinacion in combinaciones:
+                if columnas[:len(combinacion)] == combinacion:
+                    nombres.add(nombre)
+        return nombres
+
+    def handle(self, *args, **options):
+        fallidas = 0
+
+        for descripcion, queryset, combinaciones in self.consultas():
+            esperados = self.indices_aceptados(queryset.model, combinaciones)
+            plan = queryset.explain()
+
+            if options['mostrar_plan']:
+                self.stdout.write(self.style.NOTICE(f'\n{descripcion}\n{plan}'))
+
+            if not esperados:
+                fallidas += 1
+                columnas = ' | '.join(', '.join(c) for c in combinaciones)
+                self.stdout.write(self.style.ERROR(
+                    f'[FALTA ÍNDICE] {descripcion}: no existe índice sobre ({columnas}). ¿Se aplicaron las migraciones?'
+                ))
+                continue
+
+            usados = sorted(nombre for nombre in esperados if nombre in plan)
+            if usados:
+                self.stdout.write(self.style.SUCCESS(f'[OK] {descripcion}: usa {", ".join(usados)}'))
+            else:
+                fallidas += 1
+                self.stdout.write(self.style.WARNING(
+                    f'[SIN ÍNDICE] {descripcion}: el plan no usa {", ".join(sorted(esperados))} '
+                    f'(con tablas muy pequeñas el optimizador puede preferir recorrerlas completas)'
+                ))
+
+        self.stdout.write(self.style.SUCCESS('\n--- Proceso Finalizado ---'))
+        if fallidas:
+            mensaje = f'{fallidas} consulta(s) no usan los índices esperados.'
+            if options['estricto']:
+                raise CommandError(mensaje)
+            self.stdout.write(self.style.WARNING(mensaje))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todas las consultas usan los índices esperados.'))
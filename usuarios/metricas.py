@@ -0,0 +1,297 @@
+# usuarios/metricas.py
+#
+# Métricas de los dashboards de Secretaría y Administrador.
+#
+# Los dashboards muestran ~20 conteos/agregaciones que antes se calculaban en
+# cada carga de página con un count() por métrica. Aquí se agrupan por
+# sección (una consulta con agregados condicionales por tabla), cada sección
+# se guarda en el cache 'dashboard' (ver CACHES en settings) y se invalida
+# solo cuando cambia alguno de los modelos de los que depende (ver
+# usuarios/signals.py). Ambas vistas consumen el mismo SnapshotKPI.
+
+from dataclasses import dataclass, fields
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+
+from asistencias.models import RegistroAsistencia, RegistroAsistenciaDetalle
+from cursos.models import BloqueHorario, Curso, GrupoCurso, GrupoLaboratorio, GrupoTeoria
+from matriculas.models import Matricula, MatriculaLaboratorio
+from reservas.models import Aula, Reserva
+from .models import Estudiante, Perfil, Profesor, Secretaria
+
+
+ALIAS_CACHE = 'dashboard' if 'dashboard' in settings.CACHES else 'default'
+PREFIJO_CLAVE = 'dashboard'
+
+
+# ----------------------------------------------------------------------
+# FECHAS DE REFERENCIA
+# ----------------------------------------------------------------------
+
+def rango_semana(hoy):
+    """Lunes de la semana actual y el viernes correspondiente."""
+    lunes = hoy - timedelta(days=hoy.weekday())
+
+    dias_hasta_viernes = 4 - hoy.weekday()  # 0 si es viernes, positivo si es antes
+    if dias_hasta_viernes < 0:
+        # Si ya pasó el viernes, ir al viernes de la siguiente semana
+        dias_hasta_viernes += 7
+    viernes = hoy + timedelta(days=dias_hasta_viernes)
+    return lunes, viernes
+
+
+# ----------------------------------------------------------------------
+# SNAPSHOT DE KPIs
+# ----------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SnapshotKPI:
+    """Valores de los KPIs de un día, compartidos por ambos dashboards."""
+    fecha: date
+
+    # Conteos básicos
+    conteo_profesores: int
+    conteo_estudiantes: int
+    conteo_secretarias: int
+    conteo_cursos: int
+    conteo_aulas: int
+    profesores_grupos_asignados: int
+
+    # Matrículas
+    total_matriculas: int
+    matriculas_teoria: int
+    matriculas_lab: int
+
+    # Horarios
+    total_bloques: int
+    bloques_aula_normal: int
+    bloques_laboratorio: int
+
+    # Reservas
+    reservas_semana: int
+    reservas_hoy: int
+
+    # Asistencia
+    asistencia_semana: int
+    porcentaje_asistencia: float
+
+    # Grupos
+    grupos_con_profesor: int
+    grupos_sin_profesor: int
+    grupos_teoria: int
+    grupos_laboratorio: int
+
+    # Listados (instancias anotadas con total_*)
+    top_cursos: list
+    aulas_populares: list
+    profesores_activos: list
+
+    def como_contexto(self):
+        """Diccionario con las claves que esperan los templates del dashboard."""
+        contexto = {campo.name: getattr(self, campo.name) for campo in fields(self) if campo.name != 'fecha'}
+        lunes, viernes = rango_semana(self.fecha)
+        # Fechas para referencia - "Lunes Actual - Viernes Actual"
+        contexto['hoy'] = self.fecha.strftime('%d/%m/%Y')
+        contexto['semana_pasada'] = lunes.strftime('%d/%m/%Y')    # Lunes de esta semana
+        contexto['viernes_semana'] = viernes.strftime('%d/%m/%Y')  # Viernes de esta semana
+        return contexto
+
+
+# ----------------------------------------------------------------------
+# CÁLCULO POR SECCIÓN
+# ----------------------------------------------------------------------
+# Cada sección resuelve sus conteos con agregados condicionales
+# (Count(..., filter=Q(...))): una consulta por tabla en lugar de un
+# count() por métrica.
+
+def _calcular_conteos(hoy):
+    # Estudiante/Profesor/Secretaria son subtablas 1:1 de Perfil, así que un
+    # solo recorrido de Perfil con LEFT JOINs cuenta las tres.
+    perfiles = Perfil.objects.aggregate(
+        conteo_profesores=Count('profesor', distinct=True),
+        conteo_estudiantes=Count('estudiante', distinct=True),
+        conteo_secretarias=Count('secretaria', distinct=True),
+        profesores_grupos_asignados=Count(
+            'profesor', filter=Q(profesor__grupocurso__isnull=False), distinct=True
+        ),
+    )
+    return {
+        **perfiles,
+        'conteo_cursos': Curso.objects.count(),
+        'conteo_aulas': Aula.objects.count(),
+    }
+
+
+def _calcular_matriculas(hoy):
+    matriculas = Matricula.objects.aggregate(
+        # Total de matrículas activas (estado=True)
+        total_matriculas=Count('id', filter=Q(estado=True)),
+        # Matrículas por tipo (Teoría vs Laboratorio)
+        matriculas_teoria=Count('id', filter=Q(estado=True, grupo_curso__grupoteoria__isnull=False)),
+    )
+    return {
+        **matriculas,
+        'matriculas_lab': MatriculaLaboratorio.objects.count(),
+    }
+
+
+def _calcular_horarios(hoy):
+    return BloqueHorario.objects.aggregate(
+        total_bloques=Count('id'),
+        bloques_aula_normal=Count('id', filter=Q(aula__tipo='AULA_NORMAL')),
+        bloques_laboratorio=Count('id', filter=Q(aula__tipo='LABORATORIO')),
+    )
+
+
+def _calcular_reservas(hoy):
+    lunes, viernes = rango_semana(hoy)
+    return Reserva.objects.aggregate(
+        reservas_semana=Count('id', filter=Q(fecha_reserva__range=[lunes, viernes])),
+        reservas_hoy=Count('id', filter=Q(fecha_reserva=hoy)),
+    )
+
+
+def _calcular_asistencia(hoy):
+    lunes, viernes = rango_semana(hoy)
+    # Sesiones de la semana y sus detalles en una sola consulta
+    asistencia = RegistroAsistencia.objects.filter(
+        fechaClase__range=[lunes, viernes]
+    ).aggregate(
+        sesiones=Count('id', distinct=True),
+        total=Count('registroasistenciadetalle'),
+        presentes=Count('registroasistenciadetalle', filter=Q(registroasistenciadetalle__estado='PRESENTE')),
+    )
+
+    # Porcentaje promedio de asistencia
+    total = asistencia['total']
+    porcentaje_asistencia = (asistencia['presentes'] / total * 100) if total > 0 else 0
+
+    return {
+        'asistencia_semana': asistencia['sesiones'],
+        'porcentaje_asistencia': round(porcentaje_asistencia, 1),
+    }
+
+
+def _calcular_grupos(hoy):
+    return GrupoCurso.objects.aggregate(
+        grupos_con_profesor=Count('id', filter=Q(profesor__isnull=False)),
+        grupos_sin_profesor=Count('id', filter=Q(profesor__isnull=True)),
+        grupos_teoria=Count('id', filter=Q(grupoteoria__isnull=False)),
+        grupos_laboratorio=Count('id', filter=Q(grupolaboratorio__isnull=False)),
+    )
+
+
+def _calcular_rankings(hoy):
+    # Se evalúan como listas para poder guardarlas en el cache
+    top_cursos = list(Curso.objects.annotate(
+        total_matriculas=Count('grupocurso__matricula', filter=Q(grupocurso__matricula__estado=True))
+    ).order_by('-total_matriculas')[:5])
+
+    aulas_populares = list(Aula.objects.annotate(
+        total_bloques=Count('bloquehorario')
+    ).order_by('-total_bloques')[:5])
+
+    profesores_activos = list(Profesor.objects.select_related('perfil').annotate(
+        total_grupos=Count('grupocurso')
+    ).order_by('-total_grupos')[:5])
+
+    return {
+        'top_cursos': top_cursos,
+        'aulas_populares': aulas_populares,
+        'profesores_activos': profesores_activos,
+    }
+
+
+# Sección -> función que la calcula
+SECCIONES = {
+    'conteos': _calcular_conteos,
+    'matriculas': _calcular_matriculas,
+    'horarios': _calcular_horarios,
+    'reservas': _calcular_reservas,
+    'asistencia': _calcular_asistencia,
+    'grupos': _calcular_grupos,
+    'rankings': _calcular_rankings,
+}
+
+# Modelo -> secciones que dependen de él (usado por las señales)
+DEPENDENCIAS = {
+    Matricula: ('matriculas', 'rankings'),
+    MatriculaLaboratorio: ('matriculas',),
+    Reserva: ('reservas',),
+    BloqueHorario: ('horarios', 'rankings'),
+    RegistroAsistencia: ('asistencia',),
+    RegistroAsistenciaDetalle: ('asistencia',),
+    GrupoCurso: ('conteos', 'grupos', 'rankings'),
+    GrupoTeoria: ('grupos', 'matriculas'),
+    GrupoLaboratorio: ('grupos',),
+    Curso: ('conteos', 'rankings'),
+    Aula: ('conteos', 'horarios', 'rankings'),
+    Profesor: ('conteos', 'rankings'),
+    Estudiante: ('conteos',),
+    Secretaria: ('conteos',),
+    Perfil: ('rankings',),  # profesores_activos muestra perfil.nombre
+}
+
+
+# ----------------------------------------------------------------------
+# ACCESO AL CACHE
+# ----------------------------------------------------------------------
+
+def clave_seccion(seccion):
+    return f"{PREFIJO_CLAVE}:{seccion}"
+
+
+def obtener_seccion(seccion, hoy=None):
+    """
+    Devuelve las métricas de una sección desde el cache o las calcula.
+    Las secciones que dependen de la fecha (semana/hoy) se recalculan si el
+    valor guardado corresponde a otro día.
+    """
+    hoy = hoy or date.today()
+    cache = caches[ALIAS_CACHE]
+    clave = clave_seccion(seccion)
+
+    guardado = cache.get(clave)
+    if guardado is not None and guardado['fecha'] == hoy:
+        return guardado['datos']
+
+    datos = SECCIONES[seccion](hoy)
+    cache.set(clave, {'fecha': hoy, 'datos': datos})
+    return datos
+
+
+def obtener_snapshot(hoy=None):
+    """Snapshot de KPIs armado desde el cache (recalcula solo lo invalidado)."""
+    hoy = hoy or date.today()
+    valores = {}
+    for seccion in SECCIONES:
+        valores.update(obtener_seccion(seccion, hoy))
+    return SnapshotKPI(fecha=hoy, **valores)
+
+
+def calcular_snapshot(hoy=None):
+    """Snapshot de KPIs calculado directamente en la base de datos (sin cache)."""
+    hoy = hoy or date.today()
+    valores = {}
+    for calcular in SECCIONES.values():
+        valores.update(calcular(hoy))
+    return SnapshotKPI(fecha=hoy, **valores)
+
+
+def obtener_metricas_dashboard(hoy=None):
+    """Todas las métricas del dashboard (contexto listo para el template)."""
+    return obtener_snapshot(hoy).como_contexto()
+
+
+def invalidar_secciones(secciones):
+    """Elimina del cache solo las secciones indicadas."""
+    claves = [clave_seccion(seccion) for seccion in set(secciones)]
+    if claves:
+        caches[ALIAS_CACHE].delete_many(claves)
+
+
+def invalidar_por_modelo(modelo):
+    invalidar_secciones(DEPENDENCIAS.get(modelo, ()))
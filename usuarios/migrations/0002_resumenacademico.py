@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2025-11-24 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAcademico',
+            fields=[
+                ('estudiante', models.OneToOneField(db_column='estudiante_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_academico', serialize=False, to='usuarios.estudiante')),
+                ('promedio_ponderado', models.FloatField(blank=True, null=True)),
+                ('creditos', models.IntegerField(default=0)),
+                ('cursos_count', models.IntegerField(default=0)),
+                ('total_matriculas', models.IntegerField(default=0)),
+                ('tiene_laboratorio', models.BooleanField(default=False)),
+                ('total_presentes', models.IntegerField(default=0)),
+                ('total_faltas', models.IntegerField(default=0)),
+                ('porcentaje_asistencia', models.FloatField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen Académico',
+                'verbose_name_plural': 'Resúmenes Académicos',
+                'db_table': 'usuarios_resumen_academico',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2025-11-25 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_resumenacademico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['email', 'rol'], name='perfil_email_rol_idx'),
+        ),
+    ]
@@ -30,6 +30,10 @@ class Perfil(models.Model):
         db_table = 'usuarios_perfil'
         verbose_name = 'Perfil Usuario'
         verbose_name_plural = 'Perfiles Usuarios'
+        indexes = [
+            # Login: búsqueda por email y rol
+            models.Index(fields=['email', 'rol'], name='perfil_email_rol_idx'),
+        ]
         
     def __str__(self):
         return f'{self.id} - {self.nombre} ({self.rol})'
@@ -102,4 +106,40 @@ class Administrador(models.Model):
         verbose_name_plural = 'Administradores'
     
     def __str__(self):
-        return self.perfil.nombre
\ No newline at end of file
+        return self.perfil.nombre
+# =========================================================================================
+# 3. RESUMEN ACADÉMICO (Tabla desnormalizada, una fila por estudiante)
+# =========================================================================================
+
+class ResumenAcademico(models.Model):
+    # Se mantiene al día desde usuarios/resumen.py (señales de Matricula,
+    # MatriculaLaboratorio y RegistroAsistenciaDetalle) y se reconstruye con
+    # el comando `reconstruir_resumenes`.
+    estudiante = models.OneToOneField(
+        Estudiante,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='estudiante_id',
+        related_name='resumen_academico'
+    )
+
+    # Promedio ponderado por créditos (solo cursos con las 6 notas registradas)
+    promedio_ponderado = models.FloatField(null=True, blank=True)
+    creditos = models.IntegerField(default=0)           # Créditos de las matrículas activas
+    cursos_count = models.IntegerField(default=0)       # Matrículas activas
+    total_matriculas = models.IntegerField(default=0)   # Todas las matrículas
+    tiene_laboratorio = models.BooleanField(default=False)
+
+    total_presentes = models.IntegerField(default=0)
+    total_faltas = models.IntegerField(default=0)
+    porcentaje_asistencia = models.FloatField(null=True, blank=True)
+
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'usuarios_resumen_academico'
+        verbose_name = 'Resumen Académico'
+        verbose_name_plural = 'Resúmenes Académicos'
+
+    def __str__(self):
+        return f'Resumen {self.estudiante_id}'
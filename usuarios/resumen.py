@@ -0,0 +1,128 @@
+# usuarios/resumen.py
+#
+# Resumen académico desnormalizado por estudiante (modelo ResumenAcademico).
+#
+# El dashboard del estudiante y el detalle de estudiante (secretaría y
+# administrador) leen promedio ponderado, créditos, cursos, laboratorio y
+# asistencia de una sola fila en lugar de recalcularlos en cada carga. Las
+# filas se recalculan por lotes de estudiantes con consultas agrupadas (no una
+# consulta por estudiante): las señales de usuarios/signals.py actualizan
+# solo a los estudiantes afectados por cada escritura y el comando
+# `reconstruir_resumenes` rehace la tabla completa.
+
+from django.db import connection
+from django.db.models import Count, Q
+
+from asistencias.models import RegistroAsistenciaDetalle
+from matriculas.calificaciones import notas_de_queryset
+from matriculas.models import Matricula, MatriculaLaboratorio
+from .models import Estudiante, ResumenAcademico
+
+
+# Estudiantes recalculados por consulta
+TAMANO_LOTE = 1000
+
+CAMPOS_RESUMEN = [
+    'promedio_ponderado', 'creditos', 'cursos_count', 'total_matriculas', 'tiene_laboratorio',
+    'total_presentes', 'total_faltas', 'porcentaje_asistencia', 'actualizado',
+]
+
+
+def _calcular_lote(estudiante_ids):
+    """Resúmenes (sin guardar) de un lote de estudiantes existentes."""
+    existentes = list(Estudiante.objects.filter(pk__in=estudiante_ids).values_list('pk', flat=True))
+    if not existentes:
+        return []
+
+    resumenes = {pk: ResumenAcademico(estudiante_id=pk) for pk in existentes}
+
+    # Notas: una fila por matrícula activa identificada por estudiante
+    notas = notas_de_queryset(
+        Matricula.objects.filter(estudiante_id__in=existentes, estado=True),
+        clave='estudiante_id',
+    )
+    suma_ponderada = {}
+    creditos_completos = {}
+    for fila, estudiante_id in enumerate(notas.ids):
+        resumen = resumenes[estudiante_id]
+        creditos = int(notas.creditos[fila])
+        resumen.cursos_count += 1
+        resumen.creditos += creditos
+        # Solo cuentan para el promedio los cursos con las 6 notas registradas
+        if notas.completas[fila]:
+            suma_ponderada[estudiante_id] = suma_ponderada.get(estudiante_id, 0.0) + float(notas.nota_final[fila]) * creditos
+            creditos_completos[estudiante_id] = creditos_completos.get(estudiante_id, 0) + creditos
+
+    for estudiante_id, total_creditos in creditos_completos.items():
+        if total_creditos > 0:
+            resumenes[estudiante_id].promedio_ponderado = round(suma_ponderada[estudiante_id] / total_creditos, 2)
+
+    totales = Matricula.objects.filter(estudiante_id__in=existentes).values('estudiante_id').annotate(total=Count('id'))
+    for fila in totales:
+        resumenes[fila['estudiante_id']].total_matriculas = fila['total']
+
+    con_laboratorio = MatriculaLaboratorio.objects.filter(
+        estudiante_id__in=existentes
+    ).values_list('estudiante_id', flat=True).distinct()
+    for estudiante_id in con_laboratorio:
+        resumenes[estudiante_id].tiene_laboratorio = True
+
+    asistencia = RegistroAsistenciaDetalle.objects.filter(
+        estudiante_id__in=existentes
+    ).values('estudiante_id').annotate(
+        total=Count('id'),
+        presentes=Count('id', filter=Q(estado='PRESENTE')),
+    )
+    for fila in asistencia:
+        resumen = resumenes[fila['estudiante_id']]
+        resumen.total_presentes = fila['presentes']
+        resumen.total_faltas = fila['total'] - fila['presentes']
+        if fila['total'] > 0:
+            resumen.porcentaje_asistencia = round(fila['presentes'] / fila['total'] * 100, 1)
+
+    return list(resumenes.values())
+
+
+def argumentos_upsert(campos_unicos):
+    """
+    unique_fields para bulk_create(update_conflicts=True) según el motor:
+    MySQL (ON DUPLICATE KEY UPDATE) no lo acepta; PostgreSQL y SQLite
+    (ON CONFLICT) lo exigen.
+    """
+    if connection.features.supports_update_conflicts_with_target:
+        return {'unique_fields': campos_unicos}
+    return {}
+
+
+def actualizar_resumenes(estudiante_ids=None, tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula y guarda (insert o update) los resúmenes de los estudiantes
+    indicados, o de todos si `estudiante_ids` es None. Devuelve cuántos se guardaron.
+    """
+    if estudiante_ids is None:
+        ids = list(Estudiante.objects.order_by('pk').values_list('pk', flat=True))
+    else:
+        ids = list(dict.fromkeys(estudiante_ids))
+
+    guardados = 0
+    for desde in range(0, len(ids), tamano_lote):
+        resumenes = _calcular_lote(ids[desde:desde + tamano_lote])
+        if resumenes:
+            # Upsert sobre la PK (estudiante_id)
+            ResumenAcademico.objects.bulk_create(
+                resumenes,
+                update_conflicts=True,
+                update_fields=CAMPOS_RESUMEN,
+                **argumentos_upsert(['estudiante']),
+            )
+            guardados += len(resumenes)
+    return guardados
+
+
+def obtener_resumen(estudiante):
+    """Resumen académico del estudiante; si aún no existe se calcula en el momento."""
+    try:
+        return ResumenAcademico.objects.get(pk=estudiante.pk)
+    except ResumenAcademico.DoesNotExist:
+        actualizar_resumenes([estudiante.pk])
+        return ResumenAcademico.objects.get(pk=estudiante.pk)
@@ -0,0 +1,86 @@
+# usuarios/signals.py
+#
+# 1. Invalidación del cache de métricas de los dashboards. Cada modelo solo
+#    borra las secciones que dependen de él (ver metricas.DEPENDENCIAS).
+# 2. Actualización del resumen académico (ver usuarios/resumen.py) de los
+#    estudiantes afectados por cada escritura.
+# 3. Invalidación de la capa semanal de disponibilidad de aulas (ver
+#    reservas/disponibilidad.py) cuando cambia un BloqueHorario.
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from asistencias.models import RegistroAsistenciaDetalle
+from cursos.models import BloqueHorario, Curso
+from matriculas.models import Matricula, MatriculaLaboratorio
+from reservas.disponibilidad import invalidar_capas_semanales
+from .metricas import DEPENDENCIAS, invalidar_por_modelo
+from .resumen import actualizar_resumenes
+
+
+def invalidar_metricas_dashboard(sender, **kwargs):
+    # Al confirmar la transacción: si se borrara antes, otra petición podría
+    # volver a llenar el cache con los datos previos a la escritura
+    transaction.on_commit(lambda: invalidar_por_modelo(sender))
+
+
+for modelo in DEPENDENCIAS:
+    post_save.connect(
+        invalidar_metricas_dashboard, sender=modelo,
+        dispatch_uid=f'metricas_dashboard_save_{modelo._meta.label_lower}',
+    )
+    post_delete.connect(
+        invalidar_metricas_dashboard, sender=modelo,
+        dispatch_uid=f'metricas_dashboard_delete_{modelo._meta.label_lower}',
+    )
+
+
+def actualizar_resumen_estudiante(sender, instance, **kwargs):
+    # Se ejecuta al confirmar la transacción: si el estudiante se está
+    # eliminando en cascada, para entonces ya no existe y se omite
+    estudiante_id = instance.estudiante_id
+    transaction.on_commit(lambda: actualizar_resumenes([estudiante_id]))
+
+
+def actualizar_resumenes_curso(sender, instance, created=False, **kwargs):
+    # Cambian créditos o porcentajes: afecta el promedio de todos sus alumnos
+    if created:
+        return
+    estudiante_ids = list(
+        Matricula.objects.filter(grupo_curso__curso=instance)
+                         .values_list('estudiante_id', flat=True)
+                         .distinct()
+    )
+    if estudiante_ids:
+        transaction.on_commit(lambda: actualizar_resumenes(estudiante_ids))
+
+
+for modelo in (Matricula, MatriculaLaboratorio, RegistroAsistenciaDetalle):
+    post_save.connect(
+        actualizar_resumen_estudiante, sender=modelo,
+        dispatch_uid=f'resumen_academico_save_{modelo._meta.label_lower}',
+    )
+    post_delete.connect(
+        actualizar_resumen_estudiante, sender=modelo,
+        dispatch_uid=f'resumen_academico_delete_{modelo._meta.label_lower}',
+    )
+
+post_save.connect(
+    actualizar_resumenes_curso, sender=Curso,
+    dispatch_uid='resumen_academico_save_cursos.curso',
+)
+
+
+def invalidar_disponibilidad_aulas(sender, **kwargs):
+    # Igual que las métricas: solo cuando la escritura se confirma
+    transaction.on_commit(invalidar_capas_semanales)
+
+
+post_save.connect(
+    invalidar_disponibilidad_aulas, sender=BloqueHorario,
+    dispatch_uid='disponibilidad_aulas_save_cursos.bloquehorario',
+)
+post_delete.connect(
+    invalidar_disponibilidad_aulas, sender=BloqueHorario,
+    dispatch_uid='disponibilidad_aulas_delete_cursos.bloquehorario',
+)
@@ -1,3 +1,304 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, time
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from asistencias.models import RegistroAsistencia, RegistroAsistenciaDetalle
+from cursos.models import BloqueHorario, Curso, GrupoCurso, GrupoLaboratorio, GrupoTeoria
+from matriculas.models import Matricula
+from reservas.models import Aula
+from .importacion import importar_perfiles, leer_filas_csv
+from .metricas import SnapshotKPI, calcular_snapshot, clave_seccion, obtener_seccion
+from .models import Perfil, Profesor, Estudiante
+
+class SnapshotKPITests(TestCase):
+    # Consultas máximas para armar el snapshot completo de KPIs
+    TECHO_CONSULTAS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        perfil_profesor = Perfil.objects.create(id='P001', nombre='Docente Uno', password='x', rol='PROFESOR')
+        profesor = Profesor.objects.create(perfil=perfil_profesor, es_teoria=True)
+        Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P002', nombre='Docente Dos', password='x', rol='PROFESOR')
+        )
+        Estudiante.objects.create(
+            perfil=Perfil.objects.create(id='E001', nombre='Alumno Uno', password='x', rol='ESTUDIANTE')
+        )
+
+        curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        aula = Aula.objects.create(id='101', tipo='AULA_NORMAL')
+        grupo = GrupoCurso.objects.create(id='C001-A', curso=curso, profesor=profesor, grupo='A', capacidad=40)
+        GrupoTeoria.objects.create(grupo_curso=grupo)
+        GrupoCurso.objects.create(id='C001-B', curso=curso, profesor=None, grupo='B', capacidad=40)
+        BloqueHorario.objects.create(
+            grupo_curso=grupo, aula=aula, dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40)
+        )
+
+    def test_snapshot_respeta_techo_de_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            snapshot = calcular_snapshot(date.today())
+        self.assertLessEqual(len(consultas), self.TECHO_CONSULTAS)
+        self.assertIsInstance(snapshot, SnapshotKPI)
+
+    def test_snapshot_valores(self):
+        snapshot = calcular_snapshot(date.today())
+        self.assertEqual(snapshot.conteo_profesores, 2)
+        self.assertEqual(snapshot.conteo_estudiantes, 1)
+        self.assertEqual(snapshot.profesores_grupos_asignados, 1)
+        self.assertEqual(snapshot.grupos_con_profesor, 1)
+        self.assertEqual(snapshot.grupos_sin_profesor, 1)
+        self.assertEqual(snapshot.grupos_teoria, 1)
+        self.assertEqual(snapshot.bloques_aula_normal, 1)
+        self.assertEqual(snapshot.bloques_laboratorio, 0)
+        self.assertEqual(snapshot.porcentaje_asistencia, 0)
+
+    def test_invalidacion_al_confirmar_la_transaccion(self):
+        cache = caches['dashboard']
+        obtener_seccion('rankings')
+        self.assertIsNotNone(cache.get(clave_seccion('rankings')))
+
+        # Cambiar el nombre de un perfil afecta el ranking de profesores,
+        # pero el cache solo se invalida cuando la transacción se confirma
+        with self.captureOnCommitCallbacks() as callbacks:
+            perfil = Perfil.objects.get(id='P001')
+            perfil.nombre = 'Docente Renombrado'
+            perfil.save()
+        self.assertIsNotNone(cache.get(clave_seccion('rankings')))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(clave_seccion('rankings')))
+        nombres = [p.perfil.nombre for p in obtener_seccion('rankings')['profesores_activos']]
+        self.assertIn('Docente Renombrado', nombres)
+
+
+class ImportacionPerfilesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Estudiante.objects.create(
+            perfil=Perfil.objects.create(id='E001', nombre='Alumno Uno', email='uno@x.com', password='x', rol='ESTUDIANTE')
+        )
+        Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P001', nombre='Docente Uno', email='doc@x.com', password='x', rol='PROFESOR')
+        )
+
+    def test_crea_actualiza_y_reporta_errores(self):
+        filas = leer_filas_csv(
+            "E001,Alumno Uno Editado,uno@x.com,y\n"
+            "E002,Alumno Dos,,z\n"
+            "E003,Alumno Tres,doc@x.com,z\n"
+            "P001,Docente Uno,,z\n"
+            "E004,Incompleto\n"
+        )
+        resultado = importar_perfiles(filas, 'ESTUDIANTE', tamano_lote=1)
+
+        self.assertEqual(resultado.filas, 5)
+        self.assertEqual(resultado.creados, 1)
+        self.assertEqual(resultado.actualizados, 1)
+        self.assertEqual([numero for numero, _ in resultado.errores], [3, 4, 5])
+        self.assertEqual(Perfil.objects.get(id='E001').nombre, 'Alumno Uno Editado')
+        self.assertTrue(Estudiante.objects.filter(perfil_id='E002').exists())
+        self.assertFalse(Perfil.objects.filter(id='E003').exists())
+        self.assertEqual(Perfil.objects.get(id='P001').rol, 'PROFESOR')
+
+    def test_fila_rechazada_no_reserva_el_email(self):
+        filas = leer_filas_csv(
+            "P001,Docente Uno,nuevo@x.com,z\n"
+            "E005,Alumno Cinco,nuevo@x.com,z\n"
+        )
+        resultado = importar_perfiles(filas, 'ESTUDIANTE')
+
+        self.assertEqual([numero for numero, _ in resultado.errores], [1])
+        self.assertEqual(resultado.creados, 1)
+        self.assertEqual(Perfil.objects.get(id='E005').email, 'nuevo@x.com')
+
+    def test_actualizacion_invalida_el_ranking(self):
+        cache = caches['dashboard']
+        obtener_seccion('rankings')
+        resultado = importar_perfiles(leer_filas_csv("P001,Docente Renombrado,doc@x.com,x\n"), 'PROFESOR')
+        self.assertEqual((resultado.creados, resultado.actualizados), (0, 1))
+        self.assertIsNone(cache.get(clave_seccion('rankings')))
+
+
+class RegistroAsistenciaConsultasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profesor = Profesor.objects.create(
+            perfil=Perfil.objects.create(id='P001', nombre='Docente Uno', password='x', rol='PROFESOR'),
+            es_teoria=True, es_lab=True,
+        )
+        cls.curso = Curso.objects.create(
+            id='C001', nombre='Curso Uno', creditos=4, silabo_url='silabos/c001.pdf',
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        Aula.objects.create(id='101', tipo='AULA_NORMAL')
+
+    def setUp(self):
+        self.client = Client()
+        sesion = self.client.session
+        sesion['is_authenticated'] = True
+        sesion['usuario_rol'] = 'PROFESOR'
+        sesion['usuario_id'] = 'P001'
+        sesion.save()
+
+    def crear_grupos(self, desde, cantidad):
+        for numero in range(desde, desde + cantidad):
+            grupo = GrupoCurso.objects.create(
+                id=f'C001-{numero}', curso=self.curso, profesor=self.profesor, grupo=chr(65 + numero), capacidad=40
+            )
+            if numero % 2:
+                GrupoLaboratorio.objects.create(grupo_curso=grupo)
+            else:
+                GrupoTeoria.objects.create(grupo_curso=grupo)
+            BloqueHorario.objects.create(
+                grupo_curso=grupo, aula_id='101', dia='LUNES', horaInicio=time(7, 0), horaFin=time(8, 40)
+            )
+            RegistroAsistencia.objects.create(
+                grupo_curso=grupo, fechaClase=date(2025, 3, 10), ipProfesor='127.0.0.1', horaInicioVentana=time(7, 0)
+            )
+
+    def consultas_listado(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('usuarios:registro_asistencia'))
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas), respuesta
+
+    def test_consultas_no_dependen_de_la_cantidad_de_grupos(self):
+        self.crear_grupos(0, 2)
+        con_dos, _ = self.consultas_listado()
+        self.crear_grupos(2, 6)
+        con_ocho, respuesta = self.consultas_listado()
+
+        self.assertEqual(con_dos, con_ocho)
+        grupos = respuesta.context['grupos_asignados']
+        self.assertEqual(len(grupos), 8)
+        self.assertEqual({g.tipo for g in grupos}, {'TEORÍA', 'LAB'})
+        self.assertTrue(all(g.silabo_subido and g.ultima_sesion == date(2025, 3, 10) for g in grupos))
+
+    def test_borrador_por_lotes_y_confirmacion(self):
+        self.crear_grupos(0, 1)
+        grupo = GrupoCurso.objects.get(id='C001-0')
+        for cui in ['E001', 'E002', 'E003']:
+            estudiante = Estudiante.objects.create(
+                perfil=Perfil.objects.create(id=cui, nombre=f'Alumno {cui}', password='x', rol='ESTUDIANTE')
+            )
+            Matricula.objects.create(estudiante=estudiante, grupo_curso=grupo, estado=True)
+
+        url = reverse('usuarios:registro_asistencia')
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        datos = {'grupo_id': grupo.id, 'fecha': date.today().isoformat()}
+        cambios = [{'cui': 'E001', 'estado': 'F'}, {'cui': 'E002', 'estado': 'F'}, {'cui': 'E002', 'estado': 'A'}]
+
+        # El lote solo toca la sesión: no se escribe asistencia hasta confirmar
+        respuesta = self.client.post(url, {'accion': 'ajax_save', 'cambios': json.dumps(cambios), **datos}, **ajax)
+        self.assertEqual(respuesta.json()['pendientes'], 2)
+        self.assertFalse(RegistroAsistencia.objects.filter(grupo_curso=grupo, fechaClase=date.today()).exists())
+
+        respuesta = self.client.post(url, {'accion': 'ajax_confirmar', **datos}, **ajax)
+        self.assertTrue(respuesta.json()['ok'])
+        estados = dict(
+            RegistroAsistenciaDetalle.objects.filter(registro_asistencia__grupo_curso=grupo, registro_asistencia__fechaClase=date.today())
+            .values_list('estudiante_id', 'estado')
+        )
+        self.assertEqual(estados, {'E001': 'FALTA', 'E002': 'PRESENTE', 'E003': 'PRESENTE'})
+        self.assertEqual(self.client.session.get('borradores_asistencia'), {})
+
+    def test_exportar_todos_los_grupos_exige_silabo(self):
+        self.crear_grupos(0, 2)
+        registro = RegistroAsistencia.objects.get(grupo_curso_id='C001-0')
+        for cui, estado in [('E002', 'FALTA'), ('E001', 'PRESENTE')]:
+            estudiante = Estudiante.objects.create(
+                perfil=Perfil.objects.create(id=cui, nombre=f'Alumno {cui}', password='x', rol='ESTUDIANTE')
+            )
+            RegistroAsistenciaDetalle.objects.create(registro_asistencia=registro, estudiante=estudiante, estado=estado)
+
+        url = reverse('usuarios:exportar_asistencia')
+        respuesta = self.client.get(url)
+        filas = b''.join(respuesta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(filas[1:], [
+            'Curso Uno,A,E001,Alumno E001,10/03/2025,A',
+            'Curso Uno,A,E002,Alumno E002,10/03/2025,F',
+        ])
+
+        # Un curso sin sílabo bloquea la exportación de todos los grupos
+        otro = Curso.objects.create(
+            id='C002', nombre='Curso Dos', creditos=4,
+            porcentajeEC1=15, porcentajeEP1=15, porcentajeEC2=15,
+            porcentajeEP2=15, porcentajeEC3=20, porcentajeEP3=20,
+        )
+        GrupoCurso.objects.create(id='C002-A', curso=otro, profesor=self.profesor, grupo='A', capacidad=40)
+        respuesta = self.client.get(url)
+        self.assertRedirects(respuesta, reverse('usuarios:registro_asistencia'), fetch_redirect_response=False)
+
+
+class CargarPeriodoTests(TransactionTestCase):
+    ARCHIVOS = {
+        'ingresarAulas.csv': 'id,tipo\n101,AULA_NORMAL\n',
+        'ingresarCursosB.csv': 'id,nombre,creditos,EC1,EP1,EC2,EP2,EC3,EP3\nC001,Curso Uno,4,15,15,15,15,20,20\n',
+        'ingresarAlumnos.csv': 'id,nombre,password,email\nE001,Alumno Uno,E001,e001@unsa.edu.pe\n',
+        'ingresarProfesores.csv': 'id,password,nombre,email,es_teoria,es_lab\nP001,P001,Docente Uno,p001@unsa.edu.pe,1,0\n',
+        'ingresarGruposCursos.csv': (
+            'grupo_id,curso_id,profesor_codigo,grupo,capacidad,tipo,dia,hora_inicio,hora_fin,id_Aula\n'
+            'C001A,C001,P001,A,40,TEORIA,LUNES,07:00:00,08:40:00,101\n'
+        ),
+        'ingresarMatriculas.csv': 'estudiante_id,grupo_curso_id,EC1,EP1,EC2,EP2,EC3,EP3\nE001,C001A,12,,,,,\n',
+    }
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        self.escribir(self.ARCHIVOS)
+
+    def escribir(self, archivos):
+        for nombre, contenido in archivos.items():
+            with open(os.path.join(self.directorio, nombre), 'w', encoding='utf-8') as f:
+                f.write(contenido)
+
+    def cargar(self, **opciones):
+        # Un solo hilo: la base de pruebas en memoria no admite escrituras concurrentes
+        call_command('cargar_periodo', directorio=self.directorio, hilos=1, stdout=StringIO(), **opciones)
+
+    def test_dry_run_no_escribe(self):
+        self.cargar(dry_run=True)
+        self.assertFalse(Aula.objects.exists())
+        self.assertFalse(Perfil.objects.exists())
+
+    def test_carga_y_recarga_actualizan(self):
+        self.cargar()
+        self.assertEqual(Matricula.objects.get(estudiante_id='E001', grupo_curso_id='C001A').EC1, 12)
+
+        # Segunda carga sobre datos existentes: los upserts actualizan en lugar de fallar
+        self.escribir({
+            'ingresarAulas.csv': 'id,tipo\n101,LABORATORIO\n',
+            'ingresarMatriculas.csv': 'estudiante_id,grupo_curso_id,EC1,EP1,EC2,EP2,EC3,EP3\nE001,C001A,15,,,,,\n',
+        })
+        self.cargar()
+        self.assertEqual(Aula.objects.get(id='101').tipo, 'LABORATORIO')
+        self.assertEqual(Matricula.objects.get(estudiante_id='E001', grupo_curso_id='C001A').EC1, 15)
+        self.assertEqual(Matricula.objects.count(), 1)
+
+    def test_error_indica_tablas_guardadas(self):
+        # Bloque con hora de fin anterior al inicio: importar_grupos lo rechaza
+        self.escribir({'ingresarGruposCursos.csv': (
+            'grupo_id,curso_id,profesor_codigo,grupo,capacidad,tipo,dia,hora_inicio,hora_fin,id_Aula\n'
+            'C001A,C001,P001,A,40,TEORIA,LUNES,09:00:00,08:00:00,101\n'
+        )})
+        with self.assertRaisesMessage(CommandError, 'Tablas ya guardadas (no se revierten): aulas, cursos, estudiantes, profesores.'):
+            self.cargar()
+        self.assertTrue(Aula.objects.filter(id='101').exists())
+        self.assertFalse(GrupoCurso.objects.exists())
@@ -24,7 +24,9 @@ urlpatterns = [
     path('dashboard/profesor/horarios/', views.horarios_profesor, name='horarios_profesor'),
     path('dashboard/profesor/acreditacion/', views.acreditacion, name='acreditacion'),
     path('dashboard/profesor/asistencia/', views.registro_asistencia, name='registro_asistencia'),
+    path('dashboard/profesor/asistencia/exportar/', views.exportar_asistencia, name='exportar_asistencia'),
     path('dashboard/profesor/reservar-aula/', views.horarios_reserva, name='reservar_aula'),
+    path('dashboard/profesor/reservar-aula/buscar/', views.buscar_aulas_libres, name='buscar_aulas_libres'),
     path('dashboard/profesor/cancelar-reserva/', views.cancelar_reserva, name='cancelar_reserva'),
     path('dashboard/profesor/subida-notas/', views.subida_notas, name='subida_notas'),
 
@@ -48,4 +50,8 @@ urlpatterns = [
     path('dashboard/admin/registro-profesores/', views.registro_profesores_admin, name='registro_profesores_admin'),
     path('dashboard/admin/detalle-profesor/', views.detalle_profesor_admin, name='detalle_profesor_admin'),
     path('dashboard/admin/registro-secretarias/', views.registro_secretarias, name='registro_secretarias'),
-]
\ No newline at end of file
+
+    # Exportaciones en segundo plano (estado y descarga)
+    path('exportaciones/<int:trabajo_id>/estado/', views.estado_exportacion, name='estado_exportacion'),
+    path('exportaciones/<int:trabajo_id>/descargar/', views.descargar_exportacion, name='descargar_exportacion'),
+]
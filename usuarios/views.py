@@ -2,7 +2,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.urls import reverse
-from django.db.models import Count, Prefetch, Q, F, Case, When, Sum, ExpressionWrapper, DecimalField, FloatField, Value, Avg, Max, Min
+from django.db.models import Count, Prefetch, Q, F, Case, When, FloatField, BooleanField, Value, Avg, Max, Min, Exists, OuterRef, Subquery
 from django.db import transaction
 from django.db.models.functions import Coalesce
 from django.db.utils import IntegrityError
@@ -11,18 +11,29 @@ from .models import Perfil, Estudiante, Profesor, Secretaria, Administrador
 from .forms import CursoForm, GrupoCursoForm, BloqueHorarioForm
 from cursos.models import Curso, BloqueHorario, GrupoTeoria, GrupoLaboratorio, GrupoCurso, TemaCurso
 from matriculas.models import Matricula, MatriculaLaboratorio
+from matriculas.notas import CAMPOS_NOTA, guardar_notas_grupo, leer_celdas_nota
+from matriculas.inscripcion import cursos_en_cruce, indice_horario_estudiante, matricular_laboratorio
+from matriculas.calificaciones import EVALUACIONES, NOTA_APROBATORIA, notas_de_matriculas, redondear
 from reservas.models import Aula, Reserva
 from asistencias.models import RegistroAsistencia, RegistroAsistenciaDetalle
+from asistencias.registro import guardar_asistencia_masiva
+from asistencias.borrador import agregar_cambios, confirmar_borrador, descartar_borrador, obtener_borrador
+from asistencias.reportes import filas_asistencia_grupo, filas_asistencia_profesor, respuesta_csv, respuesta_xlsx
+from .metricas import invalidar_secciones, obtener_metricas_dashboard
+from .resumen import actualizar_resumenes, obtener_resumen
+from .importacion import importar_perfiles, leer_filas_csv, mensajes_importacion
+from exportaciones.cola import encolar_exportacion, ruta_absoluta
+from exportaciones.models import TrabajoExportacion
+from cursos.restricciones import crear_bloques, validar_bloques
+from reservas.registro import registrar_reserva, registrar_reservas_recurrentes
+from reservas.disponibilidad import JORNADA_FIN, JORNADA_INICIO, MAX_DIAS_BUSQUEDA, buscar_ventanas_libres, cargar_indice, dia_de, mascara
+from cursos.horarios import DIAS_SEMANA, construir_grilla, filas_de_horario, puntos_de_corte, formatear_minutos, grilla_actividades
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest
-from django.template.loader import render_to_string
-from datetime import datetime, time, timedelta, date
-from xhtml2pdf import pisa
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, FileResponse, Http404
+from datetime import datetime, timedelta, date
 
 import datetime as dt
-import math
 import io
-import openpyxl
 import csv
 import json
 
@@ -122,87 +133,28 @@ def dashboard_estudiante(request):
         return response
 
     # ----------------------------------------------------------------------
-    # 1. Conteo de Cursos y Estado de Laboratorio
+    # 1. Resumen académico (cursos, laboratorio y promedio ponderado)
     # ----------------------------------------------------------------------
-    
+    # Una sola lectura por PK de la tabla desnormalizada (ver usuarios/resumen.py)
+    resumen = obtener_resumen(estudiante_obj)
+
     # Cursos del Ciclo (Matrículas de Teoría activas)
-    cursos_count = Matricula.objects.filter(
-        estudiante=estudiante_obj, 
-        estado=True
-    ).count()
+    cursos_count = resumen.cursos_count
     
     # Estado de Matrícula Lab.
-    tiene_laboratorio = MatriculaLaboratorio.objects.filter(
-        estudiante=estudiante_obj
-    ).exists()
-
-    # ----------------------------------------------------------------------
-    # 2. Cálculo del Promedio Ponderado Global
-    # ----------------------------------------------------------------------
-    
-    # Filtramos matrículas activas y traemos los datos necesarios (notas y créditos)
-    matriculas_con_notas = Matricula.objects.filter(
-        estudiante=estudiante_obj, 
-        estado=True,
-        # Filtramos solo las que tienen notas para evitar errores de cálculo en Null
-        EC1__isnull=False, EP1__isnull=False, 
-        EC2__isnull=False, EP2__isnull=False, 
-        EC3__isnull=False, EP3__isnull=False,
-    ).select_related('grupo_curso__curso')
-
+    tiene_laboratorio = resumen.tiene_laboratorio
 
-    if matriculas_con_notas:
-        # A. Calcular la nota final (NF) por cada curso (usando los porcentajes del modelo Curso)
-        
-        # Primero, calculamos la nota final para cada matrícula (NF = Suma de (Nota * Porcentaje))
-        nota_final_expression = ExpressionWrapper(
-            # Aseguramos que la operación se haga con Decimales para precisión
-            (
-                (F('EC1') * F('grupo_curso__curso__porcentajeEC1')) +
-                (F('EP1') * F('grupo_curso__curso__porcentajeEP1')) +
-                (F('EC2') * F('grupo_curso__curso__porcentajeEC2')) +
-                (F('EP2') * F('grupo_curso__curso__porcentajeEP2')) +
-                (F('EC3') * F('grupo_curso__curso__porcentajeEC3')) +
-                (F('EP3') * F('grupo_curso__curso__porcentajeEP3'))
-            ) / 100.0,
-            output_field=DecimalField(decimal_places=2)
-        )
-        
-        # Anotamos la Nota Final y el Crédito en el QuerySet
-        qs_con_nf = matriculas_con_notas.annotate(
-            nota_final=nota_final_expression,
-            creditos=F('grupo_curso__curso__creditos')
-        )
-        
-        # B. Calcular el Promedio Ponderado Global (PPG)
-        
-        # Suma de (NF * Créditos)
-        suma_nota_por_creditos = qs_con_nf.aggregate(
-            sum_nc=Sum(F('nota_final') * F('creditos'), output_field=DecimalField())
-        )['sum_nc']
-        
-        # Suma Total de Créditos
-        total_creditos = qs_con_nf.aggregate(
-            sum_c=Sum('creditos', output_field=DecimalField())
-        )['sum_c']
-        
-        promedio_ponderado = None
-        if total_creditos and total_creditos > 0:
-            promedio_ponderado = suma_nota_por_creditos / total_creditos
-            # Redondeamos a dos decimales
-            promedio_ponderado = round(promedio_ponderado, 2)
-        
-    else:
-        promedio_ponderado = 'N/A' # O 0.0 si prefieres
+    # Promedio ponderado por créditos; solo cuentan los cursos con las 6 notas registradas
+    promedio_ponderado = resumen.promedio_ponderado if resumen.promedio_ponderado is not None else 'N/A'
 
     # ----------------------------------------------------------------------
-    # 3. Datos Académicos (Faltantes en BD, se simulan o se asumen)
+    # 2. Datos Académicos (Faltantes en BD, se simulan o se asumen)
     # ----------------------------------------------------------------------
     # Asumimos que la Carrera y Ciclo están en un modelo de Estudiante o son datos fijos.
     # Como no tenemos un modelo de Carrera, usamos valores de ejemplo.
     
     # ----------------------------------------------------------------------
-    # 4. Contexto Final
+    # 3. Contexto Final
     # ----------------------------------------------------------------------
 
     contexto = {
@@ -211,6 +163,7 @@ def dashboard_estudiante(request):
         'promedio_ponderado': promedio_ponderado,
         'cursos_count': cursos_count,
         'tiene_laboratorio': tiene_laboratorio,
+        'resumen': resumen,
         # Datos estáticos o supuestos:
         'carrera': 'Ciencia de la Computación',
         #'ciclo_actual': 'VI (Ejemplo)', 
@@ -278,52 +231,6 @@ def mi_cuenta(request):
     # Asegúrate que 'usuarios/alumno/mi_cuenta.html' sea la ruta correcta del template.
     return render(request, 'usuarios/alumno/mi_cuenta.html', contexto)
 
-def check_schedule_clash(estudiante_id, nuevo_bloque_horario):
-    """
-    Verifica si un nuevo BloqueHorario (teórico o laboratorio) causa cruce 
-    con el horario existente del estudiante.
-    Retorna True si hay cruce, False si no lo hay.
-    """
-    
-    # 1. Obtener todos los bloques de horario actuales del estudiante
-    
-    # Bloques de Teoría (Matricula)
-    teorias_matriculadas = Matricula.objects.filter(estudiante_id=estudiante_id, estado=True)
-    grupos_teoria_ids = [m.grupo_curso_id for m in teorias_matriculadas]
-    
-    # Bloques de Laboratorio (MatriculaLaboratorio)
-    labs_matriculados = MatriculaLaboratorio.objects.filter(estudiante_id=estudiante_id)
-    grupos_lab_ids = [m.laboratorio_id for m in labs_matriculados]
-
-    # IDs de todos los Grupos (Teoría + Laboratorio)
-    todos_grupos_ids = grupos_teoria_ids + grupos_lab_ids
-    
-    # Consultar todos los bloques de horario activos
-    horarios_actuales = BloqueHorario.objects.filter(grupo_curso_id__in=todos_grupos_ids)
-
-    # 2. Iterar y verificar el cruce
-    for bloque_actual in horarios_actuales:
-        # 2a. Debe ser el mismo día
-        if bloque_actual.dia != nuevo_bloque_horario.dia:
-            continue
-
-        # 2b. Debe haber solapamiento de tiempo
-        # Dos intervalos [A, B] y [C, D] se solapan si A < D y C < B.
-        # En nuestro caso, A y C son horaInicio, B y D son horaFin.
-        
-        # El nuevo bloque termina DESPUÉS de que el actual comienza
-        condicion_inicio = nuevo_bloque_horario.horaInicio < bloque_actual.horaFin
-        
-        # El nuevo bloque comienza ANTES de que el actual termina
-        condicion_fin = bloque_actual.horaInicio < nuevo_bloque_horario.horaFin
-        
-        if condicion_inicio and condicion_fin:
-            # Cruce encontrado
-            return True, bloque_actual 
-
-    # No se encontró cruce
-    return False, None
-
 def matricula_laboratorio(request):
     estudiante_obj, response = check_student_auth(request)
     if response: return response
@@ -336,43 +243,15 @@ def matricula_laboratorio(request):
         
         if lab_id_a_matricular:
             try:
-                # 1. Obtener el grupo de laboratorio
-                grupo_lab = GrupoLaboratorio.objects.get(pk=lab_id_a_matricular)
-                
-                # 2. Verificar existencia de bloques (aunque debería existir)
-                bloques_lab = BloqueHorario.objects.filter(grupo_curso_id=grupo_lab.pk)
-                
-                if not bloques_lab.exists():
-                    messages.error(request, "Error: El grupo de laboratorio seleccionado no tiene horario definido.")
-                    return redirect('usuarios:matricula_lab_alumno')
-
-                # 3. CRUCE DE HORARIO: Verificar el primer bloque del laboratorio contra el horario del estudiante
-                for nuevo_bloque in bloques_lab:
-                    hay_cruce, bloque_conflicto = check_schedule_clash(estudiante_obj.pk, nuevo_bloque)
-                    
-                    if hay_cruce:
-                        # Si hay cruce, alertar y no matricular.
-                        conflicto_curso = bloque_conflicto.grupo_curso.curso.nombre
-                        conflicto_dia = bloque_conflicto.dia
-                        conflicto_hora = bloque_conflicto.horaInicio.strftime('%H:%M')
-                        
-                        messages.error(request, 
-                            f"El laboratorio {grupo_lab.grupo_curso.curso.id} ({grupo_lab.grupo_curso.grupo}) choca con tu clase de {conflicto_curso} el {conflicto_dia} a las {conflicto_hora}. Selecciona otro grupo."
-                        )
-                        # Salimos y volvemos a mostrar la página con la alerta
-                        break 
-                
-                if not hay_cruce:
-                    # 4. Si NO HAY CRUCE, proceder a la matrícula
-                    MatriculaLaboratorio.objects.create(
-                        estudiante=estudiante_obj,
-                        laboratorio=grupo_lab
-                    )
-                    messages.success(request, f"¡Matrícula exitosa! Asignado al laboratorio de {grupo_lab.grupo_curso.curso.nombre} (Grupo {grupo_lab.grupo_curso.grupo}).")
-                    
-                
-            except GrupoLaboratorio.DoesNotExist:
-                messages.error(request, "Error: Grupo de laboratorio no encontrado.")
+                # Bloquea el grupo, valida cupos y cruces y matricula en una sola transacción
+                resultado = matricular_laboratorio(estudiante_obj, lab_id_a_matricular)
+                grupo_curso = resultado.grupo_curso
+                messages.success(request,
+                    f"¡Matrícula exitosa! Asignado al laboratorio de {grupo_curso.curso.nombre} (Grupo {grupo_curso.grupo}). "
+                    f"Cupos restantes: {resultado.cupos_restantes} de {resultado.capacidad}."
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
             except Exception as e:
                 # Puede ser un error de unicidad (si ya estaba matriculado y no se manejó antes)
                 messages.error(request, f"Ocurrió un error al intentar matricular: {e}")
@@ -409,6 +288,9 @@ def matricula_laboratorio(request):
     ).select_related(
         'grupo_curso__curso',
         'grupo_curso__profesor__perfil'
+    ).annotate(
+        # Inscritos por laboratorio (un solo GROUP BY)
+        inscritos=Count('matriculalaboratorio')
     ).prefetch_related(
         bloque_prefetch
     ).order_by(
@@ -416,16 +298,24 @@ def matricula_laboratorio(request):
         'grupo_curso__grupo'
     )
     
+    # Horario actual del estudiante indexado por día (para marcar cruces en memoria)
+    indice_estudiante = indice_horario_estudiante(estudiante_obj.pk)
+    
     # 4. Estructurar los datos para el template
     labs_disponibles = []
     
     for lab in opciones_laboratorio:
+        bloques = lab.grupo_curso.bloquehorario_set.all()
+        
         # Formatear el horario (puede haber múltiples bloques)
         horarios_formateados = []
-        for bloque in lab.grupo_curso.bloquehorario_set.all():
+        for bloque in bloques:
             horarios_formateados.append(
                 f"{bloque.get_dia_display()} {bloque.horaInicio.strftime('%H:%M')} - {bloque.horaFin.strftime('%H:%M')}"
             )
+        
+        choca_con = cursos_en_cruce(indice_estudiante, bloques)
+        cupos_restantes = max(lab.grupo_curso.capacidad - lab.inscritos, 0)
             
         labs_disponibles.append({
             'id': lab.pk,
@@ -434,9 +324,17 @@ def matricula_laboratorio(request):
             'grupo': lab.grupo_curso.grupo,
             'docente': lab.grupo_curso.profesor.perfil.nombre if lab.grupo_curso.profesor else 'Pendiente',
             'horarios': horarios_formateados,
-            'aula': lab.grupo_curso.bloquehorario_set.first().aula.id if lab.grupo_curso.bloquehorario_set.first() else 'N/A',
+            'aula': bloques[0].aula.id if bloques else 'N/A',
+            'choca_con': choca_con,
+            'cupos_restantes': cupos_restantes,
+            'capacidad': lab.grupo_curso.capacidad,
+            'sin_horario': not bloques,
+            'disponible': bool(bloques) and not choca_con and cupos_restantes > 0,
         })
 
+    # Primero los grupos a los que sí se puede matricular (orden estable por curso/grupo)
+    labs_disponibles.sort(key=lambda lab: not lab['disponible'])
+
     # 5. Contexto final
     contexto = {
         'perfil': estudiante_obj.perfil,
@@ -601,72 +499,29 @@ def mis_horarios(request):
         }
         return render(request, 'usuarios/alumno/mis_horarios.html', contexto)
 
-    # 3. Generación de Puntos de Corte
-    puntos_corte = set()
-    for bloque in horario_clases:
-        puntos_corte.add(bloque.horaInicio.replace(second=0, microsecond=0))
-        puntos_corte.add(bloque.horaFin.replace(second=0, microsecond=0))
-
-    dummy_date = datetime.today().date()
-    puntos_corte_dt = sorted(list(set([datetime.combine(dummy_date, t) for t in puntos_corte])))
+    # 3. Construcción de la grilla (puntos de corte + barrido por día)
+    grilla = construir_grilla(
+        (bloque.dia, bloque.horaInicio, bloque.horaFin, bloque) for bloque in horario_clases
+    )
 
     horas_data = [] 
-    hora_actual = None 
     color_index = 0
     
     # 🚨 BANDERA DE DEPURACIÓN
     horario_con_conflicto = False 
 
     # 4. Construcción y Consolidación de Filas
-    for dt_siguiente in puntos_corte_dt:
-        if hora_actual is None:
-            hora_actual = dt_siguiente
-            continue
-        
-        dt_inicio_fila = hora_actual
-        dt_fin_fila = dt_siguiente
-
-        duracion_minutos = (dt_fin_fila - dt_inicio_fila).total_seconds() / 60
-        if duracion_minutos < 11:
-            hora_actual = dt_siguiente
-            continue
-        
-        if dt_inicio_fila >= dt_fin_fila:
-            hora_actual = dt_siguiente
-            continue
-            
-        hora_inicio_str = dt_inicio_fila.strftime("%H:%M")
-        hora_fin_str = dt_fin_fila.strftime("%H:%M")
-        rango_hora_str = f"{hora_inicio_str} - {hora_fin_str}"
+    for fila in grilla:
+        rango_hora_str = fila['rango']
+        hora_fin_str = formatear_minutos(fila['fin'])
         
         fila_data = [None] * len(DIAS)
         hay_clase_en_fila = False
         
-        # Iterar por día para buscar clases
+        # Cada celda ya trae los bloques ACTIVOS en el inicio de la fila
         for dia_index, dia_key in enumerate(DIAS_MAP.keys()):
             
-            clashes_in_slot = [] # Lista para detectar choques
-            
-            # Buscar la clase que está ACTIVA en este intervalo [dt_inicio_fila, dt_fin_fila]
-            for bloque in horario_clases:
-                
-                b_inicio = bloque.horaInicio.replace(second=0, microsecond=0)
-                b_fin = bloque.horaFin.replace(second=0, microsecond=0)
-                
-                dt_b_inicio = datetime.combine(dummy_date, b_inicio)
-                dt_b_fin = datetime.combine(dummy_date, b_fin)
-                
-                # 🚨 CRITERIO CLAVE CORREGIDO: Solapamiento de tiempo para mostrar bloques largos.
-                # La clase está activa si: 
-                # 1. Es el día correcto.
-                # 2. El inicio de la clase es ANTES O EN el inicio del segmento de la fila.
-                # 3. El fin de la clase es DESPUÉS del inicio del segmento de la fila.
-                if (bloque.dia == dia_key and 
-                    dt_b_inicio <= dt_inicio_fila and 
-                    dt_b_fin > dt_inicio_fila): 
-                    
-                    clashes_in_slot.append(bloque)
-            
+            clashes_in_slot = fila['celdas'][dia_index]
             
             # 🚨 LÓGICA DE DETECCIÓN DE CONFLICTO
             if len(clashes_in_slot) > 1:
@@ -709,9 +564,6 @@ def mis_horarios(request):
                     'color': color,
                 }
                 hay_clase_en_fila = True
-            else:
-                # Si la celda está vacía
-                pass 
             
         # 5. Consolidación de Filas Vacías (Tiempo Libre)
         if not hay_clase_en_fila and horas_data and horas_data[-1]['tipo'] == 'LIBRE':
@@ -723,8 +575,6 @@ def mis_horarios(request):
                 'data': fila_data,
                 'tipo': 'CLASE' if hay_clase_en_fila else 'LIBRE',
             })
-            
-        hora_actual = dt_siguiente 
 
     # 🚨 MENSAJE FINAL DE DEPURACIÓN
     print("\n--- RESUMEN DE HORARIO ---")
@@ -752,20 +602,23 @@ def mis_notas(request):
     estudiante_obj, response = check_student_auth(request)
     if response: return response
 
-    TARGET_PASSING_SCORE = 10.5
+    TARGET_PASSING_SCORE = NOTA_APROBATORIA
 
     # 1. Obtener todas las matrículas del estudiante con información relacionada
-    matriculas = Matricula.objects.filter(
+    matriculas = list(Matricula.objects.filter(
         estudiante=estudiante_obj
     ).select_related(
         'grupo_curso__curso', 
         'grupo_curso__profesor__perfil'
-    )
+    ))
+
+    # Todas las métricas de notas de todas las matrículas en un solo cálculo
+    resultado = notas_de_matriculas(matriculas)
     
     # Lista de cursos matriculados para el selector (Dropdown)
     cursos_matriculados = []
     
-    # Lista para el GRÁFICO GENERAL (Se llena al final del loop)
+    # Lista para el GRÁFICO GENERAL
     promedios_generales = [] 
 
     # Inicializar datos para el detalle de notas
@@ -773,50 +626,24 @@ def mis_notas(request):
     curso_id_seleccionado = request.GET.get('curso')
     
     # --- PROCESAMIENTO GENERAL PARA GENERAR PROMEDIOS ---
-    for m in matriculas:
-        
+    for fila, m in enumerate(matriculas):
+        curso_obj = m.grupo_curso.curso
+
         # Datos básicos para el selector
         cursos_matriculados.append({
-            'curso_id': m.grupo_curso.curso.id,
-            'nombre_curso': m.grupo_curso.curso.nombre,
+            'curso_id': curso_obj.id,
+            'nombre_curso': curso_obj.nombre,
         })
 
-        # Pre-cálculo para el gráfico general
-        grupo_curso = m.grupo_curso
-        curso_obj = grupo_curso.curso
-        
-        evaluaciones = [
-            {'nombre': 'Examen Parcial 1 (EP1)', 'nota_field': 'EP1', 'porcentaje_field': 'porcentajeEP1'},
-            {'nombre': 'Nota Continua 1 (EC1)', 'nota_field': 'EC1', 'porcentaje_field': 'porcentajeEC1'},
-            {'nombre': 'Examen Parcial 2 (EP2)', 'nota_field': 'EP2', 'porcentaje_field': 'porcentajeEP2'},
-            {'nombre': 'Nota Continua 2 (EC2)', 'nota_field': 'EC2', 'porcentaje_field': 'porcentajeEC2'},
-            {'nombre': 'Examen Parcial 3 (EP3)', 'nota_field': 'EP3', 'porcentaje_field': 'porcentajeEP3'},
-            {'nombre': 'Nota Continua 3 (EC3)', 'nota_field': 'EC3', 'porcentaje_field': 'porcentajeEC3'},
-        ]
-        
-        promedio_final_temp = 0.0
-        total_porcentaje_temp = 0 # Ponderación Cubierta
-        
-        for eval_data in evaluaciones:
-            nota = getattr(m, eval_data['nota_field'])
-            porcentaje = getattr(curso_obj, eval_data['porcentaje_field'])
-
-            if porcentaje is not None and porcentaje > 0:
-                if nota is not None:
-                    promedio_final_temp += (nota * porcentaje) / 100
-                
-                # total_weight_missing_temp se calcula implícitamente fuera del loop como 100 - total_porcentaje_temp
-                total_porcentaje_temp += porcentaje 
-        
         # El promedio_final_estimado incluye solo las notas puestas (sin las faltantes)
         promedios_generales.append({
             'id': curso_obj.id,
             'nombre': curso_obj.nombre,
-            'promedio_final': round(promedio_final_temp, 1) if promedio_final_temp is not None else 0.0,
+            'promedio_final': redondear(resultado.nota_final[fila]),
             
             # DATOS GRÁFICO DONA GENERAL
-            'porcentaje_cubierto': total_porcentaje_temp,
-            'porcentaje_faltante': 100 - total_porcentaje_temp
+            'porcentaje_cubierto': int(resultado.peso_total[fila]),
+            'porcentaje_faltante': 100 - int(resultado.peso_total[fila])
         })
     # --- FIN DE PROCESAMIENTO GENERAL ---
     
@@ -825,36 +652,18 @@ def mis_notas(request):
     if curso_id_seleccionado:
         try:
             # Buscar la matrícula específica para el curso seleccionado
-            matricula_seleccionada = matriculas.get(
-                grupo_curso__curso__id=curso_id_seleccionado
+            fila = next(
+                (i for i, m in enumerate(matriculas) if str(m.grupo_curso.curso.id) == curso_id_seleccionado),
+                None
             )
+            if fila is None:
+                raise Matricula.DoesNotExist
+            matricula_seleccionada = matriculas[fila]
             grupo_curso = matricula_seleccionada.grupo_curso
             curso_obj = grupo_curso.curso
             profesor_obj = grupo_curso.profesor
             
-            # 2. Definir las evaluaciones
-            evaluaciones = [
-                {'nombre': 'Examen Parcial 1 (EP1)', 'nota_field': 'EP1', 'porcentaje_field': 'porcentajeEP1'},
-                {'nombre': 'Nota Continua 1 (EC1)', 'nota_field': 'EC1', 'porcentaje_field': 'porcentajeEC1'},
-                {'nombre': 'Examen Parcial 2 (EP2)', 'nota_field': 'EP2', 'porcentaje_field': 'porcentajeEP2'},
-                {'nombre': 'Nota Continua 2 (EC2)', 'nota_field': 'EC2', 'porcentaje_field': 'porcentajeEC2'},
-                {'nombre': 'Examen Parcial 3 (EP3)', 'nota_field': 'EP3', 'porcentaje_field': 'porcentajeEP3'},
-                {'nombre': 'Nota Continua 3 (EC3)', 'nota_field': 'EC3', 'porcentaje_field': 'porcentajeEC3'},
-            ]
-            
             notas_detalle = []
-            promedio_final = 0.0
-            total_porcentaje = 0 # Ponderación Cubierta
-            
-            # === VARIABLES DE CÁLCULO DE META ===
-            MAX_GRADE = 20.0
-            TARGET_WEIGHTED_SUM = TARGET_PASSING_SCORE * 100 # 1050
-            
-            current_weighted_score = 0.0 # Suma de (Nota * Porcentaje) de notas registradas
-            total_weight_missing = 0.0 # Suma de Porcentaje de notas faltantes
-            missing_evaluations_count = 0
-            
-            missing_notes_list = [] 
             
             # --- Variables para el GRÁFICO DE BARRAS INDIVIDUAL ---
             chart_bar_labels = [] 
@@ -862,158 +671,33 @@ def mis_notas(request):
             chart_bar_weights = []
             # =======================================================
             
-            # --- ADICIÓN DE VARIABLES PARA GRÁFICO DE DISTRIBUCIÓN ---
-            ponderacion_aprobada = 0.0
-            ponderacion_reprobada = 0.0
-            # ---------------------------------------------------------
-
-            
-            # 3. Procesar y calcular el promedio ponderado y métricas de notas faltantes
-            for eval_data in evaluaciones:
-                nota = getattr(matricula_seleccionada, eval_data['nota_field'])
-                porcentaje = getattr(curso_obj, eval_data['porcentaje_field'])
+            # 2. Detalle por evaluación (los cálculos vienen del motor de notas)
+            for nota_field, porcentaje_field, nombre in EVALUACIONES:
+                nota = getattr(matricula_seleccionada, nota_field)
+                porcentaje = getattr(curso_obj, porcentaje_field)
 
                 if porcentaje is not None and porcentaje > 0:
-                    
-                    # Datos para el detalle en tabla y para el gráfico
-                    nota_display = nota if nota is not None else 'N/A'
                     notas_detalle.append({
-                        'nombre': eval_data['nombre'],
+                        'nombre': nombre,
                         'peso': porcentaje,
-                        'nota': nota_display 
+                        'nota': nota if nota is not None else 'N/A'
                     })
                     
                     # Llenar datos para el gráfico de barras individual
-                    chart_bar_labels.append(eval_data['nombre'].split('(')[1].replace(')', '')) # Ej: EP1
+                    chart_bar_labels.append(nombre.split('(')[1].replace(')', '')) # Ej: EP1
                     chart_bar_weights.append(porcentaje)
-                    
-                    # Lógica de cálculo de promedios
-                    if nota is not None:
-                        current_weighted_score += (nota * porcentaje)
-                        promedio_final += (nota * porcentaje) / 100
-                        chart_bar_grades.append(nota)
-                        
-                        # --- LÓGICA DE CÁLCULO PARA GRÁFICO DE DISTRIBUCIÓN ---
-                        if nota >= TARGET_PASSING_SCORE:
-                            ponderacion_aprobada += porcentaje
-                        else:
-                            ponderacion_reprobada += porcentaje
-                        # -----------------------------------------------------
-                        
-                    else:
-                        total_weight_missing += porcentaje
-                        missing_evaluations_count += 1
-                        
-                        missing_notes_list.append({
-                            'name': eval_data['nombre'],
-                            'weight': porcentaje,
-                            'field': eval_data['nota_field']
-                        })
-                        chart_bar_grades.append(None)
-                        
-                    total_porcentaje += porcentaje
+                    chart_bar_grades.append(nota)
 
-            # === 4. CÁLCULO DE LA NOTA MÍNIMA REQUERIDA Y OPCIONES ===
+            # 3. NOTA MÍNIMA REQUERIDA Y OPCIONES
+            missing_evaluations_count = int(resultado.evaluaciones_faltantes[fila])
             required_avg_grade = None
-            is_impossible = False
-            approval_scenarios = [] 
-            required_weighted_sum = 0.0 
-
+            required_weighted_sum = 0.0
             if missing_evaluations_count > 0:
-                required_weighted_sum = TARGET_WEIGHTED_SUM - current_weighted_score
-                
-                if required_weighted_sum <= 0:
-                    required_avg_grade = 0.0 
-                else:
-                    required_avg_grade = required_weighted_sum / total_weight_missing
-                    
-                    if required_avg_grade > MAX_GRADE:
-                        is_impossible = True
-                        
-                # 4.2. GENERAR ESCENARIOS DE APROBACIÓN (solo si faltan al menos 2 notas)
-                if missing_evaluations_count >= 2 and required_weighted_sum > 0:
-                    
-                    missing_notes_list.sort(key=lambda x: x['weight'], reverse=True)
-                    
-                    top_missing_note_1 = missing_notes_list[0]
-                    top_missing_note_2 = missing_notes_list[1]
-                    
-                    P1 = top_missing_note_1['weight']
-                    P2 = top_missing_note_2['weight']
-                    
-                    required_weighted_sum_for_P1_P2 = required_weighted_sum 
-
-                    def calculate_scenario(N1_grade, P1, P2, required_sum, current_score_sum):
-                        """Calcula N2, el promedio final y verifica la validez."""
-                        N1_contribution = N1_grade * P1
-                        required_by_N2 = required_sum - N1_contribution
-                        
-                        N2_grade = required_by_N2 / P2 if P2 > 0 else MAX_GRADE + 1
-
-                        # Redondear N2 al entero más cercano hacia arriba (math.ceil)
-                        N2_grade_rounded = max(0.0, math.ceil(min(MAX_GRADE, N2_grade)))
-                        
-                        # Cálculo basado en la suma ponderada actual + las 2 notas clave
-                        final_weighted_score = current_score_sum + (N1_grade * P1) + (N2_grade_rounded * P2)
-                        final_average = final_weighted_score / 100.0
-                        
-                        return {
-                            'N1_grade': round(N1_grade),
-                            'N2_grade': N2_grade_rounded,
-                            'final_average': round(final_average, 1),
-                            'is_passing': final_average >= TARGET_PASSING_SCORE
-                        }
-                    
-                    # --- Generación de Escenarios Clave ---
-                    
-                    # 1. ESCENARIO BAJO: N1 (la más pesada) saca 11
-                    N1_1 = 11.0 
-                    scenario_1 = calculate_scenario(N1_1, P1, P2, required_weighted_sum_for_P1_P2, current_weighted_score)
-                    if scenario_1['is_passing']:
-                        approval_scenarios.append({**scenario_1, 'N1_name': top_missing_note_1['name'], 'N2_name': top_missing_note_2['name'], 'N1_weight': P1, 'N2_weight': P2})
-                    
-                    # 2. ESCENARIO MEDIO: N1 saca un promedio (15)
-                    N1_2 = 15.0
-                    scenario_2 = calculate_scenario(N1_2, P1, P2, required_weighted_sum_for_P1_P2, current_weighted_score)
-                    if scenario_2['is_passing']:
-                        approval_scenarios.append({**scenario_2, 'N1_name': top_missing_note_1['name'], 'N2_name': top_missing_note_2['name'], 'N1_weight': P1, 'N2_weight': P2})
-                    
-                    # 3. ESCENARIO ALTO: N1 saca 20
-                    N1_3 = 20.0
-                    scenario_3 = calculate_scenario(N1_3, P1, P2, required_weighted_sum_for_P1_P2, current_weighted_score)
-                    if scenario_3['is_passing']:
-                        approval_scenarios.append({**scenario_3, 'N1_name': top_missing_note_1['name'], 'N2_name': top_missing_note_2['name'], 'N1_weight': P1, 'N2_weight': P2})
-
-                    # Eliminar duplicados y ordenar
-                    unique_scenarios = []
-                    seen = set()
-                    for s in approval_scenarios:
-                        key = (s['N1_grade'], s['N2_grade'], s['final_average'])
-                        if key not in seen:
-                            seen.add(key)
-                            unique_scenarios.append(s)
-                            
-                    approval_scenarios = sorted(unique_scenarios, key=lambda x: x['N1_grade'])
-                    
-                    # Escenario Imposible
-                    if not approval_scenarios and is_impossible:
-                        final_weighted_score_max = current_weighted_score + (total_weight_missing * MAX_GRADE)
-                        final_average_max = final_weighted_score_max / 100.0
-                        
-                        approval_scenarios.append({
-                            'N1_grade': round(MAX_GRADE),
-                            'N2_grade': round(MAX_GRADE),
-                            'N1_name': top_missing_note_1['name'], 
-                            'N2_name': top_missing_note_2['name'],
-                            'N1_weight': P1,
-                            'N2_weight': P2,
-                            'final_average': round(final_average_max, 1),
-                            'is_passing': False
-                        })
-                        
-                # ... Fin de la lógica de escenarios ...
+                required_avg_grade = float(resultado.nota_requerida[fila])
+                required_weighted_sum = float(resultado.suma_requerida[fila])
+            total_weight_missing = float(resultado.peso_faltante[fila])
 
-            # 5. Preparar el objeto de contexto para el detalle del curso
+            # 4. Preparar el objeto de contexto para el detalle del curso
             profesor_nombre = profesor_obj.perfil.nombre if profesor_obj else 'No Asignado'
             
             curso_seleccionado_data = {
@@ -1022,25 +706,25 @@ def mis_notas(request):
                 'grupo': grupo_curso.grupo,
                 'profesor': profesor_nombre,
                 'notas': notas_detalle,
-                'promedio_final': round(promedio_final, 1) if promedio_final is not None else None, 
+                'promedio_final': redondear(resultado.nota_final[fila]), 
                 
                 # DATOS GRÁFICO DONA INDIVIDUAL: Ponderación cubierta y faltante
-                'total_porcentaje': total_porcentaje, 
+                'total_porcentaje': int(resultado.peso_total[fila]), 
                 'total_weight_missing': total_weight_missing,
                 
                 # --- DATOS ADICIONALES PARA GRÁFICO DE DISTRIBUCIÓN ---
-                'ponderacion_aprobada': round(ponderacion_aprobada, 1),
-                'ponderacion_reprobada': round(ponderacion_reprobada, 1),
-                'ponderacion_pendiente': round(total_weight_missing, 1),
+                'ponderacion_aprobada': redondear(resultado.peso_aprobado[fila]),
+                'ponderacion_reprobada': redondear(resultado.peso_reprobado[fila]),
+                'ponderacion_pendiente': redondear(total_weight_missing),
                 'nota_minima_aprobacion': TARGET_PASSING_SCORE,
                 # -----------------------------------------------------
 
                 # Variables de meta (Tu lógica de escenarios)
                 'required_avg_grade': required_avg_grade,
                 'missing_evaluations_count': missing_evaluations_count,
-                'is_impossible': is_impossible,
+                'is_impossible': bool(resultado.es_imposible[fila]),
                 'required_weighted_sum': required_weighted_sum,
-                'approval_scenarios': approval_scenarios,
+                'approval_scenarios': resultado.escenarios_aprobacion(fila),
                 
                 # --- DATOS PARA GRÁFICOS INDIVIDUALES ---
                 'chart_bar_labels': chart_bar_labels,
@@ -1219,16 +903,19 @@ def mis_cursos_profesor(request):
     # ---------------------------------------------------------
     # 1. Lista de grupos
     # ---------------------------------------------------------
-    teoria_groups = GrupoTeoria.objects.all()
-    laboratorio_groups = GrupoLaboratorio.objects.all()
+    # El prefetch ya limita teoría/laboratorio a los grupos del profesor
+    # (WHERE grupo_curso_id IN ...) y los temas de todos sus grupos de teoría
+    # llegan en una sola consulta. El auto-completado de temas antiguos ya no
+    # se hace aquí: lo ejecuta el comando programado completar_temas.
+    temas_ordenados = Prefetch('temacurso_set', queryset=TemaCurso.objects.order_by('orden'), to_attr='temas_ordenados')
 
     carga_academica = GrupoCurso.objects.filter(
         profesor=profesor_obj
     ).select_related(
         'curso'
     ).prefetch_related(
-        Prefetch('grupoteoria', queryset=teoria_groups, to_attr='teoria'),
-        Prefetch('grupolaboratorio', queryset=laboratorio_groups, to_attr='laboratorio'),
+        Prefetch('grupoteoria', queryset=GrupoTeoria.objects.prefetch_related(temas_ordenados), to_attr='teoria'),
+        Prefetch('grupolaboratorio', queryset=GrupoLaboratorio.objects.all(), to_attr='laboratorio'),
     ).order_by('curso__id', 'grupo')
 
     cursos_procesados = []
@@ -1264,21 +951,8 @@ def mis_cursos_profesor(request):
             g.tipo = "Teoría"
             g.grupo_teoria = g.teoria
 
-            # Obtener temas ordenados por el campo 'orden'
-            g.temas = TemaCurso.objects.filter(
-                grupo_teoria=g.grupo_teoria
-            ).order_by("orden")
-            
-            # === AUTO-MARCAR TEMAS CON 7+ DÍAS DE ANTIGÜEDAD ===
-            hoy = date.today()
-
-            for tema in g.temas:
-                # Comprobación de que tema.fecha no sea None
-                if tema.fecha and tema.fecha <= hoy - timedelta(days=7) and not tema.completado:
-                    # Se requiere guardar cada tema individualmente si se modifica en el bucle
-                    # Esto garantiza que el cambio se persista inmediatamente.
-                    tema.completado = True
-                    tema.save()
+            # Temas ya ordenados por 'orden' (prefetch)
+            g.temas = g.teoria.temas_ordenados
         elif g.laboratorio:
             g.tipo = "Laboratorio"
             g.grupo_teoria = None
@@ -1558,7 +1232,7 @@ def horarios_profesor(request):
     # Usamos select_related para optimizar las consultas a la base de datos
     horario_clases = BloqueHorario.objects.filter(
         grupo_curso_id__in=grupos_asignados_ids
-    ).select_related('grupo_curso__curso', 'aula').order_by('horaInicio') 
+    ).select_related('grupo_curso__curso', 'grupo_curso__grupoteoria', 'aula').order_by('horaInicio') 
 
     # Si no hay clases
     if not horario_clases:
@@ -1572,74 +1246,28 @@ def horarios_profesor(request):
         }
         return render(request, 'usuarios/profesor/horarios_profesor.html', contexto)
 
-    # 4. Generación de Puntos de Corte (Todas las horas de inicio y fin únicas)
-    puntos_corte = set()
-    for bloque in horario_clases:
-        # Añadir hora de inicio y fin (sin segundos/microsegundos para la tabla)
-        puntos_corte.add(bloque.horaInicio.replace(second=0, microsecond=0))
-        puntos_corte.add(bloque.horaFin.replace(second=0, microsecond=0))
-
-    # Convertir los puntos de corte de 'time' a 'datetime' para facilitar las comparaciones, 
-    # usando una fecha ficticia (dummy_date).
-    dummy_date = datetime.today().date()
-    puntos_corte_dt = sorted(list(set([datetime.combine(dummy_date, t) for t in puntos_corte])))
+    # 4. Construcción de la grilla (puntos de corte + barrido por día)
+    # Cada fila trae, por día, los bloques activos al inicio del intervalo
+    # (inicio del bloque <= inicio de la fila < fin del bloque).
+    grilla = construir_grilla(
+        (bloque.dia, bloque.horaInicio, bloque.horaFin, bloque) for bloque in horario_clases
+    )
     
     # Variables de estado
     horario_consolidado = [] # Almacenará las filas de la tabla
-    hora_actual = None # Marca de tiempo inicial para la primera fila
     horario_con_conflicto = False # Flag para la alerta
 
     # 5. Construcción y Consolidación de Filas
-    # Iteramos sobre los puntos de corte para crear los intervalos de tiempo de la tabla
-    for dt_siguiente in puntos_corte_dt:
-        if hora_actual is None:
-            hora_actual = dt_siguiente
-            continue
-        
-        dt_inicio_fila = hora_actual
-        dt_fin_fila = dt_siguiente
-
-        duracion_minutos = (dt_fin_fila - dt_inicio_fila).total_seconds() / 60
-        if duracion_minutos < 11:
-            hora_actual = dt_siguiente
-            continue
-        
-        # Saltamos si el intervalo es cero o negativo
-        if dt_inicio_fila >= dt_fin_fila:
-            hora_actual = dt_siguiente
-            continue
-            
-        # Formato de rango de hora para la fila
-        hora_inicio_str = dt_inicio_fila.strftime("%H:%M")
-        hora_fin_str = dt_fin_fila.strftime("%H:%M")
-        rango_hora_str = f"{hora_inicio_str} - {hora_fin_str}"
+    for fila in grilla:
+        rango_hora_str = fila['rango']
+        hora_fin_str = formatear_minutos(fila['fin'])
         
         fila_data = [None] * len(DIAS) # Datos de la celda para cada día de la semana
         hay_clase_en_fila = False
         
-        # Iterar por día para buscar clases que caigan en este intervalo [dt_inicio_fila, dt_fin_fila)
         for dia_index, dia_key in enumerate(DIAS_MAP.keys()):
             
-            clashes_in_slot = [] # Lista para detectar conflictos en esta celda (día/hora)
-            
-            for bloque in horario_clases:
-                
-                b_inicio = bloque.horaInicio.replace(second=0, microsecond=0)
-                b_fin = bloque.horaFin.replace(second=0, microsecond=0)
-                
-                dt_b_inicio = datetime.combine(dummy_date, b_inicio)
-                dt_b_fin = datetime.combine(dummy_date, b_fin)
-                
-                # CRITERIO CLAVE: La clase debe:
-                # 1. Ser en el día correcto
-                # 2. Su inicio debe ser menor o igual al inicio de la fila
-                # 3. Su fin debe ser MAYOR al inicio de la fila (garantiza que la clase cubre el inicio del intervalo)
-                if (bloque.dia == dia_key and 
-                    dt_b_inicio <= dt_inicio_fila and 
-                    dt_b_fin > dt_inicio_fila): 
-                        
-                    clashes_in_slot.append(bloque)
-            
+            clashes_in_slot = fila['celdas'][dia_index] # Bloques activos en esta celda (día/hora)
             
             # Detección y registro de CONFLICTO
             if len(clashes_in_slot) > 1:
@@ -1706,8 +1334,6 @@ def horarios_profesor(request):
                 'data': fila_data,
                 'tipo': 'CLASE' if hay_clase_en_fila else 'LIBRE',
             })
-            
-        hora_actual = dt_siguiente # Mueve el marcador de tiempo para la siguiente iteración
 
     # 7. Preparar contexto final
     leyenda_cursos = list(cursos_en_horario.values())
@@ -1825,6 +1451,35 @@ def get_client_ip(request):
         return x_forwarded_for.split(',')[0].strip()
     return request.META.get('REMOTE_ADDR', '127.0.0.1')
 
+def grupos_asistencia_profesor(profesor_obj, dia_actual_str=None):
+    """
+    Grupos asignados al profesor en una sola consulta, anotados con:
+    es_teoria / es_laboratorio, tiene_clase_hoy (bloque en `dia_actual_str`)
+    y ultima_sesion (fecha del último registro de asistencia). Se agregan
+    además los atributos tipo y silabo_subido que usa el template.
+    """
+    if dia_actual_str in DIAS_SEMANA:
+        clase_hoy = Exists(BloqueHorario.objects.filter(grupo_curso=OuterRef('pk'), dia=dia_actual_str))
+    else:
+        clase_hoy = Value(False, output_field=BooleanField())
+
+    grupos = list(
+        GrupoCurso.objects.filter(profesor=profesor_obj).select_related('curso').annotate(
+            es_teoria=Exists(GrupoTeoria.objects.filter(grupo_curso=OuterRef('pk'))),
+            es_laboratorio=Exists(GrupoLaboratorio.objects.filter(grupo_curso=OuterRef('pk'))),
+            tiene_clase_hoy=clase_hoy,
+            ultima_sesion=Subquery(
+                RegistroAsistencia.objects.filter(grupo_curso=OuterRef('pk'))
+                .order_by('-fechaClase').values('fechaClase')[:1]
+            ),
+        ).order_by('curso__nombre', 'grupo')
+    )
+
+    for g in grupos:
+        g.tipo = "TEORÍA" if g.es_teoria else "LAB" if g.es_laboratorio else "?"
+        g.silabo_subido = bool(g.curso.silabo_url)
+    return grupos
+
 def registro_asistencia(request):
     # 1. Autenticación del profesor y obtención del objeto profesor
     profesor_obj, response = check_professor_auth(request)
@@ -1857,64 +1512,34 @@ def registro_asistencia(request):
     # ----------------------------------------------------------------------
 
     # 2. LÓGICA DE CARGA REAL DE GRUPOS ASIGNADOS
-    # **IMPORTANTE:** Usar select_related('curso') para verificar el sílabo eficientemente
-    grupos_asignados = GrupoCurso.objects.filter(profesor=profesor_obj).select_related('curso').order_by('curso__nombre', 'grupo')
-
-    # --- LÓGICA PARA RESALTAR GRUPOS CON CLASE HOY Y VERIFICAR SILABO ---
-    grupos_con_clase_hoy_ids = set()
-    
-    if dia_actual_str in ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']:
-        grupos_con_clase_hoy_ids = set(
-            BloqueHorario.objects.filter(
-                grupo_curso__in=grupos_asignados.values('id'),
-                dia=dia_actual_str
-            ).values_list('grupo_curso_id', flat=True).distinct()
-        )
-
-    for g in grupos_asignados:
-        # Determinar el tipo
-        if GrupoTeoria.objects.filter(grupo_curso=g).exists():
-            g.tipo = "TEORÍA"
-        elif GrupoLaboratorio.objects.filter(grupo_curso=g).exists():
-            g.tipo = "LAB"
-        else:
-            g.tipo = "?"
-            
-        # Determinar si tiene clase hoy
-        g.tiene_clase_hoy = g.id in grupos_con_clase_hoy_ids
-        
-        # **NUEVA VERIFICACIÓN DE SÍLABO**
-        # Añade un atributo dinámico al objeto GrupoCurso para usar en el template
-        g.silabo_subido = bool(g.curso.silabo_url)
-        # ---------------------------------------------------
+    # Una sola consulta con tipo, clase hoy, sílabo y última sesión (también la usan guardar/exportar)
+    grupos_asignados = grupos_asistencia_profesor(profesor_obj, dia_actual_str)
+    grupos_por_id = {str(g.id): g for g in grupos_asignados}
 
     grupo_seleccionado = None
     estudiantes_list = []
     historial_completo = []
+    cambios_pendientes = 0
 
     # POST (Las acciones POST (guardar/exportar) asumen que el sílabo ya fue subido si llegaron aquí)
     if request.method == "POST":
         accion = request.POST.get('accion')
 
-        # --- AJAX SAVE (Guardado individual) ---
-        if accion == "ajax_save":
-            # ... (Lógica de AJAX SAVE, sin cambios significativos) ...
+        # --- AJAX SAVE (Borrador: lote de cambios) / AJAX CONFIRMAR (guardado de la lista completa) ---
+        if accion in ("ajax_save", "ajax_confirmar"):
             if request.headers.get('x-requested-with') != 'XMLHttpRequest':
                 return HttpResponseBadRequest("Only AJAX")
-            
+
             grupo_id_post = request.POST.get('grupo_id')
             fecha_post = request.POST.get('fecha')
-            estudiante_cui = request.POST.get('estudiante_cui')
-            estado_simple = request.POST.get('estado')
 
-            if not (grupo_id_post and fecha_post and estudiante_cui and estado_simple in ('A', 'F')):
+            if not (grupo_id_post and fecha_post):
                 return JsonResponse({'ok': False, 'msg': 'Faltan datos.'}, status=400)
-            
-            try:
-                grupo_obj = GrupoCurso.objects.select_related('curso').get(id=grupo_id_post, profesor=profesor_obj)
-            except GrupoCurso.DoesNotExist:
+
+            grupo_obj = grupos_por_id.get(grupo_id_post)
+            if grupo_obj is None:
                 return JsonResponse({'ok': False, 'msg': 'Grupo inválido.'}, status=403)
-            
+
             # **RESTRICCIÓN DE SÍLABO EN POST/AJAX**
             if not grupo_obj.curso.silabo_url:
                 return JsonResponse({'ok': False, 'msg': 'RESTRICCIÓN: Sílabo pendiente de subir.'}, status=403)
@@ -1922,33 +1547,48 @@ def registro_asistencia(request):
             # Solo se permite edición por AJAX para la fecha actual
             if fecha_post != hoy.isoformat():
                 return JsonResponse({'ok': False, 'msg': 'Solo edición para la fecha actual permitida por AJAX.'}, status=403)
-            
-            try:
-                fecha_obj = dt.date.fromisoformat(fecha_post)
-            except ValueError:
-                return JsonResponse({'ok': False, 'msg': 'Formato de fecha inválido.'}, status=400)
-            
-            try:
-                from usuarios.models import Estudiante # Importar Estudiante si no está arriba
-                estudiante_obj = Estudiante.objects.get(perfil__id=estudiante_cui)
-            except Estudiante.DoesNotExist:
-                return JsonResponse({'ok': False, 'msg': 'Estudiante no encontrado.'}, status=404)
-            
-            registro_principal, _ = RegistroAsistencia.objects.get_or_create(
-                grupo_curso=grupo_obj,
-                fechaClase=fecha_obj,
-                defaults={'ipProfesor': get_client_ip(request), 'horaInicioVentana': timezone.now().time()}
-            )
-            
-            estado_model = 'PRESENTE' if estado_simple == 'A' else 'FALTA'
-            
-            RegistroAsistenciaDetalle.objects.update_or_create(
-                registro_asistencia=registro_principal,
-                estudiante=estudiante_obj,
-                defaults={'estado': estado_model}
+
+            fecha_obj = hoy
+
+            if accion == "ajax_save":
+                # 'cambios' = JSON [{"cui": ..., "estado": "A" | "F"}, ...]
+                # (se mantiene el formato anterior de un solo estudiante: estudiante_cui + estado)
+                if request.POST.get('cambios'):
+                    try:
+                        cambios = json.loads(request.POST['cambios'])
+                    except ValueError:
+                        return JsonResponse({'ok': False, 'msg': 'Formato de cambios inválido.'}, status=400)
+                else:
+                    cambios = [{'cui': request.POST.get('estudiante_cui'), 'estado': request.POST.get('estado')}]
+
+                try:
+                    borrador = agregar_cambios(request.session, grupo_obj.id, fecha_obj, cambios)
+                except ValueError as e:
+                    return JsonResponse({'ok': False, 'msg': str(e)}, status=400)
+
+                return JsonResponse({'ok': True, 'msg': 'Cambios registrados en el borrador.', 'pendientes': len(borrador)})
+
+            # ajax_confirmar: se guarda toda la lista de una vez
+            if grupo_obj.es_laboratorio:
+                matriculas_query = MatriculaLaboratorio.objects.filter(laboratorio_id=grupo_obj.id)
+            else:
+                matriculas_query = Matricula.objects.filter(grupo_curso=grupo_obj)
+            estudiantes_ids = list(matriculas_query.values_list('estudiante_id', flat=True))
+
+            _, creados, actualizados = confirmar_borrador(
+                request.session, grupo_obj, fecha_obj, estudiantes_ids,
+                get_client_ip(request), timezone.now().time(),
             )
-            
-            return JsonResponse({'ok': True, 'msg': 'Asistencia guardada con éxito.'})
+            # bulk_create/bulk_update no disparan señales
+            invalidar_secciones(['asistencia'])
+            actualizar_resumenes(estudiantes_ids)
+
+            return JsonResponse({
+                'ok': True,
+                'msg': f'Asistencia guardada para {len(estudiantes_ids)} estudiantes.',
+                'creados': creados,
+                'actualizados': actualizados,
+            })
 
 
         # --- SAVE ALL (Guardado masivo) ---
@@ -1960,10 +1600,9 @@ def registro_asistencia(request):
                 messages.error(request, "Faltan datos esenciales (Grupo o Fecha).")
                 return redirect('usuarios:registro_asistencia')
 
-            try:
-                # Obtener el grupo con el curso relacionado para la verificación del sílabo
-                grupo_obj = GrupoCurso.objects.select_related('curso').get(id=grupo_id_post, profesor=profesor_obj)
-            except GrupoCurso.DoesNotExist:
+            # Grupo (con curso) ya cargado en grupos_asignados
+            grupo_obj = grupos_por_id.get(grupo_id_post)
+            if grupo_obj is None:
                 messages.error(request, "Grupo inválido o no asignado a usted.")
                 return redirect('usuarios:registro_asistencia')
             
@@ -1979,19 +1618,16 @@ def registro_asistencia(request):
                 messages.error(request, "Formato de fecha inválido.")
                 return redirect('usuarios:registro_asistencia')
             
-            grupo_lab = GrupoLaboratorio.objects.filter(grupo_curso=grupo_obj).first()
-            
-            # ... (Resto de la lógica de guardado masivo, sin cambios) ...
-            if grupo_lab:
-                # Es Laboratorio, usamos MatriculaLaboratorio
+            if grupo_obj.es_laboratorio:
+                # Es Laboratorio, usamos MatriculaLaboratorio (PK del laboratorio = id del grupo)
                 matriculas_query = MatriculaLaboratorio.objects.filter(
-                    laboratorio=grupo_lab
-                ).select_related('estudiante__perfil')
+                    laboratorio_id=grupo_obj.id
+                )
             else:
                 # Es Teoría/General, usamos Matricula
                 matriculas_query = Matricula.objects.filter(
                     grupo_curso=grupo_obj
-                ).select_related('estudiante__perfil')
+                )
 
             # 1. Obtener o crear el registro principal
             registro_principal, created = RegistroAsistencia.objects.get_or_create(
@@ -2000,31 +1636,24 @@ def registro_asistencia(request):
                 defaults={'ipProfesor': get_client_ip(request), 'horaInicioVentana': timezone.now().time()}
             )
 
-            # 2. Obtener la lista de estudiantes matriculados
-            matriculas = matriculas_query
-            updated = 0
-
-            with transaction.atomic():
-                for m in matriculas:
-                    cui = str(m.estudiante.perfil.id)
-                    
-                    # CORRECCIÓN: Leer los nombres de campo correctos ('asistencia_{cui}' y 'falta_{cui}')
-                    asistencia_post = request.POST.get(f"asistencia_{cui}") 
-                    falta_post = request.POST.get(f"falta_{cui}") 
-                    
-                    if asistencia_post == "A":
-                        estado_model = "PRESENTE"
-                    elif falta_post == "F":
-                        estado_model = "FALTA"
-                    else:
-                        estado_model = "FALTA" # Default si ambos están desmarcados
+            # 2. Armar el estado de cada estudiante matriculado
+            # Campos del formulario: 'asistencia_{cui}' = 'A' y 'falta_{cui}' = 'F'
+            estados = {}
+            for estudiante_id in matriculas_query.values_list('estudiante_id', flat=True):
+                cui = str(estudiante_id)
+                if request.POST.get(f"asistencia_{cui}") == "A":
+                    estados[estudiante_id] = "PRESENTE"
+                else:
+                    estados[estudiante_id] = "FALTA" # Falta marcada o ambos desmarcados
 
-                    RegistroAsistenciaDetalle.objects.update_or_create(
-                        registro_asistencia=registro_principal,
-                        estudiante=m.estudiante,
-                        defaults={'estado': estado_model}
-                    )
-                    updated += 1
+            # 3. Guardado en bloque (una lectura + bulk_create + bulk_update)
+            guardar_asistencia_masiva(registro_principal, estados)
+            updated = len(estados)
+            # El formulario trae la lista completa: el borrador de la sesión ya no hace falta
+            descartar_borrador(request.session, grupo_obj.id, fecha_obj)
+            # bulk_create/bulk_update no disparan señales
+            invalidar_secciones(['asistencia'])
+            actualizar_resumenes(estados.keys())
 
             messages.success(request, f"Asistencia guardada exitosamente para {updated} estudiantes en la fecha {fecha_post}.")
             return redirect(f"{reverse('usuarios:registro_asistencia')}?grupo={grupo_id_post}&fecha={fecha_post}")
@@ -2038,9 +1667,8 @@ def registro_asistencia(request):
                 messages.error(request, "Falta el ID del grupo para exportar.")
                 return redirect('usuarios:registro_asistencia')
 
-            try:
-                grupo_obj = GrupoCurso.objects.select_related('curso').get(id=grupo_id_export, profesor=profesor_obj)
-            except GrupoCurso.DoesNotExist:
+            grupo_obj = grupos_por_id.get(grupo_id_export)
+            if grupo_obj is None:
                 messages.error(request, "Grupo inválido o no asignado a usted.")
                 return redirect('usuarios:registro_asistencia')
             
@@ -2049,139 +1677,33 @@ def registro_asistencia(request):
                 messages.error(request, f"¡RESTRICCIÓN! Debe subir el sílabo para el curso {grupo_obj.curso.nombre} antes de poder exportar el registro.")
                 return redirect(f"{reverse('usuarios:registro_asistencia')}?grupo={grupo_id_export}")
 
-            # 1. Obtener los datos necesarios:
-            # (Resto de la lógica de exportación, sin cambios significativos)
-            
-            # Determinar si es un grupo de Laboratorio
-            grupo_lab_export = GrupoLaboratorio.objects.filter(grupo_curso=grupo_obj).first()
-
-            if grupo_lab_export:
-                matriculas_query = MatriculaLaboratorio.objects.filter(
-                    laboratorio=grupo_lab_export
-                )
-            else:
-                matriculas_query = Matricula.objects.filter(
-                    grupo_curso=grupo_obj
-                )
-            
-            asistencias_sesiones = RegistroAsistencia.objects.filter(grupo_curso=grupo_obj).order_by('fechaClase')
-            fechas_sesiones = [a.fechaClase for a in asistencias_sesiones]
-            fechas_str = [f.strftime('%Y-%m-%d') for f in fechas_sesiones]
-
-            # Obtener estudiantes de la matrícula y su perfil
-            if grupo_lab_export:
-                estudiantes = [{'cui': m.estudiante.perfil.id, 'nombre': m.estudiante.perfil.nombre} 
-                               for m in matriculas_query.select_related('estudiante__perfil').order_by('estudiante__perfil__nombre')]
-            else:
-                estudiantes = [{'cui': m.estudiante.perfil.id, 'nombre': m.estudiante.perfil.nombre} 
-                               for m in matriculas_query.select_related('estudiante__perfil').order_by('estudiante__perfil__nombre')]
-
-            detalles = RegistroAsistenciaDetalle.objects.filter(
-                registro_asistencia__in=asistencias_sesiones
-            ).select_related('estudiante__perfil', 'registro_asistencia')
-
-            # Diccionario de pivote: { CUI: { 'YYYY-MM-DD': 'A'/'F' } }
-            pivote_asistencia = {}
-            for d in detalles:
-                cui = d.estudiante.perfil.id
-                fecha_str = d.registro_asistencia.fechaClase.strftime('%Y-%m-%d')
-                estado = 'A' if d.estado == 'PRESENTE' else 'F'
-
-                if cui not in pivote_asistencia:
-                    pivote_asistencia[cui] = {}
-                pivote_asistencia[cui][fecha_str] = estado
-
-            # 2. Construir la estructura final para el reporte
-            reporte_data = []
-            for est in estudiantes:
-                fila = {
-                    'cui': est['cui'],
-                    'nombre': est['nombre'],
-                    'registros': {}
-                }
-                for f_str in fechas_str:
-                    fila['registros'][f_str] = pivote_asistencia.get(est['cui'], {}).get(f_str, '') 
-                reporte_data.append(fila)
-                
-            # --- Generación de EXCEL (Openpyxl) ---
+            # La generación del archivo se hace fuera del request (ver exportaciones/cola.py)
             if accion == "export_excel":
-                output = io.BytesIO()
-                workbook = openpyxl.Workbook()
-                sheet = workbook.active
-                sheet.title = "Registro Asistencia"
-
-                header_style = openpyxl.styles.Font(bold=True)
-
-                headers = ['CUI', 'ALUMNO'] + [dt.datetime.strptime(f, '%Y-%m-%d').strftime('%d/%m') for f in fechas_str]
-                sheet.append(headers)
-                
-                for cell in sheet[1]:
-                    cell.font = header_style
-
-                for fila in reporte_data:
-                    row_data = [fila['cui'], fila['nombre']] + list(fila['registros'].values())
-                    sheet.append(row_data)
+                tipo, extension, parametros = 'ASISTENCIA_EXCEL', 'xlsx', {'grupo_id': grupo_obj.id}
+            else:
+                tipo, extension, parametros = 'ASISTENCIA_PDF', 'pdf', {'grupo_id': grupo_obj.id, 'fecha': hoy.isoformat()}
 
-                workbook.save(output)
-                output.seek(0)
-                
-                response = HttpResponse(
-                    output.read(),
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    headers={'Content-Disposition': f'attachment; filename="asistencia_{grupo_obj.curso.nombre}_{grupo_obj.grupo}.xlsx"'},
-                )
-                return response
-            
-            # --- Generación de PDF (xhtml2pdf) ---
-            elif accion == "export_pdf":
-                
-                # 1. Renderizar el HTML de la tabla usando el template
-                html_content = render_to_string('usuarios/profesor/reporte_asistencia_pdf.html', {
-                    'grupo': grupo_obj,
-                    'fechas': [dt.datetime.strptime(f, '%Y-%m-%d').strftime('%d/%m/%Y') for f in fechas_str],
-                    'reporte_data': reporte_data,
-                    'titulo_reporte': f"Reporte de Asistencia: {grupo_obj.curso.nombre} (Grupo {grupo_obj.grupo})",
-                    'fecha_generacion': hoy.strftime('%d/%m/%Y')
-                })
-                
-                # Creamos un buffer en memoria para almacenar el PDF binario
-                pdf_file_buffer = io.BytesIO()
-                
-                # 2. Convertir el HTML a PDF usando xhtml2pdf (pisa)
-                try:
-                    pisa_status = pisa.CreatePDF(
-                        html_content, # El contenido HTML/CSS a convertir
-                        dest=pdf_file_buffer # Donde escribir el PDF (el buffer)
-                    )
-                except Exception as e:
-                    error_msg = f"Error al generar PDF con xhtml2pdf: {e}. Verifique que el formato HTML/CSS sea compatible."
-                    messages.error(request, error_msg)
-                    return redirect(f"{reverse('usuarios:registro_asistencia')}?grupo={grupo_id_export}")
+            trabajo = encolar_exportacion(
+                tipo,
+                parametros,
+                profesor_obj.perfil_id,
+                f"asistencia_{grupo_obj.curso.nombre}_{grupo_obj.grupo}.{extension}",
+            )
 
-                if pisa_status.err:
-                    error_msg = "Error interno de xhtml2pdf al generar el PDF. Revise el formato del template HTML."
-                    messages.error(request, error_msg)
-                    return redirect(f"{reverse('usuarios:registro_asistencia')}?grupo={grupo_id_export}")
+            # Ya existía un archivo idéntico: se descarga directamente
+            if trabajo.estado == 'COMPLETADO':
+                return redirect('usuarios:descargar_exportacion', trabajo_id=trabajo.id)
 
-                pdf_file = pdf_file_buffer.getvalue()
-                pdf_file_buffer.close()
-                
-                # 3. Crear la respuesta HTTP para el PDF
-                response = HttpResponse(pdf_file, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="asistencia_{grupo_obj.curso.nombre}_{grupo_obj.grupo}.pdf"'
-                
-                return response
+            messages.info(request, "El reporte se está generando. La descarga comenzará automáticamente cuando esté listo.")
+            return redirect(f"{reverse('usuarios:registro_asistencia')}?grupo={grupo_id_export}&exportacion={trabajo.id}")
 
 
     # GET (Lógica de carga inicial y filtro)
     if grupo_id:
-        try:
-            # Reutilizar el grupo ya procesado de grupos_asignados
-            # Se convierte a str el id del grupo.
-            grupo_seleccionado = next(g for g in grupos_asignados if str(g.id) == grupo_id)
-        except StopIteration:
+        # Reutilizar el grupo ya procesado de grupos_asignados
+        grupo_seleccionado = grupos_por_id.get(grupo_id)
+        if grupo_seleccionado is None:
             messages.error(request, "Grupo no encontrado o no asignado a usted.")
-            grupo_seleccionado = None
 
     if grupo_seleccionado:
         # **RESTRICCIÓN DE SÍLABO EN GET**
@@ -2195,12 +1717,10 @@ def registro_asistencia(request):
         else:
             # Si el sílabo está subido, procedemos con la carga de datos de asistencia
             # Historial de Asistencias y Matriculas
-            grupo_lab = GrupoLaboratorio.objects.filter(grupo_curso=grupo_seleccionado).first()
-
-            if grupo_lab:
+            if grupo_seleccionado.es_laboratorio:
                 # Es un grupo de Laboratorio, usamos MatriculaLaboratorio
                 matriculas = MatriculaLaboratorio.objects.filter(
-                    laboratorio=grupo_lab
+                    laboratorio_id=grupo_seleccionado.id
                 ).select_related('estudiante__perfil').order_by('estudiante__perfil__nombre')
             else:
                 # Es un grupo de Teoría (o general), usamos Matricula
@@ -2237,16 +1757,21 @@ def registro_asistencia(request):
                 # Si no hay registro Y estamos mirando la fecha de hoy, se sugiere 'PRESENTE' por defecto
                 if not registro and fecha_q == fecha_actual_str:
                     default_estado_contexto = 'A'
+
+                # Cambios marcados hoy y aún no confirmados (borrador en la sesión)
+                borrador = obtener_borrador(request.session, grupo_seleccionado.id, hoy) if fecha_q == fecha_actual_str else {}
+                cambios_pendientes = len(borrador)
                 
                 for m in matriculas:
                     # Determinar el objeto estudiante. Varía si es Matricula o MatriculaLaboratorio
-                    from usuarios.models import Estudiante # Importar Estudiante si no está arriba
                     estudiante_obj = m.estudiante 
                     cui = estudiante_obj.perfil.id
                     
                     estado_db = detalles_map.get(cui) 
                     
-                    if estado_db:
+                    if cui in borrador:
+                        estado_contexto = borrador[cui]
+                    elif estado_db:
                         estado_contexto = 'A' if estado_db == 'PRESENTE' else 'F'
                     else:
                         estado_contexto = default_estado_contexto
@@ -2258,7 +1783,6 @@ def registro_asistencia(request):
                     })
             else:
                 for m in matriculas:
-                    from usuarios.models import Estudiante # Importar Estudiante si no está arriba
                     # Determinar el objeto estudiante. Varía si es Matricula o MatriculaLaboratorio
                     estudiante_obj = m.estudiante
                     estudiantes_list.append({
@@ -2280,44 +1804,62 @@ def registro_asistencia(request):
         'editable': editable,
         'estudiantes_matriculados': estudiantes_list,
         'historial_completo': historial_completo,
+        'cambios_pendientes': cambios_pendientes,
         # Nueva variable que refleja la cuenta de reservas de la semana (hasta el viernes)
         'reservas_activas_semana': reservas_activas_semana, 
+        # Exportación en curso (el template consulta su estado y la descarga al terminar)
+        'exportacion_id': request.GET.get('exportacion'),
     }
 
     return render(request, 'usuarios/profesor/registro_asistencia.html', contexto)
 
-def obtener_bloques_recurrentes_ocupados(request, aula_id_a_filtrar=None):
+def exportar_asistencia(request):
+    """
+    Exportación de asistencia en streaming (CSV o XLSX).
+    ?grupo=<id> exporta un grupo; sin grupo exporta todos los grupos del profesor.
+    """
     profesor_obj, response = check_professor_auth(request)
-    if response: return response
-    aula_queryset = BloqueHorario.objects
-    if aula_id_a_filtrar:
-        aula_queryset = aula_queryset.filter(aula__id=aula_id_a_filtrar)
-
-    ocupaciones_aula = aula_queryset.values(
-        'dia',
-        'horaInicio',
-        'horaFin',
-        'aula__id'
-    ).distinct()
-
-    profesor_id = profesor_obj.perfil.id
-    ocupaciones_profesor = BloqueHorario.objects.filter(
-        grupo_curso__profesor__perfil__id=profesor_id
-    ).values(
-        'dia',
-        'horaInicio',
-        'horaFin',
-        'aula__id'
-    ).distinct()
-
-    bloques_ocupados_profesor = list(ocupaciones_profesor)
-    bloques_ocupados_aula = list(ocupaciones_aula)
-
-    return{
-        'ocupaciones_aula': bloques_ocupados_aula,
-        'ocupaciones_profesor': bloques_ocupados_profesor,
-        'aulas_existentes': list(Aula.objects.values('id','tipo'))
-    }
+    if response:
+        return response
+
+    formato = request.GET.get('formato', 'csv')
+    if formato not in ('csv', 'xlsx'):
+        return HttpResponseBadRequest("Formato de exportación no soportado.")
+
+    grupo_id = request.GET.get('grupo')
+    hoy = dt.date.today()
+
+    if grupo_id:
+        try:
+            grupo_obj = GrupoCurso.objects.select_related('curso').get(id=grupo_id, profesor=profesor_obj)
+        except GrupoCurso.DoesNotExist:
+            messages.error(request, "Grupo inválido o no asignado a usted.")
+            return redirect('usuarios:registro_asistencia')
+
+        # **RESTRICCIÓN DE SÍLABO EN EXPORT**
+        if not grupo_obj.curso.silabo_url:
+            messages.error(request, f"¡RESTRICCIÓN! Debe subir el sílabo para el curso {grupo_obj.curso.nombre} antes de poder exportar el registro.")
+            return redirect(f"{reverse('usuarios:registro_asistencia')}?grupo={grupo_id}")
+
+        filas = filas_asistencia_grupo(grupo_obj)
+        nombre = f"asistencia_{grupo_obj.curso.nombre}_{grupo_obj.grupo}"
+    else:
+        # **RESTRICCIÓN DE SÍLABO EN EXPORT** (todos los grupos)
+        sin_silabo = sorted(set(
+            GrupoCurso.objects.filter(profesor=profesor_obj)
+                              .exclude(curso__silabo_url__gt='')
+                              .values_list('curso__nombre', flat=True)
+        ))
+        if sin_silabo:
+            messages.error(request, f"¡RESTRICCIÓN! Debe subir el sílabo de los cursos {', '.join(sin_silabo)} antes de poder exportar el registro.")
+            return redirect('usuarios:registro_asistencia')
+
+        filas = filas_asistencia_profesor(profesor_obj)
+        nombre = f"asistencia_{profesor_obj.perfil_id}_{hoy.strftime('%Y%m%d')}"
+
+    if formato == 'csv':
+        return respuesta_csv(filas, f"{nombre}.csv")
+    return respuesta_xlsx(filas, f"{nombre}.xlsx")
 
 def horarios_reserva (request):
     profesor_obj, response = check_professor_auth(request)
@@ -2330,6 +1872,7 @@ def horarios_reserva (request):
     DIAS_MAP = {
         'LUNES': 'Lunes', 'MARTES': 'Martes', 'MIERCOLES': 'Miercoles', 'JUEVES': 'Jueves', 'VIERNES': 'Viernes'
     }
+    MAX_CONFLICTOS_MENSAJE = 10
 
     #calculo rango 2 semanas
     hoy=date.today()
@@ -2356,24 +1899,6 @@ def horarios_reserva (request):
     if not aula_id_a_filtrar:
         aula_id_a_filtrar='101'
 
-    if not aula_id_a_filtrar:
-        reservas_existentes=[]
-    else:
-        reservas_existentes = Reserva.objects.filter(
-            aula__id=aula_id_a_filtrar,
-            fecha_reserva__gte=inicio_semana,
-            fecha_reserva__lte=fin_periodo
-        ).select_related('aula','profesor')
-
-    bloques_ocupados = obtener_bloques_recurrentes_ocupados(request, aula_id_a_filtrar)
-    ocupaciones_aulas = bloques_ocupados['ocupaciones_aula']
-    ocupaciones_profesor = bloques_ocupados['ocupaciones_profesor']
-    aulas_existentes = bloques_ocupados['aulas_existentes']
-
-    DIAS_MAP_WEEKDAY = {
-        0: 'LUNES', 1: 'MARTES', 2: 'MIERCOLES', 3: 'JUEVES', 4: 'VIERNES', 5: 'SABADO', 6: 'DOMINGO'
-    }
-
     if request.method == 'POST':
         # 1. Obtener datos manuales del formulario
         aula_id_post = request.POST.get('aula_id')
@@ -2391,99 +1916,50 @@ def horarios_reserva (request):
             fecha_reserva = datetime.strptime(fecha_str, '%Y-%m-%d').date()
             hora_inicio = datetime.strptime(hora_inicio_str, '%H:%M').time()
             hora_fin = datetime.strptime(hora_fin_str, '%H:%M').time()
+        except ValueError as e:
+            messages.error(request, f"Error al procesar la reserva: {e}")
+            return redirect(request.path + f'?aula_id={aula_id_post}')
 
-            # Validar que la hora de inicio sea menor que la hora de fin
-            if hora_inicio >= hora_fin:
-                messages.error(request, "La hora de inicio debe ser anterior a la hora de fin.")
+        # 3b. Reserva recurrente: mismo horario cada semana hasta 'fecha_hasta'
+        if request.POST.get('repetir'):
+            try:
+                fecha_hasta = datetime.strptime(request.POST.get('fecha_hasta', ''), '%Y-%m-%d').date()
+            except ValueError:
+                messages.error(request, "Indique hasta qué fecha se repite la reserva.")
                 return redirect(request.path + f'?aula_id={aula_id_post}')
+            # Sin días marcados se repite el día de la semana de la fecha inicial
+            dias = request.POST.getlist('dias') or [dia_de(fecha_reserva)]
 
-            aula = Aula.objects.get(id=aula_id_post)
-
-            if fecha_reserva.weekday() >= 5: # 5 = Sábado, 6 = Domingo, REGLA 1 NO SABADO NI DOMINGO
-                messages.error(request, "Error: No se pueden realizar reservas en fines de semana (Sábado o Domingo).")
+            try:
+                resultado = registrar_reservas_recurrentes(
+                    profesor_obj, aula_id_post, fecha_reserva, fecha_hasta, dias, hora_inicio, hora_fin,
+                    parcial=bool(request.POST.get('solo_libres')),
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
                 return redirect(request.path + f'?aula_id={aula_id_post}')
 
-            dia_semana_clave = DIAS_MAP_WEEKDAY[fecha_reserva.weekday()]
+            for fecha_conflicto, motivo in resultado.conflictos[:MAX_CONFLICTOS_MENSAJE]:
+                messages.error(request, f"{fecha_conflicto.strftime('%d/%m/%Y')}: {motivo}")
+            if len(resultado.conflictos) > MAX_CONFLICTOS_MENSAJE:
+                messages.error(request, f"... y {len(resultado.conflictos) - MAX_CONFLICTOS_MENSAJE} fecha(s) más con conflicto.")
 
-            # Regla 2: No Fechas Pasadas
-            if fecha_reserva < date.today():
-                messages.error(request, "Error: No se pueden realizar reservas en fechas pasadas.")
-                return redirect(request.path + f'?aula_id={aula_id_post}')
+            if resultado.creadas:
+                messages.success(request, f"Se crearon {len(resultado.creadas)} reservas del aula {aula_id_post} de {hora_inicio_str} a {hora_fin_str}.")
+            elif resultado.conflictos:
+                messages.warning(request, "No se creó ninguna reserva. Corrija las fechas con conflicto o marque 'Reservar solo las fechas libres'.")
+            return redirect(request.path + f'?aula_id={aula_id_post}')
 
-            # Regla 3: Máximo 2 reservas por semana
-            # Calcular el Lunes de la semana de la reserva
-            inicio_semana_reserva = fecha_reserva - timedelta(days=fecha_reserva.weekday())
-            # Calcular el Domingo de esa semana
-            fin_semana_reserva = inicio_semana_reserva + timedelta(days=6)
-
-            conteo_reservas_semana = Reserva.objects.filter(
-                profesor=profesor_obj,
-                fecha_reserva__gte=inicio_semana_reserva,
-                fecha_reserva__lte=fin_semana_reserva
-            ).count()
-
-            if conteo_reservas_semana >= 2:
-                messages.error(request, f"Error: Ya ha alcanzado el límite de {conteo_reservas_semana} reservas para la semana del {inicio_semana_reserva.strftime('%d/%m')}.")
-                return redirect(request.path + f'?aula_id={aula_id_post}')
-
-            # 4. Validación de Superposiciones
-
-            # 4a. Ocupaciones Fijas del Aula (Recurrente)
-            # Necesitamos obtener los bloques recurrentes para la validación
-            bloques_ocupados_val = obtener_bloques_recurrentes_ocupados(request, aula_id_post)
-            dia_semana_clave = list(DIAS_MAP.keys())[fecha_reserva.weekday()]
-
-            for bloque in bloques_ocupados_val['ocupaciones_aula']:
-                if bloque['dia'] == dia_semana_clave:
-                    # (InicioBloque < FinReserva) Y (FinBloque > InicioReserva)
-                    if (bloque['horaInicio'] < hora_fin and bloque['horaFin'] > hora_inicio):
-                        messages.error(request, f"Conflicto: El aula {aula_id_post} tiene una clase fija recurrente en ese horario.")
-                        return redirect(request.path + f'?aula_id={aula_id_post}')
-
-            # 4b. Ocupaciones Fijas del Profesor (Recurrente)
-            for bloque in bloques_ocupados_val['ocupaciones_profesor']:
-                 if bloque['dia'] == dia_semana_clave:
-                    if (bloque['horaInicio'] < hora_fin and bloque['horaFin'] > hora_inicio):
-                        messages.error(request, f"Conflicto: Usted tiene una clase fija recurrente en ese horario (en aula {bloque.get('aula__id', 'otra')}).")
-                        return redirect(request.path + f'?aula_id={aula_id_post}')
-
-            # 4c. Reservas Existentes del Aula (Puntual)
-            reservas_aula_superpuestas = Reserva.objects.filter(
-                aula=aula,
-                fecha_reserva=fecha_reserva,
-                hora_inicio__lt=hora_fin, # Inicio existente < Fin nueva
-                hora_fin__gt=hora_inicio  # Fin existente > Inicio nueva
-            ).exists()
-
-            if reservas_aula_superpuestas:
-                messages.error(request, f"Conflicto: Ya existe otra reserva puntual para el aula {aula_id_post} en ese periodo.")
-                return redirect(request.path + f'?aula_id={aula_id_post}')
-
-            # 4d. Reservas Existentes del Profesor (Puntual)
-            reservas_profesor_superpuestas = Reserva.objects.filter(
-                profesor=profesor_obj,
-                fecha_reserva=fecha_reserva,
-                hora_inicio__lt=hora_fin, 
-                hora_fin__gt=hora_inicio 
-            ).exists()
-
-            if reservas_profesor_superpuestas:
-                  messages.error(request, f"Conflicto: Usted ya tiene otra reserva puntual en ese periodo en otra aula.")
-                  return redirect(request.path + f'?aula_id={aula_id_post}')
-
-            # 5. Guardar la Reserva
-            Reserva.objects.create(
-                aula=aula,
-                profesor=profesor_obj,
-                fecha_reserva=fecha_reserva,
-                hora_inicio=hora_inicio,
-                hora_fin=hora_fin
-            )
+        try:
+            # 4. Validación (fines de semana, fechas pasadas, límite semanal y
+            # superposiciones) y guardado en una sola transacción con bloqueo
+            # del profesor y del aula (ver reservas/registro.py)
+            registrar_reserva(profesor_obj, aula_id_post, fecha_reserva, hora_inicio, hora_fin)
             messages.success(request, f"Reserva del aula {aula_id_post} para el {fecha_str} de {hora_inicio_str} a {hora_fin_str} creada con éxito.")
             return redirect(request.path + f'?aula_id={aula_id_post}')
 
-        except Aula.DoesNotExist:
-             messages.error(request, "El ID del Aula ingresado no existe.")
+        except ValueError as e:
+             messages.error(request, str(e))
              return redirect(request.path + f'?aula_id={aula_id_post}')
         except Exception as e:
              messages.error(request, f"Error al procesar la reserva: {e}")
@@ -2491,118 +1967,83 @@ def horarios_reserva (request):
 
     # --- FIN LÓGICA POST ---
 
+    # Índice de disponibilidad (bitsets por minuto) del aula y del profesor en las 2 semanas
+    indice = cargar_indice(profesor_obj, [aula_id_a_filtrar], inicio_semana, fin_periodo)
+    aulas_existentes = list(Aula.objects.values('id', 'tipo'))
 
-    puntos_corte = set()
-    puntos_corte.add(time(20,10)) #HORA FIJA FIN
-    puntos_corte.add(time(7,0))
-    for bloque in ocupaciones_aulas:
-        puntos_corte.add(bloque['horaInicio'])
-        puntos_corte.add(bloque['horaFin'])
-    for bloque in ocupaciones_profesor:
-        puntos_corte.add(bloque['horaInicio'])
-        puntos_corte.add(bloque['horaFin'])
-    for bloque in reservas_existentes:
-        puntos_corte.add(bloque.hora_inicio.replace(second=0, microsecond=0))
-        puntos_corte.add(bloque.hora_fin.replace(second=0, microsecond=0))
-
-    dummy_date = date.today()
-    puntos_corte_dt = sorted(list(set([datetime.combine(dummy_date, t) for t in puntos_corte])))
+    # Puntos de corte: jornada fija 07:00 - 20:10 más todos los inicios/fines
+    filas = filas_de_horario(
+        puntos_de_corte(indice.intervalos_grilla(aula_id_a_filtrar), extras=(JORNADA_INICIO, JORNADA_FIN)),
+        duracion_minima=0,
+    )
 
-    #Mapeo de recurrencias pa acceso rápido
-    mapa_rec_aula = {d: [] for d in DIAS_MAP.keys()}
-    for bloque in ocupaciones_aulas:
-        mapa_rec_aula[bloque['dia']].append(bloque)
+    DIAS_KEYS = list(DIAS_MAP.keys())
+    horario_consolidado = []
 
-    mapa_rec_profesor = {d: [] for d in DIAS_MAP.keys()}
-    for bloque in ocupaciones_profesor:
-        mapa_rec_profesor[bloque['dia']].append(bloque)
+    # Ocupación total (aula + profesor) de cada fecha: una celda libre se
+    # resuelve con un solo AND; solo las ocupadas buscan el motivo
+    ocupacion_por_fecha = {fecha: indice.ocupacion(aula_id_a_filtrar, fecha) for fecha in dias_a_mostrar}
 
-    horario_consolidado = []
-    hora_actual = None
-
-    for dt_siguiente in puntos_corte_dt:
-        if hora_actual is None:
-            hora_actual = dt_siguiente
-            continue
-        dt_inicio_fila = hora_actual
-        dt_fin_fila = dt_siguiente
-        if dt_inicio_fila >= dt_fin_fila:
-            hora_actual = dt_siguiente
-            continue
-
-        hora_inicio_time = dt_inicio_fila.time()
-        hora_fin_time = dt_fin_fila.time()
-        rango_hora_str = f"{hora_inicio_time.strftime('%H:%M')} - {hora_fin_time.strftime('%H:%M')}"
+    for inicio_fila, fin_fila in filas:
+        hora_inicio_str_fila = formatear_minutos(inicio_fila)
+        hora_fin_str_fila = formatear_minutos(fin_fila)
+        rango_hora_str = f"{hora_inicio_str_fila} - {hora_fin_str_fila}"
+        mascara_fila = mascara(inicio_fila, fin_fila)
         fila_data = []
         hay_clase_en_fila = False
 
         for fecha_especifica in dias_a_mostrar:
-            dia_semana_str = list(DIAS_MAP.keys())[fecha_especifica.weekday()]
+            dia_semana_str = DIAS_KEYS[fecha_especifica.weekday()]
             estado_celda = {
                 'tipo': 'LIBRE', 
                 'color': COLOR_DISPONIBLE, 
                 'texto': 'Disponible para Reservar',
                 'fecha': fecha_especifica.strftime('%Y-%m-%d'),
-                'horaInicio': dt_inicio_fila.strftime('%H:%M'), 
-                'horaFin': dt_fin_fila.strftime('%H:%M'),
-                'data_reserva': f"{fecha_especifica.strftime('%Y-%m-%d')}|{dt_inicio_fila.strftime('%H:%M')}|{dt_fin_fila.strftime('%H:%M')}",
+                'horaInicio': hora_inicio_str_fila, 
+                'horaFin': hora_fin_str_fila,
+                'data_reserva': f"{fecha_especifica.strftime('%Y-%m-%d')}|{hora_inicio_str_fila}|{hora_fin_str_fila}",
             }
 
-            for reserva in reservas_existentes:
-                if reserva.fecha_reserva==fecha_especifica:
-                    r_inicio_time = reserva.hora_inicio.replace(second=0, microsecond=0)
-                    r_fin_time = reserva.hora_fin.replace(second=0, microsecond=0)
-
-                    if (r_inicio_time <= hora_inicio_time and r_fin_time > hora_inicio_time) or \
-                       (r_inicio_time < hora_fin_time and r_fin_time >= hora_fin_time) or \
-                       (r_inicio_time >= hora_inicio_time and r_fin_time <= hora_fin_time):
-
-                        hay_clase_en_fila = True
-                        if reserva.profesor.perfil.id == profesor_obj.perfil.id:
-                            estado_celda.update({
-                                'tipo': 'MI RESERVA',
-                                'color': COLOR_MI_RESERVA,
-                                'texto': "Mi Reserva",
-                                'data_reserva': None,
-                            })
-                        else:
-                            estado_celda.update({
-                                'tipo': 'AULA_RESERVA', 
-                                'color': COLOR_AULA_OCUPADA, 
-                                'texto': f"Reservado ({reserva.profesor.perfil.nombre})",
-                                'data_reserva': None,
-                            })
-                        break
+            if not ocupacion_por_fecha[fecha_especifica] & mascara_fila:
+                fila_data.append(estado_celda)
+                continue
+
+            reserva = indice.reservas_aula.primero((aula_id_a_filtrar, fecha_especifica), inicio_fila, fin_fila)
+            if reserva:
+                hay_clase_en_fila = True
+                if reserva.profesor_id == profesor_obj.perfil_id:
+                    estado_celda.update({
+                        'tipo': 'MI RESERVA',
+                        'color': COLOR_MI_RESERVA,
+                        'texto': "Mi Reserva",
+                        'data_reserva': None,
+                    })
+                else:
+                    estado_celda.update({
+                        'tipo': 'AULA_RESERVA', 
+                        'color': COLOR_AULA_OCUPADA, 
+                        'texto': f"Reservado ({reserva.profesor.perfil.nombre})",
+                        'data_reserva': None,
+                    })
 
             if estado_celda['tipo'] == 'LIBRE': 
-                bloques_aula_rec = mapa_rec_aula.get(dia_semana_str, [])
-                for bloque in bloques_aula_rec:
-                    if (bloque['horaInicio'] <= hora_inicio_time and bloque['horaFin'] > hora_inicio_time) or \
-                       (bloque['horaInicio'] < hora_fin_time and bloque['horaFin'] >= hora_fin_time) or \
-                       (bloque['horaInicio'] >= hora_inicio_time and bloque['horaFin'] <= hora_fin_time):
-
-                        estado_celda.update({
-                            'tipo': 'AULA_FIJA', 
-                            'color': COLOR_AULA_OCUPADA, 
-                            'texto': "Aula Ocupada (Clase Fija)",
-                            'data_reserva': None,
-                        })
-                        break
+                if indice.ocupacion_fija_aula(aula_id_a_filtrar, fecha_especifica) & mascara_fila:
+                    estado_celda.update({
+                        'tipo': 'AULA_FIJA', 
+                        'color': COLOR_AULA_OCUPADA, 
+                        'texto': "Aula Ocupada (Clase Fija)",
+                        'data_reserva': None,
+                    })
 
             if estado_celda['tipo'] == 'LIBRE':
-                bloques_prof_rec = mapa_rec_profesor.get(dia_semana_str,[])
-                for bloque in bloques_prof_rec:
-                    if (bloque['horaInicio'] <= hora_inicio_time and bloque['horaFin'] > hora_inicio_time) or \
-                       (bloque['horaInicio'] < hora_fin_time and bloque['horaFin'] >= hora_fin_time) or \
-                       (bloque['horaInicio'] >= hora_inicio_time and bloque['horaFin'] <= hora_fin_time):
-
-                        estado_celda.update({
-                         'tipo': 'PROFESOR_FIJO', 
-                         'color': COLOR_PROFESOR_OCUPADO, 
-                         'texto': f"Profesor Ocupado (Otra Clase en {bloque.get('aula__id', 'otra aula')})",
-                         'data_reserva': None,
-                        })
-                        break
+                if indice.bloques_profesor.ocupado(dia_semana_str, inicio_fila, fin_fila):
+                    aula_bloque = indice.bloques_profesor.primero(dia_semana_str, inicio_fila, fin_fila)
+                    estado_celda.update({
+                     'tipo': 'PROFESOR_FIJO', 
+                     'color': COLOR_PROFESOR_OCUPADO, 
+                     'texto': f"Profesor Ocupado (Otra Clase en {aula_bloque or 'otra aula'})",
+                     'data_reserva': None,
+                    })
 
             if estado_celda['tipo'] != 'LIBRE':
                 hay_clase_en_fila=True
@@ -2610,20 +2051,19 @@ def horarios_reserva (request):
 
         if not hay_clase_en_fila and horario_consolidado and horario_consolidado[-1]['tipo']=='LIBRE':
             fila_anterior = horario_consolidado[-1]
-            fila_anterior['rango'] = f"{fila_anterior['rango'].split(' - ')[0]} - {hora_fin_time.strftime('%H:%M')}"
+            fila_anterior['rango'] = f"{fila_anterior['rango'].split(' - ')[0]} - {hora_fin_str_fila}"
             for celda in fila_anterior['data']:
                 if celda['data_reserva']: # Si es reservable (LIBRE/PROFESOR_FIJO)
                     # El data_reserva es FECHA|HORA_INICIO|HORA_FIN. Actualizamos el HORA_FIN.
                     parts = celda['data_reserva'].split('|')
-                    celda['data_reserva'] = f"{parts[0]}|{parts[1]}|{dt_fin_fila.strftime('%H:%M')}"
+                    celda['data_reserva'] = f"{parts[0]}|{parts[1]}|{hora_fin_str_fila}"
         else:
             horario_consolidado.append({
                 'rango': rango_hora_str,
                 'data': fila_data, # Contiene el estado de los 10 días
                 'tipo': 'CLASE' if hay_clase_en_fila else 'LIBRE',
             })
-        hora_actual = dt_siguiente
-    dias_para_encabezado = [f"{DIAS_MAP[list(DIAS_MAP.keys())[d.weekday()]]} {d.strftime('%d/%m')}" for d in dias_a_mostrar]
+    dias_para_encabezado = [f"{DIAS_MAP[DIAS_KEYS[d.weekday()]]} {d.strftime('%d/%m')}" for d in dias_a_mostrar]
 
     mis_reservas_recientes = Reserva.objects.filter(
         profesor=profesor_obj,
@@ -2635,9 +2075,52 @@ def horarios_reserva (request):
         'horario_consolidado': horario_consolidado,
         'aula_actual_id': aula_id_a_filtrar,
         'aulas_existentes': aulas_existentes,
+        'dias_semana': DIAS_MAP.items(),
         'mis_reservas_recientes': mis_reservas_recientes,
     })
 
+def buscar_aulas_libres(request):
+    """
+    Búsqueda de ventanas libres en todas las aulas (JSON).
+    ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&duracion=<minutos>&tipo=AULA_NORMAL|LABORATORIO
+    Sin fechas se buscan las próximas 2 semanas; sin tipo, todas las aulas.
+    """
+    profesor_obj, response = check_professor_auth(request)
+    if response: return response
+
+    hoy = date.today()
+    try:
+        desde = date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else hoy
+        hasta = date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta') else desde + timedelta(days=13)
+    except ValueError:
+        return JsonResponse({'ok': False, 'msg': 'Formato de fecha inválido (use AAAA-MM-DD).'}, status=400)
+    try:
+        duracion = int(request.GET.get('duracion', 60))
+    except ValueError:
+        return JsonResponse({'ok': False, 'msg': 'La duración debe ser un número de minutos.'}, status=400)
+
+    tipo = request.GET.get('tipo') or None
+    if tipo and tipo not in dict(Aula.TIPO_CHOICES):
+        return JsonResponse({'ok': False, 'msg': f'Tipo de aula inválido: {tipo}.'}, status=400)
+    if hasta < desde:
+        return JsonResponse({'ok': False, 'msg': 'La fecha final debe ser posterior a la inicial.'}, status=400)
+    if (hasta - desde).days >= MAX_DIAS_BUSQUEDA:
+        return JsonResponse({'ok': False, 'msg': f'El rango de búsqueda no puede superar {MAX_DIAS_BUSQUEDA} días.'}, status=400)
+    if not 0 < duracion <= JORNADA_FIN - JORNADA_INICIO:
+        return JsonResponse({'ok': False, 'msg': 'Duración fuera de la jornada (07:00 - 20:10).'}, status=400)
+
+    ventanas, semanas_completas = buscar_ventanas_libres(profesor_obj, desde, hasta, duracion, tipo=tipo, hoy=hoy)
+
+    return JsonResponse({
+        'ok': True,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'duracion': duracion,
+        'ventanas': ventanas,
+        # Semanas (lunes) en las que ya se alcanzó el límite de reservas
+        'semanas_sin_cupo': [lunes.isoformat() for lunes in semanas_completas],
+    })
+
 def cancelar_reserva(request):
     profesor_obj, response = check_professor_auth(request)
     if response: return response
@@ -2678,8 +2161,6 @@ def reservar_aula(request):
     contexto = {'perfil': profesor_obj.perfil, 'titulo': 'Reserva de Aulas'}
     return render(request, 'usuarios/profesor/reservar_aula.html', contexto)
 
-CAMPOS_NOTA = ['EP1', 'EC1', 'EP2', 'EC2', 'EP3', 'EC3'] 
-
 def subida_notas(request):
     """
     Vista principal para la carga de notas y visualización de estadísticas, 
@@ -2710,7 +2191,7 @@ def subida_notas(request):
             
         try:
             # Obtener el grupo e incluir la relación para verificar si es laboratorio
-            grupo = GrupoCurso.objects.select_related('grupolaboratorio').get(id=grupo_id_post, profesor=profesor_obj)
+            grupo = GrupoCurso.objects.select_related('curso', 'grupolaboratorio').get(id=grupo_id_post, profesor=profesor_obj)
             
             # **VERIFICACIÓN DE SEGURIDAD CLAVE**
             if hasattr(grupo, 'grupolaboratorio') and grupo.grupolaboratorio is not None:
@@ -2718,57 +2199,24 @@ def subida_notas(request):
                 return redirect(f"{request.path}?grupo={grupo_id_post}")
             # **FIN VERIFICACIÓN DE SEGURIDAD**
 
+            # Carga en bloque: una consulta para leer las matrículas del grupo
+            # y un solo bulk_update con las notas que cambiaron.
             with transaction.atomic():
-                updated_count = 0
-                for key, value in request.POST.items():
-                    if key.startswith('nota_'):
-                        parts = key.split('_')
-                        if len(parts) == 3:
-                            estudiante_id = parts[1]
-                            campo_nota = parts[2]
-                            
-                            if campo_nota in CAMPOS_NOTA:
-                                try:
-                                    matricula = Matricula.objects.get(grupo_curso=grupo, estudiante__perfil__id=estudiante_id)
-                                    
-                                    value_strip = value.strip()
-                                    nota_float = None 
-
-                                    if value_strip != '':
-                                        nota_float = float(value_strip)
-                                        if not (0 <= nota_float <= 20):
-                                            messages.error(request, f"Nota fuera de rango (0-20) para CUI {estudiante_id} en {campo_nota}.")
-                                            continue 
-                                            
-                                    current_value = getattr(matricula, campo_nota)
-                                    should_update = False
-                                    
-                                    # Lógica de comparación de valores
-                                    if current_value != nota_float:
-                                         if current_value is None and nota_float is not None:
-                                            should_update = True
-                                         elif current_value is not None and nota_float is None:
-                                            should_update = True
-                                         elif current_value is not None and nota_float is not None:
-                                            if abs(current_value - nota_float) > 0.01:
-                                                should_update = True
-
-                                    if should_update:
-                                        setattr(matricula, campo_nota, nota_float)
-                                        matricula.save()
-                                        updated_count += 1
-                                            
-                                except ObjectDoesNotExist:
-                                    messages.error(request, f"Matrícula no encontrada para CUI {estudiante_id} en este grupo.")
-                                    pass 
-                                except ValueError:
-                                    messages.error(request, f"Formato de nota inválido para CUI {estudiante_id} en {campo_nota}.")
-                                    pass 
-
-                if updated_count > 0:
-                    messages.success(request, f"¡{updated_count} notas actualizadas con éxito para el grupo {grupo.curso.id}!")
-                else:
-                    messages.info(request, "No se detectaron cambios en las notas enviadas.")
+                updated_count, errores = guardar_notas_grupo(grupo, leer_celdas_nota(request.POST))
+
+            # bulk_update no dispara señales: se recalcula el resumen académico del grupo
+            if updated_count > 0:
+                actualizar_resumenes(
+                    Matricula.objects.filter(grupo_curso=grupo).values_list('estudiante_id', flat=True)
+                )
+
+            for error in errores:
+                messages.error(request, error)
+
+            if updated_count > 0:
+                messages.success(request, f"¡{updated_count} notas actualizadas con éxito para el grupo {grupo.curso.id}!")
+            elif not errores:
+                messages.info(request, "No se detectaron cambios en las notas enviadas.")
 
             return redirect(f"{request.path}?grupo={grupo_id_post}")
 
@@ -2862,177 +2310,12 @@ def dashboard_secretaria(request):
     if response:
         return response
     
-    from django.db.models import Count, Q, Sum, Avg
-    from django.utils import timezone
-    from datetime import date, timedelta
-    
-    # =============================================
-    # 1. CONTEOS BÁSICOS
-    # =============================================
-    conteo_profesores = Profesor.objects.count()
-    conteo_estudiantes = Estudiante.objects.count()
-    conteo_cursos = Curso.objects.count()
-    conteo_aulas = Aula.objects.count()
-    
-    # =============================================
-    # 2. ESTADÍSTICAS DE MATRÍCULAS
-    # =============================================
-    # Total de matrículas activas (estado=True)
-    total_matriculas = Matricula.objects.filter(estado=True).count()
-    
-    # Matrículas por tipo (Teoría vs Laboratorio)
-    matriculas_teoria = Matricula.objects.filter(
-        estado=True,
-        grupo_curso__grupoteoria__isnull=False
-    ).count()
-    
-    matriculas_lab = MatriculaLaboratorio.objects.count()
-    
-    # =============================================
-    # 3. ESTADÍSTICAS DE HORARIOS
-    # =============================================
-    # Total de bloques de horario asignados
-    total_bloques = BloqueHorario.objects.count()
-    
-    # Bloques por tipo de aula
-    bloques_aula_normal = BloqueHorario.objects.filter(
-        aula__tipo='AULA_NORMAL'
-    ).count()
-    
-    bloques_laboratorio = BloqueHorario.objects.filter(
-        aula__tipo='LABORATORIO'
-    ).count()
-    
-    # =============================================
-    # 4. ESTADÍSTICAS DE RESERVAS (semana actual: Lunes a Viernes)
-    # =============================================
-    hoy = date.today()
-    
-    # Calcular el lunes de la semana actual (0=Lunes, 6=Domingo)
-    dias_hasta_lunes = hoy.weekday()  # 0 para lunes, 1 para martes, etc.
-    lunes_semana_actual = hoy - timedelta(days=dias_hasta_lunes)
-    
-    # Calcular el viernes de esta semana
-    dias_hasta_viernes = 4 - hoy.weekday()  # 0 si es viernes, positivo si es antes
-    if dias_hasta_viernes < 0:
-        # Si ya pasó el viernes, ir al viernes de la siguiente semana
-        dias_hasta_viernes += 7
-    viernes_semana_actual = hoy + timedelta(days=dias_hasta_viernes)
-    
-    # Para estadísticas de "Actividad Reciente", usamos desde el lunes de esta semana
-    # hasta el viernes de esta semana
-    fecha_inicio_semana = lunes_semana_actual
-    fecha_fin_semana = viernes_semana_actual
-    
-    reservas_semana = Reserva.objects.filter(
-        fecha_reserva__range=[fecha_inicio_semana, fecha_fin_semana]
-    ).count()
-    
-    # Reservas para hoy
-    reservas_hoy = Reserva.objects.filter(fecha_reserva=hoy).count()
-    
-    # =============================================
-    # 5. ESTADÍSTICAS DE ASISTENCIA (semana actual: Lunes a Viernes)
-    # =============================================
-    asistencia_semana = RegistroAsistencia.objects.filter(
-        fechaClase__range=[fecha_inicio_semana, fecha_fin_semana]
-    ).count()
-    
-    # Porcentaje promedio de asistencia
-    if asistencia_semana > 0:
-        total_estudiantes_asistencia = RegistroAsistenciaDetalle.objects.filter(
-            registro_asistencia__fechaClase__range=[fecha_inicio_semana, fecha_fin_semana]
-        ).count()
-        
-        presentes = RegistroAsistenciaDetalle.objects.filter(
-            registro_asistencia__fechaClase__range=[fecha_inicio_semana, fecha_fin_semana],
-            estado='PRESENTE'
-        ).count()
-        
-        porcentaje_asistencia = (presentes / total_estudiantes_asistencia * 100) if total_estudiantes_asistencia > 0 else 0
-    else:
-        porcentaje_asistencia = 0
-    
-    # =============================================
-    # 6. INFORMACIÓN DE GRUPOS ACTIVOS
-    # =============================================
-    # Grupos con profesor asignado
-    grupos_con_profesor = GrupoCurso.objects.filter(profesor__isnull=False).count()
-    grupos_sin_profesor = GrupoCurso.objects.filter(profesor__isnull=True).count()
-    
-    # Distribución por tipo de grupo
-    grupos_teoria = GrupoTeoria.objects.count()
-    grupos_laboratorio = GrupoLaboratorio.objects.count()
-    
-    # =============================================
-    # 7. TOP 5 CURSOS CON MÁS MATRÍCULAS
-    # =============================================
-    top_cursos = Curso.objects.annotate(
-        total_matriculas=Count('grupocurso__matricula', filter=Q(grupocurso__matricula__estado=True))
-    ).order_by('-total_matriculas')[:5]
-    
-    # =============================================
-    # 8. AULAS MÁS UTILIZADAS
-    # =============================================
-    aulas_populares = Aula.objects.annotate(
-        total_bloques=Count('bloquehorario')
-    ).order_by('-total_bloques')[:5]
-    
-    # =============================================
-    # 9. PROFESORES MÁS ACTIVOS (por cantidad de grupos)
-    # =============================================
-    profesores_activos = Profesor.objects.annotate(
-        total_grupos=Count('grupocurso')
-    ).order_by('-total_grupos')[:5]
-
-    cantidad_profesores_con_grupos = Profesor.objects.annotate(
-        total_grupos=Count('grupocurso')
-    ).filter(total_grupos__gt=0).count()
-    
+    # Las métricas se leen del cache 'dashboard' y solo se recalculan las
+    # secciones invalidadas por cambios en los modelos (ver usuarios/metricas.py)
     contexto = {
         'perfil': secretaria_obj.perfil,
         'titulo': 'Panel de Control - Secretaría',
-        
-        # Conteos básicos
-        'conteo_profesores': conteo_profesores,
-        'conteo_estudiantes': conteo_estudiantes,
-        'conteo_cursos': conteo_cursos,
-        'conteo_aulas': conteo_aulas,
-        
-        # Matrículas
-        'total_matriculas': total_matriculas,
-        'matriculas_teoria': matriculas_teoria,
-        'matriculas_lab': matriculas_lab,
-        
-        # Horarios
-        'total_bloques': total_bloques,
-        'bloques_aula_normal': bloques_aula_normal,
-        'bloques_laboratorio': bloques_laboratorio,
-        
-        # Reservas
-        'reservas_semana': reservas_semana,
-        'reservas_hoy': reservas_hoy,
-        
-        # Asistencia
-        'asistencia_semana': asistencia_semana,
-        'porcentaje_asistencia': round(porcentaje_asistencia, 1),
-        
-        # Grupos
-        'grupos_con_profesor': grupos_con_profesor,
-        'grupos_sin_profesor': grupos_sin_profesor,
-        'grupos_teoria': grupos_teoria,
-        'grupos_laboratorio': grupos_laboratorio,
-        
-        # Listados
-        'top_cursos': top_cursos,
-        'aulas_populares': aulas_populares,
-        'profesores_activos': profesores_activos,
-        'profesores_grupos_asignados': cantidad_profesores_con_grupos,
-        
-        # Fechas para referencia - Ahora muestra "Lunes Actual - Viernes Actual"
-        'hoy': hoy.strftime('%d/%m/%Y'),
-        'semana_pasada': fecha_inicio_semana.strftime('%d/%m/%Y'),  # Lunes de esta semana
-        'viernes_semana': fecha_fin_semana.strftime('%d/%m/%Y'),    # Viernes de esta semana
+        **obtener_metricas_dashboard(),
     }
     
     return render(request, 'usuarios/secretaria/dashboard_secretaria.html', contexto)
@@ -3277,64 +2560,8 @@ def gestion_cursos(request):
                                 curso = Curso.objects.get(id=curso_id)
                                 capacidad_int = int(capacidad)
                                 
-                                # 3. Validar cada horario
-                                for i, h in enumerate(horarios, 1):
-                                    try:
-                                        aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    except ObjectDoesNotExist:
-                                        raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                    
-                                    # Validar campos requeridos
-                                    if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                        raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                    
-                                    # Convertir tiempos
-                                    try:
-                                        inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                        fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                    except ValueError:
-                                        raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                    
-                                    # Validar que inicio < fin
-                                    if inicio_time >= fin_time:
-                                        raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                    
-                                    # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                    horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                        aula=aula_obj,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_cruzados_aula.exists():
-                                        conflicto = horarios_cruzados_aula.first()
-                                        curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto.grupo_curso.grupo
-                                        raise ValueError(
-                                            f"Conflicto de horario en aula {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                            f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                        )
-                                    
-                                    # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                    if profesor:
-                                        # Buscar horarios donde el docente ya tenga clases asignadas
-                                        horarios_docente = BloqueHorario.objects.filter(
-                                            grupo_curso__profesor=profesor,
-                                            dia=h['dia']
-                                        ).exclude(
-                                            Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                        )
-                                        
-                                        if horarios_docente.exists():
-                                            conflicto_docente = horarios_docente.first()
-                                            curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                            grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                            aula_conflicto = conflicto_docente.aula.id
-                                            raise ValueError(
-                                                f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                                f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                            )
+                                # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                                bloques = validar_bloques(horarios, profesor)
 
                                 # 4. Crear el GrupoCurso base
                                 nuevo_grupo = GrupoCurso.objects.create(
@@ -3349,15 +2576,7 @@ def gestion_cursos(request):
                                 GrupoTeoria.objects.create(grupo_curso=nuevo_grupo)
                                 
                                 # 6. Crear los Bloques de Horario
-                                for h in horarios:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    BloqueHorario.objects.create(
-                                        dia=h['dia'],
-                                        horaInicio=h['inicio'],
-                                        horaFin=h['fin'],
-                                        grupo_curso=nuevo_grupo,
-                                        aula=aula_obj
-                                    )
+                                crear_bloques(nuevo_grupo, bloques)
                             
                             messages.success(request, f"Grupo de teoría {letra_grupo} creado exitosamente.")
 
@@ -3398,88 +2617,16 @@ def gestion_cursos(request):
                             profesor = Profesor.objects.get(perfil__id=profesor_id) if profesor_id else None
                             capacidad_int = int(capacidad) # Si no es un entero, lanza ValueError
                             
-                            # 3. Validar cada horario antes de eliminar los existentes
-                            for i, h in enumerate(horarios, 1):
-                                try:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                except ObjectDoesNotExist:
-                                    raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                
-                                # Validar campos requeridos
-                                if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                    raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                
-                                # Convertir tiempos
-                                try:
-                                    inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                    fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                except ValueError:
-                                    raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                
-                                # Validar que inicio < fin
-                                if inicio_time >= fin_time:
-                                    raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                
-                                # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                # Excluir los horarios del grupo actual que estamos editando
-                                horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                    aula=aula_obj,
-                                    dia=h['dia']
-                                ).exclude(
-                                    grupo_curso=grupo_curso  # Excluir los horarios del grupo actual
-                                ).exclude(
-                                    Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                )
-                                
-                                if horarios_cruzados_aula.exists():
-                                    conflicto = horarios_cruzados_aula.first()
-                                    curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                    grupo_conflicto = conflicto.grupo_curso.grupo
-                                    raise ValueError(
-                                        f"Conflicto de horario en aula {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                        f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                    )
-                                
-                                # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                if profesor:
-                                    # Buscar horarios donde el docente ya tenga clases asignadas
-                                    # Excluir los horarios del grupo actual que estamos editando
-                                    horarios_docente = BloqueHorario.objects.filter(
-                                        grupo_curso__profesor=profesor,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        grupo_curso=grupo_curso  # Excluir los horarios del grupo actual
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_docente.exists():
-                                        conflicto_docente = horarios_docente.first()
-                                        curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                        aula_conflicto = conflicto_docente.aula.id
-                                        raise ValueError(
-                                            f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                            f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                        )
+                            # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                            bloques = validar_bloques(horarios, profesor, excluir_grupo=grupo_curso)
 
                             # 4. Actualizar datos básicos
                             grupo_curso.profesor = profesor
                             grupo_curso.capacidad = capacidad_int
                             grupo_curso.save()
                             
-                            # 5. Actualizar horarios: Estrategia de reemplazo total (Borrar y crear)
-                            BloqueHorario.objects.filter(grupo_curso=grupo_curso).delete()
-                            
-                            for h in horarios:
-                                aula_obj = Aula.objects.get(id=h['aula_id'])
-                                BloqueHorario.objects.create(
-                                    dia=h['dia'],
-                                    horaInicio=h['inicio'],
-                                    horaFin=h['fin'],
-                                    grupo_curso=grupo_curso,
-                                    aula=aula_obj
-                                )
+                            # 5. Actualizar horarios: reemplazo total (borrar e insertar en bloque)
+                            crear_bloques(grupo_curso, bloques, reemplazar=True)
                         
                         messages.success(request, "Grupo actualizado correctamente.")
                     
@@ -3565,12 +2712,13 @@ def ver_horarios_clases(request):
                 
                 # Obtener todas las actividades para esta aula
                 horario_completo = []
-                puntos_corte = set()
                 
                 # 1. OBTENER CLASES REGULARES (GrupoCurso con BloqueHorario)
                 bloques_clases = BloqueHorario.objects.filter(aula=aula).select_related(
                     'grupo_curso__curso',
-                    'grupo_curso__profesor__perfil'
+                    'grupo_curso__profesor__perfil',
+                    'grupo_curso__grupoteoria',
+                    'grupo_curso__grupolaboratorio'
                 ).order_by('horaInicio')
                 
                 print(f"DEBUG - Total bloques encontrados: {bloques_clases.count()}")
@@ -3610,10 +2758,6 @@ def ver_horarios_clases(request):
                         'tipo': tipo
                     })
                     
-                    # Agregar puntos de corte (sin segundos/microsegundos)
-                    puntos_corte.add(bloque.horaInicio.replace(second=0, microsecond=0))
-                    puntos_corte.add(bloque.horaFin.replace(second=0, microsecond=0))
-                    
                     # Asignar color al curso
                     curso_id = bloque.grupo_curso.curso.id
                     if curso_id not in curso_colores:
@@ -3656,139 +2800,61 @@ def ver_horarios_clases(request):
                             'motivo': "RESERVA",
                             'tipo': 'RES'
                         })
-                        
-                        # Agregar puntos de corte
-                        puntos_corte.add(reserva.hora_inicio.replace(second=0, microsecond=0))
-                        puntos_corte.add(reserva.hora_fin.replace(second=0, microsecond=0))
                 
                 print(f"DEBUG - Total actividades: {len(horario_completo)}")
-                print(f"DEBUG - Puntos de corte: {len(puntos_corte)}")
                 
                 # ======================================================================
-                # GENERAR HORAS DINÁMICAS
+                # GENERAR HORAS Y ESTRUCTURAR DATOS DEL HORARIO
                 # ======================================================================
-                # Convertir puntos de corte de 'time' a 'datetime'
-                dummy_date = hoy
-                puntos_corte_dt = sorted(list(set([
-                    datetime.combine(dummy_date, t) for t in puntos_corte
-                ])))
-                
-                # Crear intervalos de hora
-                horas = []
-                hora_actual = None
-                
-                for dt_siguiente in puntos_corte_dt:
-                    if hora_actual is None:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    dt_inicio_fila = hora_actual
-                    dt_fin_fila = dt_siguiente
-
-                    duracion_minutos = (dt_fin_fila - dt_inicio_fila).total_seconds() / 60
-                    if duracion_minutos < 11:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    if dt_inicio_fila >= dt_fin_fila:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    # Formatear rango de hora
-                    hora_inicio_str = dt_inicio_fila.strftime("%H:%M")
-                    hora_fin_str = dt_fin_fila.strftime("%H:%M")
-                    horas.append(f"{hora_inicio_str} - {hora_fin_str}")
-                    
-                    hora_actual = dt_siguiente
-                
-                # Si no hay actividades, usar horas por defecto
-                if not horas:
-                    hora_actual = datetime.strptime('07:00', '%H:%M')
-                    hora_final = datetime.strptime('21:00', '%H:%M')
-                    
-                    while hora_actual < hora_final:
-                        hora_str = hora_actual.strftime('%H:%M')
-                        hora_siguiente = hora_actual + timedelta(hours=1)
-                        horas.append(f"{hora_str} - {hora_siguiente.strftime('%H:%M')}")
-                        hora_actual = hora_siguiente
+                horas, actividades_por_celda = grilla_actividades(horario_completo)
                 
                 print(f"DEBUG - Horas generadas: {horas}")
                 
-                # ======================================================================
-                # ESTRUCTURAR DATOS DEL HORARIO
-                # ======================================================================
-                dias = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
                 horario_data = {}
-                
-                # Para cada intervalo de hora
-                for hora_idx, rango_hora in enumerate(horas):
-                    hora_inicio_str, hora_fin_str = rango_hora.split(" - ")
-                    
-                    # Convertir a datetime para comparar
-                    try:
-                        hora_inicio_dt = datetime.strptime(hora_inicio_str, "%H:%M").time()
-                        hora_fin_dt = datetime.strptime(hora_fin_str, "%H:%M").time()
-                    except:
-                        # Si hay error, saltar este intervalo
-                        continue
-                    
+                for hora_idx, fila in enumerate(actividades_por_celda):
                     horario_data[str(hora_idx)] = {}
                     
-                    # Para cada día
-                    for dia_idx, dia_key in enumerate(dias):
+                    for dia_idx, actividad in enumerate(fila):
                         actividad_en_slot = None
                         
-                        # Buscar actividad que coincida en este slot
-                        for actividad in horario_completo:
-                            # Verificar si es el día correcto
-                            if actividad['dia'] != dia_key:
-                                continue
-                            
-                            # Verificar si la actividad cubre este intervalo
-                            actividad_inicio = actividad['horaInicio']
-                            actividad_fin = actividad['horaFin']
+                        if actividad is None:
+                            pass
+                        
+                        # Es una clase regular
+                        elif actividad['tipo_actividad'] == 'CLASE':
+                            curso = actividad['curso']
+                            curso_id = str(curso.id)
                             
-                            if actividad_inicio <= hora_inicio_dt and actividad_fin > hora_inicio_dt:
-                                print(f"DEBUG - ¡COINCIDE! Actividad encontrada para {dia_key} {rango_hora}")
-                                
-                                # Es una clase regular
-                                if actividad['tipo_actividad'] == 'CLASE':
-                                    curso = actividad['curso']
-                                    curso_id = str(curso.id)
-                                    
-                                    actividad_en_slot = {
-                                        'tipo': actividad['tipo'],
-                                        'nombre': curso.nombre,
-                                        'codigo_curso': curso_id,
-                                        'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': curso_colores.get(curso_id, 'bg-secondary'),
-                                        'hora_inicio': actividad_inicio.strftime("%H:%M:%S"),
-                                        'hora_fin': actividad_fin.strftime("%H:%M:%S"),
-                                        'es_reserva': False
-                                    }
-                                
-                                # Es una reserva
-                                else:
-                                    actividad_en_slot = {
-                                        'tipo': 'RES',
-                                        'nombre': actividad.get('motivo', 'Reserva de Aula'),
-                                        'codigo_curso': 'RES',
-                                        'codigo_grupo': 'RESERVA',
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': 'bg-secondary',
-                                        'hora_inicio': actividad_inicio.strftime("%H:%M:%S"),
-                                        'hora_fin': actividad_fin.strftime("%H:%M:%S"),
-                                        'es_reserva': True,
-                                        'motivo': actividad.get('motivo', '')
-                                    }
-                                break
+                            actividad_en_slot = {
+                                'tipo': actividad['tipo'],
+                                'nombre': curso.nombre,
+                                'codigo_curso': curso_id,
+                                'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
+                                'profesor': actividad['profesor_nombre'],
+                                'aula_id': aula.id,
+                                'color': curso_colores.get(curso_id, 'bg-secondary'),
+                                'hora_inicio': actividad['horaInicio'].strftime("%H:%M:%S"),
+                                'hora_fin': actividad['horaFin'].strftime("%H:%M:%S"),
+                                'es_reserva': False
+                            }
+                        
+                        # Es una reserva
+                        else:
+                            actividad_en_slot = {
+                                'tipo': 'RES',
+                                'nombre': actividad.get('motivo', 'Reserva de Aula'),
+                                'codigo_curso': 'RES',
+                                'codigo_grupo': 'RESERVA',
+                                'profesor': actividad['profesor_nombre'],
+                                'aula_id': aula.id,
+                                'color': 'bg-secondary',
+                                'hora_inicio': actividad['horaInicio'].strftime("%H:%M:%S"),
+                                'hora_fin': actividad['horaFin'].strftime("%H:%M:%S"),
+                                'es_reserva': True,
+                                'motivo': actividad.get('motivo', '')
+                            }
                         
                         horario_data[str(hora_idx)][str(dia_idx)] = actividad_en_slot
-                        if actividad_en_slot:
-                            print(f"DEBUG - Asignado: [{hora_idx}][{dia_idx}] = {actividad_en_slot['nombre']}")
                 
                 return JsonResponse({
                     'ok': True,
@@ -3815,249 +2881,23 @@ def ver_horarios_clases(request):
             
             try:
                 aula = Aula.objects.get(id=aula_id)
-                
-                # USAR LA MISMA LÓGICA QUE EN LA VISTA PRINCIPAL
-                from django.utils import timezone
                 hoy = date.today()
-                inicio_semana = hoy - timedelta(days=hoy.weekday())
-                fin_semana = inicio_semana + timedelta(days=4)
-                
-                # 1. Obtener datos EXACTAMENTE como en la vista principal
-                COLOR_OPTIONS = ['bg-primary', 'bg-success', 'bg-info', 'bg-warning', 'bg-danger', 'bg-secondary']
-                curso_colores = {}
-                color_index = 0
-                
-                horario_completo = []
-                puntos_corte = set()
-                
-                # BloqueHorario para esta aula
-                bloques_clases = BloqueHorario.objects.filter(aula=aula).select_related(
-                    'grupo_curso__curso',
-                    'grupo_curso__profesor__perfil'
-                ).order_by('horaInicio')
-                
-                for bloque in bloques_clases:
-                    tipo = "TEO"
-                    try:
-                        bloque.grupo_curso.grupoteoria
-                    except:
-                        tipo = "LAB"
-                    
-                    profesor_nombre = ""
-                    if bloque.grupo_curso.profesor and bloque.grupo_curso.profesor.perfil:
-                        profesor_nombre = bloque.grupo_curso.profesor.perfil.nombre
-                    
-                    horario_completo.append({
-                        'tipo_actividad': 'CLASE',
-                        'bloque': bloque,
-                        'horaInicio': bloque.horaInicio,
-                        'horaFin': bloque.horaFin,
-                        'dia': bloque.dia,
-                        'curso': bloque.grupo_curso.curso,
-                        'profesor_nombre': profesor_nombre,
-                        'grupo': bloque.grupo_curso.grupo,
-                        'tipo': tipo
-                    })
-                    
-                    puntos_corte.add(bloque.horaInicio.replace(second=0, microsecond=0))
-                    puntos_corte.add(bloque.horaFin.replace(second=0, microsecond=0))
-                    
-                    curso_id = bloque.grupo_curso.curso.id
-                    if curso_id not in curso_colores:
-                        curso_colores[curso_id] = COLOR_OPTIONS[color_index % len(COLOR_OPTIONS)]
-                        color_index += 1
-                
-                # Reservas
-                reservas = Reserva.objects.filter(
-                    aula=aula,
-                    fecha_reserva__range=[inicio_semana, fin_semana]
-                ).select_related('profesor__perfil')
-                
-                for reserva in reservas:
-                    profesor_nombre = ""
-                    if reserva.profesor and reserva.profesor.perfil:
-                        profesor_nombre = reserva.profesor.perfil.nombre
-                    
-                    dia_semana = reserva.fecha_reserva.weekday()
-                    dias_semana = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
-                    dia = dias_semana[dia_semana] if dia_semana < 5 else None
-                    
-                    if dia:
-                        horario_completo.append({
-                            'tipo_actividad': 'RESERVA',
-                            'reserva': reserva,
-                            'horaInicio': reserva.hora_inicio,
-                            'horaFin': reserva.hora_fin,
-                            'dia': dia,
-                            'curso': None,
-                            'profesor_nombre': profesor_nombre,
-                            'motivo': 'RESERVA',
-                            'tipo': 'RES'
-                        })
-                        
-                        puntos_corte.add(reserva.hora_inicio.replace(second=0, microsecond=0))
-                        puntos_corte.add(reserva.hora_fin.replace(second=0, microsecond=0))
-                
-                # 2. Generar horas dinámicas (MISMA LÓGICA)
-                dummy_date = hoy
-                puntos_corte_dt = sorted(list(set([
-                    datetime.combine(dummy_date, t) for t in puntos_corte
-                ])))
-                
-                horas = []
-                hora_actual = None
-                
-                for dt_siguiente in puntos_corte_dt:
-                    if hora_actual is None:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    dt_inicio_fila = hora_actual
-                    dt_fin_fila = dt_siguiente
-
-                    duracion_minutos = (dt_fin_fila - dt_inicio_fila).total_seconds() / 60
-                    if duracion_minutos < 11:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    if dt_inicio_fila >= dt_fin_fila:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    hora_inicio_str = dt_inicio_fila.strftime("%H:%M")
-                    hora_fin_str = dt_fin_fila.strftime("%H:%M")
-                    horas.append(f"{hora_inicio_str} - {hora_fin_str}")
-                    
-                    hora_actual = dt_siguiente
-                
-                if not horas:
-                    hora_actual = datetime.strptime('07:00', '%H:%M')
-                    hora_final = datetime.strptime('21:00', '%H:%M')
-                    
-                    while hora_actual < hora_final:
-                        hora_str = hora_actual.strftime('%H:%M')
-                        hora_siguiente = hora_actual + timedelta(hours=1)
-                        horas.append(f"{hora_str} - {hora_siguiente.strftime('%H:%M')}")
-                        hora_actual = hora_siguiente
-                
-                print(f"PDF DEBUG - Horas dinámicas: {len(horas)} intervalos")
-                print(f"PDF DEBUG - Primeras horas: {horas[:3]}")
-                
-                # 3. Estructurar datos (MISMA LÓGICA)
-                dias = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
-                dias_display = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
-                horario_data = {}
-                
-                # Para cada intervalo de hora
-                for hora_idx, rango_hora in enumerate(horas):
-                    hora_inicio_str, hora_fin_str = rango_hora.split(" - ")
-                    
-                    try:
-                        hora_inicio_dt = datetime.strptime(hora_inicio_str, "%H:%M").time()
-                        hora_fin_dt = datetime.strptime(hora_fin_str, "%H:%M").time()
-                    except:
-                        continue
-                    
-                    horario_data[str(hora_idx)] = {}
-                    
-                    # Para cada día
-                    for dia_idx, dia_key in enumerate(dias):
-                        actividad_en_slot = None
-                        
-                        # Buscar actividad que coincida en este slot
-                        for actividad in horario_completo:
-                            # Verificar si es el día correcto
-                            if actividad['dia'] != dia_key:
-                                continue
-                            
-                            # Convertir horas de actividad
-                            act_inicio = datetime.combine(dummy_date, actividad['horaInicio'])
-                            act_fin = datetime.combine(dummy_date, actividad['horaFin'])
-                            hora_inicio_dt_full = datetime.combine(dummy_date, hora_inicio_dt)
-                            
-                            # MISMA LÓGICA EXACTA: act_inicio <= hora_inicio_dt_full AND act_fin > hora_inicio_dt_full
-                            if act_inicio <= hora_inicio_dt_full and act_fin > hora_inicio_dt_full:
-                                
-                                # Es una clase regular
-                                if actividad['tipo_actividad'] == 'CLASE':
-                                    curso = actividad['curso']
-                                    curso_id = str(curso.id)
-                                    
-                                    actividad_en_slot = {
-                                        'tipo': actividad['tipo'],
-                                        'nombre': curso.nombre,
-                                        'codigo_curso': curso_id,
-                                        'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': curso_colores.get(curso_id, 'bg-secondary'),
-                                        'hora_inicio': actividad['horaInicio'].strftime("%H:%M"),
-                                        'hora_fin': actividad['horaFin'].strftime("%H:%M"),
-                                        'es_reserva': False
-                                    }
-                                
-                                # Es una reserva
-                                else:
-                                    actividad_en_slot = {
-                                        'tipo': 'RES',
-                                        'nombre': actividad.get('motivo', 'Reserva de Aula'),
-                                        'codigo_curso': 'RES',
-                                        'codigo_grupo': 'RESERVA',
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': 'bg-secondary',
-                                        'hora_inicio': actividad['horaInicio'].strftime("%H:%M"),
-                                        'hora_fin': actividad['horaFin'].strftime("%H:%M"),
-                                        'es_reserva': True,
-                                        'motivo': actividad.get('motivo', '')
-                                    }
-                                break
-                        
-                        horario_data[str(hora_idx)][str(dia_idx)] = actividad_en_slot
-                
-                # DEBUG
-                print(f"PDF DEBUG - Estructura final:")
-                for hora_idx in range(len(horas)):
-                    for dia_idx in range(len(dias)):
-                        celda = horario_data[str(hora_idx)][str(dia_idx)]
-                        if celda:
-                            print(f"  [{hora_idx}][{dia_idx}]: {celda['nombre'][:20]}")
-                
-                curso_colores_map = {}
-                for i, (curso_id, _) in enumerate(curso_colores.items()):
-                    curso_colores_map[str(curso_id)] = f"color-{i % 10}"
 
-                # Preparar contexto
-                contexto = {
-                    'aula': aula,
-                    'horas': horas,
-                    'horas_range': range(len(horas)),
-                    'num_horas': len(horas),
-                    'dias': dias_display,
-                    'dias_range': range(len(dias)),
-                    'horario_data': horario_data,
-                    'curso_colores_map': curso_colores_map,
-                    'fecha_emision': hoy.strftime("%d/%m/%Y"),
-                    'semana_actual': f"{inicio_semana.strftime('%d/%m')} - {fin_semana.strftime('%d/%m')}"
-                }
-                
-                # Renderizar template
-                html_string = render_to_string('usuarios/secretaria/horario_aula_pdf.html', contexto)
-                
-                # Crear PDF
-                response = HttpResponse(content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="horario_aula_{aula.id}_{hoy.strftime("%Y%m%d")}.pdf"'
-                
-                pisa_status = pisa.CreatePDF(
-                    html_string, 
-                    dest=response,
-                    encoding='UTF-8'
+                # El PDF lo genera el worker `procesar_exportaciones`; aquí solo se encola
+                trabajo = encolar_exportacion(
+                    'HORARIO_AULA_PDF',
+                    {'aula_id': aula.id, 'fecha': hoy.isoformat()},
+                    request.session.get('usuario_id'),
+                    f"horario_aula_{aula.id}_{hoy.strftime('%Y%m%d')}.pdf",
                 )
-                
-                if pisa_status.err:
-                    return HttpResponse('Error al generar PDF', status=500)
-                
-                return response
+
+                return JsonResponse({
+                    'ok': True,
+                    'trabajo_id': trabajo.id,
+                    'estado': trabajo.estado,
+                    'url_estado': reverse('usuarios:estado_exportacion', args=[trabajo.id]),
+                    'url_descarga': reverse('usuarios:descargar_exportacion', args=[trabajo.id]),
+                })
                 
             except Aula.DoesNotExist:
                 return JsonResponse({'ok': False, 'msg': 'Aula no encontrada'})
@@ -4236,68 +3076,8 @@ def gestion_laboratorios(request):
                                 if profesor and not profesor.es_lab:
                                     raise ValueError(f"El profesor {profesor.perfil.nombre} no está habilitado para laboratorios.")
                                 
-                                # 3. Validar cada horario
-                                for i, h in enumerate(horarios, 1):
-                                    try:
-                                        aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    except ObjectDoesNotExist:
-                                        raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                    
-                                    # Validar que el aula sea de tipo laboratorio
-                                    if aula_obj.tipo != 'LABORATORIO':
-                                        raise ValueError(f"El aula {aula_obj.id} no es un laboratorio. Solo se pueden usar aulas tipo LABORATORIO.")
-                                    
-                                    # Validar campos requeridos
-                                    if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                        raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                    
-                                    # Convertir tiempos
-                                    try:
-                                        inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                        fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                    except ValueError:
-                                        raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                    
-                                    # Validar que inicio < fin
-                                    if inicio_time >= fin_time:
-                                        raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                    
-                                    # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                    horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                        aula=aula_obj,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_cruzados_aula.exists():
-                                        conflicto = horarios_cruzados_aula.first()
-                                        curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto.grupo_curso.grupo
-                                        raise ValueError(
-                                            f"Conflicto de horario en laboratorio {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                            f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                        )
-                                    
-                                    # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                    if profesor:
-                                        # Buscar horarios donde el docente ya tenga clases asignadas
-                                        horarios_docente = BloqueHorario.objects.filter(
-                                            grupo_curso__profesor=profesor,
-                                            dia=h['dia']
-                                        ).exclude(
-                                            Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                        )
-                                        
-                                        if horarios_docente.exists():
-                                            conflicto_docente = horarios_docente.first()
-                                            curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                            grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                            aula_conflicto = conflicto_docente.aula.id
-                                            raise ValueError(
-                                                f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                                f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                            )
+                                # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                                bloques = validar_bloques(horarios, profesor, solo_laboratorio=True)
 
                                 # 4. Crear el GrupoCurso base
                                 nuevo_grupo = GrupoCurso.objects.create(
@@ -4312,15 +3092,7 @@ def gestion_laboratorios(request):
                                 GrupoLaboratorio.objects.create(grupo_curso=nuevo_grupo)
                                 
                                 # 6. Crear los Bloques de Horario
-                                for h in horarios:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    BloqueHorario.objects.create(
-                                        dia=h['dia'],
-                                        horaInicio=h['inicio'],
-                                        horaFin=h['fin'],
-                                        grupo_curso=nuevo_grupo,
-                                        aula=aula_obj
-                                    )
+                                crear_bloques(nuevo_grupo, bloques)
                             
                             messages.success(request, f"Laboratorio {letra_grupo} creado exitosamente.")
 
@@ -4372,92 +3144,16 @@ def gestion_laboratorios(request):
                             if profesor and not profesor.es_lab:
                                 raise ValueError(f"El profesor {profesor.perfil.nombre} no está habilitado para laboratorios.")
                             
-                            # 3. Validar cada horario antes de eliminar los existentes
-                            for i, h in enumerate(horarios, 1):
-                                try:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                except ObjectDoesNotExist:
-                                    raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                
-                                # Validar que el aula sea de tipo laboratorio
-                                if aula_obj.tipo != 'LABORATORIO':
-                                    raise ValueError(f"El aula {aula_obj.id} no es un laboratorio. Solo se pueden usar aulas tipo LABORATORIO.")
-                                
-                                # Validar campos requeridos
-                                if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                    raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                
-                                # Convertir tiempos
-                                try:
-                                    inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                    fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                except ValueError:
-                                    raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                
-                                # Validar que inicio < fin
-                                if inicio_time >= fin_time:
-                                    raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                
-                                # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                # Excluir los horarios del laboratorio actual que estamos editando
-                                horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                    aula=aula_obj,
-                                    dia=h['dia']
-                                ).exclude(
-                                    grupo_curso=grupo_curso  # Excluir los horarios del laboratorio actual
-                                ).exclude(
-                                    Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                )
-                                
-                                if horarios_cruzados_aula.exists():
-                                    conflicto = horarios_cruzados_aula.first()
-                                    curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                    grupo_conflicto = conflicto.grupo_curso.grupo
-                                    raise ValueError(
-                                        f"Conflicto de horario en laboratorio {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                        f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                    )
-                                
-                                # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                if profesor:
-                                    # Buscar horarios donde el docente ya tenga clases asignadas
-                                    # Excluir los horarios del laboratorio actual que estamos editando
-                                    horarios_docente = BloqueHorario.objects.filter(
-                                        grupo_curso__profesor=profesor,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        grupo_curso=grupo_curso  # Excluir los horarios del laboratorio actual
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_docente.exists():
-                                        conflicto_docente = horarios_docente.first()
-                                        curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                        aula_conflicto = conflicto_docente.aula.id
-                                        raise ValueError(
-                                            f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                            f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                        )
+                            # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                            bloques = validar_bloques(horarios, profesor, excluir_grupo=grupo_curso, solo_laboratorio=True)
 
                             # 4. Actualizar datos básicos
                             grupo_curso.profesor = profesor
                             grupo_curso.capacidad = capacidad_int
                             grupo_curso.save()
                             
-                            # 5. Actualizar horarios: Estrategia de reemplazo total (Borrar y crear)
-                            BloqueHorario.objects.filter(grupo_curso=grupo_curso).delete()
-                            
-                            for h in horarios:
-                                aula_obj = Aula.objects.get(id=h['aula_id'])
-                                BloqueHorario.objects.create(
-                                    dia=h['dia'],
-                                    horaInicio=h['inicio'],
-                                    horaFin=h['fin'],
-                                    grupo_curso=grupo_curso,
-                                    aula=aula_obj
-                                )
+                            # 5. Actualizar horarios: reemplazo total (borrar e insertar en bloque)
+                            crear_bloques(grupo_curso, bloques, reemplazar=True)
                         
                         messages.success(request, "Laboratorio actualizado correctamente.")
                     
@@ -4530,47 +3226,8 @@ def registro_estudiantes(request):
 
             # Convertimos a texto UTF-8
             decoded = file.read().decode("utf-8")
-            reader = csv.reader(decoded.splitlines())
-
-            # Formato esperado (sin encabezados):
-            # cui, nombre, email, password
-            for row in reader:
-                if len(row) < 4:
-                    continue
-
-                cui = row[0].strip()
-                nombre = row[1].strip()
-                email = row[2].strip() if row[2].strip() else None
-                password = row[3].strip()
-
-                if not (cui and nombre and password):
-                    continue  # Campos obligatorios
-
-                # Crear o actualizar Perfil
-                perfil, created = Perfil.objects.get_or_create(
-                    id=cui,
-                    defaults={
-                        "nombre": nombre,
-                        "email": email,
-                        "password": password,
-                        "rol": "ESTUDIANTE",
-                        "estadoCuenta": True
-                    }
-                )
-
-                # Si el perfil ya existe, actualizar nombre/email/password si cambian
-                if not created:
-                    perfil.nombre = nombre
-                    perfil.email = email
-                    perfil.password = password
-                    perfil.rol = "ESTUDIANTE"
-                    perfil.estadoCuenta = True
-                    perfil.save()
-
-                # Crear estudiante si no existe
-                Estudiante.objects.get_or_create(perfil=perfil)
-
-            messages.success(request, "CSV procesado correctamente.")
+            resultado = importar_perfiles(leer_filas_csv(decoded), "ESTUDIANTE")
+            mensajes_importacion(request, resultado)
 
         except Exception as e:
             messages.error(request, f"Error procesando CSV: {str(e)}")
@@ -4805,8 +3462,6 @@ def detalle_estudiante(request):
     ).order_by('-registro_asistencia__fechaClase')[:30]
 
     asistencias = []
-    total_presentes = 0
-    total_faltas = 0
 
     for d in asistencias_qs:
         fecha = d.registro_asistencia.fechaClase.strftime("%Y-%m-%d")
@@ -4814,11 +3469,6 @@ def detalle_estudiante(request):
         curso_nombre = grupo.curso.nombre if grupo and grupo.curso else ''
         estado = d.estado
 
-        if estado == 'PRESENTE':
-            total_presentes += 1
-        else:
-            total_faltas += 1
-
         asistencias.append({
             'fecha': fecha,
             'grupo_id': grupo.id if grupo else '',
@@ -4826,11 +3476,8 @@ def detalle_estudiante(request):
             'estado': estado
         })
 
-    resumen = {
-        'total_matriculas': matriculas_qs.count(),
-        'total_presentes': total_presentes,
-        'total_faltas': total_faltas
-    }
+    # Totales de matrículas y asistencia (todas las sesiones) desde el resumen académico
+    resumen = obtener_resumen(estudiante)
 
     contexto = {
         'perfil': perfil_obj,
@@ -4995,44 +3642,8 @@ def registro_profesores(request):
                 return redirect("usuarios:registro_profesores")
 
             decoded = file.read().decode("utf-8")
-            reader = csv.reader(decoded.splitlines())
-
-            # Formato esperado:
-            # cui, nombre, email, password
-            for row in reader:
-                if len(row) < 4:
-                    continue
-
-                codigo = row[0].strip()
-                nombre = row[1].strip()
-                email = row[2].strip() or None
-                password = row[3].strip()
-
-                if not (codigo and nombre and password):
-                    continue
-
-                perfil, created = Perfil.objects.get_or_create(
-                    id=codigo,
-                    defaults={
-                        "nombre": nombre,
-                        "email": email,
-                        "password": password,
-                        "rol": "PROFESOR",
-                        "estadoCuenta": True
-                    }
-                )
-
-                if not created:
-                    perfil.nombre = nombre
-                    perfil.email = email
-                    perfil.password = password
-                    perfil.rol = "PROFESOR"
-                    perfil.estadoCuenta = True
-                    perfil.save()
-
-                Profesor.objects.get_or_create(perfil=perfil)
-
-            messages.success(request, "CSV procesado correctamente.")
+            resultado = importar_perfiles(leer_filas_csv(decoded), "PROFESOR")
+            mensajes_importacion(request, resultado)
 
         except Exception as e:
             messages.error(request, f"Error procesando CSV: {str(e)}")
@@ -5142,205 +3753,38 @@ def registro_profesores(request):
     return render(request, "usuarios/secretaria/registro_profesores.html", {
         "profesores": profesores,   
         "grupos_disponibles_profesor": grupos_disponibles,
-    })
-
-# ----------------------------------------------------------------------
-# 4. VISTAS DEL ADMINISTRADOR
-# ----------------------------------------------------------------------
-
-def check_administrador_auth(request):
-    """Función de ayuda para verificar la sesión y el rol de Admin."""
-    if not request.session.get('is_authenticated') or request.session.get('usuario_rol') != 'ADMIN':
-        messages.warning(request, "Acceso denegado o rol incorrecto.")
-        return None, redirect('usuarios:selector_rol')
-    
-    usuario_id = request.session['usuario_id']
-    try:
-        admin_obj = Administrador.objects.select_related('perfil').get(perfil_id=usuario_id)
-        return admin_obj, None
-    except Administrador.DoesNotExist:
-        messages.error(request, "Error: Datos de secretaria no encontrados.")
-        return None, redirect('usuarios:logout')
-    
-def dashboard_admin(request):
-    """Muestra la página de inicio del dashboard de Administrador."""
-    admin_obj, response = check_administrador_auth(request)
-    if response:
-        return response
-    
-    from django.db.models import Count, Q, Sum, Avg
-    from django.utils import timezone
-    from datetime import date, timedelta
-    
-    # =============================================
-    # 1. CONTEOS BÁSICOS
-    # =============================================
-    conteo_profesores = Profesor.objects.count()
-    conteo_estudiantes = Estudiante.objects.count()
-    conteo_secretarias = Secretaria.objects.count()
-    conteo_cursos = Curso.objects.count()
-    conteo_aulas = Aula.objects.count()
-    
-    # =============================================
-    # 2. ESTADÍSTICAS DE MATRÍCULAS
-    # =============================================
-    # Total de matrículas activas (estado=True)
-    total_matriculas = Matricula.objects.filter(estado=True).count()
-    
-    # Matrículas por tipo (Teoría vs Laboratorio)
-    matriculas_teoria = Matricula.objects.filter(
-        estado=True,
-        grupo_curso__grupoteoria__isnull=False
-    ).count()
-    
-    matriculas_lab = MatriculaLaboratorio.objects.count()
-    
-    # =============================================
-    # 3. ESTADÍSTICAS DE HORARIOS
-    # =============================================
-    # Total de bloques de horario asignados
-    total_bloques = BloqueHorario.objects.count()
-    
-    # Bloques por tipo de aula
-    bloques_aula_normal = BloqueHorario.objects.filter(
-        aula__tipo='AULA_NORMAL'
-    ).count()
-    
-    bloques_laboratorio = BloqueHorario.objects.filter(
-        aula__tipo='LABORATORIO'
-    ).count()
-    
-    # =============================================
-    # 4. ESTADÍSTICAS DE RESERVAS (semana actual: Lunes a Viernes)
-    # =============================================
-    hoy = date.today()
-    
-    # Calcular el lunes de la semana actual (0=Lunes, 6=Domingo)
-    dias_hasta_lunes = hoy.weekday()  # 0 para lunes, 1 para martes, etc.
-    lunes_semana_actual = hoy - timedelta(days=dias_hasta_lunes)
-    
-    # Calcular el viernes de esta semana
-    dias_hasta_viernes = 4 - hoy.weekday()  # 0 si es viernes, positivo si es antes
-    if dias_hasta_viernes < 0:
-        # Si ya pasó el viernes, ir al viernes de la siguiente semana
-        dias_hasta_viernes += 7
-    viernes_semana_actual = hoy + timedelta(days=dias_hasta_viernes)
-    
-    # Para estadísticas de "Actividad Reciente", usamos desde el lunes de esta semana
-    # hasta el viernes de esta semana
-    fecha_inicio_semana = lunes_semana_actual
-    fecha_fin_semana = viernes_semana_actual
-    
-    reservas_semana = Reserva.objects.filter(
-        fecha_reserva__range=[fecha_inicio_semana, fecha_fin_semana]
-    ).count()
-    
-    # Reservas para hoy
-    reservas_hoy = Reserva.objects.filter(fecha_reserva=hoy).count()
-    
-    # =============================================
-    # 5. ESTADÍSTICAS DE ASISTENCIA (semana actual: Lunes a Viernes)
-    # =============================================
-    asistencia_semana = RegistroAsistencia.objects.filter(
-        fechaClase__range=[fecha_inicio_semana, fecha_fin_semana]
-    ).count()
-    
-    # Porcentaje promedio de asistencia
-    if asistencia_semana > 0:
-        total_estudiantes_asistencia = RegistroAsistenciaDetalle.objects.filter(
-            registro_asistencia__fechaClase__range=[fecha_inicio_semana, fecha_fin_semana]
-        ).count()
-        
-        presentes = RegistroAsistenciaDetalle.objects.filter(
-            registro_asistencia__fechaClase__range=[fecha_inicio_semana, fecha_fin_semana],
-            estado='PRESENTE'
-        ).count()
-        
-        porcentaje_asistencia = (presentes / total_estudiantes_asistencia * 100) if total_estudiantes_asistencia > 0 else 0
-    else:
-        porcentaje_asistencia = 0
-    
-    # =============================================
-    # 6. INFORMACIÓN DE GRUPOS ACTIVOS
-    # =============================================
-    # Grupos con profesor asignado
-    grupos_con_profesor = GrupoCurso.objects.filter(profesor__isnull=False).count()
-    grupos_sin_profesor = GrupoCurso.objects.filter(profesor__isnull=True).count()
-    
-    # Distribución por tipo de grupo
-    grupos_teoria = GrupoTeoria.objects.count()
-    grupos_laboratorio = GrupoLaboratorio.objects.count()
-    
-    # =============================================
-    # 7. TOP 5 CURSOS CON MÁS MATRÍCULAS
-    # =============================================
-    top_cursos = Curso.objects.annotate(
-        total_matriculas=Count('grupocurso__matricula', filter=Q(grupocurso__matricula__estado=True))
-    ).order_by('-total_matriculas')[:5]
+    })
+
+# ----------------------------------------------------------------------
+# 4. VISTAS DEL ADMINISTRADOR
+# ----------------------------------------------------------------------
+
+def check_administrador_auth(request):
+    """Función de ayuda para verificar la sesión y el rol de Admin."""
+    if not request.session.get('is_authenticated') or request.session.get('usuario_rol') != 'ADMIN':
+        messages.warning(request, "Acceso denegado o rol incorrecto.")
+        return None, redirect('usuarios:selector_rol')
     
-    # =============================================
-    # 8. AULAS MÁS UTILIZADAS
-    # =============================================
-    aulas_populares = Aula.objects.annotate(
-        total_bloques=Count('bloquehorario')
-    ).order_by('-total_bloques')[:5]
+    usuario_id = request.session['usuario_id']
+    try:
+        admin_obj = Administrador.objects.select_related('perfil').get(perfil_id=usuario_id)
+        return admin_obj, None
+    except Administrador.DoesNotExist:
+        messages.error(request, "Error: Datos de secretaria no encontrados.")
+        return None, redirect('usuarios:logout')
     
-    # =============================================
-    # 9. PROFESORES MÁS ACTIVOS (por cantidad de grupos)
-    # =============================================
-    profesores_activos = Profesor.objects.annotate(
-        total_grupos=Count('grupocurso')
-    ).order_by('-total_grupos')[:5]
-
-    cantidad_profesores_con_grupos = Profesor.objects.annotate(
-            total_grupos=Count('grupocurso')
-        ).filter(total_grupos__gt=0).count()
+def dashboard_admin(request):
+    """Muestra la página de inicio del dashboard de Administrador."""
+    admin_obj, response = check_administrador_auth(request)
+    if response:
+        return response
     
+    # Las métricas se leen del cache 'dashboard' y solo se recalculan las
+    # secciones invalidadas por cambios en los modelos (ver usuarios/metricas.py)
     contexto = {
         'perfil': admin_obj.perfil,
         'titulo': 'Panel de Control - Administrador',
-        
-        # Conteos básicos
-        'conteo_profesores': conteo_profesores,
-        'conteo_estudiantes': conteo_estudiantes,
-        'conteo_secretarias': conteo_secretarias,
-        'conteo_cursos': conteo_cursos,
-        'conteo_aulas': conteo_aulas,
-        
-        # Matrículas
-        'total_matriculas': total_matriculas,
-        'matriculas_teoria': matriculas_teoria,
-        'matriculas_lab': matriculas_lab,
-        
-        # Horarios
-        'total_bloques': total_bloques,
-        'bloques_aula_normal': bloques_aula_normal,
-        'bloques_laboratorio': bloques_laboratorio,
-        
-        # Reservas
-        'reservas_semana': reservas_semana,
-        'reservas_hoy': reservas_hoy,
-        
-        # Asistencia
-        'asistencia_semana': asistencia_semana,
-        'porcentaje_asistencia': round(porcentaje_asistencia, 1),
-        
-        # Grupos
-        'grupos_con_profesor': grupos_con_profesor,
-        'grupos_sin_profesor': grupos_sin_profesor,
-        'grupos_teoria': grupos_teoria,
-        'grupos_laboratorio': grupos_laboratorio,
-        
-        # Listados
-        'top_cursos': top_cursos,
-        'aulas_populares': aulas_populares,
-        'profesores_activos': profesores_activos,
-        'profesores_grupos_asignados': cantidad_profesores_con_grupos,
-        
-        # Fechas para referencia - Ahora muestra "Lunes Actual - Viernes Actual"
-        'hoy': hoy.strftime('%d/%m/%Y'),
-        'semana_pasada': fecha_inicio_semana.strftime('%d/%m/%Y'),  # Lunes de esta semana
-        'viernes_semana': fecha_fin_semana.strftime('%d/%m/%Y'),    # Viernes de esta semana
+        **obtener_metricas_dashboard(),
     }
     
     return render(request, 'usuarios/admin/dashboard_admin.html', contexto)
@@ -5585,64 +4029,8 @@ def gestion_cursos_admin(request):
                                 curso = Curso.objects.get(id=curso_id)
                                 capacidad_int = int(capacidad)
                                 
-                                # 3. Validar cada horario
-                                for i, h in enumerate(horarios, 1):
-                                    try:
-                                        aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    except ObjectDoesNotExist:
-                                        raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                    
-                                    # Validar campos requeridos
-                                    if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                        raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                    
-                                    # Convertir tiempos
-                                    try:
-                                        inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                        fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                    except ValueError:
-                                        raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                    
-                                    # Validar que inicio < fin
-                                    if inicio_time >= fin_time:
-                                        raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                    
-                                    # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                    horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                        aula=aula_obj,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_cruzados_aula.exists():
-                                        conflicto = horarios_cruzados_aula.first()
-                                        curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto.grupo_curso.grupo
-                                        raise ValueError(
-                                            f"Conflicto de horario en aula {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                            f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                        )
-                                    
-                                    # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                    if profesor:
-                                        # Buscar horarios donde el docente ya tenga clases asignadas
-                                        horarios_docente = BloqueHorario.objects.filter(
-                                            grupo_curso__profesor=profesor,
-                                            dia=h['dia']
-                                        ).exclude(
-                                            Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                        )
-                                        
-                                        if horarios_docente.exists():
-                                            conflicto_docente = horarios_docente.first()
-                                            curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                            grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                            aula_conflicto = conflicto_docente.aula.id
-                                            raise ValueError(
-                                                f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                                f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                            )
+                                # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                                bloques = validar_bloques(horarios, profesor)
 
                                 # 4. Crear el GrupoCurso base
                                 nuevo_grupo = GrupoCurso.objects.create(
@@ -5657,15 +4045,7 @@ def gestion_cursos_admin(request):
                                 GrupoTeoria.objects.create(grupo_curso=nuevo_grupo)
                                 
                                 # 6. Crear los Bloques de Horario
-                                for h in horarios:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    BloqueHorario.objects.create(
-                                        dia=h['dia'],
-                                        horaInicio=h['inicio'],
-                                        horaFin=h['fin'],
-                                        grupo_curso=nuevo_grupo,
-                                        aula=aula_obj
-                                    )
+                                crear_bloques(nuevo_grupo, bloques)
                             
                             messages.success(request, f"Grupo de teoría {letra_grupo} creado exitosamente.")
 
@@ -5706,88 +4086,16 @@ def gestion_cursos_admin(request):
                             profesor = Profesor.objects.get(perfil__id=profesor_id) if profesor_id else None
                             capacidad_int = int(capacidad) # Si no es un entero, lanza ValueError
                             
-                            # 3. Validar cada horario antes de eliminar los existentes
-                            for i, h in enumerate(horarios, 1):
-                                try:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                except ObjectDoesNotExist:
-                                    raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                
-                                # Validar campos requeridos
-                                if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                    raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                
-                                # Convertir tiempos
-                                try:
-                                    inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                    fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                except ValueError:
-                                    raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                
-                                # Validar que inicio < fin
-                                if inicio_time >= fin_time:
-                                    raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                
-                                # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                # Excluir los horarios del grupo actual que estamos editando
-                                horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                    aula=aula_obj,
-                                    dia=h['dia']
-                                ).exclude(
-                                    grupo_curso=grupo_curso  # Excluir los horarios del grupo actual
-                                ).exclude(
-                                    Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                )
-                                
-                                if horarios_cruzados_aula.exists():
-                                    conflicto = horarios_cruzados_aula.first()
-                                    curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                    grupo_conflicto = conflicto.grupo_curso.grupo
-                                    raise ValueError(
-                                        f"Conflicto de horario en aula {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                        f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                    )
-                                
-                                # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                if profesor:
-                                    # Buscar horarios donde el docente ya tenga clases asignadas
-                                    # Excluir los horarios del grupo actual que estamos editando
-                                    horarios_docente = BloqueHorario.objects.filter(
-                                        grupo_curso__profesor=profesor,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        grupo_curso=grupo_curso  # Excluir los horarios del grupo actual
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_docente.exists():
-                                        conflicto_docente = horarios_docente.first()
-                                        curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                        aula_conflicto = conflicto_docente.aula.id
-                                        raise ValueError(
-                                            f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                            f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                        )
+                            # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                            bloques = validar_bloques(horarios, profesor, excluir_grupo=grupo_curso)
 
                             # 4. Actualizar datos básicos
                             grupo_curso.profesor = profesor
                             grupo_curso.capacidad = capacidad_int
                             grupo_curso.save()
                             
-                            # 5. Actualizar horarios: Estrategia de reemplazo total (Borrar y crear)
-                            BloqueHorario.objects.filter(grupo_curso=grupo_curso).delete()
-                            
-                            for h in horarios:
-                                aula_obj = Aula.objects.get(id=h['aula_id'])
-                                BloqueHorario.objects.create(
-                                    dia=h['dia'],
-                                    horaInicio=h['inicio'],
-                                    horaFin=h['fin'],
-                                    grupo_curso=grupo_curso,
-                                    aula=aula_obj
-                                )
+                            # 5. Actualizar horarios: reemplazo total (borrar e insertar en bloque)
+                            crear_bloques(grupo_curso, bloques, reemplazar=True)
                         
                         messages.success(request, "Grupo actualizado correctamente.")
                     
@@ -5873,12 +4181,13 @@ def ver_horarios_clases_admin(request):
                 
                 # Obtener todas las actividades para esta aula
                 horario_completo = []
-                puntos_corte = set()
                 
                 # 1. OBTENER CLASES REGULARES (GrupoCurso con BloqueHorario)
                 bloques_clases = BloqueHorario.objects.filter(aula=aula).select_related(
                     'grupo_curso__curso',
-                    'grupo_curso__profesor__perfil'
+                    'grupo_curso__profesor__perfil',
+                    'grupo_curso__grupoteoria',
+                    'grupo_curso__grupolaboratorio'
                 ).order_by('horaInicio')
                 
                 print(f"DEBUG - Total bloques encontrados: {bloques_clases.count()}")
@@ -5918,10 +4227,6 @@ def ver_horarios_clases_admin(request):
                         'tipo': tipo
                     })
                     
-                    # Agregar puntos de corte (sin segundos/microsegundos)
-                    puntos_corte.add(bloque.horaInicio.replace(second=0, microsecond=0))
-                    puntos_corte.add(bloque.horaFin.replace(second=0, microsecond=0))
-                    
                     # Asignar color al curso
                     curso_id = bloque.grupo_curso.curso.id
                     if curso_id not in curso_colores:
@@ -5964,139 +4269,61 @@ def ver_horarios_clases_admin(request):
                             'motivo': "RESERVA",
                             'tipo': 'RES'
                         })
-                        
-                        # Agregar puntos de corte
-                        puntos_corte.add(reserva.hora_inicio.replace(second=0, microsecond=0))
-                        puntos_corte.add(reserva.hora_fin.replace(second=0, microsecond=0))
                 
                 print(f"DEBUG - Total actividades: {len(horario_completo)}")
-                print(f"DEBUG - Puntos de corte: {len(puntos_corte)}")
                 
                 # ======================================================================
-                # GENERAR HORAS DINÁMICAS
+                # GENERAR HORAS Y ESTRUCTURAR DATOS DEL HORARIO
                 # ======================================================================
-                # Convertir puntos de corte de 'time' a 'datetime'
-                dummy_date = hoy
-                puntos_corte_dt = sorted(list(set([
-                    datetime.combine(dummy_date, t) for t in puntos_corte
-                ])))
-                
-                # Crear intervalos de hora
-                horas = []
-                hora_actual = None
-                
-                for dt_siguiente in puntos_corte_dt:
-                    if hora_actual is None:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    dt_inicio_fila = hora_actual
-                    dt_fin_fila = dt_siguiente
-
-                    duracion_minutos = (dt_fin_fila - dt_inicio_fila).total_seconds() / 60
-                    if duracion_minutos < 11:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    if dt_inicio_fila >= dt_fin_fila:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    # Formatear rango de hora
-                    hora_inicio_str = dt_inicio_fila.strftime("%H:%M")
-                    hora_fin_str = dt_fin_fila.strftime("%H:%M")
-                    horas.append(f"{hora_inicio_str} - {hora_fin_str}")
-                    
-                    hora_actual = dt_siguiente
-                
-                # Si no hay actividades, usar horas por defecto
-                if not horas:
-                    hora_actual = datetime.strptime('07:00', '%H:%M')
-                    hora_final = datetime.strptime('21:00', '%H:%M')
-                    
-                    while hora_actual < hora_final:
-                        hora_str = hora_actual.strftime('%H:%M')
-                        hora_siguiente = hora_actual + timedelta(hours=1)
-                        horas.append(f"{hora_str} - {hora_siguiente.strftime('%H:%M')}")
-                        hora_actual = hora_siguiente
+                horas, actividades_por_celda = grilla_actividades(horario_completo)
                 
                 print(f"DEBUG - Horas generadas: {horas}")
                 
-                # ======================================================================
-                # ESTRUCTURAR DATOS DEL HORARIO
-                # ======================================================================
-                dias = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
                 horario_data = {}
-                
-                # Para cada intervalo de hora
-                for hora_idx, rango_hora in enumerate(horas):
-                    hora_inicio_str, hora_fin_str = rango_hora.split(" - ")
-                    
-                    # Convertir a datetime para comparar
-                    try:
-                        hora_inicio_dt = datetime.strptime(hora_inicio_str, "%H:%M").time()
-                        hora_fin_dt = datetime.strptime(hora_fin_str, "%H:%M").time()
-                    except:
-                        # Si hay error, saltar este intervalo
-                        continue
-                    
+                for hora_idx, fila in enumerate(actividades_por_celda):
                     horario_data[str(hora_idx)] = {}
                     
-                    # Para cada día
-                    for dia_idx, dia_key in enumerate(dias):
+                    for dia_idx, actividad in enumerate(fila):
                         actividad_en_slot = None
                         
-                        # Buscar actividad que coincida en este slot
-                        for actividad in horario_completo:
-                            # Verificar si es el día correcto
-                            if actividad['dia'] != dia_key:
-                                continue
-                            
-                            # Verificar si la actividad cubre este intervalo
-                            actividad_inicio = actividad['horaInicio']
-                            actividad_fin = actividad['horaFin']
+                        if actividad is None:
+                            pass
+                        
+                        # Es una clase regular
+                        elif actividad['tipo_actividad'] == 'CLASE':
+                            curso = actividad['curso']
+                            curso_id = str(curso.id)
                             
-                            if actividad_inicio <= hora_inicio_dt and actividad_fin > hora_inicio_dt:
-                                print(f"DEBUG - ¡COINCIDE! Actividad encontrada para {dia_key} {rango_hora}")
-                                
-                                # Es una clase regular
-                                if actividad['tipo_actividad'] == 'CLASE':
-                                    curso = actividad['curso']
-                                    curso_id = str(curso.id)
-                                    
-                                    actividad_en_slot = {
-                                        'tipo': actividad['tipo'],
-                                        'nombre': curso.nombre,
-                                        'codigo_curso': curso_id,
-                                        'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': curso_colores.get(curso_id, 'bg-secondary'),
-                                        'hora_inicio': actividad_inicio.strftime("%H:%M:%S"),
-                                        'hora_fin': actividad_fin.strftime("%H:%M:%S"),
-                                        'es_reserva': False
-                                    }
-                                
-                                # Es una reserva
-                                else:
-                                    actividad_en_slot = {
-                                        'tipo': 'RES',
-                                        'nombre': actividad.get('motivo', 'Reserva de Aula'),
-                                        'codigo_curso': 'RES',
-                                        'codigo_grupo': 'RESERVA',
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': 'bg-secondary',
-                                        'hora_inicio': actividad_inicio.strftime("%H:%M:%S"),
-                                        'hora_fin': actividad_fin.strftime("%H:%M:%S"),
-                                        'es_reserva': True,
-                                        'motivo': actividad.get('motivo', '')
-                                    }
-                                break
+                            actividad_en_slot = {
+                                'tipo': actividad['tipo'],
+                                'nombre': curso.nombre,
+                                'codigo_curso': curso_id,
+                                'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
+                                'profesor': actividad['profesor_nombre'],
+                                'aula_id': aula.id,
+                                'color': curso_colores.get(curso_id, 'bg-secondary'),
+                                'hora_inicio': actividad['horaInicio'].strftime("%H:%M:%S"),
+                                'hora_fin': actividad['horaFin'].strftime("%H:%M:%S"),
+                                'es_reserva': False
+                            }
+                        
+                        # Es una reserva
+                        else:
+                            actividad_en_slot = {
+                                'tipo': 'RES',
+                                'nombre': actividad.get('motivo', 'Reserva de Aula'),
+                                'codigo_curso': 'RES',
+                                'codigo_grupo': 'RESERVA',
+                                'profesor': actividad['profesor_nombre'],
+                                'aula_id': aula.id,
+                                'color': 'bg-secondary',
+                                'hora_inicio': actividad['horaInicio'].strftime("%H:%M:%S"),
+                                'hora_fin': actividad['horaFin'].strftime("%H:%M:%S"),
+                                'es_reserva': True,
+                                'motivo': actividad.get('motivo', '')
+                            }
                         
                         horario_data[str(hora_idx)][str(dia_idx)] = actividad_en_slot
-                        if actividad_en_slot:
-                            print(f"DEBUG - Asignado: [{hora_idx}][{dia_idx}] = {actividad_en_slot['nombre']}")
                 
                 return JsonResponse({
                     'ok': True,
@@ -6123,249 +4350,23 @@ def ver_horarios_clases_admin(request):
             
             try:
                 aula = Aula.objects.get(id=aula_id)
-                
-                # USAR LA MISMA LÓGICA QUE EN LA VISTA PRINCIPAL
-                from django.utils import timezone
                 hoy = date.today()
-                inicio_semana = hoy - timedelta(days=hoy.weekday())
-                fin_semana = inicio_semana + timedelta(days=4)
-                
-                # 1. Obtener datos EXACTAMENTE como en la vista principal
-                COLOR_OPTIONS = ['bg-primary', 'bg-success', 'bg-info', 'bg-warning', 'bg-danger', 'bg-secondary']
-                curso_colores = {}
-                color_index = 0
-                
-                horario_completo = []
-                puntos_corte = set()
-                
-                # BloqueHorario para esta aula
-                bloques_clases = BloqueHorario.objects.filter(aula=aula).select_related(
-                    'grupo_curso__curso',
-                    'grupo_curso__profesor__perfil'
-                ).order_by('horaInicio')
-                
-                for bloque in bloques_clases:
-                    tipo = "TEO"
-                    try:
-                        bloque.grupo_curso.grupoteoria
-                    except:
-                        tipo = "LAB"
-                    
-                    profesor_nombre = ""
-                    if bloque.grupo_curso.profesor and bloque.grupo_curso.profesor.perfil:
-                        profesor_nombre = bloque.grupo_curso.profesor.perfil.nombre
-                    
-                    horario_completo.append({
-                        'tipo_actividad': 'CLASE',
-                        'bloque': bloque,
-                        'horaInicio': bloque.horaInicio,
-                        'horaFin': bloque.horaFin,
-                        'dia': bloque.dia,
-                        'curso': bloque.grupo_curso.curso,
-                        'profesor_nombre': profesor_nombre,
-                        'grupo': bloque.grupo_curso.grupo,
-                        'tipo': tipo
-                    })
-                    
-                    puntos_corte.add(bloque.horaInicio.replace(second=0, microsecond=0))
-                    puntos_corte.add(bloque.horaFin.replace(second=0, microsecond=0))
-                    
-                    curso_id = bloque.grupo_curso.curso.id
-                    if curso_id not in curso_colores:
-                        curso_colores[curso_id] = COLOR_OPTIONS[color_index % len(COLOR_OPTIONS)]
-                        color_index += 1
-                
-                # Reservas
-                reservas = Reserva.objects.filter(
-                    aula=aula,
-                    fecha_reserva__range=[inicio_semana, fin_semana]
-                ).select_related('profesor__perfil')
-                
-                for reserva in reservas:
-                    profesor_nombre = ""
-                    if reserva.profesor and reserva.profesor.perfil:
-                        profesor_nombre = reserva.profesor.perfil.nombre
-                    
-                    dia_semana = reserva.fecha_reserva.weekday()
-                    dias_semana = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
-                    dia = dias_semana[dia_semana] if dia_semana < 5 else None
-                    
-                    if dia:
-                        horario_completo.append({
-                            'tipo_actividad': 'RESERVA',
-                            'reserva': reserva,
-                            'horaInicio': reserva.hora_inicio,
-                            'horaFin': reserva.hora_fin,
-                            'dia': dia,
-                            'curso': None,
-                            'profesor_nombre': profesor_nombre,
-                            'motivo': 'RESERVA',
-                            'tipo': 'RES'
-                        })
-                        
-                        puntos_corte.add(reserva.hora_inicio.replace(second=0, microsecond=0))
-                        puntos_corte.add(reserva.hora_fin.replace(second=0, microsecond=0))
-                
-                # 2. Generar horas dinámicas (MISMA LÓGICA)
-                dummy_date = hoy
-                puntos_corte_dt = sorted(list(set([
-                    datetime.combine(dummy_date, t) for t in puntos_corte
-                ])))
-                
-                horas = []
-                hora_actual = None
-                
-                for dt_siguiente in puntos_corte_dt:
-                    if hora_actual is None:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    dt_inicio_fila = hora_actual
-                    dt_fin_fila = dt_siguiente
-
-                    duracion_minutos = (dt_fin_fila - dt_inicio_fila).total_seconds() / 60
-                    if duracion_minutos < 11:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    if dt_inicio_fila >= dt_fin_fila:
-                        hora_actual = dt_siguiente
-                        continue
-                    
-                    hora_inicio_str = dt_inicio_fila.strftime("%H:%M")
-                    hora_fin_str = dt_fin_fila.strftime("%H:%M")
-                    horas.append(f"{hora_inicio_str} - {hora_fin_str}")
-                    
-                    hora_actual = dt_siguiente
-                
-                if not horas:
-                    hora_actual = datetime.strptime('07:00', '%H:%M')
-                    hora_final = datetime.strptime('21:00', '%H:%M')
-                    
-                    while hora_actual < hora_final:
-                        hora_str = hora_actual.strftime('%H:%M')
-                        hora_siguiente = hora_actual + timedelta(hours=1)
-                        horas.append(f"{hora_str} - {hora_siguiente.strftime('%H:%M')}")
-                        hora_actual = hora_siguiente
-                
-                print(f"PDF DEBUG - Horas dinámicas: {len(horas)} intervalos")
-                print(f"PDF DEBUG - Primeras horas: {horas[:3]}")
-                
-                # 3. Estructurar datos (MISMA LÓGICA)
-                dias = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
-                dias_display = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
-                horario_data = {}
-                
-                # Para cada intervalo de hora
-                for hora_idx, rango_hora in enumerate(horas):
-                    hora_inicio_str, hora_fin_str = rango_hora.split(" - ")
-                    
-                    try:
-                        hora_inicio_dt = datetime.strptime(hora_inicio_str, "%H:%M").time()
-                        hora_fin_dt = datetime.strptime(hora_fin_str, "%H:%M").time()
-                    except:
-                        continue
-                    
-                    horario_data[str(hora_idx)] = {}
-                    
-                    # Para cada día
-                    for dia_idx, dia_key in enumerate(dias):
-                        actividad_en_slot = None
-                        
-                        # Buscar actividad que coincida en este slot
-                        for actividad in horario_completo:
-                            # Verificar si es el día correcto
-                            if actividad['dia'] != dia_key:
-                                continue
-                            
-                            # Convertir horas de actividad
-                            act_inicio = datetime.combine(dummy_date, actividad['horaInicio'])
-                            act_fin = datetime.combine(dummy_date, actividad['horaFin'])
-                            hora_inicio_dt_full = datetime.combine(dummy_date, hora_inicio_dt)
-                            
-                            # MISMA LÓGICA EXACTA: act_inicio <= hora_inicio_dt_full AND act_fin > hora_inicio_dt_full
-                            if act_inicio <= hora_inicio_dt_full and act_fin > hora_inicio_dt_full:
-                                
-                                # Es una clase regular
-                                if actividad['tipo_actividad'] == 'CLASE':
-                                    curso = actividad['curso']
-                                    curso_id = str(curso.id)
-                                    
-                                    actividad_en_slot = {
-                                        'tipo': actividad['tipo'],
-                                        'nombre': curso.nombre,
-                                        'codigo_curso': curso_id,
-                                        'codigo_grupo': f"{curso_id}-{actividad['grupo']}",
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': curso_colores.get(curso_id, 'bg-secondary'),
-                                        'hora_inicio': actividad['horaInicio'].strftime("%H:%M"),
-                                        'hora_fin': actividad['horaFin'].strftime("%H:%M"),
-                                        'es_reserva': False
-                                    }
-                                
-                                # Es una reserva
-                                else:
-                                    actividad_en_slot = {
-                                        'tipo': 'RES',
-                                        'nombre': actividad.get('motivo', 'Reserva de Aula'),
-                                        'codigo_curso': 'RES',
-                                        'codigo_grupo': 'RESERVA',
-                                        'profesor': actividad['profesor_nombre'],
-                                        'aula_id': aula.id,
-                                        'color': 'bg-secondary',
-                                        'hora_inicio': actividad['horaInicio'].strftime("%H:%M"),
-                                        'hora_fin': actividad['horaFin'].strftime("%H:%M"),
-                                        'es_reserva': True,
-                                        'motivo': actividad.get('motivo', '')
-                                    }
-                                break
-                        
-                        horario_data[str(hora_idx)][str(dia_idx)] = actividad_en_slot
-                
-                # DEBUG
-                print(f"PDF DEBUG - Estructura final:")
-                for hora_idx in range(len(horas)):
-                    for dia_idx in range(len(dias)):
-                        celda = horario_data[str(hora_idx)][str(dia_idx)]
-                        if celda:
-                            print(f"  [{hora_idx}][{dia_idx}]: {celda['nombre'][:20]}")
-                
-                curso_colores_map = {}
-                for i, (curso_id, _) in enumerate(curso_colores.items()):
-                    curso_colores_map[str(curso_id)] = f"color-{i % 10}"
 
-                # Preparar contexto
-                contexto = {
-                    'aula': aula,
-                    'horas': horas,
-                    'horas_range': range(len(horas)),
-                    'num_horas': len(horas),
-                    'dias': dias_display,
-                    'dias_range': range(len(dias)),
-                    'horario_data': horario_data,
-                    'curso_colores_map': curso_colores_map,
-                    'fecha_emision': hoy.strftime("%d/%m/%Y"),
-                    'semana_actual': f"{inicio_semana.strftime('%d/%m')} - {fin_semana.strftime('%d/%m')}"
-                }
-                
-                # Renderizar template
-                html_string = render_to_string('usuarios/secretaria/horario_aula_pdf.html', contexto)
-                
-                # Crear PDF
-                response = HttpResponse(content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="horario_aula_{aula.id}_{hoy.strftime("%Y%m%d")}.pdf"'
-                
-                pisa_status = pisa.CreatePDF(
-                    html_string, 
-                    dest=response,
-                    encoding='UTF-8'
+                # El PDF lo genera el worker `procesar_exportaciones`; aquí solo se encola
+                trabajo = encolar_exportacion(
+                    'HORARIO_AULA_PDF',
+                    {'aula_id': aula.id, 'fecha': hoy.isoformat()},
+                    request.session.get('usuario_id'),
+                    f"horario_aula_{aula.id}_{hoy.strftime('%Y%m%d')}.pdf",
                 )
-                
-                if pisa_status.err:
-                    return HttpResponse('Error al generar PDF', status=500)
-                
-                return response
+
+                return JsonResponse({
+                    'ok': True,
+                    'trabajo_id': trabajo.id,
+                    'estado': trabajo.estado,
+                    'url_estado': reverse('usuarios:estado_exportacion', args=[trabajo.id]),
+                    'url_descarga': reverse('usuarios:descargar_exportacion', args=[trabajo.id]),
+                })
                 
             except Aula.DoesNotExist:
                 return JsonResponse({'ok': False, 'msg': 'Aula no encontrada'})
@@ -6544,68 +4545,8 @@ def gestion_laboratorios_admin(request):
                                 if profesor and not profesor.es_lab:
                                     raise ValueError(f"El profesor {profesor.perfil.nombre} no está habilitado para laboratorios.")
                                 
-                                # 3. Validar cada horario
-                                for i, h in enumerate(horarios, 1):
-                                    try:
-                                        aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    except ObjectDoesNotExist:
-                                        raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                    
-                                    # Validar que el aula sea de tipo laboratorio
-                                    if aula_obj.tipo != 'LABORATORIO':
-                                        raise ValueError(f"El aula {aula_obj.id} no es un laboratorio. Solo se pueden usar aulas tipo LABORATORIO.")
-                                    
-                                    # Validar campos requeridos
-                                    if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                        raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                    
-                                    # Convertir tiempos
-                                    try:
-                                        inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                        fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                    except ValueError:
-                                        raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                    
-                                    # Validar que inicio < fin
-                                    if inicio_time >= fin_time:
-                                        raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                    
-                                    # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                    horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                        aula=aula_obj,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_cruzados_aula.exists():
-                                        conflicto = horarios_cruzados_aula.first()
-                                        curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto.grupo_curso.grupo
-                                        raise ValueError(
-                                            f"Conflicto de horario en laboratorio {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                            f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                        )
-                                    
-                                    # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                    if profesor:
-                                        # Buscar horarios donde el docente ya tenga clases asignadas
-                                        horarios_docente = BloqueHorario.objects.filter(
-                                            grupo_curso__profesor=profesor,
-                                            dia=h['dia']
-                                        ).exclude(
-                                            Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                        )
-                                        
-                                        if horarios_docente.exists():
-                                            conflicto_docente = horarios_docente.first()
-                                            curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                            grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                            aula_conflicto = conflicto_docente.aula.id
-                                            raise ValueError(
-                                                f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                                f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                            )
+                                # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                                bloques = validar_bloques(horarios, profesor, solo_laboratorio=True)
 
                                 # 4. Crear el GrupoCurso base
                                 nuevo_grupo = GrupoCurso.objects.create(
@@ -6620,15 +4561,7 @@ def gestion_laboratorios_admin(request):
                                 GrupoLaboratorio.objects.create(grupo_curso=nuevo_grupo)
                                 
                                 # 6. Crear los Bloques de Horario
-                                for h in horarios:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                    BloqueHorario.objects.create(
-                                        dia=h['dia'],
-                                        horaInicio=h['inicio'],
-                                        horaFin=h['fin'],
-                                        grupo_curso=nuevo_grupo,
-                                        aula=aula_obj
-                                    )
+                                crear_bloques(nuevo_grupo, bloques)
                             
                             messages.success(request, f"Laboratorio {letra_grupo} creado exitosamente.")
 
@@ -6680,92 +4613,16 @@ def gestion_laboratorios_admin(request):
                             if profesor and not profesor.es_lab:
                                 raise ValueError(f"El profesor {profesor.perfil.nombre} no está habilitado para laboratorios.")
                             
-                            # 3. Validar cada horario antes de eliminar los existentes
-                            for i, h in enumerate(horarios, 1):
-                                try:
-                                    aula_obj = Aula.objects.get(id=h['aula_id'])
-                                except ObjectDoesNotExist:
-                                    raise ValueError(f"El aula con ID '{h['aula_id']}' no existe.")
-                                
-                                # Validar que el aula sea de tipo laboratorio
-                                if aula_obj.tipo != 'LABORATORIO':
-                                    raise ValueError(f"El aula {aula_obj.id} no es un laboratorio. Solo se pueden usar aulas tipo LABORATORIO.")
-                                
-                                # Validar campos requeridos
-                                if not h.get('dia') or not h.get('inicio') or not h.get('fin'):
-                                    raise ValueError(f"El horario {i} tiene campos incompletos.")
-                                
-                                # Convertir tiempos
-                                try:
-                                    inicio_time = datetime.strptime(h['inicio'], '%H:%M:%S').time()
-                                    fin_time = datetime.strptime(h['fin'], '%H:%M:%S').time()
-                                except ValueError:
-                                    raise ValueError(f"Formato de hora inválido en horario {i}. Use HH:MM:SS")
-                                
-                                # Validar que inicio < fin
-                                if inicio_time >= fin_time:
-                                    raise ValueError(f"El horario {i} tiene hora de inicio ({h['inicio']}) mayor o igual a la hora de fin ({h['fin']}).")
-                                
-                                # 3.1 Verificar cruce con horarios existentes en la misma aula
-                                # Excluir los horarios del laboratorio actual que estamos editando
-                                horarios_cruzados_aula = BloqueHorario.objects.filter(
-                                    aula=aula_obj,
-                                    dia=h['dia']
-                                ).exclude(
-                                    grupo_curso=grupo_curso  # Excluir los horarios del laboratorio actual
-                                ).exclude(
-                                    Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                )
-                                
-                                if horarios_cruzados_aula.exists():
-                                    conflicto = horarios_cruzados_aula.first()
-                                    curso_conflicto = conflicto.grupo_curso.curso.nombre
-                                    grupo_conflicto = conflicto.grupo_curso.grupo
-                                    raise ValueError(
-                                        f"Conflicto de horario en laboratorio {aula_obj.id} el día {h['dia']} de {h['inicio']} a {h['fin']}. "
-                                        f"Ya existe la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en ese horario."
-                                    )
-                                
-                                # 3.2 Verificar disponibilidad del docente (si se asignó un profesor)
-                                if profesor:
-                                    # Buscar horarios donde el docente ya tenga clases asignadas
-                                    # Excluir los horarios del laboratorio actual que estamos editando
-                                    horarios_docente = BloqueHorario.objects.filter(
-                                        grupo_curso__profesor=profesor,
-                                        dia=h['dia']
-                                    ).exclude(
-                                        grupo_curso=grupo_curso  # Excluir los horarios del laboratorio actual
-                                    ).exclude(
-                                        Q(horaFin__lte=inicio_time) | Q(horaInicio__gte=fin_time)
-                                    )
-                                    
-                                    if horarios_docente.exists():
-                                        conflicto_docente = horarios_docente.first()
-                                        curso_conflicto = conflicto_docente.grupo_curso.curso.nombre
-                                        grupo_conflicto = conflicto_docente.grupo_curso.grupo
-                                        aula_conflicto = conflicto_docente.aula.id
-                                        raise ValueError(
-                                            f"El profesor {profesor.perfil.nombre} ya tiene clase asignada el día {h['dia']} entre {h['inicio']} a {h['fin']}. "
-                                            f"Está asignado a la clase '{curso_conflicto}' (Grupo {grupo_conflicto}) en el aula {aula_conflicto} en ese horario."
-                                        )
+                            # 3. Validar todos los horarios (aulas, cruces existentes y cruces entre sí)
+                            bloques = validar_bloques(horarios, profesor, excluir_grupo=grupo_curso, solo_laboratorio=True)
 
                             # 4. Actualizar datos básicos
                             grupo_curso.profesor = profesor
                             grupo_curso.capacidad = capacidad_int
                             grupo_curso.save()
                             
-                            # 5. Actualizar horarios: Estrategia de reemplazo total (Borrar y crear)
-                            BloqueHorario.objects.filter(grupo_curso=grupo_curso).delete()
-                            
-                            for h in horarios:
-                                aula_obj = Aula.objects.get(id=h['aula_id'])
-                                BloqueHorario.objects.create(
-                                    dia=h['dia'],
-                                    horaInicio=h['inicio'],
-                                    horaFin=h['fin'],
-                                    grupo_curso=grupo_curso,
-                                    aula=aula_obj
-                                )
+                            # 5. Actualizar horarios: reemplazo total (borrar e insertar en bloque)
+                            crear_bloques(grupo_curso, bloques, reemplazar=True)
                         
                         messages.success(request, "Laboratorio actualizado correctamente.")
                     
@@ -6838,47 +4695,8 @@ def registro_estudiantes_admin(request):
 
             # Convertimos a texto UTF-8
             decoded = file.read().decode("utf-8")
-            reader = csv.reader(decoded.splitlines())
-
-            # Formato esperado (sin encabezados):
-            # cui, nombre, email, password
-            for row in reader:
-                if len(row) < 4:
-                    continue
-
-                cui = row[0].strip()
-                nombre = row[1].strip()
-                email = row[2].strip() if row[2].strip() else None
-                password = row[3].strip()
-
-                if not (cui and nombre and password):
-                    continue  # Campos obligatorios
-
-                # Crear o actualizar Perfil
-                perfil, created = Perfil.objects.get_or_create(
-                    id=cui,
-                    defaults={
-                        "nombre": nombre,
-                        "email": email,
-                        "password": password,
-                        "rol": "ESTUDIANTE",
-                        "estadoCuenta": True
-                    }
-                )
-
-                # Si el perfil ya existe, actualizar nombre/email/password si cambian
-                if not created:
-                    perfil.nombre = nombre
-                    perfil.email = email
-                    perfil.password = password
-                    perfil.rol = "ESTUDIANTE"
-                    perfil.estadoCuenta = True
-                    perfil.save()
-
-                # Crear estudiante si no existe
-                Estudiante.objects.get_or_create(perfil=perfil)
-
-            messages.success(request, "CSV procesado correctamente.")
+            resultado = importar_perfiles(leer_filas_csv(decoded), "ESTUDIANTE")
+            mensajes_importacion(request, resultado)
 
         except Exception as e:
             messages.error(request, f"Error procesando CSV: {str(e)}")
@@ -7114,8 +4932,6 @@ def detalle_estudiante_admin(request):
     ).order_by('-registro_asistencia__fechaClase')[:30]
 
     asistencias = []
-    total_presentes = 0
-    total_faltas = 0
 
     for d in asistencias_qs:
         fecha = d.registro_asistencia.fechaClase.strftime("%Y-%m-%d")
@@ -7123,11 +4939,6 @@ def detalle_estudiante_admin(request):
         curso_nombre = grupo.curso.nombre if grupo and grupo.curso else ''
         estado = d.estado
 
-        if estado == 'PRESENTE':
-            total_presentes += 1
-        else:
-            total_faltas += 1
-
         asistencias.append({
             'fecha': fecha,
             'grupo_id': grupo.id if grupo else '',
@@ -7135,11 +4946,8 @@ def detalle_estudiante_admin(request):
             'estado': estado
         })
 
-    resumen = {
-        'total_matriculas': matriculas_qs.count(),
-        'total_presentes': total_presentes,
-        'total_faltas': total_faltas
-    }
+    # Totales de matrículas y asistencia (todas las sesiones) desde el resumen académico
+    resumen = obtener_resumen(estudiante)
 
     contexto = {
         'perfil': perfil_obj,
@@ -7304,44 +5112,8 @@ def registro_profesores_admin(request):
                 return redirect("usuarios:registro_profesores_admin")
 
             decoded = file.read().decode("utf-8")
-            reader = csv.reader(decoded.splitlines())
-
-            # Formato esperado:
-            # cui, nombre, email, password
-            for row in reader:
-                if len(row) < 4:
-                    continue
-
-                codigo = row[0].strip()
-                nombre = row[1].strip()
-                email = row[2].strip() or None
-                password = row[3].strip()
-
-                if not (codigo and nombre and password):
-                    continue
-
-                perfil, created = Perfil.objects.get_or_create(
-                    id=codigo,
-                    defaults={
-                        "nombre": nombre,
-                        "email": email,
-                        "password": password,
-                        "rol": "PROFESOR",
-                        "estadoCuenta": True
-                    }
-                )
-
-                if not created:
-                    perfil.nombre = nombre
-                    perfil.email = email
-                    perfil.password = password
-                    perfil.rol = "PROFESOR"
-                    perfil.estadoCuenta = True
-                    perfil.save()
-
-                Profesor.objects.get_or_create(perfil=perfil)
-
-            messages.success(request, "CSV procesado correctamente.")
+            resultado = importar_perfiles(leer_filas_csv(decoded), "PROFESOR")
+            mensajes_importacion(request, resultado)
 
         except Exception as e:
             messages.error(request, f"Error procesando CSV: {str(e)}")
@@ -7643,4 +5415,51 @@ def registro_secretarias(request):
         "secretarias": secretarias,
         "titulo": "Gestión de Secretarias"
     }
-    return render(request, "usuarios/admin/registro_secretarias.html", context)
\ No newline at end of file
+    return render(request, "usuarios/admin/registro_secretarias.html", context)
+
+# ----------------------------------------------------------------------
+# 5. EXPORTACIONES EN SEGUNDO PLANO (compartidas por todos los roles)
+# ----------------------------------------------------------------------
+
+def obtener_trabajo_exportacion(request, trabajo_id):
+    """Trabajo de exportación del usuario en sesión (None si no existe o no es suyo)."""
+    if not request.session.get('is_authenticated'):
+        return None
+    return TrabajoExportacion.objects.filter(
+        id=trabajo_id,
+        solicitado_por_id=request.session.get('usuario_id'),
+    ).first()
+
+def estado_exportacion(request, trabajo_id):
+    """Estado de un trabajo de exportación (consultado por polling desde los templates)."""
+    trabajo = obtener_trabajo_exportacion(request, trabajo_id)
+    if trabajo is None:
+        return JsonResponse({'ok': False, 'msg': 'Exportación no encontrada'}, status=404)
+
+    data = {
+        'ok': True,
+        'trabajo_id': trabajo.id,
+        'estado': trabajo.estado,
+        'intentos': trabajo.intentos,
+    }
+    if trabajo.estado == 'COMPLETADO':
+        data['url_descarga'] = reverse('usuarios:descargar_exportacion', args=[trabajo.id])
+    elif trabajo.estado == 'ERROR':
+        data['msg'] = f'No se pudo generar el archivo: {trabajo.error}'
+    return JsonResponse(data)
+
+def descargar_exportacion(request, trabajo_id):
+    """Descarga el archivo generado por el worker."""
+    trabajo = obtener_trabajo_exportacion(request, trabajo_id)
+    if trabajo is None:
+        raise Http404("Exportación no encontrada")
+
+    if trabajo.estado != 'COMPLETADO' or not trabajo.ruta_archivo:
+        return HttpResponse('La exportación todavía no está lista.', status=409)
+
+    try:
+        archivo = open(ruta_absoluta(trabajo.ruta_archivo), 'rb')
+    except FileNotFoundError:
+        raise Http404("El archivo de la exportación ya no existe. Vuelva a solicitarla.")
+
+    return FileResponse(archivo, as_attachment=True, filename=trabajo.nombre_descarga)